@@ -0,0 +1,114 @@
+"""
+Import-time profile of the step, model and pipeline modules.
+
+Each module is imported in a fresh interpreter with `-X importtime`; the report
+lists its total import time, the heaviest top-level packages it pulled in and
+whether any of the deferred dependencies (TensorFlow, ZenML, MLflow, matplotlib)
+were loaded. With --budget the script exits non-zero when a module is slower.
+
+Usage:
+    python -m benchmarks.import_time --budget 1.0
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+MODULES = (
+    "model.data_cleaning",
+    "model.model_dev",
+    "model.evaluation",
+    "steps.config",
+    "steps.ingest_data",
+    "steps.clean_data",
+    "steps.model_train",
+    "steps.evaluation",
+    "steps.calibration",
+    "steps.publish",
+    "steps.export_tiles",
+    "steps.similarity_index",
+    "steps.cross_validation",
+    "pipelines.local_runner",
+)
+
+# Dependencies that must only be imported when a step actually runs
+DEFERRED_PACKAGES = ("tensorflow", "keras", "zenml", "mlflow", "matplotlib", "seaborn")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_module(module: str, top: int = 5) -> Dict:
+    """
+    Import `module` in a fresh interpreter and parse its -X importtime output.
+
+    Args:
+        module (str): Dotted module name.
+        top (int): Number of heaviest top-level packages to report.
+
+    Returns:
+        dict: seconds, heaviest packages and the deferred packages that were loaded.
+    """
+    probe = (
+        f"import sys, {module}; "
+        f"print(','.join(p for p in {DEFERRED_PACKAGES!r} if p in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    packages: Dict[str, int] = {}
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:  # the column header line
+            continue
+        name = fields[2][1:].rstrip()
+        # Self times are attributed to the top-level package that paid them;
+        # cumulative times of unindented (top-level) entries sum to the total
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + own
+        if name == name.lstrip():
+            total_us += cumulative
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    deferred = [name for name in completed.stdout.strip().split(",") if name]
+    return {
+        "module": module,
+        "seconds": total_us / 1e6,
+        "heaviest": [{"package": name, "seconds": us / 1e6} for name, us in heaviest],
+        "deferred_loaded": deferred,
+    }
+
+
+def run(modules: List[str], budget: float = None, output: str = None) -> int:
+    results = [profile_module(module) for module in modules]
+    failures = 0
+    print(f"{'module':<26} {'import s':>9}  heaviest packages")
+    for result in results:
+        heaviest = ", ".join(f"{h['package']} {h['seconds']:.2f}s" for h in result["heaviest"][:3])
+        flag = ""
+        if result["deferred_loaded"]:
+            flag = f"  loads {', '.join(result['deferred_loaded'])}"
+            failures += 1
+        elif budget is not None and result["seconds"] > budget:
+            flag = f"  over budget ({budget:.2f}s)"
+            failures += 1
+        print(f"{result['module']:<26} {result['seconds']:>9.3f}  {heaviest}{flag}")
+    if output:
+        with open(output, "w") as fid:
+            json.dump(results, fid, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(MODULES))
+    parser.add_argument("--budget", type=float, default=None, help="Max seconds per module import")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+    sys.exit(run(args.modules, args.budget, args.output))
@@ -0,0 +1,84 @@
+"""
+Save/load throughput of the HyperspectralMaterializer formats against pickle.
+
+Usage:
+    python -m benchmarks.materializer_benchmark --pixels 200000 --bands 373
+"""
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from materializer.formats import load_artifact, read_header, save_artifact
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _pickle_roundtrip(obj, directory):
+    path = os.path.join(directory, "data.pkl")
+
+    def save():
+        with open(path, "wb") as fid:
+            pickle.dump(obj, fid, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load():
+        with open(path, "rb") as fid:
+            return pickle.load(fid)
+
+    _, save_time = _timed(save)
+    _, load_time = _timed(load)
+    return save_time, load_time
+
+
+def _format_roundtrip(obj, directory, touch):
+    _, save_time = _timed(lambda: save_artifact(obj, directory))
+    loaded, open_time = _timed(lambda: load_artifact(directory, read_header(directory)))
+    # Opening a memory-mapped artifact is lazy; also time a full read of the data
+    _, touch_time = _timed(lambda: touch(loaded))
+    return save_time, open_time, open_time + touch_time
+
+
+def run(pixels: int, bands: int) -> None:
+    rng = np.random.default_rng(0)
+    X = rng.random((pixels, bands, 1), dtype=np.float32)
+    frame = pd.DataFrame(X[:, :, 0].astype(np.float64), columns=[f"frq{i}" for i in range(bands)])
+    frame["Sample_num"] = rng.integers(0, 500, pixels)
+
+    cases = [
+        ("ndarray", X, lambda arr: float(np.asarray(arr).sum())),
+        ("DataFrame", frame, lambda df: float(df["frq0"].sum())),
+    ]
+    print(f"{'artifact':<10} {'size MB':>8} {'method':<8} {'save MB/s':>10} {'open s':>8} {'load MB/s':>10}")
+    for name, obj, touch in cases:
+        size_mb = (obj.nbytes if isinstance(obj, np.ndarray) else obj.memory_usage(deep=True).sum()) / 1e6
+        for method in ("pickle", "native"):
+            directory = tempfile.mkdtemp(prefix="hsi-bench-")
+            try:
+                if method == "pickle":
+                    save_time, load_time = _pickle_roundtrip(obj, directory)
+                    open_time = load_time
+                else:
+                    save_time, open_time, load_time = _format_roundtrip(obj, directory, touch)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            print(
+                f"{name:<10} {size_mb:>8.1f} {method:<8} {size_mb / save_time:>10.0f} "
+                f"{open_time:>8.3f} {size_mb / load_time:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pixels", type=int, default=200_000)
+    parser.add_argument("--bands", type=int, default=373)
+    args = parser.parse_args()
+    run(args.pixels, args.bands)
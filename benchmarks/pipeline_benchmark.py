@@ -0,0 +1,221 @@
+"""
+End-to-end timings of the training pipeline stages on synthetic data.
+
+Times IngestData, DataPreprocessStrategy, DataDivideStrategy, one CNNModel epoch,
+prediction and the evaluation metrics for several dataset sizes, and compares
+them with a stored JSON baseline. Stages needing TensorFlow are reported as
+skipped when it is not installed.
+
+Usage:
+    python -m benchmarks.pipeline_benchmark --sizes small medium
+    python -m benchmarks.pipeline_benchmark --save-baseline
+    python -m benchmarks.pipeline_benchmark --compare   # exits 1 on a regression or unchecked stage
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from model.data_cleaning import DataCleaning, DataDivideStrategy, DataPreprocessStrategy
+from model.evaluation import ConfusionAccumulator, bootstrap_confidence_intervals
+from pipelines.synthetic_data import make_pixel_table
+from steps.ingest_data import IngestData
+
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"n_images": 60, "pixels_per_image": 100, "n_bands": 64},
+    "medium": {"n_images": 240, "pixels_per_image": 400, "n_bands": 128},
+    "large": {"n_images": 600, "pixels_per_image": 1000, "n_bands": 373},
+}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "pipeline.json")
+# A stage regresses when it is slower than baseline * (1 + relative) + absolute_seconds;
+# the absolute slack keeps millisecond-scale stages from flapping on timer noise.
+DEFAULT_THRESHOLDS = {"relative": 0.30, "absolute_seconds": 0.05}
+
+
+def _time(fn: Callable[[], Any], repeats: int) -> Tuple[float, Any]:
+    """Median wall time of `repeats` calls, and the last result."""
+    times, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def _has_tensorflow() -> bool:
+    try:
+        import tensorflow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def benchmark_size(name: str, n_images: int, pixels_per_image: int, n_bands: int, repeats: int = 3) -> Dict[str, Any]:
+    """
+    Time every stage on one synthetic dataset.
+
+    Returns:
+        dict: stage -> {"seconds", "rows_per_second"} or {"skipped": reason}.
+    """
+    table = make_pixel_table(n_images, n_bands, pixels_per_image, nan_rate=0.01, seed=0)
+    rows = len(table)
+    directory = tempfile.mkdtemp(prefix="hsi-bench-")
+    results: Dict[str, Any] = {}
+
+    def record(stage: str, seconds: float, stage_rows: int) -> None:
+        results[stage] = {"seconds": round(seconds, 5), "rows_per_second": round(stage_rows / seconds, 1)}
+
+    try:
+        csv_path = os.path.join(directory, "samples.csv")
+        table.to_csv(csv_path, index=False)
+
+        seconds, raw = _time(lambda: IngestData(csv_path).get_data(), repeats)
+        record("ingest", seconds, rows)
+
+        seconds, (clean, label_encoder) = _time(
+            lambda: DataCleaning(raw.copy(), DataPreprocessStrategy()).handle_data(), repeats
+        )
+        record("preprocess", seconds, rows)
+
+        seconds, split = _time(
+            lambda: DataCleaning(clean.copy(), DataDivideStrategy(return_sample_nums=True)).handle_data(), repeats
+        )
+        record("divide", seconds, len(clean))
+        x_train, x_test, y_train, y_test, _, test_sample_nums = split
+        y_true = y_test.argmax(axis=1)
+        num_classes = y_test.shape[1]
+
+        if _has_tensorflow():
+            from model.model_dev import CNNModel
+
+            cnn = CNNModel(input_shape=x_train.shape[1:], num_classes=num_classes)
+            seconds, _ = _time(
+                lambda: cnn.model.fit(x_train, y_train, epochs=1, batch_size=256, verbose=0), 1
+            )
+            record("cnn_epoch", seconds, len(x_train))
+            seconds, probabilities = _time(
+                lambda: cnn.model.predict(x_test, batch_size=4096, verbose=0), repeats
+            )
+            record("predict", seconds, len(x_test))
+            y_pred = probabilities.argmax(axis=1)
+        else:
+            results["cnn_epoch"] = results["predict"] = {"skipped": "tensorflow not installed"}
+            # Stand-in predictions with ~20% errors so evaluation sees a realistic confusion matrix
+            rng = np.random.default_rng(0)
+            y_pred = np.where(rng.random(len(y_true)) < 0.8, y_true, rng.integers(0, num_classes, len(y_true)))
+
+        def evaluate() -> Dict[str, float]:
+            accumulator = ConfusionAccumulator(num_classes)
+            accumulator.update(y_true, y_pred, test_sample_nums)
+            metrics = {**accumulator.pixel_metrics(), **accumulator.image_metrics()}
+            bootstrap_confidence_intervals(accumulator, n_replicates=500, seed=0)
+            return metrics
+
+        seconds, _ = _time(evaluate, repeats)
+        record("evaluation", seconds, len(y_true))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "size": name,
+        "n_images": n_images,
+        "pixels_per_image": pixels_per_image,
+        "n_bands": n_bands,
+        "rows": rows,
+        "stages": results,
+    }
+
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Stages slower than their baseline beyond the baseline's thresholds, and
+    stages that cannot be checked because either run has no timing for them
+    (e.g. CNN stages recorded without TensorFlow). A baseline recorded on a
+    different machine is compared anyway, with a warning.
+
+    Returns:
+        List[str]: One line per regression or unchecked stage (empty when
+        everything is within bounds).
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    if "machine" in current and current["machine"] != baseline.get("machine"):
+        logging.warning(
+            f"Baseline was recorded on {baseline.get('machine')}, this run is on {current['machine']}; "
+            "timings may not be comparable."
+        )
+    regressions = []
+    for size, result in current["results"].items():
+        reference = baseline["results"].get(size)
+        if reference is None:
+            regressions.append(f"{size}: no baseline for this size")
+            continue
+        for stage in sorted(set(result["stages"]) | set(reference["stages"])):
+            timing, base = result["stages"].get(stage, {}), reference["stages"].get(stage, {})
+            if "seconds" not in base:
+                regressions.append(f"{size}/{stage}: no baseline timing ({base.get('skipped', 'missing')})")
+                continue
+            if "seconds" not in timing:
+                regressions.append(f"{size}/{stage}: not timed in this run ({timing.get('skipped', 'missing')})")
+                continue
+            limit = base["seconds"] * (1 + thresholds["relative"]) + thresholds["absolute_seconds"]
+            if timing["seconds"] > limit:
+                regressions.append(
+                    f"{size}/{stage}: {timing['seconds']:.4f}s > {limit:.4f}s (baseline {base['seconds']:.4f}s)"
+                )
+    return regressions
+
+
+def run(sizes: List[str], repeats: int = 3, output: Optional[str] = None) -> Dict[str, Any]:
+    results = {}
+    for size in sizes:
+        results[size] = benchmark_size(size, repeats=repeats, **SIZES[size])
+        print(f"\n{size}: {results[size]['rows']} pixels x {results[size]['n_bands']} bands")
+        print(f"  {'stage':<12} {'seconds':>10} {'rows/s':>14}")
+        for stage, timing in results[size]["stages"].items():
+            if "skipped" in timing:
+                print(f"  {stage:<12} {'skipped':>10}  ({timing['skipped']})")
+            else:
+                print(f"  {stage:<12} {timing['seconds']:>10.4f} {timing['rows_per_second']:>14,.0f}")
+    report = {"machine": machine_info(), "thresholds": DEFAULT_THRESHOLDS, "results": results}
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as fid:
+            json.dump(report, fid, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Write this run's results as JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 if a stage regressed against the baseline")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeats, args.baseline if args.save_baseline else args.output)
+    if args.compare:
+        with open(args.baseline) as fid:
+            regressions = compare(report, json.load(fid))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
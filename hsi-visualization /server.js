@@ -133,5 +133,9 @@ app.get('/api/predictions', async (req, res) => {
     }
 });
 
+// Binary summary tiles written by the Python export step (model/summary_tiles.py):
+// manifest.json, images.bin and <zoom>/<x>/<y>.bin
+app.use('/api/tiles', express.static(process.env.TILES_DIR || 'tiles', { maxAge: '1h' }));
+
 const PORT = process.env.PORT || 4000;
 app.listen(PORT, () => console.log(`[server.js] Server running on port ${PORT}`));
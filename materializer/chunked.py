@@ -0,0 +1,286 @@
+# materializer/chunked.py
+
+import os
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from materializer.content_store import ContentAddressedStore, chunk_digest
+
+CHUNKS_DIRNAME = "chunks"
+DEFAULT_CHUNK_BYTES = 4 * 1024 ** 2
+
+
+class ChecksumError(IOError):
+    """Raised when a stored chunk does not match the checksum recorded in its header."""
+
+
+def _available_codec() -> str:
+    """
+    Fastest installed codec: zstd, then lz4. Without either, chunks are stored
+    uncompressed (still checksummed and lazily readable); zlib is available on
+    request but is too slow (~40 MB/s) to be a sensible default for band arrays.
+    """
+    try:
+        import zstandard  # noqa: F401
+        return "zstd"
+    except ImportError:
+        pass
+    try:
+        import lz4.frame  # noqa: F401
+        return "lz4"
+    except ImportError:
+        return "none"
+
+
+def compress(raw: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(raw)
+    if codec == "lz4":
+        import lz4.frame
+        return lz4.frame.compress(raw)
+    if codec == "zlib":
+        return zlib.compress(raw, 1)
+    if codec == "none":
+        return raw
+    raise ValueError(f"Unknown codec '{codec}'")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "lz4":
+        import lz4.frame
+        return lz4.frame.decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "none":
+        return data
+    raise ValueError(f"Unknown codec '{codec}'")
+
+
+def shuffle_bytes(chunk: np.ndarray) -> bytes:
+    """
+    Blosc-style byte shuffle: group the k-th byte of every element together.
+
+    For float32 reflectances the sign/exponent bytes of neighbouring values are
+    nearly identical, so after shuffling they form long runs that compress well.
+    """
+    itemsize = chunk.dtype.itemsize
+    raw = np.ascontiguousarray(chunk).reshape(-1).view(np.uint8)
+    if itemsize == 1:
+        return raw.tobytes()
+    return raw.reshape(-1, itemsize).T.tobytes()
+
+
+def unshuffle_bytes(data: bytes, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    """Inverse of shuffle_bytes."""
+    dtype = np.dtype(dtype)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if dtype.itemsize > 1:
+        raw = raw.reshape(dtype.itemsize, -1).T
+    return np.ascontiguousarray(raw).view(dtype).reshape(shape)
+
+
+def encode_chunk(chunk: np.ndarray, codec: str, shuffle: bool) -> bytes:
+    """Shuffle (optionally) and compress one chunk of rows."""
+    raw = shuffle_bytes(chunk) if shuffle else np.ascontiguousarray(chunk).tobytes()
+    return compress(raw, codec)
+
+
+def decode_chunk(data: bytes, meta: Dict[str, Any], header: Dict[str, Any]) -> np.ndarray:
+    """Verify, decompress and unshuffle one stored chunk."""
+    if zlib.crc32(data) != meta["crc32"]:
+        raise ChecksumError(f"Checksum mismatch in chunk {meta['file']}")
+    raw = decompress(data, header["codec"])
+    shape = (meta["stop"] - meta["start"],) + tuple(header["shape"][1:])
+    if header["shuffle"]:
+        return unshuffle_bytes(raw, header["dtype"], shape)
+    return np.frombuffer(raw, dtype=header["dtype"]).reshape(shape)
+
+
+def chunk_rows(array: np.ndarray, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> int:
+    """Number of leading-axis rows per chunk so that each chunk holds ~chunk_bytes."""
+    row_bytes = max(1, array.dtype.itemsize * int(np.prod(array.shape[1:], dtype=np.int64)))
+    return max(1, chunk_bytes // row_bytes)
+
+
+def save_chunked(
+    array: np.ndarray,
+    directory: str,
+    codec: Optional[str] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    shuffle: bool = True,
+    store: Optional[ContentAddressedStore] = None,
+) -> Dict[str, Any]:
+    """
+    Write an array as compressed row chunks with a CRC32 per chunk.
+
+    Args:
+        array (np.ndarray): Array to store; chunks run along the first axis (pixels).
+        directory (str): Existing local artifact directory.
+        codec (str, optional): "zstd", "lz4", "zlib" or "none"; defaults to the fastest installed.
+        chunk_bytes (int): Target uncompressed size of one chunk.
+        shuffle (bool): Byte-shuffle chunks before compressing.
+        store (ContentAddressedStore, optional): When given, chunks are keyed by a
+            hash of their raw bytes; chunks already in the store are hard-linked
+            into the artifact without being compressed or written again.
+
+    Returns:
+        dict: Header fields describing the chunk layout, to be merged into header.json.
+    """
+    codec = codec or _available_codec()
+    os.makedirs(os.path.join(directory, CHUNKS_DIRNAME), exist_ok=True)
+    rows = chunk_rows(array, chunk_bytes)
+    chunks: List[Dict[str, Any]] = []
+    stored = 0
+    deduplicated = 0
+    for index, start in enumerate(range(0, max(array.shape[0], 1), rows)):
+        stop = min(start + rows, array.shape[0])
+        chunk = np.ascontiguousarray(array[start:stop])
+        name = os.path.join(CHUNKS_DIRNAME, f"{index:06d}.bin")
+        target = os.path.join(directory, name)
+        meta: Dict[str, Any] = {"file": name, "start": start, "stop": stop}
+
+        if store is None:
+            data = encode_chunk(chunk, codec, shuffle)
+            with open(target, "wb") as fid:
+                fid.write(data)
+        else:
+            digest = chunk_digest(
+                memoryview(chunk.reshape(-1)).cast("B"),
+                chunk.dtype.str, str(chunk.shape), codec, str(shuffle),
+            )
+            if store.has(digest):
+                deduplicated += 1
+            else:
+                store.put(digest, encode_chunk(chunk, codec, shuffle))
+            store.link(digest, target)
+            with open(target, "rb") as fid:
+                data = fid.read()
+            meta["digest"] = digest
+
+        meta["crc32"] = zlib.crc32(data)
+        stored += len(data)
+        chunks.append(meta)
+
+    return {
+        "format": "chunked",
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "codec": codec,
+        "shuffle": shuffle,
+        "chunk_rows": rows,
+        "stored_bytes": stored,
+        "deduplicated_chunks": deduplicated,
+        "chunks": chunks,
+    }
+
+
+class LazyChunkedArray:
+    """
+    Read-only array proxy over a chunked artifact.
+
+    Indexing along the first axis only reads, verifies and decompresses the chunks
+    that hold the requested rows; a few recently decoded chunks are kept in memory.
+    np.asarray(proxy) materializes the whole array.
+    """
+
+    def __init__(self, directory: str, header: Dict[str, Any], cache_chunks: int = 8) -> None:
+        """
+        Args:
+            directory (str): Local artifact directory.
+            header (dict): Header written by save_chunked.
+            cache_chunks (int): Number of decoded chunks to keep in memory.
+        """
+        self.directory = directory
+        self.header = header
+        self.shape = tuple(header["shape"])
+        self.dtype = np.dtype(header["dtype"])
+        self.chunk_rows = header["chunk_rows"]
+        self._chunks = header["chunks"]
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._cache_chunks = cache_chunks
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __repr__(self) -> str:
+        return (
+            f"LazyChunkedArray(shape={self.shape}, dtype={self.dtype}, "
+            f"chunks={len(self._chunks)}, codec={self.header['codec']})"
+        )
+
+    def chunk(self, index: int) -> np.ndarray:
+        """Decoded rows of chunk `index`."""
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+        meta = self._chunks[index]
+        with open(os.path.join(self.directory, meta["file"]), "rb") as fid:
+            decoded = decode_chunk(fid.read(), meta, self.header)
+        self._cache[index] = decoded
+        if len(self._cache) > self._cache_chunks:
+            self._cache.popitem(last=False)
+        return decoded
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Gather rows by index, decoding each touched chunk once.
+
+        Args:
+            rows (np.ndarray): Row indices (negative indices allowed).
+
+        Returns:
+            np.ndarray: Array of shape (len(rows),) + shape[1:].
+        """
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+        rows = np.where(rows < 0, rows + self.shape[0], rows)
+        if rows.size and (rows.min() < 0 or rows.max() >= self.shape[0]):
+            raise IndexError(f"Row index out of range for array with {self.shape[0]} rows")
+        out = np.empty((rows.size,) + self.shape[1:], dtype=self.dtype)
+        chunk_ids = rows // self.chunk_rows
+        for chunk_id in np.unique(chunk_ids):
+            selected = np.flatnonzero(chunk_ids == chunk_id)
+            out[selected] = self.chunk(int(chunk_id))[rows[selected] - chunk_id * self.chunk_rows]
+        return out
+
+    def __getitem__(self, key) -> Any:
+        rest = ()
+        if isinstance(key, tuple):
+            key, rest = key[0], key[1:]
+        if isinstance(key, (int, np.integer)):
+            result = self.take(np.array([key]))[0]
+            return result[rest] if rest else result
+        if isinstance(key, slice):
+            rows = np.arange(self.shape[0])[key]
+        else:
+            rows = np.asarray(key)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+        result = self.take(rows)
+        return result[(slice(None),) + rest] if rest else result
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = np.empty(self.shape, dtype=self.dtype)
+        for index, meta in enumerate(self._chunks):
+            meta_start, meta_stop = meta["start"], meta["stop"]
+            if meta_stop > meta_start:
+                array[meta_start:meta_stop] = self.chunk(index)
+        return array if dtype is None else array.astype(dtype, copy=False)
@@ -0,0 +1,165 @@
+# materializer/content_store.py
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional, Tuple
+
+DEFAULT_STORE_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "hsi", "cas")
+
+
+def default_store() -> Optional["ContentAddressedStore"]:
+    """
+    Store configured through HSI_CAS_ROOT (defaults to ~/.cache/hsi/cas).
+    Setting HSI_CAS_ROOT to an empty string disables deduplication.
+    """
+    root = os.environ.get("HSI_CAS_ROOT", DEFAULT_STORE_ROOT)
+    return ContentAddressedStore(root) if root else None
+
+
+def chunk_digest(raw: memoryview, *parts: str) -> str:
+    """
+    Content address of one chunk: a hash of its uncompressed bytes plus everything
+    that affects the stored encoding (dtype, shape, codec, shuffle).
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(raw)
+    return digest.hexdigest()
+
+
+class ContentAddressedStore:
+    """
+    Local blob store keyed by content hash, shared by every run and pipeline.
+
+    Artifacts reference blobs through hard links, so identical chunks written by
+    repeated runs occupy disk space once and are not re-compressed. The filesystem
+    link count doubles as the reference count: a blob whose only remaining link is
+    the store's own is unreferenced and is reclaimed by `gc`.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_ROOT) -> None:
+        """
+        Args:
+            root (str): Directory holding the blobs.
+        """
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest[2:])
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.blob_path(digest))
+
+    def put(self, digest: str, data: bytes) -> str:
+        """
+        Store a blob under its digest (no-op if it already exists).
+
+        Args:
+            digest (str): Content address from chunk_digest.
+            data (bytes): Encoded chunk bytes.
+
+        Returns:
+            str: Path of the blob.
+        """
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as fid:
+            fid.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def link(self, digest: str, target: str) -> bool:
+        """
+        Reference a blob from an artifact directory.
+
+        Hard-links the blob to `target`; when that is impossible (e.g. the artifact
+        store is on another filesystem) the blob is copied instead.
+
+        Args:
+            digest (str): Content address of an existing blob.
+            target (str): Path inside the artifact directory.
+
+        Returns:
+            bool: True if the blob was hard-linked (deduplicated), False if copied.
+        """
+        source = self.blob_path(digest)
+        if os.path.exists(target):
+            os.remove(target)
+        try:
+            os.link(source, target)
+            # Refresh the blob's mtime so gc's grace period counts from the last reuse
+            os.utime(source)
+            return True
+        except OSError:
+            shutil.copyfile(source, target)
+            return False
+
+    def gc(self, grace_seconds: float = 3600.0, dry_run: bool = False) -> Tuple[int, int]:
+        """
+        Delete blobs no artifact links to any more.
+
+        Args:
+            grace_seconds (float): Keep unreferenced blobs younger than this, so a
+                blob written by a save that has not linked it yet is not collected.
+            dry_run (bool): Only report what would be removed.
+
+        Returns:
+            Tuple[int, int]: Number of blobs and bytes reclaimed.
+        """
+        now = time.time()
+        removed, freed = 0, 0
+        for directory, _, files in os.walk(os.path.join(self.root, "blobs")):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_nlink > 1 or now - stat.st_mtime < grace_seconds:
+                    continue
+                if not dry_run:
+                    os.remove(path)
+                removed += 1
+                freed += stat.st_size
+        logging.info(
+            f"Content store gc {'would reclaim' if dry_run else 'reclaimed'} "
+            f"{removed} blobs ({freed / 1e6:.1f} MB) from {self.root}"
+        )
+        return removed, freed
+
+    def usage(self) -> Tuple[int, int]:
+        """Number of blobs and bytes currently held by the store."""
+        count, size = 0, 0
+        for directory, _, files in os.walk(os.path.join(self.root, "blobs")):
+            for name in files:
+                count += 1
+                size += os.path.getsize(os.path.join(directory, name))
+        return count, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the local content-addressed artifact store.")
+    parser.add_argument("command", choices=["gc", "usage"])
+    parser.add_argument("--root", default=os.environ.get("HSI_CAS_ROOT") or DEFAULT_STORE_ROOT)
+    parser.add_argument("--grace-seconds", type=float, default=3600.0)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    store = ContentAddressedStore(args.root)
+    if args.command == "gc":
+        removed, freed = store.gc(args.grace_seconds, args.dry_run)
+        print(f"{'Would remove' if args.dry_run else 'Removed'} {removed} blobs ({freed / 1e6:.1f} MB)")
+    else:
+        count, size = store.usage()
+        print(f"{count} blobs, {size / 1e6:.1f} MB in {args.root}")
@@ -2,6 +2,8 @@
 
 import os
 import pickle
+import shutil
+import tempfile
 from typing import Any, Type, Union
 
 import numpy as np
@@ -10,16 +12,45 @@ from tensorflow.keras.models import Model, Sequential
 from zenml.io import fileio
 from zenml.materializers.base_materializer import BaseMaterializer
 
+from materializer.content_store import default_store
+from materializer.formats import HEADER_FILENAME, load_artifact, read_header, save_artifact
+from model.compact import CompactBands
+
 DEFAULT_FILENAME = "HyperspectralEnvironment"
 
+# Arrays/DataFrames at least this large are stored compressed in checksummed
+# chunks and loaded as lazy proxies (see materializer.chunked).
+CHUNKED_MIN_BYTES = int(os.environ.get("HSI_CHUNKED_MIN_BYTES", 64 * 1024 ** 2))
+
+
+def _is_local(uri: str) -> bool:
+    """True when the artifact URI is a local path that can be memory-mapped in place."""
+    return "://" not in uri or uri.startswith("file://")
+
+
+def _local_path(uri: str) -> str:
+    return uri[len("file://"):] if uri.startswith("file://") else uri
+
+
 class HyperspectralMaterializer(BaseMaterializer):
     """
     Handles saving/loading complex data types (models, arrays, DataFrames, etc.).
+
+    Each type gets its own format (see materializer.formats): arrays are stored as
+    .npy and loaded memory-mapped, DataFrames/Series as Parquet and Keras models in
+    the native .keras format, with a header.json recording the format. Large
+    arrays are written as compressed, checksummed row chunks and come back as
+    LazyChunkedArray proxies that decompress only the chunks a step touches.
+    For local artifact stores those chunks live in a content-addressed store
+    (HSI_CAS_ROOT) and are hard-linked into the artifact, so byte-identical
+    outputs of repeated runs are neither re-encoded nor stored twice.
+    Artifacts written by the earlier pickle-only version are still loaded.
     """
 
     ASSOCIATED_TYPES = (
         str,
         np.ndarray,
+        CompactBands,
         pd.Series,
         pd.DataFrame,
         Model,
@@ -28,13 +59,52 @@ class HyperspectralMaterializer(BaseMaterializer):
 
     def handle_input(self, data_type: Type[Any]) -> Any:
         super().handle_input(data_type)
-        filepath = os.path.join(self.artifact.uri, DEFAULT_FILENAME)
-        with fileio.open(filepath, "rb") as fid:
-            obj = pickle.load(fid)
-        return obj
+        uri = self.artifact.uri
+
+        legacy_path = os.path.join(uri, DEFAULT_FILENAME)
+        if not fileio.exists(os.path.join(uri, HEADER_FILENAME)) and fileio.exists(legacy_path):
+            with fileio.open(legacy_path, "rb") as fid:
+                return pickle.load(fid)
+
+        if _is_local(uri):
+            directory = _local_path(uri)
+            return load_artifact(directory, read_header(directory))
+
+        # Remote stores cannot be memory-mapped: stage the files locally first.
+        # The staging directory is left to the OS temp cleanup because the
+        # returned arrays may still be mapped from it.
+        directory = tempfile.mkdtemp(prefix="hsi-artifact-")
+        for root, _, files in fileio.walk(uri):
+            root = str(root)
+            relative_root = os.path.relpath(root, uri)
+            target_root = os.path.join(directory, relative_root)
+            os.makedirs(target_root, exist_ok=True)
+            for name in files:
+                fileio.copy(os.path.join(root, str(name)), os.path.join(target_root, str(name)))
+        return load_artifact(directory, read_header(directory))
 
     def handle_return(self, obj: Any) -> None:
         super().handle_return(obj)
-        filepath = os.path.join(self.artifact.uri, DEFAULT_FILENAME)
-        with fileio.open(filepath, "wb") as fid:
-            pickle.dump(obj, fid)
\ No newline at end of file
+        uri = self.artifact.uri
+
+        if _is_local(uri):
+            directory = _local_path(uri)
+            os.makedirs(directory, exist_ok=True)
+            save_artifact(
+                obj, directory, chunked_min_bytes=CHUNKED_MIN_BYTES, store=default_store()
+            )
+            return
+
+        directory = tempfile.mkdtemp(prefix="hsi-artifact-")
+        try:
+            save_artifact(obj, directory, chunked_min_bytes=CHUNKED_MIN_BYTES)
+            for root, _, files in os.walk(directory):
+                relative_root = os.path.relpath(root, directory)
+                target_root = uri if relative_root == "." else os.path.join(uri, relative_root)
+                fileio.makedirs(target_root)
+                for name in files:
+                    fileio.copy(
+                        os.path.join(root, name), os.path.join(target_root, name), overwrite=True
+                    )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
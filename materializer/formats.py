@@ -0,0 +1,223 @@
+# materializer/formats.py
+
+import json
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from materializer.chunked import LazyChunkedArray, save_chunked
+from materializer.content_store import ContentAddressedStore
+from model.compact import ENCODING_ATTR, CompactBands, SpectralEncoding
+
+HEADER_FILENAME = "header.json"
+FORMAT_VERSION = 1
+
+NPY_FILENAME = "data.npy"
+PARQUET_FILENAME = "data.parquet"
+KERAS_FILENAME = "model.keras"
+TEXT_FILENAME = "data.txt"
+PICKLE_FILENAME = "data.pkl"
+CODES_DIRNAME = "codes"
+
+PARQUET_ROW_GROUP_SIZE = 65536
+
+
+def _is_keras_model(obj: Any) -> bool:
+    """Duck-typed Keras model check, so TensorFlow is only imported when a model is handled."""
+    module = type(obj).__module__
+    return module.startswith(("keras", "tensorflow")) and hasattr(obj, "save") and hasattr(obj, "get_weights")
+
+
+def _frame_nbytes(obj: Any) -> int:
+    return int(obj.memory_usage(index=False, deep=False).sum()) if isinstance(obj, pd.DataFrame) else int(obj.nbytes)
+
+
+def _has_string_columns(df: pd.DataFrame) -> bool:
+    return all(isinstance(col, str) for col in df.columns)
+
+
+def write_header(directory: str, header: Dict[str, Any]) -> None:
+    """Write the format header describing how an artifact directory was serialized."""
+    with open(os.path.join(directory, HEADER_FILENAME), "w") as fid:
+        json.dump(header, fid, indent=2)
+
+
+def read_header(directory: str) -> Dict[str, Any]:
+    """
+    Read the format header of an artifact directory.
+
+    Args:
+        directory (str): Local artifact directory.
+
+    Returns:
+        dict: The header, or {} for artifacts written before headers existed.
+    """
+    path = os.path.join(directory, HEADER_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fid:
+        return json.load(fid)
+
+
+def _save_parquet(
+    obj: Any, directory: str, header: Dict[str, Any], compressed: bool = False
+) -> bool:
+    """
+    Write a DataFrame/Series as Parquet, returning False when Parquet cannot represent
+    it (non-string column names, mixed object columns, pyarrow missing) so the caller
+    can fall back to pickle.
+
+    With `compressed`, frames are written as zstd-compressed row groups with page
+    checksums, so readers can pull individual row groups and detect corruption.
+    """
+    if isinstance(obj, pd.Series):
+        if obj.name is not None and not isinstance(obj.name, str):
+            return False
+        column = obj.name if isinstance(obj.name, str) else "__series__"
+        frame, extra = obj.to_frame(name=column), {"kind": "series", "column": column, "name": obj.name}
+    else:
+        frame, extra = obj, {"kind": "frame", "shape": list(obj.shape)}
+    if not _has_string_columns(frame):
+        return False
+    path = os.path.join(directory, PARQUET_FILENAME)
+    # Dictionary encoding only pays off for repetitive columns (File, Label,
+    # Sample_num); on float or compact (model.compact) spectra it costs time
+    # without saving space.
+    spectral_columns = set(frame.attrs.get(ENCODING_ATTR, {}).get("columns", []))
+    dictionary_columns = [
+        col for col in frame.columns
+        if not pd.api.types.is_float_dtype(frame[col]) and col not in spectral_columns
+    ]
+    options: Dict[str, Any] = {"use_dictionary": dictionary_columns}
+    if compressed:
+        options.update(
+            compression="zstd", row_group_size=PARQUET_ROW_GROUP_SIZE, write_page_checksum=True
+        )
+    try:
+        frame.to_parquet(path, **options)
+    except (ImportError, ValueError, TypeError, NotImplementedError):
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    header.update(format="parquet", compressed=compressed, **extra)
+    return True
+
+
+def _save_pickle(obj: Any, directory: str, header: Dict[str, Any]) -> None:
+    with open(os.path.join(directory, PICKLE_FILENAME), "wb") as fid:
+        pickle.dump(obj, fid, protocol=pickle.HIGHEST_PROTOCOL)
+    header.update(format="pickle")
+
+
+def save_artifact(
+    obj: Any,
+    directory: str,
+    chunked_min_bytes: Optional[int] = None,
+    store: Optional[ContentAddressedStore] = None,
+) -> Dict[str, Any]:
+    """
+    Serialize an object into `directory` using a format chosen by its type.
+
+      - np.ndarray (numeric)          -> .npy, loadable with mmap_mode, or compressed
+                                         checksummed chunks when large (see chunked.py)
+      - model.compact.CompactBands    -> its int16/float16 codes saved as an array in
+                                         codes/, with the encoding in the header
+      - pd.DataFrame / pd.Series      -> Parquet (pickle if Parquet can't hold it)
+      - Keras Model / Sequential      -> native .keras archive
+      - str                           -> UTF-8 text
+      - anything else                 -> pickle
+
+    Args:
+        obj (Any): Object to save.
+        directory (str): Existing local directory to write into.
+        chunked_min_bytes (int, optional): Arrays and frames of at least this many
+            bytes are stored compressed in chunks/row groups. None disables it.
+        store (ContentAddressedStore, optional): Deduplicate array chunks through
+            this store (see materializer.content_store).
+
+    Returns:
+        dict: The header written next to the data.
+    """
+    header: Dict[str, Any] = {"version": FORMAT_VERSION, "type": f"{type(obj).__module__}.{type(obj).__name__}"}
+
+    if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+        if chunked_min_bytes is not None and obj.nbytes >= chunked_min_bytes:
+            header.update(save_chunked(obj, directory, store=store))
+        else:
+            np.save(os.path.join(directory, NPY_FILENAME), obj, allow_pickle=False)
+            header.update(format="npy", dtype=obj.dtype.str, shape=list(obj.shape))
+    elif isinstance(obj, CompactBands):
+        codes_directory = os.path.join(directory, CODES_DIRNAME)
+        os.makedirs(codes_directory, exist_ok=True)
+        save_artifact(np.asarray(obj.codes), codes_directory, chunked_min_bytes=chunked_min_bytes, store=store)
+        header.update(format="compact", encoding=obj.encoding.to_dict(), shape=list(obj.shape))
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        compressed = chunked_min_bytes is not None and _frame_nbytes(obj) >= chunked_min_bytes
+        if not _save_parquet(obj, directory, header, compressed=compressed):
+            _save_pickle(obj, directory, header)
+    elif _is_keras_model(obj):
+        obj.save(os.path.join(directory, KERAS_FILENAME))
+        header.update(format="keras")
+    elif isinstance(obj, str):
+        with open(os.path.join(directory, TEXT_FILENAME), "w", encoding="utf-8") as fid:
+            fid.write(obj)
+        header.update(format="text")
+    else:
+        _save_pickle(obj, directory, header)
+
+    write_header(directory, header)
+    return header
+
+
+def load_artifact(directory: str, header: Dict[str, Any], mmap: bool = True) -> Any:
+    """
+    Load an object saved by save_artifact.
+
+    Arrays are memory-mapped copy-on-write by default, so loading is lazy and
+    zero-copy: pages are read on first touch and callers may still modify the
+    result without affecting the stored artifact. Chunked arrays come back as a
+    LazyChunkedArray that only decompresses the chunks that are indexed.
+
+    Args:
+        directory (str): Local artifact directory.
+        header (dict): Header returned by read_header.
+        mmap (bool): Memory-map .npy arrays instead of reading them eagerly.
+
+    Returns:
+        Any: The deserialized object.
+    """
+    fmt = header["format"]
+    if fmt == "chunked":
+        return LazyChunkedArray(directory, header)
+    if fmt == "compact":
+        codes_directory = os.path.join(directory, CODES_DIRNAME)
+        codes = load_artifact(codes_directory, read_header(codes_directory), mmap=mmap)
+        return CompactBands(codes, SpectralEncoding.from_dict(header["encoding"]))
+    if fmt == "npy":
+        return np.load(os.path.join(directory, NPY_FILENAME), mmap_mode="c" if mmap else None)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        options = {"page_checksum_verification": True} if header.get("compressed") else {}
+        table = pq.read_table(os.path.join(directory, PARQUET_FILENAME), memory_map=mmap, **options)
+        # split_blocks avoids consolidating all float columns into one new block and
+        # self_destruct releases Arrow buffers as columns are converted, so peak
+        # memory stays near one copy of the data.
+        frame = table.to_pandas(split_blocks=True, self_destruct=True)
+        if header.get("kind") == "series":
+            return frame[header["column"]].rename(header.get("name"))
+        return frame
+    if fmt == "keras":
+        from tensorflow.keras.models import load_model
+
+        return load_model(os.path.join(directory, KERAS_FILENAME))
+    if fmt == "text":
+        with open(os.path.join(directory, TEXT_FILENAME), encoding="utf-8") as fid:
+            return fid.read()
+    if fmt == "pickle":
+        with open(os.path.join(directory, PICKLE_FILENAME), "rb") as fid:
+            return pickle.load(fid)
+    raise ValueError(f"Unknown artifact format '{fmt}' in {directory}")
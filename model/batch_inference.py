@@ -0,0 +1,361 @@
+import glob
+import json
+import logging
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NODATA_LABEL = 255
+TILE_PATTERNS = ("*.tif", "*.tiff", "*.npy")
+# Bytes held per pixel while a window is scored: the raw window, its float32
+# copy in Conv1D layout and the class probabilities, with headroom for the
+# model's per-batch activations (those are bounded by predict_batch_size).
+BYTES_PER_BAND_VALUE = 3 * 4
+
+
+def load_predictor(model_path: str) -> Any:
+    """
+    Load a trained model for inference.
+
+    Keras archives (.keras, .h5) are loaded with TensorFlow; anything else is
+    unpickled and must expose `predict(x)` returning class probabilities or labels.
+
+    Args:
+        model_path (str): Path to the saved model.
+
+    Returns:
+        Any: Object with a `predict` method.
+    """
+    if model_path.endswith((".keras", ".h5")):
+        from tensorflow.keras.models import load_model
+
+        return load_model(model_path)
+    with open(model_path, "rb") as fid:
+        return pickle.load(fid)
+
+
+def predict_scores(predictor: Any, x: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+    """
+    Raw model output (class probabilities, or labels for label-only predictors)
+    for a batch of pixels in Conv1D layout (n, bands, 1).
+    """
+    if hasattr(predictor, "count_params"):  # Keras model
+        return np.asarray(predictor.predict(x, batch_size=batch_size, verbose=0))
+    return np.asarray(predictor.predict(x))
+
+
+def predict_labels(predictor: Any, x: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+    """
+    Class indices for a batch of pixels in Conv1D layout (n, bands, 1).
+    """
+    output = predict_scores(predictor, x, batch_size)
+    return output.argmax(axis=1) if output.ndim == 2 else output.reshape(-1)
+
+
+def read_window(
+    path: str, row_start: int, row_stop: int, bands: Optional[Sequence[int]] = None
+) -> np.ndarray:
+    """
+    Read rows [row_start, row_stop) of a tile as a (bands, rows, cols) array.
+
+    GeoTIFFs are read with a rasterio window; .npy tiles (bands, rows, cols) are
+    memory-mapped, so only the requested rows are paged in.
+    """
+    if path.endswith(".npy"):
+        tile = np.load(path, mmap_mode="r")
+        window = tile[:, row_start:row_stop]
+        return np.asarray(window if bands is None else window[list(bands)])
+
+    import rasterio
+    from rasterio.windows import Window
+
+    with rasterio.open(path) as src:
+        indexes = None if bands is None else [band + 1 for band in bands]
+        window = Window(0, row_start, src.width, row_stop - row_start)
+        return src.read(indexes, window=window)
+
+
+def tile_info(path: str) -> Dict[str, Any]:
+    """Shape, nodata value and (for GeoTIFFs) raster profile of a tile."""
+    if path.endswith(".npy"):
+        tile = np.load(path, mmap_mode="r")
+        if tile.ndim != 3:
+            raise ValueError(f"{path}: .npy tiles must be (bands, rows, cols), got {tile.shape}")
+        return {"bands": tile.shape[0], "rows": tile.shape[1], "cols": tile.shape[2], "nodata": None, "profile": None}
+
+    try:
+        import rasterio
+    except ImportError as e:
+        raise ImportError("Reading GeoTIFF tiles requires rasterio (pip install rasterio)") from e
+    with rasterio.open(path) as src:
+        return {
+            "bands": src.count, "rows": src.height, "cols": src.width,
+            "nodata": src.nodata, "profile": dict(src.profile),
+        }
+
+
+def list_tiles(tile_dir: str, patterns: Sequence[str] = TILE_PATTERNS) -> List[str]:
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(tile_dir, pattern)))
+    return sorted(paths)
+
+
+def rows_per_window(cols: int, bands: int, memory_limit_mb: float, workers: int) -> int:
+    """
+    Number of tile rows each worker scores at a time so that all workers together,
+    each with one window being scored and one queued, stay under the memory ceiling.
+    """
+    budget = memory_limit_mb * 1024 ** 2 / (2 * max(workers, 1))
+    bytes_per_row = max(1, cols * bands * BYTES_PER_BAND_VALUE)
+    return max(1, int(budget // bytes_per_row))
+
+
+def iter_windows(rows: int, window_rows: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, rows, window_rows):
+        yield start, min(start + window_rows, rows)
+
+
+def peak_rss_mb() -> Tuple[float, float]:
+    """
+    Peak resident set size of this process and of its largest finished child, in MB
+    (both 0 where `resource` is unavailable, e.g. Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0, 0.0
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 ** 2
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 1024 ** 2
+    return own, children
+
+
+# Per-process state of the scoring workers, set once by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(model_path: str, bands: Optional[Sequence[int]], batch_size: int) -> None:
+    """Load the model once per worker process instead of once per window."""
+    _WORKER.update(predictor=load_predictor(model_path), bands=bands, batch_size=batch_size)
+
+
+def _score_window(path: str, row_start: int, row_stop: int, nodata: Optional[float]) -> Tuple[str, int, np.ndarray]:
+    """
+    Score one window of a tile inside a worker. The worker reads the pixels itself,
+    so only the (small) label block travels back to the parent process.
+    """
+    window = read_window(path, row_start, row_stop, _WORKER["bands"])
+    n_bands, n_rows, n_cols = window.shape
+    # Flatten to pixels in the Conv1D layout used for training: (pixels, bands, 1)
+    pixels = window.reshape(n_bands, -1).T.astype(np.float32)
+    valid = np.isfinite(pixels).all(axis=1)
+    if nodata is not None:
+        valid &= ~(pixels == nodata).all(axis=1)
+
+    labels = np.full(pixels.shape[0], NODATA_LABEL, dtype=np.uint8)
+    if valid.any():
+        labels[valid] = predict_labels(
+            _WORKER["predictor"], pixels[valid][..., np.newaxis], _WORKER["batch_size"]
+        )
+    return path, row_start, labels.reshape(n_rows, n_cols)
+
+
+def _write_label_raster(labels: np.ndarray, output_dir: str, path: str, info: Dict[str, Any]) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if info["profile"] is not None:
+        import rasterio
+
+        profile = dict(info["profile"], count=1, dtype="uint8", nodata=NODATA_LABEL, compress="deflate")
+        out_path = os.path.join(output_dir, f"{stem}_labels.tif")
+        with rasterio.open(out_path, "w", **profile) as dst:
+            dst.write(labels, 1)
+        return out_path
+    out_path = os.path.join(output_dir, f"{stem}_labels.npy")
+    np.save(out_path, labels)
+    return out_path
+
+
+def majority_label(labels: np.ndarray, num_classes: int = NODATA_LABEL) -> Tuple[Optional[int], int, float]:
+    """
+    Most frequent predicted class of an image, ignoring nodata pixels.
+
+    Returns:
+        Tuple: (label or None if no valid pixel, valid pixel count, fraction of valid pixels voting for it)
+    """
+    counts = np.bincount(labels.reshape(-1), minlength=NODATA_LABEL + 1)[:num_classes]
+    valid = int(counts.sum())
+    if valid == 0:
+        return None, 0, 0.0
+    label = int(counts.argmax())
+    return label, valid, float(counts[label] / valid)
+
+
+class BatchInference:
+    """
+    Scores whole directories of hyperspectral tiles into per-pixel label maps.
+
+    Tiles are split into row windows sized from a memory ceiling; a process pool
+    of workers (each holding one warm copy of the model) reads, flattens and
+    scores windows in parallel, and the parent assembles each tile's label raster
+    as its windows arrive. At most two windows per worker are in flight, so
+    memory stays bounded however large the flight line is.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        workers: int = 4,
+        memory_limit_mb: float = 4096,
+        bands: Optional[Sequence[int]] = None,
+        predict_batch_size: int = 4096,
+        class_names: Optional[Sequence[str]] = None,
+    ) -> None:
+        """
+        Args:
+            model_path (str): Saved model (.keras/.h5, or a pickled predictor).
+            workers (int): Number of worker processes; 0 scores in this process.
+            memory_limit_mb (float): Memory ceiling shared by all workers; sets the window size.
+            bands (Sequence[int], optional): Tile band indices the model was trained on.
+            predict_batch_size (int): Pixels per model forward pass.
+            class_names (Sequence[str], optional): Names for the class indices in the report.
+        """
+        self.model_path = model_path
+        self.workers = workers
+        self.memory_limit_mb = memory_limit_mb
+        self.bands = list(bands) if bands is not None else None
+        self.predict_batch_size = predict_batch_size
+        self.class_names = list(class_names) if class_names is not None else None
+
+    def _executor(self):
+        initargs = (self.model_path, self.bands, self.predict_batch_size)
+        if self.workers == 0:
+            _init_worker(*initargs)
+            return None
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=initargs)
+
+    def run(self, tile_paths: Sequence[str], output_dir: str) -> Dict[str, Any]:
+        """
+        Score every tile and write `<tile>_labels.tif` (or .npy), majority_labels.csv
+        and batch_inference_report.json into `output_dir`.
+
+        Args:
+            tile_paths (Sequence[str]): GeoTIFF or .npy (bands, rows, cols) tiles.
+            output_dir (str): Directory for the outputs.
+
+        Returns:
+            dict: The report (throughput, peak memory, per-image majority labels).
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        infos = {path: tile_info(path) for path in tile_paths}
+        # Label rasters of the tiles with windows in flight; tasks are in tile order,
+        # so only a few tiles are open at a time
+        labels: Dict[str, np.ndarray] = {}
+        remaining_windows = {}
+        tasks = []
+        for path, info in infos.items():
+            n_bands = len(self.bands) if self.bands is not None else info["bands"]
+            window_rows = rows_per_window(info["cols"], n_bands, self.memory_limit_mb, self.workers)
+            windows = list(iter_windows(info["rows"], window_rows))
+            remaining_windows[path] = len(windows)
+            tasks.extend((path, start, stop, info["nodata"]) for start, stop in windows)
+
+        images = []
+        start_time = time.perf_counter()
+
+        def open_tile(task: Tuple) -> Tuple:
+            path = task[0]
+            if path not in labels:
+                labels[path] = np.empty((infos[path]["rows"], infos[path]["cols"]), dtype=np.uint8)
+            return task
+
+        def finish(path: str, row_start: int, block: np.ndarray) -> None:
+            labels[path][row_start:row_start + block.shape[0]] = block
+            remaining_windows[path] -= 1
+            if remaining_windows[path] == 0:
+                images.append(self._finish_tile(path, labels.pop(path), infos[path], output_dir))
+
+        executor = self._executor()
+        try:
+            if executor is None:
+                for task in tasks:
+                    finish(*_score_window(*open_tile(task)))
+            else:
+                pending = set()
+                task_iter = iter(tasks)
+                while True:
+                    # Keep two windows per worker queued: enough to hide I/O, bounded memory
+                    while len(pending) < 2 * self.workers:
+                        task = next(task_iter, None)
+                        if task is None:
+                            break
+                        pending.add(executor.submit(_score_window, *open_tile(task)))
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(*future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - start_time
+        parent_rss, worker_rss = peak_rss_mb()
+        # Every worker may have reached the largest worker's peak at the same time
+        total_rss = parent_rss + self.workers * worker_rss
+        total_pixels = sum(info["rows"] * info["cols"] for info in infos.values())
+        report = {
+            "tiles": len(infos),
+            "pixels": total_pixels,
+            "seconds": round(elapsed, 3),
+            "pixels_per_second": round(total_pixels / elapsed, 1) if elapsed > 0 else None,
+            "workers": self.workers,
+            "memory_limit_mb": self.memory_limit_mb,
+            "peak_rss_mb": round(parent_rss, 1),
+            "peak_worker_rss_mb": round(worker_rss, 1),
+            "peak_total_rss_mb": round(total_rss, 1),
+            "within_memory_limit": total_rss <= self.memory_limit_mb if total_rss > 0 else None,
+            "images": sorted(images, key=lambda image: image["image"]),
+        }
+        if report["within_memory_limit"] is False:
+            logging.warning(
+                f"Peak RSS of {total_rss:.0f} MB (parent plus {self.workers} workers) exceeded the "
+                f"{self.memory_limit_mb:.0f} MB ceiling; lower --memory-limit-mb or --predict-batch-size."
+            )
+        self._write_summary(report, output_dir)
+        logging.info(
+            f"Scored {total_pixels} pixels from {len(infos)} tiles in {elapsed:.1f}s "
+            f"({report['pixels_per_second']} pixels/s, peak RSS {parent_rss:.0f} MB parent / "
+            f"{worker_rss:.0f} MB worker)"
+        )
+        return report
+
+    def _finish_tile(self, path: str, labels: np.ndarray, info: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+        label, valid, fraction = majority_label(labels)
+        image = {
+            "image": os.path.basename(path),
+            "label_raster": _write_label_raster(labels, output_dir, path, info),
+            "majority_label": label,
+            "majority_label_name": (
+                self.class_names[label] if self.class_names is not None and label is not None else None
+            ),
+            "majority_fraction": round(fraction, 4),
+            "valid_pixels": valid,
+        }
+        logging.info(f"{image['image']}: majority label {label} ({fraction:.1%} of {valid} pixels)")
+        return image
+
+    def _write_summary(self, report: Dict[str, Any], output_dir: str) -> None:
+        with open(os.path.join(output_dir, "majority_labels.csv"), "w") as fid:
+            fid.write("image,majority_label,majority_label_name,majority_fraction,valid_pixels\n")
+            for image in report["images"]:
+                name = image["majority_label_name"] or ""
+                label = "" if image["majority_label"] is None else image["majority_label"]
+                fid.write(f"{image['image']},{label},{name},{image['majority_fraction']},{image['valid_pixels']}\n")
+        with open(os.path.join(output_dir, "batch_inference_report.json"), "w") as fid:
+            json.dump(report, fid, indent=2)
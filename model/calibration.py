@@ -0,0 +1,329 @@
+import json
+import logging
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+TOPK_META_FILENAME = "topk.json"
+
+
+def _log_probabilities(probabilities: np.ndarray) -> np.ndarray:
+    """Softmax outputs back to logits (up to a per-row constant)."""
+    return np.log(np.clip(np.asarray(probabilities, dtype=np.float64), 1e-12, None))
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Row-wise softmax of a (n, classes) block of logits."""
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+def fit_temperature(
+    logits: np.ndarray, y_true: np.ndarray, bounds: Tuple[float, float] = (1e-4, 1e2), iterations: int = 60
+) -> float:
+    """
+    Temperature T minimizing the negative log-likelihood of softmax(logits / T),
+    by golden-section search over log T (the likelihood is unimodal in T).
+
+    Args:
+        logits (np.ndarray): (n, classes) class scores.
+        y_true (np.ndarray): True class indices.
+        bounds (Tuple[float, float]): Search interval of T.
+        iterations (int): Golden-section iterations.
+
+    Returns:
+        float: The fitted temperature.
+    """
+    logits = np.asarray(logits, dtype=np.float64)
+    logits = logits - logits.max(axis=1, keepdims=True)
+    true_logits = logits[np.arange(len(y_true)), np.asarray(y_true)]
+
+    def nll(log_temperature: float) -> float:
+        inverse = math.exp(-log_temperature)
+        return float(np.mean(np.log(np.exp(logits * inverse).sum(axis=1)) - true_logits * inverse))
+
+    ratio = (math.sqrt(5) - 1) / 2
+    low, high = math.log(bounds[0]), math.log(bounds[1])
+    a, b = high - ratio * (high - low), low + ratio * (high - low)
+    nll_a, nll_b = nll(a), nll(b)
+    for _ in range(iterations):
+        if nll_a < nll_b:
+            high, b, nll_b = b, a, nll_a
+            a = high - ratio * (high - low)
+            nll_a = nll(a)
+        else:
+            low, a, nll_a = a, b, nll_b
+            b = low + ratio * (high - low)
+            nll_b = nll(b)
+    return math.exp((low + high) / 2)
+
+
+def negative_log_likelihood(probabilities: np.ndarray, y_true: np.ndarray) -> float:
+    """Mean negative log-likelihood of the true classes."""
+    probabilities = np.asarray(probabilities)
+    return float(-np.mean(np.log(np.clip(probabilities[np.arange(len(y_true)), y_true], 1e-12, None))))
+
+
+def expected_calibration_error(probabilities: np.ndarray, y_true: np.ndarray, n_bins: int = 15) -> float:
+    """
+    Expected calibration error: the pixel-weighted gap between confidence and
+    accuracy over equal-width confidence bins.
+
+    Args:
+        probabilities (np.ndarray): (n, classes) probabilities.
+        y_true (np.ndarray): True class indices.
+        n_bins (int): Number of confidence bins.
+
+    Returns:
+        float: ECE in [0, 1].
+    """
+    probabilities = np.asarray(probabilities)
+    if len(probabilities) == 0:
+        return 0.0
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == y_true
+    bins = np.minimum((confidence * n_bins).astype(np.int64), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    gaps = np.abs(
+        np.bincount(bins, weights=confidence, minlength=n_bins) - np.bincount(bins, weights=correct, minlength=n_bins)
+    )
+    return float(gaps.sum() / counts.sum())
+
+
+def held_out_images(sample_nums: np.ndarray, fraction: float = 0.5, seed: int = 42) -> np.ndarray:
+    """
+    Pixel mask of a random subset of images, so calibration is fitted on whole
+    images and checked on the others (pixels of one image are correlated).
+
+    Args:
+        sample_nums (np.ndarray): Sample_num of every pixel.
+        fraction (float): Fraction of images selected.
+        seed (int): Selection seed.
+
+    Returns:
+        np.ndarray: True for pixels of the selected images.
+    """
+    images, image_index = np.unique(np.asarray(sample_nums), return_inverse=True)
+    n_selected = max(1, int(round(fraction * len(images))))
+    selected = np.zeros(len(images), dtype=bool)
+    selected[np.random.default_rng(seed).choice(len(images), n_selected, replace=False)] = True
+    return selected[image_index.ravel()]
+
+
+class TemperatureScaler:
+    """
+    Temperature scaling: calibrated = softmax(log(p) / T), with the single
+    temperature T fitted by likelihood on held-out pixels. Dividing all logits
+    by the same T never changes the argmax, so labels and accuracy are unchanged
+    while confidences become usable as probabilities.
+    """
+
+    def __init__(self, temperature: float = 1.0) -> None:
+        self.temperature = temperature
+
+    def fit(
+        self, probabilities: np.ndarray, y_true: np.ndarray, bounds: Tuple[float, float] = (0.05, 20.0), iterations: int = 60
+    ) -> "TemperatureScaler":
+        """
+        Fit T on the log-probabilities with `fit_temperature`.
+
+        Args:
+            probabilities (np.ndarray): Raw softmax outputs of the held-out pixels.
+            y_true (np.ndarray): True class indices.
+            bounds (Tuple[float, float]): Search interval of T.
+            iterations (int): Golden-section iterations.
+
+        Returns:
+            TemperatureScaler: self.
+        """
+        self.temperature = fit_temperature(_log_probabilities(probabilities), y_true, bounds, iterations)
+        logging.info(f"Fitted softmax temperature {self.temperature:.3f} on {len(probabilities)} held-out pixels")
+        return self
+
+    def transform(self, probabilities: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        """Calibrated probabilities (float32), computed in blocks of rows."""
+        probabilities = np.asarray(probabilities)
+        out = np.empty(probabilities.shape, dtype=np.float32)
+        for start in range(0, len(probabilities), block_rows):
+            rows = slice(start, start + block_rows)
+            out[rows] = softmax(_log_probabilities(probabilities[rows]) / self.temperature)
+        return out
+
+
+class TopKProbabilities:
+    """
+    Compact per-pixel probabilities: the k most likely classes of every pixel
+    (uint8/int16 indices) and their probabilities (float16), most likely first.
+    With 11 classes and k = 3 that is 9 bytes per pixel instead of 44 for the
+    full float32 softmax. Confidences, margins and votes only need the top
+    classes, so they keep float16 precision; the tail classes share the
+    remaining mass 1 - sum(top k).
+
+    Downstream decisions are vectorized queries over the stored arrays, which
+    are memory-mapped on load; the model is never run again.
+    """
+
+    def __init__(self, indices: np.ndarray, probabilities: np.ndarray, num_classes: int, temperature: float = 1.0) -> None:
+        """
+        Args:
+            indices (np.ndarray): (n, k) class indices, most likely first.
+            probabilities (np.ndarray): (n, k) probabilities of those classes.
+            num_classes (int): Number of classes of the model.
+            temperature (float): Temperature the probabilities were calibrated with.
+        """
+        self.indices = indices
+        self.probabilities = probabilities
+        self.num_classes = num_classes
+        self.temperature = temperature
+
+    @classmethod
+    def from_probabilities(cls, probabilities: np.ndarray, k: int = 3, temperature: float = 1.0) -> "TopKProbabilities":
+        """
+        Args:
+            probabilities (np.ndarray): (n, classes) probabilities.
+            k (int): Classes kept per pixel.
+            temperature (float): Recorded calibration temperature.
+        """
+        probabilities = np.asarray(probabilities)
+        num_classes = probabilities.shape[1]
+        k = min(k, num_classes)
+        top = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        top_probabilities = np.take_along_axis(probabilities, top, axis=1)
+        order = np.argsort(-top_probabilities, axis=1, kind="stable")
+        index_dtype = np.uint8 if num_classes <= 256 else np.int16
+        return cls(
+            np.take_along_axis(top, order, axis=1).astype(index_dtype),
+            np.take_along_axis(top_probabilities, order, axis=1).astype(np.float16),
+            num_classes,
+            temperature,
+        )
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @property
+    def k(self) -> int:
+        return self.indices.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.indices.nbytes + self.probabilities.nbytes)
+
+    def save(self, directory: str) -> None:
+        """Write indices.npy, probabilities.npy and topk.json to directory."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "indices.npy"), np.asarray(self.indices))
+        np.save(os.path.join(directory, "probabilities.npy"), np.asarray(self.probabilities))
+        with open(os.path.join(directory, TOPK_META_FILENAME), "w") as fid:
+            json.dump({"num_classes": self.num_classes, "temperature": self.temperature, "k": self.k}, fid)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "TopKProbabilities":
+        """Load probabilities saved with `save`, memory-mapped by default."""
+        with open(os.path.join(directory, TOPK_META_FILENAME)) as fid:
+            meta = json.load(fid)
+        mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(directory, "indices.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, "probabilities.npy"), mmap_mode=mode),
+            meta["num_classes"],
+            meta["temperature"],
+        )
+
+    # Queries
+
+    def labels(self) -> np.ndarray:
+        """Most likely class of every pixel."""
+        return np.asarray(self.indices[:, 0], dtype=np.int64)
+
+    def confidence(self) -> np.ndarray:
+        """Probability of the most likely class."""
+        return np.asarray(self.probabilities[:, 0], dtype=np.float32)
+
+    def margin(self) -> np.ndarray:
+        """Top-1 minus top-2 probability (with k == 1, the runner-up is bounded by 1 - top-1)."""
+        top = np.asarray(self.probabilities, dtype=np.float32)
+        return top[:, 0] - (top[:, 1] if self.k > 1 else 1 - top[:, 0])
+
+    def class_probability(self, class_index: int) -> np.ndarray:
+        """
+        Probability of one class for every pixel; 0 where it is outside the top k
+        (its true probability is then at most the k-th probability).
+        """
+        hits = np.asarray(self.indices) == class_index
+        return (np.asarray(self.probabilities, dtype=np.float32) * hits).sum(axis=1)
+
+    def confident(self, min_confidence: float) -> np.ndarray:
+        """Mask of the pixels whose top probability is at least min_confidence."""
+        return self.confidence() >= min_confidence
+
+    def image_votes(
+        self, sample_nums: np.ndarray, min_confidence: Optional[float] = None, weighted: bool = False
+    ) -> Dict[str, np.ndarray]:
+        """
+        Per-image majority vote over the stored labels.
+
+        Args:
+            sample_nums (np.ndarray): Sample_num of every pixel.
+            min_confidence (float, optional): Only pixels at least this confident
+                vote; images without such pixels fall back to all their pixels.
+            weighted (bool): Weight votes by confidence instead of counting.
+
+        Returns:
+            dict: "sample_nums", "labels", "vote_share" (winning share of the
+            votes) and "voters" (pixels that voted) per image.
+        """
+        images, image_index = np.unique(np.asarray(sample_nums), return_inverse=True)
+        image_index = image_index.ravel()
+        labels, confidence = self.labels(), self.confidence()
+        weights = confidence.astype(np.float64) if weighted else np.ones(len(labels))
+        voting = np.ones(len(labels), dtype=bool)
+        if min_confidence is not None:
+            voting = confidence >= min_confidence
+            has_voters = np.bincount(image_index, weights=voting, minlength=len(images)) > 0
+            voting |= ~has_voters[image_index]
+        votes = np.bincount(
+            image_index[voting] * self.num_classes + labels[voting],
+            weights=weights[voting],
+            minlength=len(images) * self.num_classes,
+        ).reshape(len(images), self.num_classes)
+        totals = votes.sum(axis=1)
+        return {
+            "sample_nums": images,
+            "labels": votes.argmax(axis=1),
+            "vote_share": votes.max(axis=1) / np.maximum(totals, 1e-12),
+            "voters": np.bincount(image_index[voting], minlength=len(images)),
+        }
+
+    def select_for_review(self, n: int, sample_nums: Optional[np.ndarray] = None, by: str = "margin") -> np.ndarray:
+        """
+        Active-learning selection of the least certain pixels or images.
+
+        Args:
+            n (int): Number of pixels (or images) to select.
+            sample_nums (np.ndarray, optional): When given, rank images by the
+                mean uncertainty of their pixels and return Sample_nums.
+            by (str): "margin" (smallest top-1 minus top-2) or "confidence"
+                (smallest top-1 probability).
+
+        Returns:
+            np.ndarray: Pixel indices or Sample_nums, least certain first.
+        """
+        if by not in ("margin", "confidence"):
+            raise ValueError(f"Unknown review criterion '{by}'")
+        certainty = self.margin() if by == "margin" else self.confidence()
+        if sample_nums is not None:
+            images, image_index = np.unique(np.asarray(sample_nums), return_inverse=True)
+            image_index = image_index.ravel()
+            certainty = np.bincount(image_index, weights=certainty) / np.bincount(image_index)
+            order = np.argsort(certainty, kind="stable")[:n]
+            return images[order]
+        n = min(n, len(certainty))
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.argpartition(certainty, n - 1)[:n]
+        return candidates[np.argsort(certainty[candidates], kind="stable")]
@@ -0,0 +1,260 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Float sentinel of missing band values in samples.csv and the float pipeline
+MISSING_FREQ_VALUE = -9999
+
+# DataFrame.attrs key recording the encoding of compact frequency columns
+ENCODING_ATTR = "spectral_encoding"
+
+COMPACT_DTYPES = ("int16", "float16")
+DEFAULT_SCALES = {"int16": 1e-4, "float16": 1.0}
+
+
+class SpectralEncoding:
+    """
+    Compact storage of reflectances: value = code * scale + offset, with codes
+    held as int16 or float16 (2 bytes per band instead of 8 for float64).
+
+    int16 reserves its lowest code (-32768) for missing values and rounds to the
+    nearest multiple of `scale` (1e-4 by default, the usual scaled-integer
+    reflectance convention, covering reflectances up to 3.2767). float16 keeps
+    about three significant digits and stores missing values as NaN. Values are
+    decoded to float32 only where they are consumed, batch by batch.
+    """
+
+    def __init__(self, dtype: str = "int16", scale: Optional[float] = None, offset: float = 0.0) -> None:
+        """
+        Args:
+            dtype (str): "int16" or "float16".
+            scale (float, optional): Reflectance per code unit; defaults to 1e-4
+                for int16 and 1.0 for float16.
+            offset (float): Reflectance of code 0.
+        """
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f"Unsupported compact dtype '{dtype}', expected one of {COMPACT_DTYPES}")
+        self.dtype = np.dtype(dtype)
+        self.scale = float(scale if scale is not None else DEFAULT_SCALES[dtype])
+        self.offset = float(offset)
+        if self.scale <= 0:
+            raise ValueError("scale must be positive")
+
+    @property
+    def missing_code(self) -> Union[int, float]:
+        return int(np.iinfo(self.dtype).min) if self.dtype.kind == "i" else float("nan")
+
+    def __repr__(self) -> str:
+        return f"SpectralEncoding(dtype={self.dtype.name}, scale={self.scale:g}, offset={self.offset:g})"
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, SpectralEncoding) and self.to_dict() == other.to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"dtype": self.dtype.name, "scale": self.scale, "offset": self.offset}
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> "SpectralEncoding":
+        return cls(spec["dtype"], spec["scale"], spec.get("offset", 0.0))
+
+    def missing(self, codes: np.ndarray) -> np.ndarray:
+        """Boolean mask of the missing-value codes."""
+        codes = np.asarray(codes)
+        if self.dtype.kind == "i":
+            return codes == self.missing_code
+        return np.isnan(codes)
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """
+        Encode reflectances. NaN and the -9999 sentinel become the missing code;
+        values outside the representable range are clipped (and logged).
+
+        Args:
+            values (np.ndarray): Float reflectances.
+
+        Returns:
+            np.ndarray: Codes of dtype `self.dtype`, same shape as values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values) | (values == MISSING_FREQ_VALUE)
+        scaled = (values - self.offset) / self.scale
+        if self.dtype.kind == "i":
+            scaled = np.rint(scaled)
+            low, high = np.iinfo(self.dtype).min + 1, np.iinfo(self.dtype).max
+        else:
+            high = float(np.finfo(self.dtype).max)
+            low = -high
+        clipped = ~missing & ((scaled < low) | (scaled > high))
+        if clipped.any():
+            logging.warning(
+                f"{int(clipped.sum())} band values outside the {self} range were clipped"
+            )
+        codes = np.clip(np.where(missing, 0, scaled), low, high).astype(self.dtype)
+        codes[missing] = self.missing_code
+        return codes
+
+    def decode(self, codes: np.ndarray, dtype: Any = np.float32) -> np.ndarray:
+        """
+        Decode codes to reflectances (NaN where missing).
+
+        Args:
+            codes (np.ndarray): Codes of any shape.
+            dtype: Output float dtype.
+
+        Returns:
+            np.ndarray: Reflectances of the given dtype.
+        """
+        codes = np.asarray(codes)
+        values = codes.astype(dtype)
+        values *= self.scale
+        values += self.offset
+        if self.dtype.kind == "i":
+            values[codes == self.missing_code] = np.nan
+        return values
+
+    def decode_summary(self, summary: pd.DataFrame) -> pd.DataFrame:
+        """Convert a DataFrame.describe() of codes to reflectance units."""
+        summary = summary.astype(np.float64)
+        locations = [row for row in summary.index if row not in ("count", "std")]
+        summary.loc[locations] = summary.loc[locations] * self.scale + self.offset
+        if "std" in summary.index:
+            summary.loc["std"] = summary.loc["std"] * self.scale
+        return summary
+
+
+class CompactBands:
+    """
+    Read-only array proxy over encoded band codes.
+
+    Indexing returns float32 reflectances decoded from only the indexed rows, so a
+    training batch or a prediction batch is the only float copy that ever exists;
+    np.asarray(proxy) decodes the whole array. The codes may themselves be a
+    memory-mapped array or a LazyChunkedArray (materializer.chunked).
+    """
+
+    def __init__(self, codes: Any, encoding: SpectralEncoding) -> None:
+        """
+        Args:
+            codes: Encoded bands (np.ndarray, memmap or array proxy), one row per pixel.
+            encoding (SpectralEncoding): Encoding of the codes.
+        """
+        if np.dtype(codes.dtype) != encoding.dtype:
+            raise ValueError(f"Codes of dtype {codes.dtype} do not match {encoding}")
+        self.codes = codes
+        self.encoding = encoding
+        self.shape = tuple(codes.shape)
+        self.dtype = np.dtype(np.float32)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the codes (not by the decoded float32 view)."""
+        return self.size * self.encoding.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __repr__(self) -> str:
+        return f"CompactBands(shape={self.shape}, encoding={self.encoding})"
+
+    def __getitem__(self, key) -> np.ndarray:
+        return self.encoding.decode(self.codes[key])
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return self.encoding.decode(np.asarray(self.codes), dtype=dtype or np.float32)
+
+
+# Band matrices handed between steps: float arrays or compact codes
+BandArray = Union[np.ndarray, CompactBands]
+
+
+def band_columns(data: pd.DataFrame) -> List[str]:
+    """The frq* columns of a pixel frame."""
+    return [col for col in data.columns if col.startswith('frq')]
+
+
+def frame_encoding(data: pd.DataFrame) -> Optional[SpectralEncoding]:
+    """Encoding of the frequency columns of a frame, or None if they hold floats."""
+    spec = data.attrs.get(ENCODING_ATTR)
+    return SpectralEncoding.from_dict(spec) if spec else None
+
+
+def encode_frame(data: pd.DataFrame, encoding: SpectralEncoding) -> pd.DataFrame:
+    """
+    Frame with its frequency columns replaced by codes (column order kept) and
+    the encoding recorded in `attrs`, which travels through filtering, Parquet
+    artifacts and the preprocessing strategies.
+
+    Args:
+        data (pd.DataFrame): Frame with float frq columns.
+        encoding (SpectralEncoding): Target encoding.
+
+    Returns:
+        pd.DataFrame: The compact frame.
+    """
+    columns = band_columns(data)
+    codes = pd.DataFrame(encoding.encode(data[columns].to_numpy()), columns=columns, index=data.index)
+    others = data.drop(columns=columns)
+    compact = pd.concat([codes, others], axis=1)[list(data.columns)]
+    compact.attrs = {**data.attrs, ENCODING_ATTR: {**encoding.to_dict(), "columns": columns}}
+    return compact
+
+
+def frequency_bands(data: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> BandArray:
+    """
+    Band matrix of a frame: CompactBands for encoded frames, float32 otherwise.
+
+    Args:
+        data (pd.DataFrame): Cleaned or raw pixel frame.
+        columns (Sequence[str], optional): Band columns; defaults to the frq columns.
+
+    Returns:
+        np.ndarray or CompactBands: (rows, bands) matrix.
+    """
+    columns = list(columns) if columns is not None else band_columns(data)
+    encoding = frame_encoding(data)
+    if encoding is None:
+        return data[columns].to_numpy(dtype=np.float32)
+    return CompactBands(data[columns].to_numpy(dtype=encoding.dtype), encoding)
+
+
+def predict_batches(model: Any, x: Any, batch_size: int = 4096, **predict_kwargs) -> np.ndarray:
+    """
+    model.predict over an array or CompactBands, decoding one batch at a time.
+
+    Args:
+        model: Object with a Keras-style predict(x, **kwargs).
+        x: Model input; CompactBands are decoded per batch of batch_size rows.
+        batch_size (int): Rows decoded and predicted at once.
+        predict_kwargs: Passed to model.predict.
+
+    Returns:
+        np.ndarray: Concatenated model outputs.
+    """
+    if not isinstance(x, CompactBands):
+        return model.predict(x, **predict_kwargs)
+    batch_size = predict_kwargs.pop("batch_size", batch_size)
+    outputs = [
+        np.asarray(model.predict(x[start:start + batch_size], batch_size=batch_size, **predict_kwargs))
+        for start in range(0, len(x), batch_size)
+    ]
+    return np.concatenate(outputs) if outputs else np.empty((0,))
+
+
+def load_bands(x: Any) -> BandArray:
+    """
+    Bring an artifact (array, memmap or lazy proxy) into memory: arrays are
+    materialized as they are, CompactBands keep their codes and stay encoded.
+    """
+    if isinstance(x, CompactBands):
+        return CompactBands(np.asarray(x.codes), x.encoding)
+    return np.asarray(x)
@@ -0,0 +1,242 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .evaluation import ConfusionAccumulator
+
+# Memory-mapped inputs of the fold workers, set by _attach_fold_inputs
+_FOLD_INPUTS: Dict[str, Any] = {}
+
+# trainer(x_train, y_train, train_sample_nums, x_test, num_classes) -> predicted class per test row
+FoldTrainer = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int], np.ndarray]
+
+
+def group_folds(
+    labels: np.ndarray, sample_nums: np.ndarray, n_folds: int = 5, seed: int = 42
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Stratified folds that keep every image (Sample_num) in a single fold.
+
+    Args:
+        labels (np.ndarray): Class index of every pixel.
+        sample_nums (np.ndarray): Sample_num of every pixel.
+        n_folds (int): Number of folds.
+        seed (int): Shuffling seed.
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray]]: (train_rows, test_rows) per fold.
+    """
+    from sklearn.model_selection import StratifiedGroupKFold
+
+    splitter = StratifiedGroupKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(labels)), labels, groups=sample_nums))
+
+
+def _attach_fold_inputs(
+    x_path: str, labels: np.ndarray, sample_nums: np.ndarray, trainer: FoldTrainer, num_classes: int
+) -> None:
+    """Worker initializer: memory-map the band matrix written by CrossValidation.run."""
+    _FOLD_INPUTS.update(
+        x=np.load(x_path, mmap_mode="r"),
+        labels=labels,
+        sample_nums=sample_nums,
+        trainer=trainer,
+        num_classes=num_classes,
+    )
+
+
+def _run_fold(fold: int, train_rows: np.ndarray, test_rows: np.ndarray) -> Dict[str, Any]:
+    """Train on one fold's training rows and score its held-out images."""
+    x, labels, sample_nums = _FOLD_INPUTS["x"], _FOLD_INPUTS["labels"], _FOLD_INPUTS["sample_nums"]
+    num_classes = _FOLD_INPUTS["num_classes"]
+    start = time.perf_counter()
+    # Fancy indexing gathers this fold's rows from the shared page cache
+    x_train, x_test = x[train_rows], x[test_rows]
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = _FOLD_INPUTS["trainer"](x_train, labels[train_rows], sample_nums[train_rows], x_test, num_classes)
+    fit_predict_seconds = time.perf_counter() - start
+
+    accumulator = ConfusionAccumulator(num_classes)
+    accumulator.update(labels[test_rows], np.asarray(y_pred).ravel(), sample_nums[test_rows])
+    return {
+        "fold": fold,
+        "accumulator": accumulator,
+        "train_pixels": int(len(train_rows)),
+        "test_pixels": int(len(test_rows)),
+        "test_images": int(accumulator.sample_nums.size),
+        "load_seconds": load_seconds,
+        "fit_predict_seconds": fit_predict_seconds,
+        "pid": os.getpid(),
+    }
+
+
+class CNNFoldTrainer:
+    """
+    Fold trainer building a fresh CNNModel per fold (picklable, for worker processes).
+    """
+
+    def __init__(
+        self,
+        epochs: int = 10,
+        batch_size: int = 32,
+        max_pixels_per_image: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            epochs (int): Training epochs per fold.
+            batch_size (int): Mini-batch size.
+            max_pixels_per_image (int, optional): Per-image pixel budget per epoch
+                (model.sampling.PixelBudgetSampler).
+            threads_per_worker (int, optional): TensorFlow intra-op threads, so
+                concurrent folds do not oversubscribe the CPUs.
+        """
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.max_pixels_per_image = max_pixels_per_image
+        self.threads_per_worker = threads_per_worker
+
+    def __call__(
+        self,
+        x_train: np.ndarray,
+        y_train: np.ndarray,
+        train_sample_nums: np.ndarray,
+        x_test: np.ndarray,
+        num_classes: int,
+    ) -> np.ndarray:
+        import tensorflow as tf
+
+        from .data_cleaning import to_categorical
+        from .model_dev import CNNModel
+        from .sampling import PixelBudgetSampler, SampledBatches, keras_dataset
+
+        if self.threads_per_worker:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(self.threads_per_worker)
+            except RuntimeError:
+                pass  # Already initialised in this process
+        x_train = x_train.reshape(len(x_train), -1, 1)
+        x_test = x_test.reshape(len(x_test), -1, 1)
+        y_train_cat = to_categorical(y_train, num_classes)
+        cnn = CNNModel(input_shape=x_train.shape[1:], num_classes=num_classes)
+        if self.max_pixels_per_image is not None:
+            sampler = PixelBudgetSampler(train_sample_nums, y_train, max_pixels_per_image=self.max_pixels_per_image)
+            batches = SampledBatches(x_train, y_train_cat, sampler, self.batch_size)
+            cnn.model.fit(keras_dataset(batches), epochs=self.epochs, verbose=0)
+        else:
+            cnn.model.fit(x_train, y_train_cat, epochs=self.epochs, batch_size=self.batch_size, verbose=0)
+        return cnn.model.predict(x_test, batch_size=4096, verbose=0).argmax(axis=1)
+
+
+class CrossValidation:
+    """
+    Stratified group k-fold cross-validation run concurrently in worker processes.
+
+    The band matrix is written once to a temporary .npy file and memory-mapped
+    by every worker, so k concurrent folds share one copy through the page cache
+    instead of each receiving a pickled copy. Each fold returns its integer
+    confusion counts; pooled metrics come from merging them
+    (ConfusionAccumulator.merge_all), and per-fold metrics give the spread.
+    """
+
+    def __init__(self, trainer: FoldTrainer, n_folds: int = 5, num_workers: int = 1, seed: int = 42) -> None:
+        """
+        Args:
+            trainer (FoldTrainer): Picklable callable training on one fold and
+                returning the predicted class of every test row.
+            n_folds (int): Number of folds.
+            num_workers (int): Concurrent fold processes; 1 runs the folds here.
+            seed (int): Fold shuffling seed.
+        """
+        self.trainer = trainer
+        self.n_folds = n_folds
+        self.num_workers = num_workers
+        self.seed = seed
+
+    def run(
+        self, x: np.ndarray, labels: np.ndarray, sample_nums: np.ndarray, num_classes: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            x (np.ndarray): Band matrix, one row per pixel.
+            labels (np.ndarray): Class index of every pixel.
+            sample_nums (np.ndarray): Sample_num of every pixel.
+            num_classes (int, optional): Defaults to labels.max() + 1.
+
+        Returns:
+            dict: "folds" (per-fold metrics and timings), "pixel_metrics" and
+            "image_metrics" pooled over all held-out pixels, "mean"/"std" of every
+            metric across folds, and "seconds" of wall time.
+        """
+        try:
+            start = time.perf_counter()
+            labels = np.asarray(labels, dtype=np.int64)
+            sample_nums = np.asarray(sample_nums, dtype=np.int64)
+            num_classes = num_classes or int(labels.max()) + 1
+            folds = group_folds(labels, sample_nums, self.n_folds, self.seed)
+            logging.info(
+                f"Running {self.n_folds}-fold group cross-validation over {np.unique(sample_nums).size} images "
+                f"with {self.num_workers} workers"
+            )
+
+            directory = tempfile.mkdtemp(prefix="hsi-cv-")
+            try:
+                x_path = os.path.join(directory, "x.npy")
+                np.save(x_path, np.asarray(x).reshape(len(x), -1))
+                initargs = (x_path, labels, sample_nums, self.trainer, num_classes)
+                jobs = [(fold, train_rows, test_rows) for fold, (train_rows, test_rows) in enumerate(folds)]
+                if self.num_workers == 1:
+                    _attach_fold_inputs(*initargs)
+                    results = [_run_fold(*job) for job in jobs]
+                    _FOLD_INPUTS.clear()
+                else:
+                    # Spawned workers: forking a parent that already runs TensorFlow is unsafe
+                    with ProcessPoolExecutor(
+                        max_workers=self.num_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_attach_fold_inputs,
+                        initargs=initargs,
+                    ) as executor:
+                        results = list(executor.map(_run_fold, *zip(*jobs)))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+            fold_reports, accumulators = [], []
+            for result in results:
+                accumulator = result.pop("accumulator")
+                accumulators.append(accumulator)
+                result.update(accumulator.pixel_metrics())
+                result.update(accumulator.image_metrics())
+                fold_reports.append(result)
+                logging.info(
+                    f"Fold {result['fold']}: {result['test_images']} test images, "
+                    f"pixel accuracy {result['pixel_accuracy']:.4f}, image accuracy {result['image_accuracy']:.4f}, "
+                    f"{result['fit_predict_seconds']:.1f}s fit+predict"
+                )
+            pooled = ConfusionAccumulator.merge_all(accumulators)
+            metric_names = [name for name in fold_reports[0] if name.startswith(("pixel_", "image_"))]
+            summary = {
+                "folds": fold_reports,
+                "pixel_metrics": pooled.pixel_metrics(),
+                "image_metrics": pooled.image_metrics(),
+                "mean": {name: float(np.mean([fold[name] for fold in fold_reports])) for name in metric_names},
+                "std": {name: float(np.std([fold[name] for fold in fold_reports])) for name in metric_names},
+                "seconds": time.perf_counter() - start,
+            }
+            logging.info(
+                f"Cross-validation done in {summary['seconds']:.1f}s: image accuracy "
+                f"{summary['mean']['image_accuracy']:.4f} +/- {summary['std']['image_accuracy']:.4f}"
+            )
+            return summary
+        except Exception as e:
+            logging.error(f"Error during cross-validation: {str(e)}")
+            raise e
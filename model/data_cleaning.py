@@ -1,17 +1,41 @@
 import logging
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import StratifiedShuffleSplit
-from sklearn.preprocessing import LabelEncoder, RobustScaler
-from tensorflow.keras.utils import to_categorical
 
-class HyperspectralDataCleaner:
+from .compact import MISSING_FREQ_VALUE, CompactBands, SpectralEncoding, frame_encoding
+
+if TYPE_CHECKING:
+    from sklearn.preprocessing import LabelEncoder
+
+
+def to_categorical(y: np.ndarray, num_classes: int) -> np.ndarray:
     """
-    A data cleaner specialized for hyperspectral classification tasks.
+    One-hot encode integer labels (float32, like keras.utils.to_categorical)
+    without importing TensorFlow.
+    """
+    return np.eye(num_classes, dtype=np.float32)[np.asarray(y, dtype=np.int64)]
+
+
+class DataStrategy(ABC):
+    """
+    Abstract class defining strategy for handling data.
     """
     @abstractmethod
     def handle_data(self, data: pd.DataFrame) -> Union[pd.DataFrame, pd.Series, Tuple]:
         pass
 
+
+class HyperspectralDataCleaner:
+    """
+    A data cleaner specialized for hyperspectral classification tasks.
+    """
+
     def combine_classes(
         self,
         df: pd.DataFrame,
@@ -28,7 +52,7 @@ class DataPreprocessStrategy(DataStrategy):
     """
     Data preprocessing strategy which preprocesses the data.
     """
-    def handle_data(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, LabelEncoder]:
+    def handle_data(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, "LabelEncoder"]:
         """
         Preprocess the samples DataFrame by cleaning and encoding labels, 
         handling missing values, and preparing frequency columns.
@@ -52,11 +76,16 @@ class DataPreprocessStrategy(DataStrategy):
 
             # Handle frequency columns
             frequency_columns = [col for col in data.columns if col.startswith('frq')]
-            # Fill NaN with -9999
-            data.loc[:, frequency_columns] = data[frequency_columns].fillna(-9999)
-            # Drop rows if they still contain -9999
+            encoding = frame_encoding(data)
             before_freq_remove = data.shape[0]
-            data = data[np.logical_not(data[frequency_columns].eq(-9999).any(axis=1))]
+            if encoding is not None:
+                # Compact (int16/float16) bands carry their own missing-value code
+                data = data[np.logical_not(encoding.missing(data[frequency_columns].to_numpy()).any(axis=1))]
+            else:
+                # Fill NaN with -9999
+                data.loc[:, frequency_columns] = data[frequency_columns].fillna(-9999)
+                # Drop rows if they still contain -9999
+                data = data[np.logical_not(data[frequency_columns].eq(-9999).any(axis=1))]
             after_freq_remove = data.shape[0]
             logging.info(
                 f"Removed {before_freq_remove - after_freq_remove} rows due to missing freq data. "
@@ -66,12 +95,16 @@ class DataPreprocessStrategy(DataStrategy):
             # Validate no invalid values remain in frequency columns
             assert data[frequency_columns].isna().sum().sum() == 0, \
                 "NaN values still exist in frequency columns"
-            assert (data[frequency_columns] == -9999).sum().sum() == 0, \
-                "Invalid (-9999) values remain after filtering freq columns"
+            if encoding is None:
+                assert (data[frequency_columns] == -9999).sum().sum() == 0, \
+                    "Invalid (-9999) values remain after filtering freq columns"
 
             # --- Additional logging: distribution of freq columns ---
+            summary = data[frequency_columns].describe()
+            if encoding is not None:
+                summary = encoding.decode_summary(summary)
             logging.info(
-                f"Frequency columns stats:\n{data[frequency_columns].describe().round(2)}"
+                f"Frequency columns stats:\n{summary.round(2)}"
             )
 
             # Verify we still have data
@@ -83,6 +116,8 @@ class DataPreprocessStrategy(DataStrategy):
             logging.info(f"Label distribution after cleaning:\n{label_counts}")
 
             # Label Encoding
+            from sklearn.preprocessing import LabelEncoder
+
             label_encoder = LabelEncoder()
             data['Label_Encoded'] = label_encoder.fit_transform(data['Label'])
 
@@ -93,13 +128,235 @@ class DataPreprocessStrategy(DataStrategy):
             raise e
 
 
+# Shared-memory inputs of the sharded preprocessing workers, set by _attach_shard_inputs
+_SHARD_INPUTS: Dict[str, Any] = {}
+
+MIXED_LABEL = 'Mixed or Not Classified'
+
+
+def _attach_shard_inputs(
+    values_name: str,
+    values_shape: Tuple[int, int],
+    codes_name: str,
+    mixed_lookup: np.ndarray,
+    encoding: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Worker initializer: map the frequency block and label codes from shared memory.
+    With an encoding (model.compact), the block holds compact band codes.
+    """
+    values_shm = shared_memory.SharedMemory(name=values_name)
+    codes_shm = shared_memory.SharedMemory(name=codes_name)
+    band_encoding = SpectralEncoding.from_dict(encoding) if encoding else None
+    _SHARD_INPUTS.update(
+        values=np.ndarray(
+            values_shape, dtype=band_encoding.dtype if band_encoding else np.float64, buffer=values_shm.buf
+        ),
+        codes=np.ndarray((values_shape[0],), dtype=np.int64, buffer=codes_shm.buf),
+        mixed_lookup=mixed_lookup,
+        encoding=band_encoding,
+        # Keep the handles alive for as long as the arrays are used
+        handles=(values_shm, codes_shm),
+    )
+
+
+def _clean_shard(rows: np.ndarray) -> Tuple[np.ndarray, int, int, Dict[str, np.ndarray]]:
+    """
+    Clean one shard of rows (all pixels of a set of images).
+
+    Returns:
+        Tuple: kept row positions (ascending), rows dropped as "Mixed or Not
+        Classified", rows dropped for missing frequency data, and per-band
+        count/sum/sum-of-squares/min/max of the kept rows for the summary log.
+    """
+    if rows.size and rows[-1] - rows[0] + 1 == rows.size:
+        # Images stored contiguously give contiguous shards: slice the shared block without copying
+        rows_index = slice(int(rows[0]), int(rows[-1]) + 1)
+    else:
+        rows_index = rows
+    values = _SHARD_INPUTS["values"][rows_index]
+    # Label codes are shifted by one so that missing labels (code -1) index slot 0
+    mixed = _SHARD_INPUTS["mixed_lookup"][_SHARD_INPUTS["codes"][rows_index] + 1]
+    encoding = _SHARD_INPUTS["encoding"]
+    if encoding is not None:
+        missing = encoding.missing(values).any(axis=1)
+    else:
+        # Same test as the serial path: NaN (filled with -9999 there) or -9999 in any band
+        missing = (np.isnan(values) | (values == MISSING_FREQ_VALUE)).any(axis=1)
+    keep = ~mixed & ~missing
+    # Statistics are taken in reflectance units whatever the storage dtype
+    kept_values = encoding.decode(values[keep], np.float64) if encoding is not None else values[keep]
+    stats = {
+        "count": np.array(kept_values.shape[0]),
+        "sum": kept_values.sum(axis=0),
+        "sumsq": np.square(kept_values).sum(axis=0),
+        "min": kept_values.min(axis=0) if kept_values.size else np.full(values.shape[1], np.inf),
+        "max": kept_values.max(axis=0) if kept_values.size else np.full(values.shape[1], -np.inf),
+    }
+    return rows[keep], int(mixed.sum()), int((~mixed & missing).sum()), stats
+
+
+class ShardedPreprocessStrategy(DataStrategy):
+    """
+    DataPreprocessStrategy executed across a process pool, sharded by Sample_num.
+
+    The frequency block and the per-row label codes are placed in shared memory
+    once; workers map them and each cleans whole images (NaN/-9999 filtering,
+    "Mixed or Not Classified" removal), returning only the positions of the rows
+    it keeps. File and Label strings are parsed once per distinct value rather
+    than once per pixel. Kept positions are merged in ascending order, so the
+    result (rows, order, index, dtypes, label encoding) is identical to the
+    serial DataPreprocessStrategy whatever the number of workers.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, shards_per_worker: int = 4) -> None:
+        """
+        Args:
+            num_workers (int, optional): Worker processes; defaults to the CPU count.
+                1 runs the shards in this process.
+            shards_per_worker (int): Shards per worker, for load balancing between
+                images of different sizes.
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.shards_per_worker = shards_per_worker
+
+    @staticmethod
+    def _shard_rows(image_codes: np.ndarray, num_shards: int) -> List[np.ndarray]:
+        """
+        Row positions per shard; all pixels of an image land in the same shard.
+        Images are numbered in order of first appearance and assigned to shards in
+        consecutive blocks, so a table stored image by image yields contiguous shards.
+        """
+        n_images = int(image_codes.max()) + 1 if image_codes.size else 1
+        shard_of_row = image_codes * num_shards // n_images
+        order = np.argsort(shard_of_row, kind="stable")
+        bounds = np.cumsum(np.bincount(shard_of_row, minlength=num_shards))[:-1]
+        return [rows for rows in np.split(order, bounds) if rows.size]
+
+    def handle_data(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, "LabelEncoder"]:
+        """
+        Preprocess the samples DataFrame exactly like DataPreprocessStrategy.
+        """
+        try:
+            logging.info(f"Starting ShardedPreprocessStrategy with {self.num_workers} workers...")
+            frequency_columns = [col for col in data.columns if col.startswith('frq')]
+
+            # Parse File and Label once per distinct value
+            file_codes, file_uniques = pd.factorize(data['File'])
+            sample_uniques = pd.Series(file_uniques).str.split('_').str[0].astype(int).to_numpy()
+            if (file_codes < 0).any():
+                raise ValueError("Missing values in 'File' column")
+            sample_nums = sample_uniques[file_codes]
+
+            label_codes, label_uniques = pd.factorize(data['Label'])
+            # Same string operations as the serial path, so the cleaned labels get the same dtype;
+            # slot 0 stands for missing labels (factorize code -1)
+            label_uniques = pd.concat(
+                [pd.Series([np.nan], dtype=data['Label'].dtype), pd.Series(label_uniques, dtype=data['Label'].dtype)],
+                ignore_index=True,
+            )
+            clean_labels = label_uniques.str.split('(').str[0].str.strip()
+            mixed_lookup = (clean_labels == MIXED_LABEL).to_numpy(dtype=bool, na_value=False)
+
+            encoding = frame_encoding(data)
+            values_dtype = encoding.dtype if encoding is not None else np.float64
+            values = np.ascontiguousarray(data[frequency_columns].to_numpy(dtype=values_dtype))
+            values_shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            codes_shm = shared_memory.SharedMemory(create=True, size=max(label_codes.nbytes, 1))
+            try:
+                np.ndarray(values.shape, dtype=values_dtype, buffer=values_shm.buf)[:] = values
+                np.ndarray(label_codes.shape, dtype=np.int64, buffer=codes_shm.buf)[:] = label_codes
+                del values
+                initargs = (
+                    values_shm.name, (len(data), len(frequency_columns)), codes_shm.name, mixed_lookup,
+                    encoding.to_dict() if encoding is not None else None,
+                )
+                # Shard by the parsed Sample_num, so every pixel of an image (from any
+                # of its files) is cleaned by the same worker
+                image_codes, _ = pd.factorize(sample_nums)
+                shards = self._shard_rows(image_codes, self.num_workers * self.shards_per_worker)
+                if self.num_workers == 1:
+                    _attach_shard_inputs(*initargs)
+                    results = [_clean_shard(rows) for rows in shards]
+                    _SHARD_INPUTS.clear()
+                else:
+                    with ProcessPoolExecutor(
+                        max_workers=self.num_workers, initializer=_attach_shard_inputs, initargs=initargs
+                    ) as executor:
+                        results = list(executor.map(_clean_shard, shards))
+            finally:
+                for shm in (values_shm, codes_shm):
+                    shm.close()
+                    shm.unlink()
+
+            # Deterministic merge: kept rows in their original order
+            kept = np.sort(np.concatenate([result[0] for result in results] + [np.empty(0, dtype=np.int64)]))
+            removed_mixed = sum(result[1] for result in results)
+            removed_freq = sum(result[2] for result in results)
+            logging.info(
+                f"Removed {removed_mixed} rows labeled '{MIXED_LABEL}' and {removed_freq} rows "
+                f"due to missing freq data. Remaining rows: {kept.size}"
+            )
+            if kept.size == 0:
+                raise ValueError("No data remains after cleaning steps!")
+
+            count = sum(int(result[3]["count"]) for result in results)
+            band_sum = np.sum([result[3]["sum"] for result in results], axis=0)
+            band_sumsq = np.sum([result[3]["sumsq"] for result in results], axis=0)
+            mean = band_sum / count
+            std = np.sqrt(np.maximum(band_sumsq / count - mean ** 2, 0) * count / max(count - 1, 1))
+            summary = pd.DataFrame(
+                {
+                    "mean": mean,
+                    "std": std,
+                    "min": np.min([result[3]["min"] for result in results], axis=0),
+                    "max": np.max([result[3]["max"] for result in results], axis=0),
+                },
+                index=frequency_columns,
+            ).T
+            logging.info(f"Frequency columns stats:\n{summary.round(2)}")
+
+            # Rebuild the frame the serial path produces: positions after dropping
+            # "Mixed or Not Classified" rows become the index
+            not_mixed = ~mixed_lookup[label_codes + 1]
+            index_after_mixed = np.cumsum(not_mixed) - 1
+            result = data.iloc[kept].copy()
+            result.index = pd.Index(index_after_mixed[kept], dtype=np.int64)
+            result['Sample_num'] = sample_nums[kept]
+            result['Label'] = pd.Series(
+                clean_labels.to_numpy()[label_codes[kept] + 1], index=result.index, dtype=clean_labels.dtype
+            )
+
+            label_counts = result['Label'].value_counts()
+            logging.info(f"Label distribution after cleaning:\n{label_counts}")
+
+            from sklearn.preprocessing import LabelEncoder
+
+            label_encoder = LabelEncoder()
+            result['Label_Encoded'] = label_encoder.fit_transform(result['Label'])
+
+            return result, label_encoder
+
+        except Exception as e:
+            logging.error(f"Error in ShardedPreprocessStrategy: {str(e)}")
+            raise e
+
+
 class DataDivideStrategy(DataStrategy):
     """
     Data dividing strategy which divides the data into train and test data.
     Now includes RobustScaler for frequency columns to avoid data leakage.
     """
 
-    def handle_data(self, data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    def __init__(self, return_sample_nums: bool = False) -> None:
+        """
+        Args:
+            return_sample_nums (bool): Also return the Sample_num of every train/test
+                pixel, which image-level metrics need to group pixels by image.
+        """
+        self.return_sample_nums = return_sample_nums
+
+    def handle_data(self, data: pd.DataFrame) -> Tuple[np.ndarray, ...]:
         """
         Stratified splitting of the data into train and test datasets, 
         followed by robust scaling of frequency columns and final reshaping 
@@ -107,6 +364,7 @@ class DataDivideStrategy(DataStrategy):
 
         Returns:
             X_train, X_test, y_train_cat, y_test_cat
+            (followed by train_sample_nums, test_sample_nums if return_sample_nums)
         """
         try:
             logging.info("Starting DataDivideStrategy...")
@@ -116,6 +374,8 @@ class DataDivideStrategy(DataStrategy):
             logging.info(f"Unique sample images: {image_samples_df.shape[0]}")
 
             # Stratified split at the image level
+            from sklearn.model_selection import StratifiedShuffleSplit
+
             sss = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
             train_indices, test_indices = next(
                 sss.split(image_samples_df['Sample_num'], image_samples_df['Label_Encoded'])
@@ -155,6 +415,11 @@ class DataDivideStrategy(DataStrategy):
             X_train = X_train.reshape((X_train.shape[0], X_train.shape[1], 1))
             X_test = X_test.reshape((X_test.shape[0], X_test.shape[1], 1))
 
+            # Compact bands stay encoded; batches are decoded to float32 when consumed
+            encoding = frame_encoding(data)
+            if encoding is not None:
+                X_train, X_test = CompactBands(X_train, encoding), CompactBands(X_test, encoding)
+
             # Convert labels to one-hot encoding
             num_classes = len(data['Label_Encoded'].unique())
             y_train_cat = to_categorical(y_train, num_classes)
@@ -167,6 +432,11 @@ class DataDivideStrategy(DataStrategy):
                 f"Num classes: {num_classes}"
             )
 
+            if self.return_sample_nums:
+                train_sample_nums = train_df['Sample_num'].values
+                test_sample_nums = test_df['Sample_num'].values
+                return X_train, X_test, y_train_cat, y_test_cat, train_sample_nums, test_sample_nums
+
             return X_train, X_test, y_train_cat, y_test_cat
 
         except Exception as e:
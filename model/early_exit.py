@@ -0,0 +1,377 @@
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .batch_inference import (
+    _WORKER,
+    _init_worker,
+    iter_windows,
+    load_predictor,
+    peak_rss_mb,
+    predict_labels,
+    read_window,
+    rows_per_window,
+    tile_info,
+)
+
+
+def vote_settled(counts: np.ndarray, scored: int, total: int, alpha: float) -> bool:
+    """
+    Whether the leading class of the pixels scored so far is the majority of all
+    `total` pixels, at error probability `alpha` for this look.
+
+    Settled when the runner-up cannot catch up even if every remaining pixel
+    votes for it, or when a Hoeffding-Serfling bound (sampling without
+    replacement) on the leader-minus-runner-up share of the whole image is above 0.
+    Each scored pixel contributes +1 (leader), -1 (runner-up) or 0, so the bound
+    also covers every class behind the runner-up.
+
+    Args:
+        counts (np.ndarray): Votes per class among the scored pixels.
+        scored (int): Pixels scored so far (in random order).
+        total (int): Pixels of the image.
+        alpha (float): Error probability allowed for this look.
+
+    Returns:
+        bool: True if scoring can stop.
+    """
+    if scored >= total:
+        return True
+    top = np.sort(counts)[::-1]
+    leader, runner_up = int(top[0]), int(top[1]) if len(top) > 1 else 0
+    if leader - runner_up > total - scored:
+        return True
+    finite_population = 1 - (scored - 1) / total
+    margin = math.sqrt(2 * finite_population * math.log(1 / alpha) / scored)
+    return (leader - runner_up) / scored > margin
+
+
+class TilePixels:
+    """
+    The valid pixels of a tile, read on demand.
+
+    Construction streams the tile once, window by window, to find the valid
+    pixels (finite in every band and not all nodata, as in BatchInference); only
+    their flat positions are kept. Indexing with sorted positions reads just the
+    row windows holding the requested pixels, so memory stays bounded by the
+    window size however large the tile is.
+
+    A random pixel order touches almost every window at every look, so the
+    decoded valid pixels of each window read are kept while they fit in
+    `cache_bytes`; windows beyond the budget are read again when needed.
+    """
+
+    def __init__(
+        self, path: str, window_rows: int, bands: Optional[Sequence[int]] = None, cache_bytes: int = 0
+    ) -> None:
+        """
+        Args:
+            path (str): GeoTIFF or .npy (bands, rows, cols) tile.
+            window_rows (int): Tile rows read at a time.
+            bands (Sequence[int], optional): Tile band indices the model was trained on.
+            cache_bytes (int): Memory for keeping the valid pixels of windows read.
+        """
+        self.path = path
+        self.bands = bands
+        self.window_rows = max(1, int(window_rows))
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self._cache: Dict[int, np.ndarray] = {}
+        info = tile_info(path)
+        self.cols = info["cols"]
+        self.windows = list(iter_windows(info["rows"], self.window_rows))
+        index_dtype = np.uint32 if info["rows"] * info["cols"] < 2 ** 32 else np.int64
+        positions = []
+        for row_start, row_stop in self.windows:
+            pixels = self._window_pixels(row_start, row_stop)
+            valid = np.isfinite(pixels).all(axis=1)
+            if info["nodata"] is not None:
+                valid &= ~(pixels == info["nodata"]).all(axis=1)
+            positions.append((np.flatnonzero(valid) + row_start * self.cols).astype(index_dtype))
+        self.positions = np.concatenate(positions) if positions else np.empty(0, dtype=index_dtype)
+        self.window_offsets = np.cumsum([0] + [len(window) for window in positions])
+
+    def _window_pixels(self, row_start: int, row_stop: int) -> np.ndarray:
+        window = read_window(self.path, row_start, row_stop, self.bands)
+        return window.reshape(window.shape[0], -1).T.astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _valid_pixels(self, i: int) -> np.ndarray:
+        """The valid pixels of window i, from the cache or read from the tile."""
+        if i in self._cache:
+            return self._cache[i]
+        row_start, row_stop = self.windows[i]
+        flat = self.positions[self.window_offsets[i]:self.window_offsets[i + 1]].astype(np.int64)
+        pixels = self._window_pixels(row_start, row_stop)[flat - row_start * self.cols]
+        if self.cached_bytes + pixels.nbytes <= self.cache_bytes:
+            self._cache[i] = pixels
+            self.cached_bytes += pixels.nbytes
+        return pixels
+
+    def __getitem__(self, rows: np.ndarray) -> np.ndarray:
+        """(len(rows), bands) float32 pixels at sorted valid-pixel indices `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        window_of = np.searchsorted(self.window_offsets, rows, side="right") - 1
+        bounds = np.searchsorted(window_of, np.arange(len(self.windows) + 1))
+        pixels = []
+        for i in np.unique(window_of):
+            pixels.append(self._valid_pixels(i)[rows[bounds[i]:bounds[i + 1]] - self.window_offsets[i]])
+        return np.concatenate(pixels) if pixels else np.empty((0, 0), dtype=np.float32)
+
+
+def _vote_tile(
+    voter: "EarlyExitVoter",
+    path: str,
+    index: int,
+    window_rows: int,
+    bands: Optional[Sequence[int]],
+    cache_bytes: int = 0,
+) -> Dict[str, Any]:
+    """Vote over one tile; each tile draws its pixel order from (seed, tile index)."""
+    pixels = TilePixels(path, window_rows, bands, cache_bytes)
+    name = os.path.splitext(os.path.basename(path))[0]
+    if len(pixels) == 0:
+        return {"image": name, "label": None, "scored_pixels": 0, "total_pixels": 0, "early_exit": False}
+    return {"image": name, **voter.vote(pixels, np.random.default_rng([voter.seed, index]))}
+
+
+def _vote_tile_in_worker(
+    settings: Dict[str, Any], path: str, index: int, window_rows: int, cache_bytes: int
+) -> Dict[str, Any]:
+    """Vote over one tile inside a worker process, with the worker's warm model."""
+    voter = EarlyExitVoter(
+        lambda pixels: predict_labels(_WORKER["predictor"], pixels[..., None], _WORKER["batch_size"]),
+        **settings,
+    )
+    return _vote_tile(voter, path, index, window_rows, _WORKER["bands"], cache_bytes)
+
+
+class EarlyExitVoter:
+    """
+    Image labels by sequential majority voting: each image's pixels are scored in
+    random order, in batches that double in size, and scoring stops as soon as
+    `vote_settled` shows the leading class cannot be overtaken. The error
+    probability 1 - confidence is spread over the looks (alpha / (t (t + 1)) for
+    the t-th look) and over the competing classes, so the early label equals the
+    full-vote label with probability at least `confidence`. Contested images
+    never settle and are scored in full.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        num_classes: int,
+        confidence: float = 0.99,
+        batch_size: int = 256,
+        seed: int = 0,
+        verify: bool = False,
+        model_path: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            predict_fn (Callable): Maps pixels (n, bands) to predicted class indices.
+            num_classes (int): Number of classes of the model.
+            confidence (float): Probability that the early label equals the full vote.
+            batch_size (int): Pixels in the first batch of an image.
+            seed (int): Seed of the pixel order.
+            verify (bool): After an early exit, also score the remaining pixels to
+                report the agreement rate with full voting (no time is saved).
+            model_path (str, optional): Saved model, needed to vote over tiles in
+                worker processes (set by `from_path`).
+        """
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be in (0, 1)")
+        self.predict_fn = predict_fn
+        self.num_classes = num_classes
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.seed = seed
+        self.verify = verify
+        self.model_path = model_path
+
+    @classmethod
+    def from_path(cls, model_path: str, predict_batch_size: int = 4096, **kwargs) -> "EarlyExitVoter":
+        """Voter around a saved model (see model.batch_inference.load_predictor)."""
+        predictor = load_predictor(model_path)
+        num_classes = kwargs.pop("num_classes", None)
+        if num_classes is None:
+            if not hasattr(predictor, "output_shape"):
+                raise ValueError("num_classes is required for predictors other than Keras models.")
+            num_classes = int(predictor.output_shape[-1])
+        return cls(
+            lambda pixels: predict_labels(predictor, pixels[..., None], predict_batch_size),
+            num_classes,
+            model_path=model_path,
+            **kwargs,
+        )
+
+    def vote(self, pixels: Any, rng: np.random.Generator) -> Dict[str, Any]:
+        """
+        Sequential vote over one image.
+
+        Args:
+            pixels: (n, bands) array (or memmap) of the image's valid pixels.
+            rng (np.random.Generator): Source of the pixel order.
+
+        Returns:
+            dict: "label", "scored_pixels", "total_pixels", "early_exit" and, with
+            verify, "full_label".
+        """
+        total = len(pixels)
+        order = rng.permutation(total)
+        alpha = (1 - self.confidence) / max(self.num_classes - 1, 1)
+        counts = np.zeros(self.num_classes, dtype=np.int64)
+        scored, look, size = 0, 0, self.batch_size
+        while scored < total:
+            rows = np.sort(order[scored:scored + size])
+            counts += np.bincount(self.predict_fn(np.asarray(pixels[rows])), minlength=self.num_classes)
+            scored += len(rows)
+            look += 1
+            size *= 2
+            if vote_settled(counts, scored, total, alpha / (look * (look + 1))):
+                break
+        result = {
+            "label": int(counts.argmax()),
+            "scored_pixels": scored,
+            "total_pixels": total,
+            "early_exit": scored < total,
+        }
+        if self.verify:
+            if scored < total:
+                rows = np.sort(order[scored:])
+                counts += np.bincount(self.predict_fn(np.asarray(pixels[rows])), minlength=self.num_classes)
+            result["full_label"] = int(counts.argmax())
+        return result
+
+    def _report(self, images: pd.DataFrame, seconds: float) -> Dict[str, Any]:
+        scored, total = int(images["scored_pixels"].sum()), int(images["total_pixels"].sum())
+        report = {
+            "images": len(images),
+            "pixels_total": total,
+            "pixels_scored": scored,
+            "pixels_saved_fraction": round(1 - scored / total, 4) if total else 0.0,
+            "early_exit_rate": round(float(images["early_exit"].mean()), 4) if len(images) else 0.0,
+            "confidence": self.confidence,
+            "seconds": round(seconds, 3),
+        }
+        # Tiles without valid pixels have no label to agree on
+        voted = images[images["total_pixels"] > 0] if len(images) else images
+        if self.verify and len(voted):
+            report["agreement_rate"] = round(float((voted["label"] == voted["full_label"]).mean()), 4)
+        logging.info(
+            f"Early-exit voting: {report['images']} images, {report['pixels_saved_fraction']:.1%} of pixels saved, "
+            f"{report['early_exit_rate']:.1%} exited early"
+            + (f", {report['agreement_rate']:.2%} agree with full voting" if "agreement_rate" in report else "")
+        )
+        return report
+
+    def classify_images(self, x: np.ndarray, sample_nums: np.ndarray) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Label every image of a pixel table (e.g. x_test with test_sample_nums).
+
+        Returns:
+            (pd.DataFrame, dict): One row per image (sample_num plus the `vote`
+            fields), and the report (pixels saved, early-exit and agreement rates).
+        """
+        start = time.perf_counter()
+        x = np.asarray(x).reshape(len(x), -1)
+        rng = np.random.default_rng(self.seed)
+        order = np.argsort(sample_nums, kind="stable")
+        keys, starts = np.unique(np.asarray(sample_nums)[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        rows = []
+        for i, sample_num in enumerate(keys):
+            rows.append({"sample_num": int(sample_num), **self.vote(x[order[bounds[i]:bounds[i + 1]]], rng)})
+        images = pd.DataFrame(rows)
+        return images, self._report(images, time.perf_counter() - start)
+
+    def classify_tiles(
+        self,
+        tile_paths: Sequence[str],
+        bands: Optional[Sequence[int]] = None,
+        workers: int = 0,
+        memory_limit_mb: float = 4096,
+        predict_batch_size: int = 4096,
+    ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Label every tile (one image per tile, as in BatchInference), skipping
+        nodata and NaN pixels.
+
+        Tiles are never loaded whole: pixels are read lazily through `TilePixels`
+        in row windows sized from the memory ceiling (half of each worker's
+        share; the other half keeps the valid pixels of windows already read,
+        so later looks rarely read the tile again), and with workers the tiles
+        are voted on in parallel by processes that each hold one warm copy of the
+        model (model.batch_inference worker setup).
+
+        Args:
+            tile_paths (Sequence[str]): GeoTIFF or .npy (bands, rows, cols) tiles.
+            bands (Sequence[int], optional): Tile band indices the model was trained on.
+            workers (int): Number of worker processes; 0 votes in this process.
+            memory_limit_mb (float): Memory ceiling shared by all workers; sets the window size.
+            predict_batch_size (int): Pixels per model forward pass in the workers.
+
+        Returns:
+            (pd.DataFrame, dict): One row per tile and the report.
+        """
+        start = time.perf_counter()
+        bands = list(bands) if bands is not None else None
+        cache_bytes = int(memory_limit_mb * 1024 ** 2 / (2 * max(workers, 1)))
+        tasks = []
+        for index, path in enumerate(tile_paths):
+            info = tile_info(path)
+            n_bands = len(bands) if bands is not None else info["bands"]
+            window_rows = rows_per_window(info["cols"], n_bands, memory_limit_mb, workers)
+            tasks.append((path, index, window_rows, cache_bytes))
+
+        if workers == 0:
+            rows = [
+                _vote_tile(self, path, index, window_rows, bands, cache_bytes)
+                for path, index, window_rows, cache_bytes in tasks
+            ]
+        else:
+            if self.model_path is None:
+                raise ValueError("Voting in worker processes requires a voter built with EarlyExitVoter.from_path.")
+            settings = {
+                "num_classes": self.num_classes, "confidence": self.confidence,
+                "batch_size": self.batch_size, "seed": self.seed, "verify": self.verify,
+            }
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(self.model_path, bands, predict_batch_size),
+            ) as executor:
+                futures = [executor.submit(_vote_tile_in_worker, settings, *task) for task in tasks]
+                rows = [future.result() for future in futures]
+
+        images = pd.DataFrame(rows)
+        report = self._report(images, time.perf_counter() - start)
+        parent_rss, worker_rss = peak_rss_mb()
+        report.update(
+            workers=workers,
+            memory_limit_mb=memory_limit_mb,
+            peak_rss_mb=round(parent_rss, 1),
+            peak_worker_rss_mb=round(worker_rss, 1),
+        )
+        return images, report
+
+
+def write_early_exit_outputs(
+    images: pd.DataFrame, report: Dict[str, Any], output_dir: str, class_names: Optional[Sequence[str]] = None
+) -> None:
+    """Write early_exit_labels.csv and early_exit_report.json to output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    images = images.copy()
+    if class_names is not None:
+        images["label_name"] = [None if label is None or pd.isna(label) else class_names[int(label)] for label in images["label"]]
+    images.to_csv(os.path.join(output_dir, "early_exit_labels.csv"), index=False)
+    with open(os.path.join(output_dir, "early_exit_report.json"), "w") as fid:
+        json.dump(report, fid, indent=2)
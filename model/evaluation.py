@@ -1,16 +1,456 @@
 import logging
 from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
 import numpy as np
-import pandas as pd
-from sklearn.metrics import (
-    mean_squared_error,
-    r2_score,
-    accuracy_score,
-    confusion_matrix,
-    classification_report,
-)
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise division that yields 0 where the denominator is 0 (sklearn's zero_division=0)."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def confusion_counts(
+    y_true: np.ndarray, y_pred: np.ndarray, num_classes: int
+) -> np.ndarray:
+    """
+    Build an integer confusion matrix with a single bincount.
+
+    Args:
+        y_true (np.ndarray): Encoded ground truth labels in [0, num_classes).
+        y_pred (np.ndarray): Encoded predicted labels in [0, num_classes).
+        num_classes (int): Number of classes.
+
+    Returns:
+        np.ndarray: (num_classes, num_classes) int64 matrix, rows are true labels.
+    """
+    codes = np.asarray(y_true, dtype=np.int64) * num_classes + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(codes, minlength=num_classes * num_classes).reshape(
+        num_classes, num_classes
+    )
+
+
+def batch_confusion_counts(
+    y_true: np.ndarray, y_preds: np.ndarray, num_classes: int
+) -> np.ndarray:
+    """
+    Confusion matrices for several models scored on the same test set, in one bincount.
+
+    Args:
+        y_true (np.ndarray): (n,) encoded ground truth labels.
+        y_preds (np.ndarray): (num_models, n) encoded predictions, one row per model.
+        num_classes (int): Number of classes.
+
+    Returns:
+        np.ndarray: (num_models, num_classes, num_classes) int64 confusion matrices.
+    """
+    y_preds = np.atleast_2d(np.asarray(y_preds, dtype=np.int64))
+    num_models = y_preds.shape[0]
+    cells = num_classes * num_classes
+    model_offsets = (np.arange(num_models, dtype=np.int64) * cells)[:, None]
+    codes = model_offsets + np.asarray(y_true, dtype=np.int64)[None, :] * num_classes + y_preds
+    return np.bincount(codes.ravel(), minlength=num_models * cells).reshape(
+        num_models, num_classes, num_classes
+    )
+
+
+def _confusion_metric_arrays(cm: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Classification metrics for a confusion matrix or a stack of them.
+
+    Works on arrays of shape (..., C, C) so bootstrap replicates are scored in one
+    vectorized pass; each metric has the leading (...) shape.
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    total = cm.sum(axis=(-2, -1))
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+
+    precision = _safe_divide(tp, predicted)
+    recall = _safe_divide(tp, support)
+    f1 = _safe_divide(2 * tp, support + predicted)
+    present = (support + predicted) > 0
+    observed = support > 0
+
+    return {
+        "accuracy": _safe_divide(tp.sum(axis=-1), total),
+        "f1": _safe_divide((f1 * support).sum(axis=-1), total),
+        "macro_f1": _safe_divide((f1 * present).sum(axis=-1), present.sum(axis=-1)),
+        "precision": _safe_divide((precision * support).sum(axis=-1), total),
+        "recall": _safe_divide((recall * support).sum(axis=-1), total),
+        "balanced_accuracy": _safe_divide((recall * observed).sum(axis=-1), observed.sum(axis=-1)),
+    }
+
+
+def metrics_from_confusion(cm: np.ndarray, prefix: str = "") -> Dict[str, float]:
+    """
+    Derive the classification metrics used by the pipeline from a confusion matrix.
+
+    Averages follow sklearn: "weighted" averages use per-class support, "macro"
+    averages only include classes present in either the labels or the predictions.
+
+    Args:
+        cm (np.ndarray): (C, C) confusion matrix, rows are true labels.
+        prefix (str): Prefix for the metric names, e.g. "pixel_" or "image_".
+
+    Returns:
+        Dict[str, float]: accuracy, weighted/macro F1, weighted precision/recall
+        and balanced accuracy.
+    """
+    return {
+        f"{prefix}{name}": float(value)
+        for name, value in _confusion_metric_arrays(cm).items()
+    }
+
+
+def format_classification_report(
+    cm: np.ndarray, class_names: Optional[Sequence[str]] = None, digits: int = 2
+) -> str:
+    """
+    Render a text report in the layout of sklearn's classification_report,
+    computed from a confusion matrix instead of the raw label arrays.
+
+    Args:
+        cm (np.ndarray): (C, C) confusion matrix, rows are true labels.
+        class_names (Sequence[str], optional): Display names for each class.
+        digits (int): Number of decimals.
+
+    Returns:
+        str: The formatted report.
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    num_classes = cm.shape[0]
+    if class_names is None:
+        class_names = [str(i) for i in range(num_classes)]
+    tp = np.diag(cm)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = _safe_divide(tp, predicted)
+    recall = _safe_divide(tp, support)
+    f1 = _safe_divide(2 * tp, support + predicted)
+    present = (support + predicted) > 0
+    total = support.sum()
+
+    width = max(max(len(str(name)) for name in class_names), len("weighted avg"))
+    header = f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}"
+    lines = [header, ""]
+    for i in np.flatnonzero(present):
+        lines.append(
+            f"{str(class_names[i]):>{width}} {precision[i]:>9.{digits}f} {recall[i]:>9.{digits}f} "
+            f"{f1[i]:>9.{digits}f} {int(support[i]):>9}"
+        )
+    lines.append("")
+    accuracy = float(_safe_divide(tp.sum(), total))
+    lines.append(f"{'accuracy':>{width}} {'':>9} {'':>9} {accuracy:>9.{digits}f} {int(total):>9}")
+    lines.append(
+        f"{'macro avg':>{width}} {precision[present].mean():>9.{digits}f} "
+        f"{recall[present].mean():>9.{digits}f} {f1[present].mean():>9.{digits}f} {int(total):>9}"
+    )
+    weights = _safe_divide(support, total)
+    lines.append(
+        f"{'weighted avg':>{width}} {(precision * weights).sum():>9.{digits}f} "
+        f"{(recall * weights).sum():>9.{digits}f} {(f1 * weights).sum():>9.{digits}f} {int(total):>9}"
+    )
+    return "\n".join(lines)
+
+
+class ConfusionAccumulator:
+    """
+    Mergeable integer confusion counts for pixel-level and image-level classification metrics.
+
+    When sample numbers are provided, counts are kept per image as a
+    (num_images, C, C) array built with one bincount. The pixel confusion matrix is the
+    sum over images, and the image label/prediction come from a majority vote over each
+    image's rows/columns, so every metric is derived from the counts without rescanning
+    the predictions. Accumulators built on different shards (or by different worker
+    processes) are combined with `merge`; images split across shards are summed.
+
+    Without sample numbers only pixel counts are kept and each pixel is treated as its
+    own image.
+    """
+
+    def __init__(self, num_classes: int) -> None:
+        """
+        Args:
+            num_classes (int): Number of classes (length of label_encoder.classes_).
+        """
+        self.num_classes = num_classes
+        self.sample_nums = np.empty(0, dtype=np.int64)
+        self.image_counts = np.zeros((0, num_classes, num_classes), dtype=np.int64)
+        self.pixel_counts = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.has_images: Optional[bool] = None
+
+    def _check_mode(self, has_images: bool) -> None:
+        if self.has_images is None:
+            self.has_images = has_images
+        elif self.has_images != has_images:
+            raise ValueError(
+                "Cannot mix batches with and without sample numbers in one ConfusionAccumulator."
+            )
+
+    def update(
+        self,
+        y_true: np.ndarray,
+        y_pred: np.ndarray,
+        sample_nums: Optional[np.ndarray] = None,
+    ) -> "ConfusionAccumulator":
+        """
+        Add a batch of encoded labels and predictions.
+
+        Args:
+            y_true (np.ndarray): Encoded ground truth labels.
+            y_pred (np.ndarray): Encoded predicted labels.
+            sample_nums (np.ndarray, optional): Image (Sample_num) of every pixel.
+
+        Returns:
+            ConfusionAccumulator: self, to allow chaining.
+        """
+        y_true = np.asarray(y_true, dtype=np.int64).ravel()
+        y_pred = np.asarray(y_pred, dtype=np.int64).ravel()
+        if y_true.shape != y_pred.shape:
+            raise ValueError(
+                f"y_true and y_pred have different lengths: {y_true.shape[0]} vs {y_pred.shape[0]}"
+            )
+        num_classes = self.num_classes
+        cells = num_classes * num_classes
+
+        if sample_nums is None:
+            self._check_mode(False)
+            self.pixel_counts += confusion_counts(y_true, y_pred, num_classes)
+            return self
+
+        self._check_mode(True)
+        sample_nums = np.asarray(sample_nums, dtype=np.int64).ravel()
+        if sample_nums.shape != y_true.shape:
+            raise ValueError("sample_nums must have one entry per prediction.")
+        batch_samples, image_index = np.unique(sample_nums, return_inverse=True)
+        codes = image_index * cells + y_true * num_classes + y_pred
+        batch_counts = np.bincount(codes, minlength=batch_samples.size * cells).reshape(
+            batch_samples.size, num_classes, num_classes
+        )
+        self._add_images(batch_samples, batch_counts)
+        return self
+
+    def _add_images(self, sample_nums: np.ndarray, counts: np.ndarray) -> None:
+        self.pixel_counts += counts.sum(axis=0)
+        if self.sample_nums.size == 0:
+            self.sample_nums, self.image_counts = sample_nums, counts
+            return
+        all_samples = np.concatenate([self.sample_nums, sample_nums])
+        all_counts = np.concatenate([self.image_counts, counts])
+        merged_samples, image_index = np.unique(all_samples, return_inverse=True)
+        merged_counts = np.zeros(
+            (merged_samples.size, self.num_classes, self.num_classes), dtype=np.int64
+        )
+        np.add.at(merged_counts, image_index, all_counts)
+        self.sample_nums, self.image_counts = merged_samples, merged_counts
+
+    def merge(self, other: "ConfusionAccumulator") -> "ConfusionAccumulator":
+        """
+        Fold the counts of another accumulator (e.g. from another shard) into this one.
+
+        Args:
+            other (ConfusionAccumulator): Partial result with the same number of classes.
+
+        Returns:
+            ConfusionAccumulator: self, to allow chaining.
+        """
+        if other.num_classes != self.num_classes:
+            raise ValueError(
+                f"Cannot merge accumulators with {other.num_classes} and {self.num_classes} classes."
+            )
+        if other.has_images is None:
+            return self
+        self._check_mode(other.has_images)
+        if other.has_images:
+            self._add_images(other.sample_nums, other.image_counts)
+        else:
+            self.pixel_counts += other.pixel_counts
+        return self
+
+    @classmethod
+    def merge_all(cls, partials: Iterable["ConfusionAccumulator"]) -> "ConfusionAccumulator":
+        """
+        Combine partial results from parallel workers into a single accumulator.
+
+        Args:
+            partials (Iterable[ConfusionAccumulator]): Partial accumulators.
+
+        Returns:
+            ConfusionAccumulator: A new accumulator holding the summed counts.
+        """
+        partials = list(partials)
+        if not partials:
+            raise ValueError("merge_all needs at least one partial result.")
+        merged = cls(partials[0].num_classes)
+        for partial in partials:
+            merged.merge(partial)
+        return merged
+
+    @property
+    def image_labels(self) -> np.ndarray:
+        """Ground truth label of each image (majority of its true pixel labels)."""
+        return self.image_counts.sum(axis=2).argmax(axis=1)
+
+    @property
+    def image_predictions(self) -> np.ndarray:
+        """Majority-vote prediction of each image (ties go to the lowest class index)."""
+        return self.image_counts.sum(axis=1).argmax(axis=1)
+
+    @property
+    def image_confusion_matrix(self) -> np.ndarray:
+        """Image-level confusion matrix built from the per-image majority votes."""
+        if not self.has_images:
+            return self.pixel_counts.copy()
+        return confusion_counts(self.image_labels, self.image_predictions, self.num_classes)
+
+    @property
+    def pixel_confusion_matrix(self) -> np.ndarray:
+        """Pixel-level confusion matrix."""
+        return self.pixel_counts.copy()
+
+    def pixel_metrics(self) -> Dict[str, float]:
+        """Pixel-level metrics derived from the pixel confusion matrix."""
+        return metrics_from_confusion(self.pixel_counts, prefix="pixel_")
+
+    def image_metrics(self) -> Dict[str, float]:
+        """Image-level metrics derived from the image confusion matrix."""
+        return metrics_from_confusion(self.image_confusion_matrix, prefix="image_")
+
+
+def bootstrap_confidence_intervals(
+    accumulator: ConfusionAccumulator,
+    n_replicates: int = 2000,
+    confidence_level: float = 0.95,
+    seed: Optional[int] = None,
+    block_size: int = 500,
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Percentile bootstrap intervals for pixel and image metrics, resampling whole images.
+
+    Each replicate draws images with replacement as a row of multinomial counts, so the
+    replicate's pixel confusion matrix is a weighted sum of the per-image confusion counts
+    and its image confusion matrix a weighted sum of one-hot (label, vote) cells. Both are
+    matrix products over all replicates at once; no Python loop touches pixels or images.
+
+    Args:
+        accumulator (ConfusionAccumulator): Counts built with sample numbers.
+        n_replicates (int): Number of bootstrap replicates.
+        confidence_level (float): Coverage of the interval, e.g. 0.95.
+        seed (int, optional): Seed for the resampling generator.
+        block_size (int): Replicates scored per block, bounding memory use.
+
+    Returns:
+        Dict[str, Tuple[float, float]]: (lower, upper) bound per metric, keyed like
+        pixel_metrics()/image_metrics().
+    """
+    if not accumulator.has_images:
+        raise ValueError("Bootstrap over images needs an accumulator built with sample_nums.")
+    num_images = accumulator.sample_nums.size
+    if num_images < 2:
+        raise ValueError("Bootstrap over images needs at least two images.")
+
+    num_classes = accumulator.num_classes
+    cells = num_classes * num_classes
+    pixel_cells = accumulator.image_counts.reshape(num_images, cells).astype(np.float64)
+    image_cells = np.zeros((num_images, cells), dtype=np.float64)
+    image_cells[
+        np.arange(num_images),
+        accumulator.image_labels * num_classes + accumulator.image_predictions,
+    ] = 1.0
+
+    rng = np.random.default_rng(seed)
+    uniform = np.full(num_images, 1.0 / num_images)
+    pixel_scores: Dict[str, list] = {}
+    image_scores: Dict[str, list] = {}
+    for start in range(0, n_replicates, block_size):
+        size = min(block_size, n_replicates - start)
+        weights = rng.multinomial(num_images, uniform, size=size).astype(np.float64)
+        pixel_cm = (weights @ pixel_cells).reshape(size, num_classes, num_classes)
+        image_cm = (weights @ image_cells).reshape(size, num_classes, num_classes)
+        for name, values in _confusion_metric_arrays(pixel_cm).items():
+            pixel_scores.setdefault(f"pixel_{name}", []).append(values)
+        for name, values in _confusion_metric_arrays(image_cm).items():
+            image_scores.setdefault(f"image_{name}", []).append(values)
+
+    alpha = 1.0 - confidence_level
+    intervals = {}
+    for name, blocks in {**pixel_scores, **image_scores}.items():
+        lower, upper = np.quantile(np.concatenate(blocks), [alpha / 2, 1 - alpha / 2])
+        intervals[name] = (float(lower), float(upper))
+    return intervals
+
+
+class RegressionAccumulator:
+    """
+    Single-pass, mergeable moments from which MSE, RMSE and R2 are all derived.
+
+    Uses Chan et al.'s pairwise update for the target variance so partial results from
+    shards merge without loss of precision.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum_squared_error = 0.0
+        self.mean_true = 0.0
+        self.m2_true = 0.0
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> "RegressionAccumulator":
+        """
+        Add a batch of targets and predictions.
+
+        Args:
+            y_true (np.ndarray): Ground truth values.
+            y_pred (np.ndarray): Predicted values.
+
+        Returns:
+            RegressionAccumulator: self, to allow chaining.
+        """
+        y_true = np.asarray(y_true, dtype=np.float64).ravel()
+        y_pred = np.asarray(y_pred, dtype=np.float64).ravel()
+        if y_true.size == 0:
+            return self
+        batch = RegressionAccumulator()
+        batch.count = y_true.size
+        batch.sum_squared_error = float(np.sum((y_true - y_pred) ** 2))
+        batch.mean_true = float(y_true.mean())
+        batch.m2_true = float(np.sum((y_true - batch.mean_true) ** 2))
+        return self.merge(batch)
+
+    def merge(self, other: "RegressionAccumulator") -> "RegressionAccumulator":
+        """Fold the moments of another accumulator into this one."""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean_true - self.mean_true
+        self.m2_true += other.m2_true + delta ** 2 * self.count * other.count / total
+        self.mean_true += delta * other.count / total
+        self.sum_squared_error += other.sum_squared_error
+        self.count = total
+        return self
+
+    @property
+    def mse(self) -> float:
+        return self.sum_squared_error / self.count if self.count else 0.0
+
+    @property
+    def rmse(self) -> float:
+        return float(np.sqrt(self.mse))
+
+    @property
+    def r2(self) -> float:
+        if self.m2_true == 0:
+            return 1.0 if self.sum_squared_error == 0 else 0.0
+        return 1.0 - self.sum_squared_error / self.m2_true
+
+    def metrics(self) -> Dict[str, float]:
+        """All regression metrics from one pass over the data."""
+        return {"mse": self.mse, "rmse": self.rmse, "r2": self.r2}
 
 
 class Evaluation(ABC):
@@ -63,7 +503,7 @@ class MSE(Evaluation):
         """
         try:
             logging.info("Calculating MSE...")
-            mse = mean_squared_error(y_true, y_pred)
+            mse = RegressionAccumulator().update(y_true, y_pred).mse
             logging.info(f"MSE: {mse}")
             return mse
         except Exception as e:
@@ -82,7 +522,7 @@ class RMSE(Evaluation):
 
     def calculate_score(self, y_true: np.ndarray, y_pred: np.ndarray) -> float:
         """
-        Calculate the RMSE manually.
+        Calculate the RMSE.
 
         Args:
             y_true (np.ndarray): Ground truth values.
@@ -93,8 +533,7 @@ class RMSE(Evaluation):
         """
         try:
             logging.info("Calculating RMSE...")
-            mse = np.mean((y_true - y_pred) ** 2)
-            rmse = np.sqrt(mse)
+            rmse = RegressionAccumulator().update(y_true, y_pred).rmse
             logging.info(f"RMSE: {rmse}")
             return rmse
         except Exception as e:
@@ -124,7 +563,7 @@ class R2Score(Evaluation):
         """
         try:
             logging.info("Calculating R2 Score...")
-            r2 = r2_score(y_true, y_pred)
+            r2 = RegressionAccumulator().update(y_true, y_pred).r2
             logging.info(f"R2 Score: {r2}")
             return r2
         except Exception as e:
@@ -141,8 +580,38 @@ class ClassificationMetrics(Evaluation):
     Evaluation strategy for classification tasks, including pixel-level and image-level metrics.
 
     Supports metrics such as accuracy, F1-score, confusion matrix, and classification report.
+    All of them are derived from the integer confusion counts of a ConfusionAccumulator.
     """
 
+    def __init__(self, num_classes: Optional[int] = None) -> None:
+        """
+        Args:
+            num_classes (int, optional): Number of classes. Inferred from the labels if omitted.
+        """
+        self.num_classes = num_classes
+
+    def accumulate(
+        self,
+        y_true: np.ndarray,
+        y_pred: np.ndarray,
+        sample_nums: Optional[np.ndarray] = None,
+    ) -> ConfusionAccumulator:
+        """
+        Build the confusion counts for encoded labels and predictions.
+
+        Args:
+            y_true (np.ndarray): Encoded ground truth labels.
+            y_pred (np.ndarray): Encoded predicted labels.
+            sample_nums (np.ndarray, optional): Image (Sample_num) of every pixel.
+
+        Returns:
+            ConfusionAccumulator: The accumulated counts.
+        """
+        num_classes = self.num_classes
+        if num_classes is None:
+            num_classes = int(max(np.max(y_true), np.max(y_pred))) + 1
+        return ConfusionAccumulator(num_classes).update(y_true, y_pred, sample_nums)
+
     def calculate_score(self, y_true: np.ndarray, y_pred: np.ndarray) -> float:
         """
         Calculate pixel-level accuracy as the primary metric for classification.
@@ -156,7 +625,7 @@ class ClassificationMetrics(Evaluation):
         """
         try:
             logging.info("Calculating Pixel-Level Accuracy...")
-            accuracy = accuracy_score(y_true, y_pred)
+            accuracy = self.accumulate(y_true, y_pred).pixel_metrics()["pixel_accuracy"]
             logging.info(f"Pixel-Level Accuracy: {accuracy}")
             return accuracy
         except Exception as e:
@@ -168,20 +637,27 @@ class ClassificationMetrics(Evaluation):
         Visualize classification metrics, including confusion matrix and classification report.
 
         Args:
-            y_true (np.ndarray): Ground truth labels.
-            y_pred (np.ndarray): Predicted labels.
-            kwargs: Optional parameters such as label_encoder and class_names.
+            y_true (np.ndarray): Encoded ground truth labels.
+            y_pred (np.ndarray): Encoded predicted labels.
+            kwargs: Optional parameters such as label_encoder, class_names and sample_nums.
         """
         label_encoder = kwargs.get("label_encoder", None)
         class_names = kwargs.get("class_names", None)
+        sample_nums = kwargs.get("sample_nums", None)
 
         try:
-            if label_encoder:
-                y_true = label_encoder.inverse_transform(y_true)
-                y_pred = label_encoder.inverse_transform(y_pred)
+            if class_names is None and label_encoder is not None:
+                class_names = list(label_encoder.classes_)
+            if self.num_classes is None and class_names is not None:
+                self.num_classes = len(class_names)
+
+            accumulator = self.accumulate(y_true, y_pred, sample_nums)
+
+            import matplotlib.pyplot as plt
+            import seaborn as sns
 
             # Confusion Matrix
-            cm = confusion_matrix(y_true, y_pred)
+            cm = accumulator.pixel_confusion_matrix
             plt.figure(figsize=(10, 8))
             sns.heatmap(cm, annot=True, fmt="d", cmap="Blues",
                         xticklabels=class_names, yticklabels=class_names)
@@ -191,7 +667,7 @@ class ClassificationMetrics(Evaluation):
             plt.show()
 
             # Classification Report
-            report = classification_report(y_true, y_pred, target_names=class_names)
+            report = format_classification_report(cm, class_names)
             logging.info(f"Classification Report:\n{report}")
             print(f"Classification Report:\n{report}")
         except Exception as e:
@@ -214,6 +690,8 @@ class TrainingVisualizer:
             model_name (str): Name of the model for labeling plots.
         """
         try:
+            import matplotlib.pyplot as plt
+
             plt.figure(figsize=(12, 5))
 
             # Accuracy
@@ -1,17 +1,4 @@
 import numpy as np
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import (
-    Conv1D,
-    MaxPooling1D,
-    Flatten,
-    Dense,
-    Dropout,
-    BatchNormalization,
-    Input,
-)
-from tensorflow.keras.optimizers import Adam
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import RobustScaler
 
 
 class CNNModel:
@@ -27,6 +14,19 @@ class CNNModel:
         self.model = self._build_model(wd, drop_rate, learning_rate)
 
     def _build_model(self, wd, drop_rate, learning_rate):
+        # TensorFlow is imported on first use so that importing this module stays fast
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import (
+            Conv1D,
+            MaxPooling1D,
+            Flatten,
+            Dense,
+            Dropout,
+            BatchNormalization,
+            Input,
+        )
+        from tensorflow.keras.optimizers import Adam
+
         model = Sequential(
             [
                 Input(shape=self.input_shape),
@@ -51,7 +51,33 @@ class CNNModel:
         )
         return model
 
-    def train(self, x_train, y_train, x_test, y_test, epochs, batch_size, callbacks):
+    def train(self, x_train, y_train, x_test, y_test, epochs, batch_size, callbacks, sampler=None):
+        """
+        Fit the model. With a PixelBudgetSampler (model.sampling), every epoch
+        trains on a fresh capped subset of x_train drawn by row index, instead
+        of on every pixel. Compact bands (model.compact.CompactBands) are always
+        fed by row index, so only one batch at a time is decoded to float32.
+        """
+        from .compact import CompactBands
+
+        if sampler is not None or isinstance(x_train, CompactBands):
+            from .sampling import PixelBudgetSampler, SampledBatches, keras_dataset
+
+            if sampler is None:
+                # No caps: every training row, reshuffled each epoch
+                sampler = PixelBudgetSampler(np.zeros(len(x_train)), y_train)
+            batches = SampledBatches(x_train, y_train, sampler, batch_size)
+            validation_data = (x_test, y_test)
+            if isinstance(x_test, CompactBands):
+                validation_data = keras_dataset(
+                    SampledBatches(x_test, y_test, PixelBudgetSampler(np.zeros(len(x_test)), y_test), batch_size)
+                )
+            return self.model.fit(
+                keras_dataset(batches),
+                validation_data=validation_data,
+                epochs=epochs,
+                callbacks=callbacks,
+            )
         history = self.model.fit(
             x_train,
             y_train,
@@ -69,6 +95,9 @@ class PCATransformer:
     """
 
     def __init__(self, n_components=0.95):
+        from sklearn.decomposition import PCA
+        from sklearn.preprocessing import RobustScaler
+
         self.scaler = RobustScaler()
         self.pca = PCA(n_components=n_components)
 
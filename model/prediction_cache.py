@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Any, Optional
+
+import numpy as np
+
+from .compact import CompactBands, predict_batches
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "predictions")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def _hash_array(digest, array: np.ndarray) -> None:
+    """Feed an array's dtype, shape and raw bytes into a hashlib digest without copying."""
+    array = np.ascontiguousarray(array)
+    digest.update(str(array.dtype).encode())
+    digest.update(str(array.shape).encode())
+    digest.update(memoryview(array.reshape(-1)).cast("B"))
+
+
+def array_fingerprint(array: np.ndarray) -> str:
+    """
+    Content hash of an input array.
+
+    Args:
+        array (np.ndarray): Array to fingerprint (e.g. x_test).
+
+    Returns:
+        str: Hex digest covering dtype, shape and values.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(array, CompactBands):
+        # Hash the compact codes and their encoding rather than decoded floats
+        digest.update(repr(array.encoding).encode())
+        array = array.codes
+    _hash_array(digest, np.asarray(array))
+    return digest.hexdigest()
+
+
+def model_fingerprint(model: Any) -> str:
+    """
+    Content hash of a Keras model's architecture and weights.
+
+    Args:
+        model: Model exposing get_weights() (and optionally to_json()).
+
+    Returns:
+        str: Hex digest that changes whenever any weight changes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if hasattr(model, "to_json"):
+        digest.update(model.to_json().encode())
+    for weights in model.get_weights():
+        _hash_array(digest, weights)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    On-disk cache of model softmax outputs keyed by model and input fingerprints.
+
+    Entries are plain .npy files opened with mmap_mode="r", so a hit costs a file
+    open rather than a read. The cache is size-bounded: each hit refreshes the
+    entry's modification time and the least recently used entries are evicted
+    once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Args:
+            cache_dir (str): Directory holding the cached prediction arrays.
+            max_bytes (int): Upper bound on the total size of cached entries.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: Any, x: np.ndarray) -> str:
+        """Cache key for predicting `x` with `model`."""
+        return f"{model_fingerprint(model)}-{array_fingerprint(x)}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up cached predictions.
+
+        Args:
+            key (str): Key from make_key.
+
+        Returns:
+            np.ndarray or None: Read-only memory-mapped predictions, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            predictions = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)
+        return predictions
+
+    def put(self, key: str, predictions: np.ndarray) -> np.ndarray:
+        """
+        Store predictions and evict least recently used entries beyond the size bound.
+
+        Args:
+            key (str): Key from make_key.
+            predictions (np.ndarray): Model outputs to cache.
+
+        Returns:
+            np.ndarray: The cached predictions, memory-mapped from the cache file.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fid:
+            np.save(fid, np.asarray(predictions))
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+        cached = self.get(key)
+        return cached if cached is not None else np.asarray(predictions)
+
+    def evict(self) -> int:
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of bytes freed.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                continue
+        if freed:
+            logging.info(f"Prediction cache evicted {freed / 1e6:.1f} MB from {self.cache_dir}")
+        return freed
+
+    def predict(self, model: Any, x: np.ndarray, **predict_kwargs) -> np.ndarray:
+        """
+        Return model.predict(x), reusing cached outputs for an unchanged model and input.
+
+        Args:
+            model: Keras model (or any object with predict and get_weights).
+            x (np.ndarray): Model input.
+            predict_kwargs: Passed to model.predict on a miss.
+
+        Returns:
+            np.ndarray: Softmax outputs (memory-mapped when served from the cache).
+        """
+        key = self.make_key(model, x)
+        predictions = self.get(key)
+        if predictions is not None:
+            logging.info(f"Prediction cache hit for {key}")
+            return predictions
+        logging.info(f"Prediction cache miss for {key}, running model.predict...")
+        predict_kwargs.setdefault("verbose", 0)
+        return self.put(key, predict_batches(model, x, **predict_kwargs))
+
+
+def cached_predict(
+    model: Any,
+    x: np.ndarray,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    **predict_kwargs,
+) -> np.ndarray:
+    """
+    Predict through a PredictionCache, or directly when cache_dir is None.
+
+    Args:
+        model: Keras model.
+        x (np.ndarray): Model input.
+        cache_dir (str, optional): Cache directory; None disables caching.
+        max_bytes (int): Size bound of the cache.
+        predict_kwargs: Passed to model.predict.
+
+    Returns:
+        np.ndarray: Softmax outputs.
+    """
+    if cache_dir is None:
+        predict_kwargs.setdefault("verbose", 0)
+        return predict_batches(model, x, **predict_kwargs)
+    return PredictionCache(cache_dir, max_bytes).predict(model, x, **predict_kwargs)
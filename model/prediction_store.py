@@ -0,0 +1,263 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _batches(documents: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PredictionStore(ABC):
+    """
+    Abstract base class for the document stores read by hsi-visualization.
+
+    Documents are upserted by a key field (sample_num), so publishing the same
+    predictions twice leaves one copy of each.
+    """
+
+    @abstractmethod
+    def upsert_batch(self, collection: str, documents: List[Dict[str, Any]], key: str) -> None:
+        """
+        Insert or replace one batch of documents in a single round trip.
+
+        Args:
+            collection (str): Collection (table) name.
+            documents (List[dict]): Documents, each holding the key field.
+            key (str): Field identifying a document.
+        """
+        pass
+
+    @abstractmethod
+    def find(self, collection: str, key: str = "sample_num") -> List[Dict[str, Any]]:
+        """All documents of a collection, ordered by key."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def upsert(
+        self,
+        collection: str,
+        documents: Iterable[Dict[str, Any]],
+        key: str = "sample_num",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Dict[str, float]:
+        """
+        Upsert documents in batches of batch_size.
+
+        Returns:
+            dict: "rows", "batches", "seconds" and "rows_per_second".
+        """
+        start = time.perf_counter()
+        rows = batches = 0
+        for batch in _batches(documents, batch_size):
+            self.upsert_batch(collection, batch, key)
+            rows += len(batch)
+            batches += 1
+        seconds = time.perf_counter() - start
+        stats = {
+            "rows": rows,
+            "batches": batches,
+            "seconds": seconds,
+            "rows_per_second": rows / seconds if seconds > 0 else float("inf"),
+        }
+        logging.info(
+            f"Upserted {rows} documents into {collection} in {batches} batches "
+            f"({seconds:.2f}s, {stats['rows_per_second']:,.0f} rows/s)"
+        )
+        return stats
+
+
+class InMemoryStore(PredictionStore):
+    """
+    Process-local store for tests and dry runs.
+    """
+
+    def __init__(self) -> None:
+        self.collections: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self.round_trips = 0
+
+    def upsert_batch(self, collection: str, documents: List[Dict[str, Any]], key: str) -> None:
+        table = self.collections.setdefault(collection, {})
+        for document in documents:
+            table[document[key]] = dict(document)
+        self.round_trips += 1
+
+    def find(self, collection: str, key: str = "sample_num") -> List[Dict[str, Any]]:
+        table = self.collections.get(collection, {})
+        return [dict(table[value]) for value in sorted(table)]
+
+
+class SQLiteStore(PredictionStore):
+    """
+    Local stand-in for MongoDB: one table per collection holding the key and the
+    JSON document, upserted with INSERT ... ON CONFLICT in one transaction per batch.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): Database file (":memory:" for a private in-memory database).
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._tables = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _table(collection: str) -> str:
+        if not collection.replace("_", "").isalnum():
+            raise ValueError(f"Invalid collection name: {collection!r}")
+        return f'"{collection}"'
+
+    def _ensure_table(self, collection: str) -> None:
+        if collection not in self._tables:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table(collection)} "
+                "(key PRIMARY KEY, document TEXT NOT NULL)"
+            )
+            self._tables.add(collection)
+
+    def upsert_batch(self, collection: str, documents: List[Dict[str, Any]], key: str) -> None:
+        with self._lock, self.connection:
+            self._ensure_table(collection)
+            self.connection.executemany(
+                f"INSERT INTO {self._table(collection)} (key, document) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET document = excluded.document",
+                [(document[key], json.dumps(document)) for document in documents],
+            )
+
+    def find(self, collection: str, key: str = "sample_num") -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_table(collection)
+            rows = self.connection.execute(
+                f"SELECT document FROM {self._table(collection)} ORDER BY key"
+            ).fetchall()
+        return [json.loads(document) for (document,) in rows]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class MongoStore(PredictionStore):
+    """
+    MongoDB store (requires pymongo) using unordered bulk writes of upserting
+    UpdateOne operations, one per document, and a unique index on the key.
+    """
+
+    def __init__(self, uri: str, database: str) -> None:
+        """
+        Args:
+            uri (str): MongoDB connection string (the MONGODB_URI used by server.js).
+            database (str): Database name.
+        """
+        from pymongo import MongoClient
+
+        self.client = MongoClient(uri)
+        self.database = self.client[database]
+        self._indexed = set()
+
+    def upsert_batch(self, collection: str, documents: List[Dict[str, Any]], key: str) -> None:
+        from pymongo import UpdateOne
+
+        target = self.database[collection]
+        if (collection, key) not in self._indexed:
+            target.create_index(key, unique=True)
+            self._indexed.add((collection, key))
+        target.bulk_write(
+            [UpdateOne({key: document[key]}, {"$set": document}, upsert=True) for document in documents],
+            ordered=False,
+        )
+
+    def find(self, collection: str, key: str = "sample_num") -> List[Dict[str, Any]]:
+        return list(self.database[collection].find({}, {"_id": False}).sort(key, 1))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+_STORES: Dict[str, PredictionStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(uri: str, database: str = "hsi") -> PredictionStore:
+    """
+    Store for a URI, reused across calls so a process keeps one connection
+    (pool) per destination.
+
+    Args:
+        uri (str): "memory://<name>", "sqlite:///<path>" or "mongodb://..." /
+            "mongodb+srv://...".
+        database (str): MongoDB database name.
+
+    Returns:
+        PredictionStore: The cached store for the URI.
+    """
+    cache_key = f"{uri}#{database}"
+    with _STORES_LOCK:
+        if cache_key not in _STORES:
+            if uri.startswith("memory://"):
+                store: PredictionStore = InMemoryStore()
+            elif uri.startswith("sqlite:///"):
+                store = SQLiteStore(uri[len("sqlite:///"):])
+            elif uri.startswith(("mongodb://", "mongodb+srv://")):
+                store = MongoStore(uri, database)
+            else:
+                raise ValueError(f"Unsupported store URI: {uri}")
+            logging.info(f"Opened {type(store).__name__} for {uri.split('@')[-1]}")
+            _STORES[cache_key] = store
+        return _STORES[cache_key]
+
+
+def close_stores() -> None:
+    """Close and forget every cached store."""
+    with _STORES_LOCK:
+        for store in _STORES.values():
+            store.close()
+        _STORES.clear()
+
+
+def prediction_documents(
+    sample_nums: Sequence[int],
+    ground_truth: Sequence[int],
+    predicted: Sequence[int],
+    class_names: Sequence[str],
+    pixel_counts: Optional[Sequence[int]] = None,
+    agreement: Optional[Sequence[float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Per-image documents in the `predictions` schema of hsi-visualization/server.js.
+    """
+    documents = []
+    for i, (sample_num, truth, prediction) in enumerate(zip(sample_nums, ground_truth, predicted)):
+        document = {
+            "sample_num": int(sample_num),
+            "ground_truth": int(truth),
+            "predicted_label": int(prediction),
+            "ground_truth_label": str(class_names[truth]),
+            "predicted_label_name": str(class_names[prediction]),
+        }
+        if pixel_counts is not None:
+            document["pixel_count"] = int(pixel_counts[i])
+        if agreement is not None:
+            document["agreement"] = round(float(agreement[i]), 4)
+        documents.append(document)
+    return documents
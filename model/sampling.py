@@ -0,0 +1,168 @@
+import logging
+import math
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+
+def _rank_within(groups: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Rank of every row among the rows of its group, ordered by key."""
+    order = np.lexsort((keys, groups))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    lengths = np.diff(np.r_[starts, len(order)])
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - np.repeat(starts, lengths)
+    return ranks
+
+
+class PixelBudgetSampler:
+    """
+    Draws the training rows of one epoch with at most `max_pixels_per_image`
+    pixels per image (Sample_num) and `max_pixels_per_class` pixels per class.
+
+    Large homogeneous images otherwise contribute thousands of near-duplicate
+    pixels and dominate every epoch. Each epoch draws a fresh random subset, so
+    over several epochs the model still sees most pixels of the large images.
+    Only row indices are produced; the band matrix is never copied or resampled.
+    """
+
+    def __init__(
+        self,
+        sample_nums: np.ndarray,
+        labels: np.ndarray,
+        max_pixels_per_image: Optional[int] = None,
+        max_pixels_per_class: Optional[int] = None,
+        balance_classes: bool = False,
+        seed: int = 0,
+    ) -> None:
+        """
+        Args:
+            sample_nums (np.ndarray): Sample_num of every training row.
+            labels (np.ndarray): Class index (or one-hot row) of every training row.
+            max_pixels_per_image (int, optional): Pixel cap per image and epoch.
+            max_pixels_per_class (int, optional): Pixel cap per class and epoch,
+                applied after the image cap.
+            balance_classes (bool): Also return sample weights giving every class
+                the same total weight in an epoch.
+            seed (int): Seed of the per-epoch draws.
+        """
+        labels = np.asarray(labels)
+        self.labels = labels.argmax(axis=1) if labels.ndim == 2 else labels.astype(np.int64)
+        self.images = np.unique(np.asarray(sample_nums), return_inverse=True)[1].ravel()
+        if len(self.images) != len(self.labels):
+            raise ValueError("sample_nums and labels must have one entry per training row.")
+        self.max_pixels_per_image = max_pixels_per_image
+        self.max_pixels_per_class = max_pixels_per_class
+        self.balance_classes = balance_classes
+        self.seed = seed
+
+    def __len__(self) -> int:
+        """Rows per epoch; the caps make it the same for every epoch."""
+        counts = np.bincount(self.images)
+        if self.max_pixels_per_image is not None:
+            counts = np.minimum(counts, self.max_pixels_per_image)
+        class_of_image = np.zeros(len(counts), dtype=np.int64)
+        class_of_image[self.images] = self.labels
+        per_class = np.bincount(class_of_image, weights=counts).astype(np.int64)
+        if self.max_pixels_per_class is not None:
+            per_class = np.minimum(per_class, self.max_pixels_per_class)
+        return int(per_class.sum())
+
+    def epoch_indices(self, epoch: int) -> np.ndarray:
+        """
+        Shuffled training row indices of one epoch.
+
+        Args:
+            epoch (int): Epoch number; the draw is a function of (seed, epoch).
+
+        Returns:
+            np.ndarray: Row indices into the training arrays.
+        """
+        rng = np.random.default_rng([self.seed, epoch])
+        keys = rng.random(len(self.labels))
+        keep = np.ones(len(keys), dtype=bool)
+        if self.max_pixels_per_image is not None:
+            keep &= _rank_within(self.images, keys) < self.max_pixels_per_image
+        rows = np.flatnonzero(keep)
+        if self.max_pixels_per_class is not None:
+            rows = rows[_rank_within(self.labels[rows], keys[rows]) < self.max_pixels_per_class]
+        return rng.permutation(rows)
+
+    def sample_weights(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Weights of the given epoch rows giving every class the same total weight
+        (mean weight 1), or ones without balance_classes.
+        """
+        if not self.balance_classes:
+            return np.ones(len(rows), dtype=np.float32)
+        labels = self.labels[rows]
+        counts = np.bincount(labels)
+        present = np.count_nonzero(counts)
+        return (len(rows) / (present * counts[labels])).astype(np.float32)
+
+
+class SampledBatches:
+    """
+    Index-based mini-batches of one epoch's sample: rows are gathered from the
+    band matrix per batch (sorted, for memory-mapped locality), and
+    `on_epoch_end` draws the next epoch's subset. Framework-free; see
+    `keras_dataset` for use with `model.fit`.
+    """
+
+    def __init__(self, x: Any, y: Any, sampler: PixelBudgetSampler, batch_size: int = 32) -> None:
+        self.x, self.y = x, y
+        self.sampler = sampler
+        self.batch_size = batch_size
+        self.epoch = 0
+        self._draw()
+
+    def _draw(self) -> None:
+        self.indices = self.sampler.epoch_indices(self.epoch)
+        self.weights = self.sampler.sample_weights(self.indices)
+
+    def __len__(self) -> int:
+        return math.ceil(len(self.indices) / self.batch_size)
+
+    def __getitem__(self, batch: int) -> Tuple[np.ndarray, ...]:
+        window = slice(batch * self.batch_size, (batch + 1) * self.batch_size)
+        order = np.argsort(self.indices[window])
+        rows = self.indices[window][order]
+        x, y = np.asarray(self.x[rows]), np.asarray(self.y[rows])
+        if self.sampler.balance_classes:
+            return x, y, self.weights[window][order]
+        return x, y
+
+    def on_epoch_end(self) -> None:
+        self.epoch += 1
+        self._draw()
+
+
+def keras_dataset(batches: SampledBatches) -> Any:
+    """
+    Wrap SampledBatches in a Keras PyDataset (Sequence on older Keras) so
+    `model.fit` calls on_epoch_end between epochs.
+    """
+    from tensorflow import keras
+
+    base = getattr(keras.utils, "PyDataset", None) or keras.utils.Sequence
+
+    class _SampledDataset(base):
+        def __init__(self) -> None:
+            # PyDataset sets up its worker options here and warns if it is skipped
+            super().__init__()
+
+        def __len__(self) -> int:
+            return len(batches)
+
+        def __getitem__(self, batch: int):
+            return batches[batch]
+
+        def on_epoch_end(self) -> None:
+            batches.on_epoch_end()
+
+    logging.info(
+        f"Sampling {len(batches.indices)} of {len(batches.sampler.labels)} training pixels per epoch "
+        f"({len(batches)} batches)"
+    )
+    return _SampledDataset()
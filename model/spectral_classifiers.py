@@ -0,0 +1,320 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from .calibration import fit_temperature, softmax
+
+# Rows scored at once, bounding the (rows, classes) and (rows, bands) temporaries
+BLOCK_ROWS = 65536
+
+# Training rows used to calibrate the softmax temperature
+CALIBRATION_ROWS = 20000
+
+
+def _as_matrix(x: Any, rows: slice) -> np.ndarray:
+    """Rows of a band array (ndarray, memmap or CompactBands) as a float32 (n, bands) matrix."""
+    block = np.asarray(x[rows], dtype=np.float32)
+    return block.reshape(len(block), -1)
+
+
+def _class_means(x: np.ndarray, y: np.ndarray, num_classes: int) -> np.ndarray:
+    counts = np.bincount(y, minlength=num_classes).astype(np.float64)
+    sums = np.zeros((num_classes, x.shape[1]))
+    np.add.at(sums, y, x)
+    return sums / np.maximum(counts, 1)[:, None]
+
+
+class SpectralClassifier(ABC):
+    """
+    Abstract base class for the fast classical pixel classifiers.
+
+    Classifiers are fitted on a (pixels, bands) matrix and score blocks of rows
+    with a few matrix products, so they label millions of pixels per second on a
+    CPU and can take the easy pixels off the CNN (see CascadeClassifier).
+    Probabilities are softmax(logits / temperature), the temperature being fitted
+    by likelihood on training rows, so that confidence thresholds mean roughly
+    the same thing for every classifier.
+    """
+
+    num_classes: int
+    temperature: float = 1.0
+
+    @abstractmethod
+    def fit(self, x: np.ndarray, y: np.ndarray, num_classes: Optional[int] = None) -> "SpectralClassifier":
+        """
+        Args:
+            x (np.ndarray): Training pixels, (n, bands) or Conv1D layout (n, bands, 1).
+            y (np.ndarray): Class index (or one-hot row) of every pixel.
+            num_classes (int, optional): Defaults to y.max() + 1.
+
+        Returns:
+            SpectralClassifier: self.
+        """
+        pass
+
+    @abstractmethod
+    def _block_logits(self, x: np.ndarray) -> np.ndarray:
+        """Uncalibrated class scores of a float32 (n, bands) block."""
+        pass
+
+    def _calibrate(self, x: np.ndarray, y: np.ndarray, seed: int = 0) -> None:
+        """Fit the softmax temperature minimizing the negative log-likelihood of y."""
+        if len(x) > CALIBRATION_ROWS:
+            rows = np.random.default_rng(seed).choice(len(x), CALIBRATION_ROWS, replace=False)
+            x, y = x[rows], y[rows]
+        self.temperature = fit_temperature(self._block_logits(x), y)
+
+    def predict_proba(self, x: Any) -> np.ndarray:
+        """
+        Class probabilities, scored in blocks of BLOCK_ROWS rows.
+
+        Args:
+            x: Pixels as an array, memmap or model.compact.CompactBands.
+
+        Returns:
+            np.ndarray: (n, num_classes) float32 probabilities.
+        """
+        out = np.empty((len(x), self.num_classes), dtype=np.float32)
+        for start in range(0, len(x), BLOCK_ROWS):
+            rows = slice(start, start + BLOCK_ROWS)
+            out[rows] = softmax(self._block_logits(_as_matrix(x, rows)) / self.temperature)
+        return out
+
+    def predict(self, x: Any) -> np.ndarray:
+        return self.predict_proba(x).argmax(axis=1)
+
+    @staticmethod
+    def _prepare(x: Any, y: np.ndarray, num_classes: Optional[int]):
+        x = np.asarray(x, dtype=np.float32)
+        x = x.reshape(len(x), -1)
+        y = np.asarray(y)
+        y = y.argmax(axis=1) if y.ndim == 2 else y.astype(np.int64)
+        return x, y, num_classes or int(y.max()) + 1
+
+
+class SpectralAngleMapper(SpectralClassifier):
+    """
+    Spectral angle mapper: the class whose mean spectrum makes the smallest angle
+    with the pixel. Angles ignore overall brightness, so illumination and
+    topographic shading do not change the label. The logits are minus the angles.
+    """
+
+    def fit(self, x: np.ndarray, y: np.ndarray, num_classes: Optional[int] = None) -> "SpectralAngleMapper":
+        x, y, self.num_classes = self._prepare(x, y, num_classes)
+        means = _class_means(x, y, self.num_classes)
+        self.directions = (means / np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+        self._calibrate(x, y)
+        return self
+
+    def angles(self, x: np.ndarray) -> np.ndarray:
+        """Angle (radians) between every pixel and every class mean."""
+        cosines = x @ self.directions.T
+        cosines /= np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+        return np.arccos(np.clip(cosines, -1, 1))
+
+    def _block_logits(self, x: np.ndarray) -> np.ndarray:
+        return -self.angles(x)
+
+
+class NearestCentroidClassifier(SpectralClassifier):
+    """
+    Nearest class centroid under a pooled diagonal covariance (per-band scaling
+    by the within-class standard deviation), with class priors: a Gaussian
+    classifier whose posteriors serve as confidences.
+    """
+
+    def fit(self, x: np.ndarray, y: np.ndarray, num_classes: Optional[int] = None) -> "NearestCentroidClassifier":
+        x, y, self.num_classes = self._prepare(x, y, num_classes)
+        means = _class_means(x, y, self.num_classes)
+        residual_variance = np.square(x - means[y].astype(np.float32)).mean(axis=0)
+        self.inverse_std = (1 / np.sqrt(np.maximum(residual_variance, 1e-12))).astype(np.float32)
+        self.centroids = (means * self.inverse_std).astype(np.float32)
+        counts = np.bincount(y, minlength=self.num_classes)
+        self.log_priors = np.log(np.maximum(counts, 1) / counts.sum()).astype(np.float32)
+        self._calibrate(x, y)
+        return self
+
+    def _block_logits(self, x: np.ndarray) -> np.ndarray:
+        x = x * self.inverse_std
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; the ||x||^2 term cancels in the softmax
+        logits = x @ self.centroids.T
+        logits -= 0.5 * np.square(self.centroids).sum(axis=1)
+        return logits + self.log_priors
+
+
+class PCALinearClassifier(SpectralClassifier):
+    """
+    Multinomial logistic regression on the leading principal components of the
+    standardized bands. Neighbouring bands are highly correlated, so a few
+    dozen components keep nearly all the variance and the fit takes seconds.
+    """
+
+    def __init__(self, n_components: int = 30, max_iter: int = 200, max_fit_rows: int = 200_000, seed: int = 0) -> None:
+        """
+        Args:
+            n_components (int): Principal components kept.
+            max_iter (int): Iterations of the logistic regression solver.
+            max_fit_rows (int): Training rows drawn at random for the fit.
+            seed (int): Seed of the row draw.
+        """
+        self.n_components = n_components
+        self.max_iter = max_iter
+        self.max_fit_rows = max_fit_rows
+        self.seed = seed
+
+    def fit(self, x: np.ndarray, y: np.ndarray, num_classes: Optional[int] = None) -> "PCALinearClassifier":
+        from sklearn.linear_model import LogisticRegression
+
+        x, y, self.num_classes = self._prepare(x, y, num_classes)
+        if len(x) > self.max_fit_rows:
+            rows = np.sort(np.random.default_rng(self.seed).choice(len(x), self.max_fit_rows, replace=False))
+            x, y = x[rows], y[rows]
+        self.mean = x.mean(axis=0)
+        self.scale = 1 / np.maximum(x.std(axis=0), 1e-12)
+        standardized = (x - self.mean) * self.scale
+        # Principal axes from the (bands, bands) covariance rather than an SVD of every row
+        eigenvalues, eigenvectors = np.linalg.eigh(standardized.T @ standardized / len(standardized))
+        order = np.argsort(eigenvalues)[::-1][:self.n_components]
+        self.components = eigenvectors[:, order].astype(np.float32)
+        # Fold standardization and projection into one (bands, components) matrix
+        self.projection = (self.components * self.scale[:, None]).astype(np.float32)
+        self.projection_offset = (self.mean * self.scale) @ self.components
+
+        regression = LogisticRegression(max_iter=self.max_iter)
+        regression.fit(standardized @ self.components, y)
+        self.weights = np.zeros((self.components.shape[1], self.num_classes), dtype=np.float32)
+        self.bias = np.full(self.num_classes, -np.inf, dtype=np.float32)
+        # Classes absent from the fit rows keep probability 0
+        if len(regression.classes_) == 2:
+            coef = np.vstack([-regression.coef_[0], regression.coef_[0]]) / 2
+            intercept = np.array([-regression.intercept_[0], regression.intercept_[0]]) / 2
+        else:
+            coef, intercept = regression.coef_, regression.intercept_
+        self.weights[:, regression.classes_] = coef.T
+        self.bias[regression.classes_] = intercept
+        self._calibrate(x, y)
+        return self
+
+    def _block_logits(self, x: np.ndarray) -> np.ndarray:
+        components = x @ self.projection - self.projection_offset
+        return components @ self.weights + self.bias
+
+
+SPECTRAL_CLASSIFIERS = {
+    "sam": SpectralAngleMapper,
+    "centroid": NearestCentroidClassifier,
+    "pca_linear": PCALinearClassifier,
+}
+
+
+def get_spectral_classifier(name: str, **kwargs) -> SpectralClassifier:
+    """Classifier by name: "sam", "centroid" or "pca_linear"."""
+    if name not in SPECTRAL_CLASSIFIERS:
+        raise ValueError(f"Unknown spectral classifier '{name}', expected one of {sorted(SPECTRAL_CLASSIFIERS)}")
+    return SPECTRAL_CLASSIFIERS[name](**kwargs)
+
+
+class CascadeClassifier:
+    """
+    Two-stage pixel classifier: a fast SpectralClassifier labels every pixel and
+    its predictions with probability >= threshold are accepted; only the
+    remaining, uncertain pixels are sent to the CNN. Raising the threshold sends
+    more pixels to the CNN (closer to its accuracy), lowering it offloads more.
+    """
+
+    def __init__(
+        self,
+        front: SpectralClassifier,
+        model_predict: Callable[[Any], np.ndarray],
+        threshold: float = 0.95,
+    ) -> None:
+        """
+        Args:
+            front (SpectralClassifier): Fitted fast classifier.
+            model_predict (Callable): Maps pixels in the model's input layout to
+                class probabilities (e.g. model.compact.predict_batches around a
+                Keras model).
+            threshold (float): Minimum front probability to accept its label.
+        """
+        self.front = front
+        self.model_predict = model_predict
+        self.threshold = threshold
+
+    def predict(self, x: Any) -> Dict[str, Any]:
+        """
+        Label pixels with the cascade.
+
+        Args:
+            x: Pixels in the CNN's input layout (array, memmap or CompactBands).
+
+        Returns:
+            dict: "labels", "front_proba", "offloaded" (mask of the pixels
+            labelled by the front classifier), "offload_fraction",
+            "front_seconds", "model_seconds" and "model_seconds_per_pixel".
+        """
+        start = time.perf_counter()
+        proba = self.front.predict_proba(x)
+        labels = proba.argmax(axis=1)
+        offloaded = proba.max(axis=1) >= self.threshold
+        front_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        uncertain = np.flatnonzero(~offloaded)
+        if uncertain.size:
+            labels[uncertain] = np.asarray(self.model_predict(x[uncertain])).argmax(axis=1)
+        model_seconds = time.perf_counter() - start
+        return {
+            "labels": labels,
+            "front_proba": proba,
+            "offloaded": offloaded,
+            "offload_fraction": float(offloaded.mean()) if len(offloaded) else 0.0,
+            "front_seconds": front_seconds,
+            "model_seconds": model_seconds,
+            "model_seconds_per_pixel": model_seconds / uncertain.size if uncertain.size else None,
+        }
+
+    @staticmethod
+    def speedup(result: Dict[str, Any], model_seconds_per_pixel: Optional[float] = None) -> Optional[float]:
+        """
+        Estimated speedup over running the CNN on every pixel: the CNN's per-pixel
+        time (measured on the uncertain pixels unless given) times all pixels,
+        over the cascade's front plus CNN time.
+        """
+        per_pixel = model_seconds_per_pixel or result["model_seconds_per_pixel"]
+        cascade_seconds = result["front_seconds"] + result["model_seconds"]
+        if per_pixel is None or cascade_seconds <= 0:
+            return None
+        return per_pixel * len(result["labels"]) / cascade_seconds
+
+
+def threshold_tradeoff(
+    front_proba: np.ndarray, model_labels: np.ndarray, y_true: np.ndarray, thresholds: Sequence[float]
+) -> Dict[float, Dict[str, float]]:
+    """
+    Offload fraction and pixel accuracy of the cascade at several thresholds,
+    from one pass of each stage over the same pixels (no re-scoring).
+
+    Args:
+        front_proba (np.ndarray): Front classifier probabilities, (n, classes).
+        model_labels (np.ndarray): CNN labels of the same pixels.
+        y_true (np.ndarray): True class indices.
+        thresholds (Sequence[float]): Thresholds to evaluate.
+
+    Returns:
+        dict: threshold -> {"offload_fraction", "accuracy"}.
+    """
+    confidence = front_proba.max(axis=1)
+    front_correct = front_proba.argmax(axis=1) == y_true
+    model_correct = np.asarray(model_labels) == y_true
+    tradeoff = {}
+    for threshold in thresholds:
+        offloaded = confidence >= threshold
+        tradeoff[float(threshold)] = {
+            "offload_fraction": float(offloaded.mean()),
+            "accuracy": float(np.where(offloaded, front_correct, model_correct).mean()),
+        }
+    logging.info(f"Cascade threshold trade-off: {tradeoff}")
+    return tradeoff
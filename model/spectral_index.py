@@ -0,0 +1,322 @@
+import json
+import logging
+import os
+import pickle
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+METRICS = ("euclidean", "angle")
+DEFAULT_BLOCK_ROWS = 262_144
+DEFAULT_QUERY_ROWS = 64
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k smallest scores of every row (unordered)."""
+    if scores.shape[1] <= k:
+        return np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    return np.argpartition(scores, k - 1, axis=1)[:, :k]
+
+
+def image_spectra(x: np.ndarray, sample_nums: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mean spectrum of every image.
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): Sorted Sample_nums, mean spectra
+        (images, bands) and pixel counts.
+    """
+    x = np.asarray(x).reshape(len(x), -1)
+    order = np.argsort(sample_nums, kind="stable")
+    keys, starts = np.unique(np.asarray(sample_nums)[order], return_index=True)
+    sums = np.add.reduceat(x[order].astype(np.float64), starts, axis=0)
+    counts = np.diff(np.append(starts, len(order)))
+    return keys, (sums / counts[:, None]).astype(np.float32), counts
+
+
+class SpectralIndex:
+    """
+    Nearest-neighbour index over spectra (pixels or per-image mean spectra).
+
+    Two metrics are supported: "euclidean" distance and "angle", the spectral
+    angle (SAM) in radians, which ignores brightness. Exact queries score the
+    whole matrix in blocks of `block_rows` with one matrix product per block and
+    keep a running top-k; queries are scored `query_rows` at a time, so a score
+    matrix never exceeds query_rows x block_rows. With `n_lists` set, an IVF partition (k-means
+    centroids, rows stored grouped by their nearest centroid) lets approximate
+    queries score only the `n_probe` lists closest to the query.
+
+    With `pca_components`, spectra are reduced with model.model_dev.PCATransformer
+    before indexing (euclidean metric only, since the transform centres the data).
+    """
+
+    def __init__(
+        self,
+        metric: str = "euclidean",
+        pca_components: Optional[float] = None,
+        n_lists: Optional[int] = None,
+        block_rows: int = DEFAULT_BLOCK_ROWS,
+        seed: int = 0,
+        query_rows: int = DEFAULT_QUERY_ROWS,
+    ) -> None:
+        """
+        Args:
+            metric (str): "euclidean" or "angle".
+            pca_components (float, optional): PCA components (int) or explained
+                variance fraction (float < 1).
+            n_lists (int, optional): Number of IVF lists; None keeps only exact search.
+            block_rows (int): Rows scored per matrix product.
+            seed (int): Seed of the k-means initialisation.
+            query_rows (int): Queries scored per matrix product.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}")
+        if pca_components is not None and metric == "angle":
+            raise ValueError("PCA reduction is only supported with the euclidean metric.")
+        self.metric = metric
+        self.pca_components = pca_components
+        self.n_lists = n_lists
+        self.block_rows = block_rows
+        self.seed = seed
+        self.query_rows = query_rows
+        self.transformer = None
+        self.vectors: Optional[np.ndarray] = None
+        self.norms: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.metadata: Dict[str, np.ndarray] = {}
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+    def _prepare(self, x: np.ndarray, transformed: bool = False) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32).reshape(len(x), -1)
+        if self.transformer is not None and not transformed:
+            x = self.transformer.transform(x).astype(np.float32)
+        if self.metric == "angle":
+            x = x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+        return np.ascontiguousarray(x, dtype=np.float32)
+
+    def _scores(self, queries: np.ndarray, vectors: np.ndarray, norms: Optional[np.ndarray]) -> np.ndarray:
+        """Monotone stand-in for the distance: squared distance minus |q|^2, or -cosine."""
+        products = queries @ vectors.T
+        if self.metric == "angle":
+            return -products
+        return norms[None, :] - 2 * products
+
+    def _distances(self, queries: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        if self.metric == "angle":
+            return np.arccos(np.clip(-scores, -1.0, 1.0))
+        return np.sqrt(np.maximum(scores + (queries ** 2).sum(axis=1, keepdims=True), 0.0))
+
+    def _kmeans(self, x: np.ndarray, n_iter: int = 20, sample_size: int = 100_000) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        sample = x[rng.choice(len(x), size=min(sample_size, len(x)), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids, dtype=np.float64)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=self.n_lists)
+            filled = counts > 0
+            centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+            if self.metric == "angle":
+                centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        return centroids
+
+    def _assign(self, x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        norms = (centroids ** 2).sum(axis=1)
+        assignment = np.empty(len(x), dtype=np.int64)
+        for start in range(0, len(x), self.block_rows):
+            block = x[start:start + self.block_rows]
+            assignment[start:start + len(block)] = self._scores(block, centroids, norms).argmin(axis=1)
+        return assignment
+
+    def build(self, x: np.ndarray, **metadata: np.ndarray) -> "SpectralIndex":
+        """
+        Index a spectra matrix.
+
+        Args:
+            x (np.ndarray): (rows, bands) spectra, e.g. the cleaned frq columns.
+            **metadata (np.ndarray): Per-row arrays returned with the neighbours
+                (e.g. sample_num, row, label).
+
+        Returns:
+            SpectralIndex: self.
+        """
+        try:
+            start = time.perf_counter()
+            if self.pca_components is not None:
+                from .model_dev import PCATransformer
+
+                self.transformer = PCATransformer(n_components=self.pca_components)
+                x = self.transformer.fit_transform(np.asarray(x, dtype=np.float32).reshape(len(x), -1))
+            vectors = self._prepare(x, transformed=True)
+            order = np.arange(len(vectors))
+            if self.n_lists:
+                if self.n_lists > len(vectors):
+                    raise ValueError(f"n_lists={self.n_lists} exceeds the {len(vectors)} indexed rows.")
+                self.centroids = self._kmeans(vectors)
+                assignment = self._assign(vectors, self.centroids)
+                order = np.argsort(assignment, kind="stable")
+                self.list_offsets = np.searchsorted(assignment[order], np.arange(self.n_lists + 1))
+                vectors = vectors[order]
+            self.vectors = vectors
+            self.norms = (vectors ** 2).sum(axis=1) if self.metric == "euclidean" else None
+            self.metadata = {name: np.asarray(values)[order] for name, values in metadata.items()}
+            logging.info(
+                f"Indexed {len(vectors)} spectra x {vectors.shape[1]} dims ({self.metric}"
+                f"{f', {self.n_lists} IVF lists' if self.n_lists else ''}) in {time.perf_counter() - start:.2f}s"
+            )
+            return self
+        except Exception as e:
+            logging.error(f"Error while building the spectral index: {str(e)}")
+            raise e
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+    def _search_range(
+        self, queries: np.ndarray, k: int, ranges: Any
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k of queries over the given (start, stop) row ranges, `query_rows` queries at a time."""
+        if len(queries) <= self.query_rows:
+            return self._search_blocks(queries, k, ranges)
+        results = [
+            self._search_blocks(queries[start:start + self.query_rows], k, ranges)
+            for start in range(0, len(queries), self.query_rows)
+        ]
+        return np.concatenate([scores for scores, _ in results]), np.concatenate([rows for _, rows in results])
+
+    def _search_blocks(
+        self, queries: np.ndarray, k: int, ranges: Any
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k of a batch of queries over the given row ranges, in blocks of `block_rows`."""
+        best_scores = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for range_start, range_stop in ranges:
+            for start in range(range_start, range_stop, self.block_rows):
+                stop = min(start + self.block_rows, range_stop)
+                norms = self.norms[start:stop] if self.norms is not None else None
+                scores = self._scores(queries, self.vectors[start:stop], norms)
+                candidates = _top_k(scores, k)
+                scores = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+                rows = np.concatenate([best_rows, candidates + start], axis=1)
+                keep = _top_k(scores, k)
+                best_scores = np.take_along_axis(scores, keep, axis=1)
+                best_rows = np.take_along_axis(rows, keep, axis=1)
+        order = np.argsort(best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+    def search(
+        self, queries: np.ndarray, k: int = 10, n_probe: Optional[int] = None, transformed: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest indexed rows of every query spectrum.
+
+        Args:
+            queries (np.ndarray): (queries, bands) raw spectra (transformed like the index).
+            k (int): Neighbours per query.
+            n_probe (int, optional): IVF lists scored per query; None (or an index
+                without lists) searches exactly.
+            transformed (bool): Queries are already in index space (e.g. rows of
+                `vectors`), so the PCA transform is skipped.
+
+        Returns:
+            (np.ndarray, np.ndarray): Distances (euclidean, or angle in radians) and
+            positions into the index, both (queries, k) sorted by distance. Queries
+            probing fewer than k rows are padded with inf / -1.
+        """
+        if self.vectors is None:
+            raise ValueError("The index is empty; call build() or load() first.")
+        queries = self._prepare(queries, transformed)
+        if not n_probe or self.centroids is None:
+            scores, rows = self._search_range(queries, k, [(0, len(self.vectors))])
+            return self._distances(queries, scores), rows
+
+        distances = np.full((len(queries), k), np.inf)
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        centroid_norms = (self.centroids ** 2).sum(axis=1)
+        lists = _top_k(self._scores(queries, self.centroids, centroid_norms), min(n_probe, len(self.centroids)))
+        for i, probed in enumerate(lists):
+            ranges = [(self.list_offsets[j], self.list_offsets[j + 1]) for j in np.sort(probed)]
+            scores, rows = self._search_range(queries[i:i + 1], k, ranges)
+            found = rows.shape[1]
+            distances[i, :found] = self._distances(queries[i:i + 1], scores)[0]
+            positions[i, :found] = rows[0]
+        return distances, positions
+
+    def neighbours(
+        self, queries: np.ndarray, k: int = 10, n_probe: Optional[int] = None, transformed: bool = False
+    ) -> pd.DataFrame:
+        """
+        search() as a table: one row per (query, rank) with the distance and the
+        neighbour's metadata.
+        """
+        distances, positions = self.search(queries, k, n_probe, transformed)
+        found = positions >= 0
+        query, rank = np.nonzero(found)
+        table = pd.DataFrame({"query": query, "rank": rank, "distance": distances[found]})
+        for name, values in self.metadata.items():
+            table[name] = values[positions[found]]
+        return table
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, directory: str) -> None:
+        """Write the index as .npy arrays plus index.json (and the pickled PCA transform)."""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {"vectors": self.vectors, "norms": self.norms, "centroids": self.centroids,
+                  "list_offsets": self.list_offsets}
+        arrays.update({f"meta_{name}": values for name, values in self.metadata.items()})
+        for name, values in arrays.items():
+            if values is not None:
+                np.save(os.path.join(directory, f"{name}.npy"), values, allow_pickle=values.dtype == object)
+        if self.transformer is not None:
+            with open(os.path.join(directory, "transformer.pkl"), "wb") as fid:
+                pickle.dump(self.transformer, fid)
+        with open(os.path.join(directory, "index.json"), "w") as fid:
+            json.dump({
+                "metric": self.metric,
+                "pca_components": self.pca_components,
+                "n_lists": self.n_lists,
+                "block_rows": self.block_rows,
+                "seed": self.seed,
+                "query_rows": self.query_rows,
+                "rows": len(self.vectors),
+                "dims": self.vectors.shape[1],
+                "metadata": sorted(self.metadata),
+            }, fid, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "SpectralIndex":
+        """
+        Read an index written by save(); with mmap the vectors are memory-mapped,
+        so opening a large index is instant and pages are read on demand.
+        """
+        with open(os.path.join(directory, "index.json")) as fid:
+            info = json.load(fid)
+        index = cls(
+            info["metric"], info["pca_components"], info["n_lists"], info["block_rows"], info["seed"],
+            info.get("query_rows", DEFAULT_QUERY_ROWS),
+        )
+
+        def read(name: str) -> Optional[np.ndarray]:
+            path = os.path.join(directory, f"{name}.npy")
+            if not os.path.exists(path):
+                return None
+            try:
+                return np.load(path, mmap_mode="r" if mmap else None)
+            except ValueError:
+                return np.load(path, allow_pickle=True)
+
+        index.vectors, index.norms = read("vectors"), read("norms")
+        index.centroids, index.list_offsets = read("centroids"), read("list_offsets")
+        index.metadata = {name: read(f"meta_{name}") for name in info["metadata"]}
+        if os.path.exists(os.path.join(directory, "transformer.pkl")):
+            with open(os.path.join(directory, "transformer.pkl"), "rb") as fid:
+                index.transformer = pickle.load(fid)
+        return index
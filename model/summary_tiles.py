@@ -0,0 +1,423 @@
+import json
+import logging
+import math
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS = 6378137.0  # Web Mercator sphere, metres
+TILE_MAGIC = b"HSIT"
+TILE_VERSION = 1
+# magic, version, records, bands, quantiles, classes
+TILE_HEADER = struct.Struct("<4sHIHHH")
+SPECTRUM_DTYPES = {"float16": np.float16, "float32": np.float32}
+
+
+def _group_offsets(groups: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stable order sorting rows by group, the distinct groups and the start of
+    each group in that order.
+    """
+    order = np.argsort(groups, kind="stable")
+    keys, starts = np.unique(groups[order], return_index=True)
+    return order, keys, starts
+
+
+def grouped_quantiles(
+    x: np.ndarray, groups: np.ndarray, quantiles: Sequence[float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-group, per-band quantiles (linear interpolation, as np.quantile) of a
+    pixel x band matrix, for all groups and bands in one sort.
+
+    Each group's values are shifted by its rank times the data range, so one
+    column-wise sort of the whole matrix orders every group's values inside its
+    own contiguous block; quantiles are then read at fractional positions.
+
+    Args:
+        x (np.ndarray): (pixels, bands) finite values.
+        groups (np.ndarray): Group id of every pixel.
+        quantiles (Sequence[float]): Levels in [0, 1].
+
+    Returns:
+        (np.ndarray, np.ndarray): Sorted group ids, and the quantiles with shape
+        (groups, len(quantiles), bands).
+    """
+    order, keys, starts = _group_offsets(groups)
+    counts = np.diff(np.append(starts, len(groups)))
+    values = np.asarray(x, dtype=np.float64)[order]
+    low, high = values.min(), values.max()
+    span = (high - low) + 1.0
+    rank = np.repeat(np.arange(len(keys), dtype=np.float64), counts)
+    shifted = np.sort(values - low + (rank * span)[:, None], axis=0)
+
+    levels = np.asarray(quantiles, dtype=np.float64)
+    position = starts[:, None] + levels[None, :] * (counts[:, None] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, (starts + counts - 1)[:, None])
+    weight = (position - lower)[..., None]
+    offset = (np.arange(len(keys)) * span)[:, None, None] - low
+    result = shifted[lower] * (1 - weight) + shifted[upper] * weight - offset
+    return keys, result
+
+
+def image_aggregates(
+    x: np.ndarray,
+    sample_nums: np.ndarray,
+    y_true: Optional[np.ndarray] = None,
+    y_pred: Optional[np.ndarray] = None,
+    num_classes: Optional[int] = None,
+    quantiles: Sequence[float] = (0.1, 0.5, 0.9),
+) -> Dict[str, np.ndarray]:
+    """
+    Per-image summaries of the cleaned band matrix and its predictions.
+
+    Args:
+        x (np.ndarray): (pixels, bands) or (pixels, bands, 1) as produced by
+            DataDivideStrategy.
+        sample_nums (np.ndarray): Sample_num of every pixel.
+        y_true (np.ndarray, optional): True class index (or one-hot) of every pixel.
+        y_pred (np.ndarray, optional): Predicted class index (or probabilities).
+        num_classes (int, optional): Length of the label count vectors.
+        quantiles (Sequence[float]): Band quantile levels.
+
+    Returns:
+        dict: "sample_nums", "pixel_count", "frequency_sum" (sum of every band of
+        every pixel), "band_sums", "mean_spectrum", "band_quantiles" and, when the
+        labels are given, "true_counts"/"pred_counts" (images x classes).
+    """
+    x = np.asarray(x).reshape(len(x), -1)
+    sample_nums = np.asarray(sample_nums)
+    order, keys, starts = _group_offsets(sample_nums)
+    band_sums = np.add.reduceat(x[order].astype(np.float64), starts, axis=0)
+    pixel_count = np.diff(np.append(starts, len(sample_nums)))
+    _, band_quantiles = grouped_quantiles(x, sample_nums, quantiles)
+    aggregates = {
+        "sample_nums": keys,
+        "pixel_count": pixel_count,
+        "frequency_sum": band_sums.sum(axis=1),
+        "band_sums": band_sums,
+        "mean_spectrum": band_sums / pixel_count[:, None],
+        "band_quantiles": band_quantiles,
+    }
+    image_index = np.searchsorted(keys, sample_nums)
+    for name, labels in (("true_counts", y_true), ("pred_counts", y_pred)):
+        if labels is None:
+            continue
+        labels = np.asarray(labels)
+        if labels.ndim == 2:
+            labels = labels.argmax(axis=1)
+        classes = num_classes or int(labels.max()) + 1
+        aggregates[name] = np.bincount(
+            image_index * classes + labels, minlength=len(keys) * classes
+        ).reshape(len(keys), classes)
+    return aggregates
+
+
+def polygon_centroids(polygons: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Vertex-mean centroids of polygon documents ({"sample_num", "coordinates":
+    [[lng, lat], ...]}, the `polygons` collection of hsi-visualization), matching
+    the map's calculateCentroid.
+    """
+    rows = [
+        (record["sample_num"], *np.asarray(record["coordinates"], dtype=np.float64).mean(axis=0)[:2])
+        for record in polygons
+    ]
+    return pd.DataFrame(rows, columns=["Sample_num", "longitude", "latitude"])
+
+
+def to_web_mercator(longitude: np.ndarray, latitude: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    latitude = np.clip(latitude, -85.05112878, 85.05112878)
+    x = EARTH_RADIUS * np.radians(longitude)
+    y = EARTH_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(latitude) / 2))
+    return x, y
+
+
+def from_web_mercator(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.degrees(x / EARTH_RADIUS), np.degrees(2 * np.arctan(np.exp(y / EARTH_RADIUS)) - np.pi / 2)
+
+
+def hex_size(zoom: int, hex_pixels: float) -> float:
+    """Centre-to-corner hexagon size in metres that is `hex_pixels` wide on screen at `zoom`."""
+    return hex_pixels * 2 * math.pi * EARTH_RADIUS / (256 * 2 ** zoom)
+
+
+def hex_cells(x: np.ndarray, y: np.ndarray, size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Axial (q, r) of the pointy-top hexagon containing each point (cube rounding)."""
+    q = (math.sqrt(3) / 3 * x - y / 3) / size
+    r = (2 / 3 * y) / size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def hex_centers(q: np.ndarray, r: np.ndarray, size: float) -> Tuple[np.ndarray, np.ndarray]:
+    return size * math.sqrt(3) * (q + r / 2), size * 1.5 * r
+
+
+def tile_index(x: np.ndarray, y: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Slippy-map (x, y) tile of Web Mercator points at `zoom`."""
+    n = 2 ** zoom
+    extent = 2 * math.pi * EARTH_RADIUS
+    tx = np.clip(np.floor((x + extent / 2) / extent * n), 0, n - 1)
+    ty = np.clip(np.floor((extent / 2 - y) / extent * n), 0, n - 1)
+    return tx.astype(np.int64), ty.astype(np.int64)
+
+
+def encode_tile(records: Dict[str, np.ndarray], spectrum_dtype: str = "float16") -> bytes:
+    """
+    Columnar little-endian tile: header, then id (int64), longitude and latitude
+    (float32), pixel_count and image_count (uint32), frequency_sum (float64),
+    mean_spectrum and band_quantiles (spectrum_dtype), true_counts and
+    pred_counts (uint32, zero classes when absent).
+    """
+    n, bands = records["mean_spectrum"].shape
+    n_quantiles = records["band_quantiles"].shape[1]
+    classes = records["true_counts"].shape[1] if "true_counts" in records else 0
+    dtype = SPECTRUM_DTYPES[spectrum_dtype]
+    parts = [
+        TILE_HEADER.pack(TILE_MAGIC, TILE_VERSION, n, bands, n_quantiles, classes),
+        records["id"].astype("<i8").tobytes(),
+        records["longitude"].astype("<f4").tobytes(),
+        records["latitude"].astype("<f4").tobytes(),
+        records["pixel_count"].astype("<u4").tobytes(),
+        records["image_count"].astype("<u4").tobytes(),
+        records["frequency_sum"].astype("<f8").tobytes(),
+        records["mean_spectrum"].astype(np.dtype(dtype).newbyteorder("<")).tobytes(),
+        records["band_quantiles"].astype(np.dtype(dtype).newbyteorder("<")).tobytes(),
+    ]
+    if classes:
+        parts.append(records["true_counts"].astype("<u4").tobytes())
+        parts.append(records["pred_counts"].astype("<u4").tobytes())
+    return b"".join(parts)
+
+
+def decode_tile(data: bytes, spectrum_dtype: str = "float16") -> Dict[str, np.ndarray]:
+    """Inverse of encode_tile."""
+    magic, version, n, bands, n_quantiles, classes = TILE_HEADER.unpack_from(data)
+    if magic != TILE_MAGIC or version != TILE_VERSION:
+        raise ValueError(f"Not a version {TILE_VERSION} summary tile")
+    dtype = np.dtype(SPECTRUM_DTYPES[spectrum_dtype]).newbyteorder("<")
+    layout = [
+        ("id", "<i8", (n,)), ("longitude", "<f4", (n,)), ("latitude", "<f4", (n,)),
+        ("pixel_count", "<u4", (n,)), ("image_count", "<u4", (n,)), ("frequency_sum", "<f8", (n,)),
+        ("mean_spectrum", dtype, (n, bands)), ("band_quantiles", dtype, (n, n_quantiles, bands)),
+    ]
+    if classes:
+        layout += [("true_counts", "<u4", (n, classes)), ("pred_counts", "<u4", (n, classes))]
+    records, offset = {}, TILE_HEADER.size
+    for name, column_dtype, shape in layout:
+        count = int(np.prod(shape))
+        records[name] = np.frombuffer(data, dtype=column_dtype, count=count, offset=offset).reshape(shape)
+        offset += count * np.dtype(column_dtype).itemsize
+    return records
+
+
+class SummaryTileExporter:
+    """
+    Writes per-image and per-hexagon summaries of the band matrix as binary
+    tiles, so the visualization map loads a few kilobytes per view instead of
+    raw pixel spectra.
+
+    Layout of output_dir:
+        manifest.json                zoom levels, hex sizes, bands, classes, encoding
+        images.bin                   one record per image (id = Sample_num)
+        frequency_summary.json       {Sample_num, frequency_sum} documents for the
+                                     `frequency_summary` collection
+        <zoom>/<x>/<y>.bin           one record per hexagon (id = packed axial q, r)
+                                     whose centre lies in slippy tile (x, y)
+
+    Image aggregates come from one sorted pass over the pixels; hexagon sums,
+    counts and mean spectra are added up from them, and hexagon quantiles are
+    exact over the hexagon's pixels.
+    """
+
+    def __init__(
+        self,
+        zoom_levels: Sequence[int] = (6, 8, 10, 12),
+        hex_pixels: float = 24.0,
+        quantiles: Sequence[float] = (0.1, 0.5, 0.9),
+        spectrum_dtype: str = "float16",
+    ) -> None:
+        if spectrum_dtype not in SPECTRUM_DTYPES:
+            raise ValueError(f"spectrum_dtype must be one of {list(SPECTRUM_DTYPES)}")
+        self.zoom_levels = list(zoom_levels)
+        self.hex_pixels = hex_pixels
+        self.quantiles = list(quantiles)
+        self.spectrum_dtype = spectrum_dtype
+
+    def _write(self, path: str, records: Dict[str, np.ndarray]) -> int:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = encode_tile(records, self.spectrum_dtype)
+        with open(path, "wb") as fid:
+            fid.write(data)
+        return len(data)
+
+    def export(
+        self,
+        output_dir: str,
+        x: np.ndarray,
+        sample_nums: np.ndarray,
+        positions: Optional[pd.DataFrame] = None,
+        y_true: Optional[np.ndarray] = None,
+        y_pred: Optional[np.ndarray] = None,
+        class_names: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            output_dir (str): Directory receiving the tiles (see class docstring).
+            x (np.ndarray): Cleaned band matrix, one row per pixel.
+            sample_nums (np.ndarray): Sample_num of every pixel.
+            positions (pd.DataFrame, optional): Sample_num, longitude, latitude of
+                every image (e.g. polygon_centroids). Without it only the image
+                summaries are written.
+            y_true (np.ndarray, optional): True class of every pixel.
+            y_pred (np.ndarray, optional): Predicted class of every pixel.
+            class_names (List[str], optional): Names of the class indices.
+
+        Returns:
+            dict: The manifest, including tile counts and bytes per zoom level.
+        """
+        try:
+            x = np.asarray(x).reshape(len(x), -1)
+            sample_nums = np.asarray(sample_nums)
+            num_classes = len(class_names) if class_names is not None else None
+            if y_pred is not None and y_true is None:
+                raise ValueError("y_pred needs y_true for the label counts.")
+            images = image_aggregates(x, sample_nums, y_true, y_pred, num_classes, self.quantiles)
+            n_images = len(images["sample_nums"])
+            if y_true is not None and y_pred is None:
+                images["pred_counts"] = np.zeros_like(images["true_counts"])
+            logging.info(f"Aggregated {len(x)} pixels into {n_images} image summaries")
+
+            os.makedirs(output_dir, exist_ok=True)
+            image_records = {
+                **images,
+                "id": images["sample_nums"],
+                "image_count": np.ones(n_images, dtype=np.int64),
+                "longitude": np.full(n_images, np.nan),
+                "latitude": np.full(n_images, np.nan),
+            }
+            located = np.zeros(n_images, dtype=bool)
+            if positions is not None:
+                positions = positions.drop_duplicates("Sample_num").set_index("Sample_num")
+                matched = positions.reindex(images["sample_nums"])
+                located = matched["longitude"].notna().to_numpy()
+                image_records["longitude"] = matched["longitude"].to_numpy(dtype=np.float64)
+                image_records["latitude"] = matched["latitude"].to_numpy(dtype=np.float64)
+                if not located.all():
+                    logging.warning(f"{(~located).sum()} of {n_images} images have no position and are left off the hex tiles")
+            image_bytes = self._write(os.path.join(output_dir, "images.bin"), image_records)
+            with open(os.path.join(output_dir, "frequency_summary.json"), "w") as fid:
+                json.dump([
+                    {"Sample_num": int(num), "frequency_sum": float(total)}
+                    for num, total in zip(images["sample_nums"], images["frequency_sum"])
+                ], fid)
+
+            manifest: Dict[str, Any] = {
+                "version": TILE_VERSION,
+                "bands": x.shape[1],
+                "quantiles": self.quantiles,
+                "class_names": list(class_names) if class_names is not None else None,
+                "spectrum_dtype": self.spectrum_dtype,
+                "hex_pixels": self.hex_pixels,
+                "images": {"count": n_images, "bytes": image_bytes},
+                "zoom_levels": {},
+            }
+            if located.any():
+                mx, my = to_web_mercator(image_records["longitude"][located], image_records["latitude"][located])
+                pixel_image = np.searchsorted(images["sample_nums"], sample_nums)
+                pixel_located = located[pixel_image]
+                for zoom in self.zoom_levels:
+                    manifest["zoom_levels"][str(zoom)] = self._export_zoom(
+                        output_dir, zoom, images, located, mx, my, x[pixel_located], pixel_image[pixel_located]
+                    )
+
+            with open(os.path.join(output_dir, "manifest.json"), "w") as fid:
+                json.dump(manifest, fid, indent=2)
+            logging.info(
+                f"Wrote summary tiles to {output_dir}: {n_images} images ({image_bytes / 1e3:.1f} kB), "
+                + ", ".join(
+                    f"z{zoom}: {level['hexagons']} hexagons in {level['tiles']} tiles ({level['bytes'] / 1e3:.1f} kB)"
+                    for zoom, level in manifest["zoom_levels"].items()
+                )
+            )
+            return manifest
+        except Exception as e:
+            logging.error(f"Error while exporting summary tiles: {str(e)}")
+            raise e
+
+    def _export_zoom(
+        self,
+        output_dir: str,
+        zoom: int,
+        images: Dict[str, np.ndarray],
+        located: np.ndarray,
+        mx: np.ndarray,
+        my: np.ndarray,
+        pixels: np.ndarray,
+        pixel_image: np.ndarray,
+    ) -> Dict[str, Any]:
+        size = hex_size(zoom, self.hex_pixels)
+        q, r = hex_cells(mx, my, size)
+        # Pack axial coordinates into one id; |q|, |r| < 2**31 at any zoom used here
+        cell_ids = (q << 32) + (r & 0xFFFFFFFF)
+        hex_ids, image_hex = np.unique(cell_ids, return_inverse=True)
+        n_hex = len(hex_ids)
+
+        def add_up(values: np.ndarray) -> np.ndarray:
+            totals = np.zeros((n_hex,) + values.shape[1:], dtype=np.result_type(values, np.float64))
+            np.add.at(totals, image_hex, values)
+            return totals
+
+        pixel_count = add_up(images["pixel_count"][located])
+        band_sums = add_up(images["band_sums"][located])
+        # Map every located pixel to its hexagon through its image
+        image_to_hex = np.full(len(located), -1)
+        image_to_hex[np.flatnonzero(located)] = image_hex
+        _, hex_quantiles = grouped_quantiles(pixels, image_to_hex[pixel_image], self.quantiles)
+
+        hq, hr = (hex_ids >> 32), ((hex_ids & 0xFFFFFFFF).astype(np.int64) ^ 0x80000000) - 0x80000000
+        cx, cy = hex_centers(hq, hr, size)
+        longitude, latitude = from_web_mercator(cx, cy)
+        records = {
+            "id": hex_ids,
+            "longitude": longitude,
+            "latitude": latitude,
+            "pixel_count": pixel_count,
+            "image_count": np.bincount(image_hex, minlength=n_hex),
+            "frequency_sum": band_sums.sum(axis=1),
+            "mean_spectrum": band_sums / pixel_count[:, None],
+            "band_quantiles": hex_quantiles,
+        }
+        for name in ("true_counts", "pred_counts"):
+            if name in images:
+                records[name] = add_up(images[name][located])
+
+        tx, ty = tile_index(cx, cy, zoom)
+        tiles = tx * (2 ** zoom) + ty
+        total_bytes = 0
+        for tile in np.unique(tiles):
+            members = tiles == tile
+            path = os.path.join(output_dir, str(zoom), str(tile // 2 ** zoom), f"{tile % 2 ** zoom}.bin")
+            total_bytes += self._write(path, {name: values[members] for name, values in records.items()})
+        return {
+            "hex_size_m": size,
+            "hexagons": n_hex,
+            "tiles": int(len(np.unique(tiles))),
+            "bytes": total_bytes,
+        }
+
+
+def read_manifest(output_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(output_dir, "manifest.json")) as fid:
+        return json.load(fid)
@@ -0,0 +1,455 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from materializer.formats import load_artifact, read_header, save_artifact
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "local_pipeline")
+PROJECT_PACKAGES = ("model", "steps", "pipelines", "materializer")
+
+
+def _module_source(module_name: str) -> str:
+    module = sys.modules.get(module_name)
+    try:
+        return inspect.getsource(module) if module is not None else ""
+    except (OSError, TypeError):
+        return ""
+
+
+def code_fingerprint(fn: Callable) -> str:
+    """
+    Hash of a step's code: its own module plus the project modules it references
+    directly (e.g. model.data_cleaning for clean_data), so editing a strategy class
+    invalidates the steps that use it.
+    """
+    # Unwrap ZenML steps and decorators (e.g. steps.instrumentation) to the real function
+    fn = inspect.unwrap(getattr(fn, "entrypoint", fn))
+    modules = {fn.__module__}
+    for value in getattr(fn, "__globals__", {}).values():
+        name = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+        if isinstance(name, str) and name.split(".")[0] in PROJECT_PACKAGES:
+            modules.add(name)
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(modules):
+        digest.update(name.encode())
+        digest.update(_module_source(name).encode())
+    return digest.hexdigest()
+
+
+def _param_fingerprint(value: Any) -> str:
+    """Stable description of a parameter; files are identified by size and mtime."""
+    if isinstance(value, str) and os.path.isfile(value):
+        stat = os.stat(value)
+        return f"file:{os.path.abspath(value)}:{stat.st_size}:{stat.st_mtime_ns}"
+    if hasattr(value, "model_dump_json"):
+        return f"{type(value).__name__}:{value.model_dump_json()}"
+    if hasattr(value, "json"):
+        return f"{type(value).__name__}:{value.json()}"
+    return repr(value)
+
+
+class LocalStep:
+    """
+    One node of a local pipeline DAG.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        inputs: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        outputs: Sequence[str] = ("output",),
+        enable_cache: bool = True,
+        after: Sequence[str] = (),
+    ) -> None:
+        """
+        Args:
+            name (str): Unique step name.
+            fn (Callable): Step function. ZenML steps are unwrapped to their entrypoint,
+                so no stack, orchestrator or experiment tracker is needed.
+            inputs (dict): Argument name -> "upstream_step.output_name" (or just
+                "upstream_step" when it has a single output).
+            params (dict): Constant keyword arguments (paths, configs, ...).
+            outputs (Sequence[str]): Names of the returned values, in order.
+            enable_cache (bool): Reuse outputs when inputs, code and params are unchanged.
+            after (Sequence[str]): Steps that must finish first although no output
+                of theirs is consumed (e.g. to read a cache they fill).
+        """
+        self.name = name
+        self.fn = getattr(fn, "entrypoint", fn)
+        self.inputs = inputs or {}
+        self.params = params or {}
+        self.outputs = tuple(outputs)
+        self.enable_cache = enable_cache
+        self.after = tuple(after)
+
+    @property
+    def upstream(self) -> List[str]:
+        return sorted({ref.split(".")[0] for ref in self.inputs.values()} | set(self.after))
+
+
+class LocalPipelineRunner:
+    """
+    Runs a DAG of steps in-process, with hash-keyed output caching.
+
+    A step's cache key combines its code fingerprint, its parameters and the cache
+    keys of the upstream outputs it consumes (Merkle-style), so large inputs are never
+    rehashed. Outputs are stored with the materializer formats and reloaded lazily.
+    Steps whose dependencies are satisfied run concurrently in a thread pool.
+    """
+
+    def __init__(
+        self,
+        steps: Sequence[LocalStep],
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_workers: int = 4,
+    ) -> None:
+        """
+        Args:
+            steps (Sequence[LocalStep]): Pipeline steps in any order.
+            cache_dir (str): Directory for cached step outputs.
+            max_workers (int): Maximum number of steps running at the same time.
+        """
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Step names must be unique.")
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.report: List[Dict[str, Any]] = []
+        self._validate()
+
+    def _validate(self) -> None:
+        for step in self.steps.values():
+            for arg, ref in step.inputs.items():
+                upstream, _, output = ref.partition(".")
+                if upstream not in self.steps:
+                    raise ValueError(f"Step '{step.name}' input '{arg}' references unknown step '{upstream}'.")
+                if output and output not in self.steps[upstream].outputs:
+                    raise ValueError(f"Step '{upstream}' has no output '{output}' (needed by '{step.name}').")
+            for upstream in step.after:
+                if upstream not in self.steps:
+                    raise ValueError(f"Step '{step.name}' runs after unknown step '{upstream}'.")
+        # Kahn's algorithm to reject cycles before running anything
+        pending = {name: set(step.upstream) for name, step in self.steps.items()}
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline has a cycle between steps: {sorted(pending)}")
+            for name in ready:
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+
+    def _cache_key(self, step: LocalStep, upstream_keys: Dict[str, str]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(step.name.encode())
+        digest.update(code_fingerprint(step.fn).encode())
+        for arg in sorted(step.params):
+            digest.update(f"{arg}={_param_fingerprint(step.params[arg])}".encode())
+        for arg in sorted(step.inputs):
+            ref = step.inputs[arg]
+            digest.update(f"{arg}<-{upstream_keys[ref.split('.')[0]]}:{ref}".encode())
+        return digest.hexdigest()
+
+    def _cache_path(self, step: LocalStep, key: str) -> str:
+        return os.path.join(self.cache_dir, step.name, key)
+
+    def _load_cached(self, step: LocalStep, key: str) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(step, key)
+        if not step.enable_cache or not os.path.exists(os.path.join(path, "COMPLETE")):
+            return None
+        outputs = {}
+        for output in step.outputs:
+            directory = os.path.join(path, output)
+            outputs[output] = load_artifact(directory, read_header(directory))
+        return outputs
+
+    def _store(self, step: LocalStep, key: str, outputs: Dict[str, Any]) -> None:
+        path = self._cache_path(step, key)
+        shutil.rmtree(path, ignore_errors=True)
+        for output, value in outputs.items():
+            directory = os.path.join(path, output)
+            os.makedirs(directory, exist_ok=True)
+            save_artifact(value, directory)
+        open(os.path.join(path, "COMPLETE"), "w").close()
+
+    def _execute(
+        self, step: LocalStep, key: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], bool, float, float]:
+        start = time.perf_counter()
+        cached = self._load_cached(step, key)
+        if cached is not None:
+            return cached, True, start, time.perf_counter() - start
+
+        result = step.fn(**kwargs, **step.params)
+        if len(step.outputs) == 1:
+            outputs = {step.outputs[0]: result}
+        else:
+            if not isinstance(result, tuple) or len(result) != len(step.outputs):
+                raise ValueError(
+                    f"Step '{step.name}' declared {len(step.outputs)} outputs but returned {type(result).__name__}."
+                )
+            outputs = dict(zip(step.outputs, result))
+        elapsed = time.perf_counter() - start
+        if step.enable_cache:
+            self._store(step, key, outputs)
+        return outputs, False, start, elapsed
+
+    def _resolve(self, step: LocalStep, results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        kwargs = {}
+        for arg, ref in step.inputs.items():
+            upstream, _, output = ref.partition(".")
+            kwargs[arg] = results[upstream][output or self.steps[upstream].outputs[0]]
+        return kwargs
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Execute the pipeline.
+
+        Returns:
+            dict: step name -> {output name -> value}. Per-step timings are in self.report.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        keys: Dict[str, str] = {}
+        remaining = dict(self.steps)
+        running = {}
+        self.report = []
+        pipeline_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while remaining or running:
+                ready = [
+                    step for step in remaining.values()
+                    if all(dep in results for dep in step.upstream)
+                ]
+                for step in ready:
+                    del remaining[step.name]
+                    keys[step.name] = self._cache_key(step, keys)
+                    logging.info(f"[local pipeline] Starting step '{step.name}'")
+                    future = executor.submit(
+                        self._execute, step, keys[step.name], self._resolve(step, results)
+                    )
+                    running[future] = step
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    outputs, cached, started, elapsed = future.result()
+                    results[step.name] = outputs
+                    self.report.append({
+                        "step": step.name,
+                        "cached": cached,
+                        "seconds": round(elapsed, 4),
+                        "started_at": round(started - pipeline_start, 4),
+                        "finished_at": round(started + elapsed - pipeline_start, 4),
+                        "cache_key": keys[step.name],
+                    })
+                    logging.info(
+                        f"[local pipeline] Step '{step.name}' "
+                        f"{'loaded from cache' if cached else 'finished'} in {elapsed:.2f}s"
+                    )
+
+        self.report.append({"step": "<total>", "seconds": round(time.perf_counter() - pipeline_start, 4)})
+        return results
+
+    def format_report(self) -> str:
+        """Human readable per-step wall time table for the last run."""
+        lines = [f"{'step':<20} {'status':<8} {'start s':>8} {'wall s':>8}"]
+        for entry in self.report:
+            status = "" if entry["step"] == "<total>" else ("cached" if entry["cached"] else "ran")
+            lines.append(
+                f"{entry['step']:<20} {status:<8} {entry.get('started_at', 0):>8.2f} {entry['seconds']:>8.2f}"
+            )
+        return "\n".join(lines)
+
+    def write_report(self, path: str) -> None:
+        with open(path, "w") as fid:
+            json.dump(self.report, fid, indent=2)
+
+
+def training_pipeline_steps(
+    data_path: str,
+    model_config: Any = None,
+    evaluation_config: Any = None,
+    cleaning_config: Any = None,
+    ingestion_config: Any = None,
+    cascade_config: Any = None,
+    calibration_config: Any = None,
+    publish_config: Any = None,
+    export_config: Any = None,
+    similarity_config: Any = None,
+) -> List[LocalStep]:
+    """
+    The training pipeline (ingest_data -> clean_data -> model_train -> evaluation)
+    as local DAG steps, calling the plain step implementations so neither ZenML
+    nor a stack is needed.
+
+    Args:
+        data_path (str): Path to the samples CSV.
+        model_config (ModelNameConfig, optional): Training configuration.
+        evaluation_config (EvaluationConfig, optional): Evaluation configuration.
+        cleaning_config (DataCleaningConfig, optional): Preprocessing workers.
+        ingestion_config (DataIngestionConfig, optional): Compact band storage.
+        cascade_config (CascadeConfig, optional): Also evaluate a classical
+            front-end cascaded with the CNN (steps.evaluation.evaluate_cascade).
+        calibration_config (CalibrationConfig, optional): Also store temperature-
+            calibrated top-k probabilities of the test pixels (steps.calibration).
+            Never cached.
+        publish_config (PublishConfig, optional): Publish per-image predictions to
+            the visualization store after evaluation (steps.publish). Never cached.
+        export_config (TileExportConfig, optional): Export summary tiles for the
+            visualization map after evaluation (steps.export_tiles). Never cached.
+        similarity_config (SimilarityIndexConfig, optional): Build a spectral
+            similarity index over the training pixels (steps.similarity_index).
+            Never cached.
+
+    Returns:
+        List[LocalStep]: Steps for LocalPipelineRunner.
+    """
+    from steps.clean_data import clean
+    from steps.config import DataCleaningConfig, DataIngestionConfig, EvaluationConfig, ModelNameConfig
+    from steps.evaluation import evaluate, evaluate_cascade
+    from steps.ingest_data import ingest
+    from steps.model_train import train
+
+    steps = [
+        LocalStep(
+            "ingest_data",
+            ingest,
+            params={"data_path": data_path, "config": ingestion_config or DataIngestionConfig()},
+            outputs=("data",),
+        ),
+        LocalStep(
+            "clean_data",
+            clean,
+            inputs={"data": "ingest_data.data"},
+            params={"config": cleaning_config or DataCleaningConfig()},
+            outputs=(
+                "X_train", "X_test", "y_train", "y_test", "label_encoder",
+                "train_sample_nums", "test_sample_nums",
+            ),
+        ),
+        LocalStep(
+            "model_train",
+            train,
+            inputs={
+                "x_train": "clean_data.X_train",
+                "x_test": "clean_data.X_test",
+                "y_train": "clean_data.y_train",
+                "y_test": "clean_data.y_test",
+                "train_sample_nums": "clean_data.train_sample_nums",
+            },
+            params={"config": model_config or ModelNameConfig()},
+            outputs=("model",),
+        ),
+        LocalStep(
+            "evaluation",
+            evaluate,
+            inputs={
+                "model": "model_train.model",
+                "x_test": "clean_data.X_test",
+                "y_test": "clean_data.y_test",
+                "label_encoder": "clean_data.label_encoder",
+                "test_sample_nums": "clean_data.test_sample_nums",
+            },
+            params={"config": evaluation_config or EvaluationConfig()},
+            outputs=("pixel_metrics", "image_metrics"),
+        ),
+    ]
+    if cascade_config is not None:
+        steps.append(
+            LocalStep(
+                "cascade_evaluation",
+                evaluate_cascade,
+                inputs={
+                    "model": "model_train.model",
+                    "x_train": "clean_data.X_train",
+                    "y_train": "clean_data.y_train",
+                    "x_test": "clean_data.X_test",
+                    "y_test": "clean_data.y_test",
+                    "test_sample_nums": "clean_data.test_sample_nums",
+                },
+                params={"config": cascade_config},
+                outputs=("cascade_report",),
+            )
+        )
+    if calibration_config is not None:
+        from steps.calibration import calibrate
+
+        steps.append(
+            LocalStep(
+                "calibration",
+                calibrate,
+                inputs={
+                    "model": "model_train.model",
+                    "x_test": "clean_data.X_test",
+                    "y_test": "clean_data.y_test",
+                    "test_sample_nums": "clean_data.test_sample_nums",
+                },
+                params={"config": calibration_config},
+                outputs=("calibration_report",),
+                enable_cache=False,
+            )
+        )
+    if publish_config is not None:
+        from steps.publish import publish
+
+        steps.append(
+            LocalStep(
+                "publish",
+                publish,
+                inputs={
+                    "model": "model_train.model",
+                    "x_test": "clean_data.X_test",
+                    "y_test": "clean_data.y_test",
+                    "label_encoder": "clean_data.label_encoder",
+                    "test_sample_nums": "clean_data.test_sample_nums",
+                },
+                params={"config": publish_config},
+                outputs=("publish_stats",),
+                enable_cache=False,
+                after=("evaluation",),
+            )
+        )
+    if export_config is not None:
+        from steps.export_tiles import export_tiles
+
+        steps.append(
+            LocalStep(
+                "export_tiles",
+                export_tiles,
+                inputs={
+                    "model": "model_train.model",
+                    "x_test": "clean_data.X_test",
+                    "y_test": "clean_data.y_test",
+                    "label_encoder": "clean_data.label_encoder",
+                    "test_sample_nums": "clean_data.test_sample_nums",
+                },
+                params={"config": export_config},
+                outputs=("tile_manifest",),
+                enable_cache=False,
+                after=("evaluation",),
+            )
+        )
+    if similarity_config is not None:
+        from steps.similarity_index import build_index
+
+        steps.append(
+            LocalStep(
+                "similarity_index",
+                build_index,
+                inputs={"x": "clean_data.X_train", "sample_nums": "clean_data.train_sample_nums"},
+                params={"config": similarity_config},
+                outputs=("index_dir",),
+                enable_cache=False,
+            )
+        )
+    return steps
@@ -0,0 +1,207 @@
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Image-level label counts of the real dataset (README, "Initial Label Counts")
+DEFAULT_CLASS_MIX: Dict[str, int] = {
+    "Shrubs": 670,
+    "Annual Crops": 298,
+    "Waterbodies": 239,
+    "Natural Wooded Land": 192,
+    "Planted Forest": 171,
+    "Permanent Crops": 153,
+    "Built-up": 125,
+    "Natural Grassland": 123,
+    "Wetlands": 112,
+    "Consolidated Barren": 105,
+    "Unconsolidated Barren": 89,
+    "Mixed or Not Classified": 145,
+}
+
+
+def class_prototypes(class_names: List[str], n_bands: int, seed: int = 0) -> np.ndarray:
+    """
+    One smooth reflectance curve per class: a sloped baseline plus a few absorption
+    and reflectance features, in [0, 1]. Classes are separable but overlap once
+    image and pixel noise are added, like the real spectra.
+    """
+    rng = np.random.default_rng(seed)
+    wavelengths = np.linspace(0.0, 1.0, n_bands)
+    prototypes = np.empty((len(class_names), n_bands))
+    for i in range(len(class_names)):
+        curve = rng.uniform(0.05, 0.35) + rng.uniform(-0.15, 0.25) * wavelengths
+        for _ in range(3):
+            center, width = rng.uniform(0.1, 0.9), rng.uniform(0.03, 0.12)
+            curve += rng.uniform(-0.12, 0.12) * np.exp(-0.5 * ((wavelengths - center) / width) ** 2)
+        prototypes[i] = np.clip(curve, 0.01, 0.95)
+    return prototypes
+
+
+def _image_labels(
+    n_images: int, class_mix: Dict[str, int], rng: np.random.Generator
+) -> np.ndarray:
+    """Labels for n_images drawn in the proportions of class_mix, every class at least twice."""
+    names = list(class_mix)
+    weights = np.array([class_mix[name] for name in names], dtype=float)
+    counts = np.maximum(2, np.floor(weights / weights.sum() * n_images)).astype(int)
+    while counts.sum() > n_images and counts.max() > 2:
+        counts[counts.argmax()] -= 1
+    while counts.sum() < n_images:
+        counts[np.argmax(weights / weights.sum() * n_images - counts)] += 1
+    labels = np.repeat(np.arange(len(names)), counts)
+    rng.shuffle(labels)
+    return labels
+
+
+def make_pixel_table(
+    n_images: int = 60,
+    n_bands: int = 64,
+    pixels_per_image: int = 100,
+    class_mix: Optional[Dict[str, int]] = None,
+    nan_rate: float = 0.0,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Synthetic pixel table with the columns of data/samples.csv (see createDF.ipynb).
+
+    Args:
+        n_images (int): Number of images (samples); each gets one class.
+        n_bands (int): Number of frequency columns frq0..frq{n_bands-1}.
+        pixels_per_image (int): Pixels per image (a square-ish patch).
+        class_mix (dict, optional): Class name -> relative frequency; defaults to the
+            real dataset's image counts, including "Mixed or Not Classified".
+        nan_rate (float): Fraction of pixels with one missing band value.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: One row per pixel.
+    """
+    rng = np.random.default_rng(seed)
+    class_mix = class_mix or DEFAULT_CLASS_MIX
+    names = list(class_mix)
+    if n_images < 2 * len(names):
+        raise ValueError(f"Need at least {2 * len(names)} images for {len(names)} classes.")
+    prototypes = class_prototypes(names, n_bands, seed)
+    labels = _image_labels(n_images, class_mix, rng)
+
+    n_pixels = n_images * pixels_per_image
+    image_index = np.repeat(np.arange(n_images), pixels_per_image)
+    # Image-level brightness/shape shifts, then per-pixel noise
+    gain = rng.normal(1.0, 0.08, size=(n_images, 1))
+    offset = rng.normal(0.0, 0.02, size=(n_images, 1))
+    spectra = prototypes[labels[image_index]] * gain[image_index] + offset[image_index]
+    spectra += rng.normal(0.0, 0.015, size=(n_pixels, n_bands))
+    spectra = np.clip(spectra, 0.0, 1.0).astype(np.float32)
+    if nan_rate > 0:
+        rows = np.flatnonzero(rng.random(n_pixels) < nan_rate)
+        spectra[rows, rng.integers(0, n_bands, size=rows.size)] = np.nan
+
+    sample_nums = rng.choice(np.arange(100, 100 + 10 * n_images), size=n_images, replace=False)
+    side = int(np.ceil(np.sqrt(pixels_per_image)))
+    pixel_index = np.tile(np.arange(pixels_per_image), n_images)
+    files = np.array([f"{num}_ang20231109t{120000 + i:06d}_{i % 1000:03d}.tif" for i, num in enumerate(sample_nums)])
+
+    table = pd.DataFrame(spectra, columns=[f"frq{band}" for band in range(n_bands)])
+    # The real labels carry a parenthetical code that the preprocessing strips
+    table["Label"] = np.array([f"{name} ({i + 1})" for i, name in enumerate(names)])[labels[image_index]]
+    table["Sample_num"] = sample_nums[image_index]
+    table["Shape"] = "Polygon"
+    table["File_UID_Num"] = image_index
+    table["File"] = files[image_index]
+    table["img_pxl_index"] = pixel_index
+    table["row_coord"] = pixel_index // side
+    table["col_coord"] = pixel_index % side
+    table["img_pos"] = [f"({r}, {c})" for r, c in zip(pixel_index // side, pixel_index % side)]
+    return table
+
+
+def make_cube(
+    n_bands: int = 64,
+    rows: int = 256,
+    cols: int = 256,
+    n_classes: int = 11,
+    nan_rate: float = 0.0,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Synthetic image cube shaped like a GeoTIFF read: (bands, rows, cols) float32,
+    made of blocky land-cover patches, plus the ground-truth label map.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: cube (bands, rows, cols), labels (rows, cols) uint8.
+    """
+    rng = np.random.default_rng(seed)
+    prototypes = class_prototypes([str(i) for i in range(n_classes)], n_bands, seed=0)
+    # Nearest-seed (Voronoi) patches give contiguous fields with sharp borders
+    seeds = rng.uniform(0, [rows, cols], size=(max(4, n_classes * 2), 2))
+    seed_labels = rng.integers(0, n_classes, size=len(seeds))
+    grid_r, grid_c = np.mgrid[0:rows, 0:cols]
+    nearest = np.zeros((rows, cols), dtype=np.int64)
+    best = np.full((rows, cols), np.inf)
+    for i, (r, c) in enumerate(seeds):
+        distance = (grid_r - r) ** 2 + (grid_c - c) ** 2
+        closer = distance < best
+        best[closer], nearest[closer] = distance[closer], i
+    labels = seed_labels[nearest].astype(np.uint8)
+
+    cube = prototypes[labels].transpose(2, 0, 1)
+    cube = cube + rng.normal(0.0, 0.015, size=cube.shape)
+    cube = np.clip(cube, 0.0, 1.0).astype(np.float32)
+    if nan_rate > 0:
+        mask = rng.random((rows, cols)) < nan_rate
+        cube[:, mask] = np.nan
+    return cube, labels
+
+
+def write_cubes(
+    directory: str,
+    n_images: int = 4,
+    n_bands: int = 64,
+    rows: int = 256,
+    cols: int = 256,
+    n_classes: int = 11,
+    nan_rate: float = 0.0,
+    seed: int = 0,
+) -> List[str]:
+    """
+    Write synthetic cubes as <i>.npy (bands, rows, cols) tiles, the layout read by
+    model.batch_inference, with <i>_truth.npy label maps next to them.
+
+    Returns:
+        List[str]: Paths of the cube files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(n_images):
+        cube, labels = make_cube(n_bands, rows, cols, n_classes, nan_rate, seed + i)
+        path = os.path.join(directory, f"synthetic_{i:04d}.npy")
+        np.save(path, cube)
+        np.save(os.path.join(directory, f"synthetic_{i:04d}_truth.npy"), labels)
+        paths.append(path)
+    logging.info(f"Wrote {n_images} synthetic cubes of shape {(n_bands, rows, cols)} to {directory}")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic hyperspectral data.")
+    parser.add_argument("kind", choices=["table", "cubes"])
+    parser.add_argument("--output", required=True, help="CSV path (table) or directory (cubes)")
+    parser.add_argument("--images", type=int, default=60)
+    parser.add_argument("--bands", type=int, default=64)
+    parser.add_argument("--pixels-per-image", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=256)
+    parser.add_argument("--cols", type=int, default=256)
+    parser.add_argument("--nan-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.kind == "table":
+        table = make_pixel_table(args.images, args.bands, args.pixels_per_image, nan_rate=args.nan_rate, seed=args.seed)
+        table.to_csv(args.output, index=False)
+        print(f"Wrote {len(table)} pixels from {args.images} images to {args.output}")
+    else:
+        write_cubes(args.output, args.images, args.bands, args.rows, args.cols, nan_rate=args.nan_rate, seed=args.seed)
@@ -1,23 +1,163 @@
 import logging
+from typing import Dict, List, Optional
+
+import numpy as np
 import pandas as pd
 from model.data_cleaning import DataCleaning, DataPreprocessStrategy, DataDivideStrategy
 
+
+def _image_keys(sample_nums: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Uniform pseudo-random key in [0, 1) per image (splitmix64 of Sample_num and seed).
+    Every row of an image gets the same key, whichever chunk it arrives in.
+    """
+    with np.errstate(over="ignore"):
+        x = sample_nums.astype(np.uint64) ^ np.uint64((seed * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+        x = (x + np.uint64(0x9E3779B97F4A7C15))
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def sample_images(
+    file_path: str,
+    max_rows: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    min_images_per_label: int = 2,
+    seed: int = 0,
+    chunksize: int = 100_000,
+) -> pd.DataFrame:
+    """
+    Stratified sample of whole images from a pixel CSV, read in a single streaming pass.
+
+    Every image gets a pseudo-random key derived from its Sample_num. The sample is
+    the images with the smallest keys whose pixels fit the budget together, so each
+    label contributes the same fraction of its images (proportional stratification),
+    plus the `min_images_per_label` lowest-key images of every label so that rare
+    classes survive and image-level splits stay possible. Images are kept or dropped
+    as a whole even when their pixels are spread over several chunks, and memory
+    stays within about one budget plus one chunk however large the file is.
+
+    Args:
+        file_path (str): Pixel CSV (the data/samples.csv layout).
+        max_rows (int, optional): Pixel budget of the sample.
+        max_bytes (int, optional): Memory budget, converted to rows from the first chunk.
+        min_images_per_label (int): Images kept per label regardless of the budget.
+        seed (int): Changes which images are drawn.
+        chunksize (int): Rows read per chunk.
+
+    Returns:
+        pd.DataFrame: All pixels of the sampled images, in file order, indexed by
+        their row number in the file.
+    """
+    try:
+        logging.info(f"Sampling whole images from {file_path} (max_rows={max_rows}, max_bytes={max_bytes})")
+        budget = max_rows if max_rows is not None else np.inf
+        stored: Dict[int, List[pd.DataFrame]] = {}
+        rows_of: Dict[int, int] = {}
+        key_of: Dict[int, float] = {}
+        label_of: Dict[int, str] = {}
+        global_members: set = set()
+        label_members: Dict[str, set] = {}
+        global_threshold = np.inf
+        label_threshold: Dict[str, float] = {}
+        seen: Dict[str, set] = {}
+        offset = 0
+
+        for chunk in pd.read_csv(file_path, chunksize=chunksize):
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            if max_bytes is not None and max_rows is None:
+                row_bytes = chunk.memory_usage(index=True, deep=True).sum() / max(len(chunk), 1)
+                budget = max_rows = int(max_bytes // row_bytes)
+                logging.info(f"Memory budget of {max_bytes / 1e6:.1f} MB allows about {max_rows} rows")
+
+            if "Sample_num" in chunk.columns:
+                sample_nums = chunk["Sample_num"].to_numpy(dtype=np.int64)
+            else:
+                sample_nums = chunk["File"].str.split("_").str[0].astype(int).to_numpy()
+            labels = chunk["Label"].astype(str).str.split("(").str[0].str.strip().to_numpy()
+            keys = _image_keys(sample_nums, seed)
+
+            # Admit rows of images whose key is below the global threshold (the smallest
+            # evicted key) or within their label's threshold; thresholds only ever
+            # decrease, so admitted images are always complete
+            thresholds = pd.Series(labels).map(label_threshold).fillna(np.inf).to_numpy()
+            admit = (keys < global_threshold) | (keys <= thresholds)
+            images = pd.DataFrame({"label": labels, "image": sample_nums}).drop_duplicates()
+            for label, image in zip(images["label"], images["image"]):
+                seen.setdefault(label, set()).add(int(image))
+            if not admit.any():
+                continue
+            admitted = chunk[admit]
+            admitted_keys, admitted_labels = keys[admit], labels[admit]
+            for image, positions in admitted.groupby(sample_nums[admit], sort=False).indices.items():
+                image = int(image)
+                stored.setdefault(image, []).append(admitted.iloc[positions])
+                rows_of[image] = rows_of.get(image, 0) + len(positions)
+                if image not in key_of:
+                    key_of[image] = float(admitted_keys[positions[0]])
+                    label_of[image] = admitted_labels[positions[0]]
+                if key_of[image] < global_threshold:
+                    global_members.add(image)
+                if key_of[image] <= label_threshold.get(label_of[image], np.inf):
+                    label_members.setdefault(label_of[image], set()).add(image)
+
+            # Keep the min_images_per_label smallest keys of every label
+            for label, members in label_members.items():
+                if len(members) > min_images_per_label:
+                    ordered = sorted(members, key=key_of.get)[:min_images_per_label]
+                    label_members[label] = set(ordered)
+                    label_threshold[label] = key_of[ordered[-1]] if ordered else -np.inf
+
+            # Evict the largest keys until the global set fits the row budget. An evicted
+            # image can only grow, so it and every larger key stay out for good
+            total = sum(rows_of[image] for image in global_members)
+            if total > budget:
+                for image in sorted(global_members, key=key_of.get, reverse=True):
+                    if total <= budget:
+                        break
+                    global_members.discard(image)
+                    total -= rows_of[image]
+                    global_threshold = min(global_threshold, key_of[image])
+
+            keep = global_members.union(*label_members.values())
+            for image in [image for image in stored if image not in keep]:
+                del stored[image], rows_of[image]
+
+        if not stored:
+            raise ValueError(f"No images could be sampled from {file_path}")
+        sample = pd.concat([rows for parts in stored.values() for rows in parts]).sort_index()
+        kept_per_label = pd.Series([label_of[image] for image in stored]).value_counts()
+        seen_per_label = pd.Series({label: len(images) for label, images in seen.items()})
+        logging.info(
+            f"Sampled {len(stored)} images ({len(sample)} rows) of {sum(seen_per_label)} "
+            f"images ({offset} rows):\n"
+            f"{pd.DataFrame({'sampled': kept_per_label, 'images': seen_per_label}).fillna(0).astype(int)}"
+        )
+        return sample
+    except Exception as e:
+        logging.error(f"Error in sample_images: {str(e)}")
+        raise e
+
+
 def get_sample_data_for_testing(file_path: str, sample_size: int = 100) -> pd.DataFrame:
     """
     Load a sample of the data for testing purposes.
 
     Args:
         file_path (str): Path to the CSV file containing sample data.
-        sample_size (int): Number of samples to extract.
+        sample_size (int): Pixel budget of the sample; whole images are drawn,
+            stratified by label (see sample_images).
 
     Returns:
         pd.DataFrame: Sampled and preprocessed data.
     """
     try:
         logging.info("Loading sample data for testing...")
-        # Load data and sample
-        df = pd.read_csv(file_path)
-        df_sample = df.sample(n=sample_size)
+        # Stream the file once and keep complete images
+        df_sample = sample_images(file_path, max_rows=sample_size)
 
         # Apply preprocessing strategy
         preprocess_strategy = DataPreprocessStrategy()
@@ -28,4 +168,4 @@ def get_sample_data_for_testing(file_path: str, sample_size: int = 100) -> pd.Da
         return preprocessed_sample, label_encoder
     except Exception as e:
         logging.error(f"Error in get_sample_data_for_testing: {str(e)}")
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,113 @@
+import logging
+import os
+
+import click
+
+
+@click.command()
+@click.option("--model-path", required=True, help="Saved model (.keras/.h5, or a pickled predictor).")
+@click.option("--tile-dir", required=True, help="Directory of GeoTIFF or .npy (bands, rows, cols) tiles.")
+@click.option("--output-dir", default="./predictions", help="Where label rasters and reports are written.")
+@click.option("--workers", default=os.cpu_count() or 1, help="Model worker processes (0 = score in-process).")
+@click.option("--memory-limit-mb", default=4096.0, help="Memory ceiling shared by all workers.")
+@click.option("--predict-batch-size", default=4096, help="Pixels per model forward pass.")
+@click.option(
+    "--bands",
+    default=None,
+    help="Comma-separated tile band indices the model was trained on (default: all bands).",
+)
+@click.option(
+    "--label-encoder",
+    default=None,
+    help="Optional pickled LabelEncoder, to report class names next to the majority labels.",
+)
+@click.option(
+    "--early-exit-confidence",
+    type=float,
+    default=None,
+    help="Only label images, stopping once the majority vote is settled at this confidence "
+    "(e.g. 0.99); no label rasters are written.",
+)
+@click.option(
+    "--verify-early-exit",
+    is_flag=True,
+    default=False,
+    help="With --early-exit-confidence, also score every pixel to report agreement with full voting.",
+)
+def main(
+    model_path: str,
+    tile_dir: str,
+    output_dir: str,
+    workers: int,
+    memory_limit_mb: float,
+    predict_batch_size: int,
+    bands: str,
+    label_encoder: str,
+    early_exit_confidence: float,
+    verify_early_exit: bool,
+):
+    """
+    Classify every pixel of a directory of tiles and write per-image label rasters,
+    majority labels and a throughput/memory report.
+    """
+    import pickle
+
+    from model.batch_inference import BatchInference, list_tiles
+
+    logging.basicConfig(level=logging.INFO)
+    class_names = None
+    if label_encoder:
+        with open(label_encoder, "rb") as fid:
+            class_names = [str(name) for name in pickle.load(fid).classes_]
+
+    tiles = list_tiles(tile_dir)
+    if not tiles:
+        raise click.ClickException(f"No .tif/.tiff/.npy tiles found in {tile_dir}")
+
+    band_indices = [int(band) for band in bands.split(",")] if bands else None
+    if early_exit_confidence is not None:
+        from model.early_exit import EarlyExitVoter, write_early_exit_outputs
+
+        voter = EarlyExitVoter.from_path(
+            model_path,
+            num_classes=len(class_names) if class_names else None,
+            predict_batch_size=predict_batch_size,
+            confidence=early_exit_confidence,
+            verify=verify_early_exit,
+        )
+        images, report = voter.classify_tiles(
+            tiles,
+            band_indices,
+            workers=workers,
+            memory_limit_mb=memory_limit_mb,
+            predict_batch_size=predict_batch_size,
+        )
+        write_early_exit_outputs(images, report, output_dir, class_names)
+        print(
+            f"{report['images']} images labelled from {report['pixels_scored']} of {report['pixels_total']} pixels "
+            f"({report['pixels_saved_fraction']:.1%} saved) in {report['seconds']}s"
+            + (f"; {report['agreement_rate']:.2%} agree with full voting" if "agreement_rate" in report else "")
+        )
+        print(f"Outputs written to {output_dir}")
+        return
+
+    inference = BatchInference(
+        model_path,
+        workers=workers,
+        memory_limit_mb=memory_limit_mb,
+        bands=band_indices,
+        predict_batch_size=predict_batch_size,
+        class_names=class_names,
+    )
+    report = inference.run(tiles, output_dir)
+    print(
+        f"{report['pixels']} pixels in {report['seconds']}s "
+        f"({report['pixels_per_second']} pixels/s); peak RSS "
+        f"{report['peak_rss_mb']} MB parent, {report['peak_worker_rss_mb']} MB worker "
+        f"(limit {report['memory_limit_mb']} MB)"
+    )
+    print(f"Outputs written to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,6 @@
 from typing import cast
 
 import click
-from pipelines.deployment_pipeline import (
-    continuous_deployment_pipeline,
-    inference_pipeline,
-)
-from rich import print
-from zenml.integrations.mlflow.mlflow_utils import get_tracking_uri
-from zenml.integrations.mlflow.model_deployers.mlflow_model_deployer import (
-    MLFlowModelDeployer,
-)
-from zenml.integrations.mlflow.services import MLFlowDeploymentService
 
 DEPLOY = "deploy"
 PREDICT = "predict"
@@ -36,6 +26,18 @@ DEPLOY_AND_PREDICT = "deploy_and_predict"
 )
 def main(config: str, min_accuracy: float):
     """Run the MLflow example pipeline."""
+    # Heavy imports are deferred so that `--help` does not load ZenML or the pipelines
+    from pipelines.deployment_pipeline import (
+        continuous_deployment_pipeline,
+        inference_pipeline,
+    )
+    from rich import print
+    from zenml.integrations.mlflow.mlflow_utils import get_tracking_uri
+    from zenml.integrations.mlflow.model_deployers.mlflow_model_deployer import (
+        MLFlowModelDeployer,
+    )
+    from zenml.integrations.mlflow.services import MLFlowDeploymentService
+
     # get the MLflow model deployer stack component
     mlflow_model_deployer_component = MLFlowModelDeployer.get_active_model_deployer()
     deploy = config == DEPLOY or config == DEPLOY_AND_PREDICT
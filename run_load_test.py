@@ -0,0 +1,92 @@
+import json
+import logging
+import sys
+
+import click
+
+
+@click.command()
+@click.option("--url", default="http://127.0.0.1:8000/predict", help="Prediction endpoint to load.")
+@click.option(
+    "--requests-file",
+    default=None,
+    help="JSONL file of recorded prediction payloads to replay (synthetic requests if omitted).",
+)
+@click.option("--synthetic", default=1000, help="Number of synthetic requests to generate.")
+@click.option("--spectra-per-request", default=1, help="Spectra per synthetic request.")
+@click.option(
+    "--n-bands",
+    default=None,
+    type=int,
+    help="Spectrum length of synthetic requests (asked from the server's /health if omitted).",
+)
+@click.option("--mode", type=click.Choice(["closed", "open"]), default="closed", help="Concurrency model.")
+@click.option("--concurrency", default=8, help="Closed-loop concurrent clients.")
+@click.option("--rate", default=100.0, help="Open-loop arrival rate in requests/s.")
+@click.option("--num-requests", default=None, type=int, help="Total requests to send.")
+@click.option("--duration", default=None, type=float, help="Seconds to keep sending.")
+@click.option("--output", default="load_test_report.json", help="Where to write the JSON report.")
+@click.option("--max-p99-ms", default=None, type=float, help="Fail if p99 latency exceeds this.")
+@click.option("--max-error-rate", default=None, type=float, help="Fail if the error rate exceeds this.")
+def main(
+    url: str,
+    requests_file: str,
+    synthetic: int,
+    spectra_per_request: int,
+    n_bands: int,
+    mode: str,
+    concurrency: int,
+    rate: float,
+    num_requests: int,
+    duration: float,
+    output: str,
+    max_p99_ms: float,
+    max_error_rate: float,
+):
+    """
+    Load-test a prediction endpoint (run_server.py or an MLflow deployment) and
+    write throughput, latency percentiles and error rates as JSON.
+    """
+    from urllib.parse import urlsplit
+    from urllib.request import urlopen
+
+    from serving.load_test import LoadTest, check_thresholds, load_recorded_requests, synthetic_requests
+
+    logging.basicConfig(level=logging.INFO)
+    skipped = 0
+    if requests_file:
+        bodies, skipped = load_recorded_requests(requests_file)
+        if not bodies:
+            raise click.ClickException(f"No prediction requests found in {requests_file}")
+    else:
+        if n_bands is None:
+            parts = urlsplit(url)
+            with urlopen(f"{parts.scheme}://{parts.netloc}/health", timeout=10) as response:
+                n_bands = json.loads(response.read()).get("n_bands")
+            if n_bands is None:
+                raise click.ClickException("The server does not report n_bands; pass --n-bands.")
+        bodies = synthetic_requests(synthetic, n_bands, spectra_per_request)
+
+    report = LoadTest(
+        url, bodies, mode=mode, concurrency=concurrency, rate=rate,
+        num_requests=num_requests, duration=duration,
+    ).run()
+    report["skipped_lines"] = skipped
+    failures = check_thresholds(report, max_p99_ms, max_error_rate)
+    report["threshold_failures"] = failures
+    with open(output, "w") as fid:
+        json.dump(report, fid, indent=2)
+
+    latency = report["latency_ms"]
+    print(
+        f"{report['requests']} requests, {report['throughput_rps']} req/s, "
+        f"p50/p95/p99 {latency['p50']}/{latency['p95']}/{latency['p99']} ms, "
+        f"error rate {report['error_rate']:.2%}"
+    )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
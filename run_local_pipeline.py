@@ -0,0 +1,174 @@
+import logging
+
+import click
+
+from pipelines.local_runner import DEFAULT_CACHE_DIR, LocalPipelineRunner, training_pipeline_steps
+
+
+@click.command()
+@click.option(
+    "--data-path",
+    default="./data/samples.csv",
+    help="Path to the samples CSV to train on.",
+)
+@click.option(
+    "--cache-dir",
+    default=DEFAULT_CACHE_DIR,
+    help="Directory holding cached step outputs.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Re-run every step instead of reusing cached outputs.",
+)
+@click.option("--epochs", default=None, type=int, help="Override the number of training epochs.")
+@click.option("--workers", default=4, help="Maximum number of steps run concurrently.")
+@click.option(
+    "--clean-workers",
+    default=1,
+    help="Processes for sharded preprocessing (1 = serial; results are identical).",
+)
+@click.option(
+    "--max-pixels-per-image",
+    default=None,
+    type=int,
+    help="Train each epoch on at most this many freshly drawn pixels per image.",
+)
+@click.option(
+    "--band-dtype",
+    default=None,
+    type=click.Choice(["int16", "float16"]),
+    help="Store band values compactly (decoded to float32 per training/prediction batch).",
+)
+@click.option(
+    "--cascade",
+    default=None,
+    type=click.Choice(["sam", "centroid", "pca_linear"]),
+    help="Also evaluate this classical classifier as a front-end to the CNN.",
+)
+@click.option(
+    "--cascade-threshold",
+    default=0.95,
+    help="Front-end probability above which its label is accepted without the CNN.",
+)
+@click.option(
+    "--calibrate",
+    is_flag=True,
+    default=False,
+    help="Fit a softmax temperature and store calibrated top-k test probabilities.",
+)
+@click.option(
+    "--publish-store",
+    default=None,
+    help="Publish per-image predictions after evaluation to this store URI "
+    "(e.g. sqlite:///.cache/hsi_store.db or mongodb://...).",
+)
+@click.option(
+    "--export-tiles",
+    default=None,
+    help="Export summary tiles of the test pixels for the visualization map to this directory.",
+)
+@click.option(
+    "--positions-path",
+    default=None,
+    help="CSV (Sample_num, longitude, latitude) or polygons JSON locating the images for --export-tiles.",
+)
+@click.option(
+    "--similarity-index",
+    default=None,
+    help="Build a spectral similarity index over the training pixels in this directory.",
+)
+@click.option(
+    "--similarity-level",
+    default="pixel",
+    type=click.Choice(["pixel", "image"]),
+    help="Index every training pixel or the mean spectrum of every training image.",
+)
+@click.option("--report", default=None, help="Optional path for a JSON report of step timings.")
+def main(
+    data_path: str,
+    cache_dir: str,
+    no_cache: bool,
+    epochs: int,
+    workers: int,
+    clean_workers: int,
+    max_pixels_per_image: int,
+    band_dtype: str,
+    cascade: str,
+    cascade_threshold: float,
+    calibrate: bool,
+    publish_store: str,
+    export_tiles: str,
+    positions_path: str,
+    similarity_index: str,
+    similarity_level: str,
+    report: str,
+):
+    """
+    Run the training pipeline (ingest_data -> clean_data -> model_train -> evaluation)
+    locally, without a ZenML stack or MLflow server, caching each step's outputs.
+    """
+    from steps.config import (
+        CalibrationConfig, CascadeConfig, DataCleaningConfig, DataIngestionConfig, ModelNameConfig, PublishConfig,
+        SimilarityIndexConfig, TileExportConfig,
+    )
+
+    logging.basicConfig(level=logging.INFO)
+    overrides = {"epochs": epochs, "max_pixels_per_image": max_pixels_per_image}
+    model_config = ModelNameConfig(**{key: value for key, value in overrides.items() if value is not None})
+    steps = training_pipeline_steps(
+        data_path,
+        model_config=model_config,
+        cleaning_config=DataCleaningConfig(num_workers=clean_workers),
+        ingestion_config=DataIngestionConfig(band_dtype=band_dtype),
+        cascade_config=CascadeConfig(classifier=cascade, threshold=cascade_threshold) if cascade else None,
+        calibration_config=CalibrationConfig() if calibrate else None,
+        publish_config=PublishConfig(store_uri=publish_store) if publish_store else None,
+        export_config=(
+            TileExportConfig(output_dir=export_tiles, positions_path=positions_path) if export_tiles else None
+        ),
+        similarity_config=(
+            SimilarityIndexConfig(output_dir=similarity_index, level=similarity_level) if similarity_index else None
+        ),
+    )
+    for step in steps:
+        step.enable_cache = step.enable_cache and not no_cache
+
+    runner = LocalPipelineRunner(steps, cache_dir=cache_dir, max_workers=workers)
+    results = runner.run()
+
+    print(runner.format_report())
+    print(f"Pixel-level metrics: {results['evaluation']['pixel_metrics']}")
+    print(f"Image-level metrics: {results['evaluation']['image_metrics']}")
+    if cascade:
+        cascade_report = results["cascade_evaluation"]["cascade_report"]
+        print(
+            f"Cascade ({cascade}): {cascade_report['cascade_offload_fraction']:.1%} offloaded, "
+            f"speedup {cascade_report['cascade_speedup'] or float('nan'):.2f}x, "
+            f"pixel accuracy delta {cascade_report['cascade_pixel_accuracy_delta']:+.4f}"
+        )
+    if calibrate:
+        calibration_report = results["calibration"]["calibration_report"]
+        print(
+            f"Calibration: temperature {calibration_report['temperature']:.3f}, "
+            f"ECE {calibration_report['ece_before']:.4f} -> {calibration_report['ece_after']:.4f}, "
+            f"probabilities in {calibration_report['directory']}"
+        )
+    if publish_store:
+        for collection, stats in results["publish"]["publish_stats"].items():
+            print(f"Published {stats['rows']} {collection} ({stats['rows_per_second']:,.0f} rows/s)")
+    if export_tiles:
+        manifest = results["export_tiles"]["tile_manifest"]
+        print(
+            f"Exported summary tiles of {manifest['images']['count']} images to {export_tiles} "
+            f"(zoom levels: {', '.join(manifest['zoom_levels']) or 'none, no positions'})"
+        )
+    if similarity_index:
+        print(f"Spectral similarity index ({similarity_level} level) saved to {similarity_index}")
+    if report:
+        runner.write_report(report)
+
+
+if __name__ == "__main__":
+    main()
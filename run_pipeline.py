@@ -1,6 +1,3 @@
-from pipelines.training_pipeline import train_pipeline
-from zenml.integrations.mlflow.mlflow_utils import get_tracking_uri
-
 def main():
     """
     Main entry point to run the training pipeline. This pipeline will:
@@ -9,21 +6,17 @@ def main():
       3. Train a CNN model.
       4. Evaluate the model with both pixel-level and image-level metrics.
     """
-    # Instantiate the pipeline
-    training_pipeline_instance = train_pipeline()
+    # Imported here so that importing this module stays cheap
+    from pipelines.local_runner import LocalPipelineRunner, training_pipeline_steps
 
-    # The `run()` method is provided by ZenML's `BasePipeline` class.
-    # It executes the pipeline by resolving step dependencies, checking for cached outputs,
-    # and orchestrating step execution while tracking artifacts, logs, and metrics.
-    training_pipeline_instance.run()
+    # Run the steps in-process with cached outputs; no ZenML stack or MLflow
+    # server is needed (see run_local_pipeline.py for the options)
+    runner = LocalPipelineRunner(training_pipeline_steps("./data/samples.csv"))
+    results = runner.run()
 
-    print(
-        "Now run: \n "
-        f"    mlflow ui --backend-store-uri '{get_tracking_uri()}'\n"
-        "to inspect your experiment runs within the MLflow UI.\n"
-        "You can find your runs tracked within the `mlflow_example_pipeline` "
-        "experiment. Here you'll also be able to compare multiple runs."
-    )
+    print(runner.format_report())
+    print(f"Pixel-level metrics: {results['evaluation']['pixel_metrics']}")
+    print(f"Image-level metrics: {results['evaluation']['image_metrics']}")
 
 if __name__ == "__main__":
     main()
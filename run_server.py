@@ -0,0 +1,63 @@
+import logging
+
+import click
+
+
+@click.command()
+@click.option("--model-path", required=True, help="Saved model (.keras/.h5, or a pickled predictor).")
+@click.option("--host", default="127.0.0.1", help="Interface to bind.")
+@click.option("--port", default=8000, help="Port to listen on.")
+@click.option("--max-batch-size", default=1024, help="Maximum spectra scored per micro-batch.")
+@click.option(
+    "--max-latency-ms",
+    default=5.0,
+    help="Longest a request waits for other requests to share its micro-batch.",
+)
+@click.option("--max-queue", default=10000, help="Queued requests before the server answers 503.")
+@click.option("--n-bands", default=None, type=int, help="Spectrum length (read from Keras models if omitted).")
+@click.option(
+    "--label-encoder",
+    default=None,
+    help="Optional pickled LabelEncoder, to return class names with the predictions.",
+)
+def main(
+    model_path: str,
+    host: str,
+    port: int,
+    max_batch_size: int,
+    max_latency_ms: float,
+    max_queue: int,
+    n_bands: int,
+    label_encoder: str,
+):
+    """
+    Serve the trained CNN locally with micro-batching, as a stand-in for the
+    MLflow deployment started by run_deployment.py.
+    """
+    import asyncio
+    import pickle
+
+    from serving.server import PredictionServer
+
+    logging.basicConfig(level=logging.INFO)
+    class_names = None
+    if label_encoder:
+        with open(label_encoder, "rb") as fid:
+            class_names = [str(name) for name in pickle.load(fid).classes_]
+
+    server = PredictionServer.from_path(
+        model_path,
+        class_names=class_names,
+        n_bands=n_bands,
+        max_batch_size=max_batch_size,
+        max_latency_ms=max_latency_ms,
+        max_queue=max_queue,
+    )
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import logging
+import time
+
+import click
+
+
+@click.group()
+def main():
+    """
+    Build and query spectral similarity indexes over the cleaned pixel table,
+    to find pixels or images that look like a suspicious one.
+    """
+    logging.basicConfig(level=logging.INFO)
+
+
+@main.command()
+@click.option("--data-path", default="data/samples.csv", help="Pixel CSV (the data/samples.csv layout).")
+@click.option("--index-dir", default=".cache/spectral_index", help="Where the index is written.")
+@click.option("--level", type=click.Choice(["pixel", "image"]), default="pixel",
+              help="Index every pixel, or the mean spectrum of every image.")
+@click.option("--metric", type=click.Choice(["euclidean", "angle"]), default="euclidean",
+              help="Euclidean distance or spectral angle (SAM).")
+@click.option("--pca", "pca_components", type=float, default=None,
+              help="PCA components (>= 1) or explained variance (< 1); euclidean only.")
+@click.option("--lists", "n_lists", type=int, default=None, help="IVF lists for approximate queries.")
+def build(data_path: str, index_dir: str, level: str, metric: str, pca_components: float, n_lists: int):
+    """Clean the pixel table and index its spectra."""
+    import numpy as np
+
+    from model.data_cleaning import DataCleaning, DataPreprocessStrategy
+    from model.spectral_index import SpectralIndex, image_spectra
+    from steps.ingest_data import IngestData
+
+    raw = IngestData(data_path).get_data()
+    # Preprocessing renumbers the rows; keep the CSV row of every pixel for --row
+    raw["csv_row"] = np.arange(len(raw))
+    data, _ = DataCleaning(raw, DataPreprocessStrategy()).handle_data()
+    frequency_columns = [column for column in data.columns if column.startswith("frq")]
+    x = data[frequency_columns].to_numpy(dtype=np.float32)
+    sample_nums = data["Sample_num"].to_numpy()
+    labels = data["Label"].to_numpy(dtype=str)
+    if pca_components is not None and pca_components >= 1:
+        pca_components = int(pca_components)
+
+    index = SpectralIndex(metric, pca_components, n_lists)
+    if level == "image":
+        keys, spectra, counts = image_spectra(x, sample_nums)
+        first = np.unique(sample_nums, return_index=True)[1]
+        index.build(spectra, sample_num=keys, label=labels[first], pixel_count=counts)
+    else:
+        index.build(x, sample_num=sample_nums, row=data["csv_row"].to_numpy(), label=labels)
+    index.save(index_dir)
+    print(f"Indexed {len(index.vectors)} {level} spectra into {index_dir}")
+
+
+@main.command()
+@click.option("--index-dir", default=".cache/spectral_index", help="Index written by `build`.")
+@click.option("--sample-num", type=int, default=None,
+              help="Query image (its mean spectrum in a pixel index).")
+@click.option("--row", type=int, default=None, help="Query pixel, by its row in the CSV (pixel index only).")
+@click.option("--k", default=10, help="Neighbours to return.")
+@click.option("--n-probe", type=int, default=None, help="IVF lists to search (approximate); default exact.")
+@click.option("--output", default=None, help="Also write the neighbours as CSV.")
+def query(index_dir: str, sample_num: int, row: int, k: int, n_probe: int, output: str):
+    """Print the nearest spectra of an indexed image or pixel."""
+    import numpy as np
+
+    from model.spectral_index import SpectralIndex
+
+    if (sample_num is None) == (row is None):
+        raise click.UsageError("Pass exactly one of --sample-num or --row.")
+    index = SpectralIndex.load(index_dir)
+    if row is not None:
+        if "row" not in index.metadata:
+            raise click.UsageError("--row needs a pixel-level index.")
+        matches = np.flatnonzero(index.metadata["row"] == row)
+    else:
+        matches = np.flatnonzero(index.metadata["sample_num"] == sample_num)
+    if matches.size == 0:
+        raise click.ClickException("The query is not in the index.")
+
+    start = time.perf_counter()
+    queries = np.asarray(index.vectors[np.sort(matches)]).mean(axis=0, keepdims=True)
+    neighbours = index.neighbours(queries, k, n_probe, transformed=True)
+    seconds = time.perf_counter() - start
+    print(neighbours.drop(columns="query").to_string(index=False))
+    print(f"{len(index.vectors)} indexed spectra searched in {seconds * 1000:.1f} ms"
+          f" ({'approximate, ' + str(n_probe) + ' lists' if n_probe else 'exact'})")
+    if output:
+        neighbours.to_csv(output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the batcher's queue is full and a request must be shed."""
+
+
+class MicroBatcher:
+    """
+    Collects concurrent prediction requests into micro-batches.
+
+    The first request of a batch waits at most `max_latency_ms` for company; the
+    batch is dispatched earlier once it holds `max_batch_size` spectra. Batches
+    run one at a time on a dedicated inference thread (so the model stays warm in
+    one place and TensorFlow is never called concurrently), while the next batch
+    keeps filling on the event loop. Under load batches therefore grow towards
+    `max_batch_size` and throughput approaches offline scoring, while queueing
+    delay is bounded by the latency budget plus one batch's compute time.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = 1024,
+        max_latency_ms: float = 5.0,
+        max_queue: int = 10000,
+        latency_window: int = 10000,
+    ) -> None:
+        """
+        Args:
+            predict_fn (Callable): Scores an (n, bands) float32 array, returning (n, ...) outputs.
+            max_batch_size (int): Maximum number of spectra per model call.
+            max_latency_ms (float): Longest the oldest queued request waits before dispatch.
+            max_queue (int): Queued requests beyond this are rejected with QueueFullError.
+            latency_window (int): Number of recent request latencies kept for percentiles.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+        self.counters: Dict[str, float] = {
+            "requests": 0, "rows": 0, "batches": 0, "rejected": 0, "errors": 0, "inference_seconds": 0.0,
+        }
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, x: np.ndarray) -> np.ndarray:
+        """
+        Score one request's spectra as part of the next micro-batch.
+
+        Args:
+            x (np.ndarray): (n, bands) float32 spectra.
+
+        Returns:
+            np.ndarray: Model outputs for those n spectra.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((x, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise QueueFullError(f"Prediction queue is full ({self.max_queue} requests)")
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = batch[0][2] + self.max_latency
+        while rows < self.max_batch_size:
+            # Drain whatever is already queued before waiting for more
+            if self._queue.empty():
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Requests whose client went away are dropped before scoring
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+            sizes = [len(x) for x, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                outputs = await loop.run_in_executor(
+                    self._executor, self.predict_fn, np.concatenate([x for x, _, _ in batch])
+                )
+            except Exception as e:
+                logging.error(f"Micro-batch of {sum(sizes)} spectra failed: {str(e)}")
+                self.counters["errors"] += len(batch)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            self.counters["batches"] += 1
+            self.counters["inference_seconds"] += finished - started
+            offset = 0
+            for (_, future, enqueued), size in zip(batch, sizes):
+                if not future.done():
+                    future.set_result(outputs[offset:offset + size])
+                offset += size
+                self.latencies.append(finished - enqueued)
+            self.counters["requests"] += len(batch)
+            self.counters["rows"] += sum(sizes)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus latency percentiles (seconds) over the recent window."""
+        latencies = np.asarray(self.latencies)
+        percentiles = (
+            dict(zip(("p50", "p95", "p99"), np.percentile(latencies, [50, 95, 99]).tolist()))
+            if latencies.size else {"p50": None, "p95": None, "p99": None}
+        )
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "queue_depth": self.queue_depth,
+            "mean_batch_rows": self.counters["rows"] / batches if batches else 0.0,
+            "latency_seconds": percentiles,
+        }
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+PAYLOAD_KEYS = ("instances", "inputs", "dataframe_split")
+
+
+def load_recorded_requests(path: str) -> Tuple[List[bytes], int]:
+    """
+    Read recorded prediction requests from a JSONL file.
+
+    Each line is either a prediction payload ({"instances": ...}, {"inputs": ...}
+    or {"dataframe_split": ...}) or a wrapper {"payload": {...}}. Lines that are not
+    prediction requests are skipped and counted.
+
+    Args:
+        path (str): JSONL file with one request per line.
+
+    Returns:
+        Tuple[List[bytes], int]: Encoded request bodies and the number of skipped lines.
+    """
+    bodies, skipped = [], 0
+    with open(path) as fid:
+        for line in fid:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if isinstance(record, dict) and isinstance(record.get("payload"), dict):
+                record = record["payload"]
+            if isinstance(record, dict) and any(key in record for key in PAYLOAD_KEYS):
+                bodies.append(json.dumps(record).encode())
+            else:
+                skipped += 1
+    if skipped:
+        logging.warning(f"Skipped {skipped} lines of {path} that are not prediction requests")
+    return bodies, skipped
+
+
+def synthetic_requests(
+    count: int, n_bands: int, spectra_per_request: int = 1, seed: int = 0
+) -> List[bytes]:
+    """
+    Random reflectance-like spectra (smooth, in [0, 1]) packed into request bodies.
+    """
+    rng = np.random.default_rng(seed)
+    bands = np.linspace(0, 1, n_bands, dtype=np.float32)
+    bodies = []
+    for _ in range(count):
+        level = rng.uniform(0.05, 0.6, size=(spectra_per_request, 1))
+        slope = rng.uniform(-0.3, 0.3, size=(spectra_per_request, 1))
+        noise = rng.normal(0, 0.01, size=(spectra_per_request, n_bands))
+        spectra = np.clip(level + slope * bands + noise, 0, 1)
+        bodies.append(json.dumps({"instances": np.round(spectra, 5).tolist()}).encode())
+    return bodies
+
+
+class _Connection:
+    """Minimal keep-alive HTTP/1.1 client connection."""
+
+    def __init__(self, host: str, port: int, path: str) -> None:
+        self.host, self.port, self.path = host, port, path
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def post(self, body: bytes) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            self.writer.write(
+                f"POST {self.path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await self.writer.drain()
+            status = int((await self.reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            await self.reader.readexactly(length)
+            return status
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class LoadTest:
+    """
+    Replays prediction requests against an HTTP endpoint and measures it.
+
+    Closed loop: `concurrency` clients each send their next request as soon as the
+    previous one returns (measures capacity). Open loop: requests arrive as a
+    Poisson process at `rate` per second regardless of how fast the server answers
+    (measures latency at a given load). In open-loop mode latency is measured from
+    the scheduled send time, so queueing in the client counts against the server
+    instead of being hidden (no coordinated omission).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        bodies: List[bytes],
+        mode: str = "closed",
+        concurrency: int = 8,
+        rate: float = 100.0,
+        num_requests: Optional[int] = None,
+        duration: Optional[float] = None,
+        timeout: float = 30.0,
+        max_connections: int = 256,
+        seed: int = 0,
+    ) -> None:
+        """
+        Args:
+            url (str): Prediction endpoint, e.g. http://127.0.0.1:8000/predict.
+            bodies (List[bytes]): Request bodies, replayed in order and cycled.
+            mode (str): "closed" or "open".
+            concurrency (int): Closed-loop clients.
+            rate (float): Open-loop arrival rate (requests/s).
+            num_requests (int, optional): Stop after this many requests.
+            duration (float, optional): Stop sending after this many seconds.
+            timeout (float): Per-request timeout; timeouts count as errors.
+            max_connections (int): Open-loop connection pool limit.
+            seed (int): Seed for the Poisson arrival times.
+        """
+        if mode not in ("closed", "open"):
+            raise ValueError(f"Unknown mode '{mode}', use 'closed' or 'open'.")
+        if not bodies:
+            raise ValueError("No requests to replay.")
+        if num_requests is None and duration is None:
+            num_requests = len(bodies)
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.path = parts.path or "/predict"
+        self.url = url
+        self.bodies = bodies
+        self.mode = mode
+        self.concurrency = concurrency
+        self.rate = rate
+        self.num_requests = num_requests
+        self.duration = duration
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.seed = seed
+        self._latencies: List[float] = []
+        self._statuses: Counter = Counter()
+
+    def _more(self, sent: int, started: float, now: float) -> bool:
+        if self.num_requests is not None and sent >= self.num_requests:
+            return False
+        return self.duration is None or now - started < self.duration
+
+    async def _send(self, connection: _Connection, body: bytes, scheduled: float) -> None:
+        try:
+            status = await asyncio.wait_for(connection.post(body), self.timeout)
+            self._statuses[str(status)] += 1
+            if status == 200:
+                self._latencies.append(time.perf_counter() - scheduled)
+        except asyncio.TimeoutError:
+            connection.close()
+            self._statuses["timeout"] += 1
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            self._statuses["connection_error"] += 1
+
+    async def _closed_loop(self, started: float) -> int:
+        sent = 0
+
+        async def client() -> None:
+            nonlocal sent
+            connection = _Connection(self.host, self.port, self.path)
+            while self._more(sent, started, time.perf_counter()):
+                body = self.bodies[sent % len(self.bodies)]
+                sent += 1
+                await self._send(connection, body, time.perf_counter())
+            connection.close()
+
+        await asyncio.gather(*(client() for _ in range(self.concurrency)))
+        return sent
+
+    async def _open_loop(self, started: float) -> int:
+        rng = np.random.default_rng(self.seed)
+        idle: List[_Connection] = []
+        slots = asyncio.Semaphore(self.max_connections)
+        tasks = []
+        sent = 0
+
+        async def fire(body: bytes, scheduled: float) -> None:
+            async with slots:
+                connection = idle.pop() if idle else _Connection(self.host, self.port, self.path)
+                await self._send(connection, body, scheduled)
+                idle.append(connection)
+
+        next_at = started
+        while self._more(sent, started, next_at):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(self.bodies[sent % len(self.bodies)], next_at)))
+            sent += 1
+            next_at += rng.exponential(1.0 / self.rate)
+        await asyncio.gather(*tasks)
+        for connection in idle:
+            connection.close()
+        return sent
+
+    async def run_async(self) -> Dict[str, Any]:
+        self._latencies, self._statuses = [], Counter()
+        started = time.perf_counter()
+        if self.mode == "closed":
+            sent = await self._closed_loop(started)
+        else:
+            sent = await self._open_loop(started)
+        return self.report(sent, time.perf_counter() - started)
+
+    def run(self) -> Dict[str, Any]:
+        """Run the load test and return its report."""
+        return asyncio.run(self.run_async())
+
+    def report(self, sent: int, elapsed: float) -> Dict[str, Any]:
+        ok = self._statuses.get("200", 0)
+        latencies_ms = np.asarray(self._latencies) * 1000.0
+        latency = {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+        if latencies_ms.size:
+            p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+            latency = {
+                "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+                "max": round(float(latencies_ms.max()), 3), "mean": round(float(latencies_ms.mean()), 3),
+            }
+        return {
+            "url": self.url,
+            "mode": self.mode,
+            "concurrency": self.concurrency if self.mode == "closed" else None,
+            "target_rate": self.rate if self.mode == "open" else None,
+            "requests": sent,
+            "succeeded": ok,
+            "errors": sent - ok,
+            "error_rate": round((sent - ok) / sent, 6) if sent else 0.0,
+            "status_counts": dict(self._statuses),
+            "duration_seconds": round(elapsed, 3),
+            "throughput_rps": round(ok / elapsed, 2) if elapsed > 0 else None,
+            "latency_ms": latency,
+        }
+
+
+def check_thresholds(
+    report: Dict[str, Any], max_p99_ms: Optional[float] = None, max_error_rate: Optional[float] = None
+) -> List[str]:
+    """Human readable threshold violations for a load-test report (empty if it passes)."""
+    failures = []
+    p99 = report["latency_ms"]["p99"]
+    if max_p99_ms is not None and (p99 is None or p99 > max_p99_ms):
+        failures.append(f"p99 latency {p99} ms exceeds {max_p99_ms} ms")
+    if max_error_rate is not None and report["error_rate"] > max_error_rate:
+        failures.append(f"error rate {report['error_rate']:.4f} exceeds {max_error_rate}")
+    return failures
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model.batch_inference import load_predictor, predict_scores
+from serving.batcher import MicroBatcher, QueueFullError
+
+MAX_BODY_BYTES = 64 * 1024 ** 2
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class BadRequest(ValueError):
+    """Malformed prediction payload (answered with HTTP 400)."""
+
+
+def parse_instances(payload: Dict[str, Any], n_bands: Optional[int]) -> np.ndarray:
+    """
+    Spectra from a prediction payload as an (n, bands) float32 array.
+
+    Accepts {"instances": [[...], ...]} / {"inputs": ...} and MLflow's
+    {"dataframe_split": {"columns": [...], "data": [[...]]}} so existing clients
+    of the MLflow deployment keep working.
+    """
+    if "instances" in payload:
+        data = payload["instances"]
+    elif "inputs" in payload:
+        data = payload["inputs"]
+    elif "dataframe_split" in payload:
+        data = payload["dataframe_split"].get("data")
+    else:
+        raise BadRequest("Payload needs 'instances', 'inputs' or 'dataframe_split'.")
+    try:
+        x = np.asarray(data, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise BadRequest(f"Spectra must be numeric: {e}")
+    if x.ndim == 1:
+        x = x[np.newaxis]
+    if x.ndim == 3 and x.shape[2] == 1:  # already in Conv1D layout
+        x = x[..., 0]
+    if x.ndim != 2 or x.shape[0] == 0:
+        raise BadRequest(f"Expected a non-empty list of spectra, got shape {x.shape}.")
+    if n_bands is not None and x.shape[1] != n_bands:
+        raise BadRequest(f"Expected {n_bands} bands per spectrum, got {x.shape[1]}.")
+    if not np.isfinite(x).all():
+        raise BadRequest("Spectra contain NaN or infinite values.")
+    return x
+
+
+class PredictionServer:
+    """
+    Self-contained asyncio HTTP server for a trained CNNModel.
+
+    Endpoints:
+        POST /predict (alias /invocations)  score spectra through the MicroBatcher
+        GET  /health                        readiness and model information
+        GET  /metrics                       Prometheus text: counters, batch size, latency quantiles
+
+    The model is loaded and warmed (one full-size and one single-spectrum forward
+    pass) before the port opens, so the first request does not pay graph tracing.
+    """
+
+    def __init__(
+        self,
+        predictor: Any,
+        class_names: Optional[Sequence[str]] = None,
+        n_bands: Optional[int] = None,
+        max_batch_size: int = 1024,
+        max_latency_ms: float = 5.0,
+        max_queue: int = 10000,
+        predict_batch_size: int = 4096,
+    ) -> None:
+        """
+        Args:
+            predictor (Any): Loaded model (see model.batch_inference.load_predictor).
+            class_names (Sequence[str], optional): Names for the class indices.
+            n_bands (int, optional): Expected spectrum length; read from the Keras
+                input shape when not given.
+            max_batch_size (int): Maximum spectra per micro-batch.
+            max_latency_ms (float): Micro-batching latency budget.
+            max_queue (int): Queued requests before the server sheds load with 503.
+            predict_batch_size (int): Keras forward-pass batch size.
+        """
+        self.predictor = predictor
+        self.class_names = list(class_names) if class_names is not None else None
+        input_shape = getattr(predictor, "input_shape", None)
+        self.n_bands = n_bands or (input_shape[1] if input_shape is not None else None)
+        self.predict_batch_size = predict_batch_size
+        self.batcher = MicroBatcher(
+            self._predict, max_batch_size=max_batch_size, max_latency_ms=max_latency_ms, max_queue=max_queue
+        )
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_path(cls, model_path: str, **kwargs) -> "PredictionServer":
+        return cls(load_predictor(model_path), **kwargs)
+
+    def _predict(self, x: np.ndarray) -> np.ndarray:
+        return predict_scores(self.predictor, x[..., np.newaxis], self.predict_batch_size)
+
+    def warm_up(self) -> None:
+        if self.n_bands is None:
+            logging.warning("Spectrum length unknown; skipping model warm-up.")
+            return
+        start = time.perf_counter()
+        for rows in (self.batcher.max_batch_size, 1):
+            self._predict(np.zeros((rows, self.n_bands), dtype=np.float32))
+        logging.info(f"Model warmed up in {time.perf_counter() - start:.2f}s")
+
+    # -- HTTP -----------------------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        self.warm_up()
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        self.started_at = time.time()
+        logging.info(f"Prediction server listening on http://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        await self.start(host, port)
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def start_background(self, host: str = "127.0.0.1", port: int = 0) -> "PredictionServer":
+        """Run the server on its own event loop thread (used by tests and the load tester)."""
+        ready = threading.Event()
+        errors = []
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start(host, port))
+            except Exception as e:
+                errors.append(e)
+                ready.set()
+                self._loop.close()
+                return
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="prediction-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def shutdown(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, content_type, payload = await self._route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Disconnects, oversized bodies and malformed request lines end the connection
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise ConnectionError("Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?")[0], headers, body
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        if path in ("/predict", "/invocations"):
+            if method != "POST":
+                return self._json(405, {"error": "Use POST"})
+            return await self._handle_predict(body)
+        if path in ("/health", "/ping"):
+            return self._json(200, {
+                "status": "ok",
+                "model": type(self.predictor).__name__,
+                "n_bands": self.n_bands,
+                "classes": self.class_names,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+            })
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4", self.metrics_text().encode()
+        return self._json(404, {"error": f"Unknown path {path}"})
+
+    async def _handle_predict(self, body: bytes) -> Tuple[int, str, bytes]:
+        try:
+            payload = json.loads(body or b"{}")
+            x = parse_instances(payload, self.n_bands)
+        except (BadRequest, json.JSONDecodeError, AttributeError, TypeError) as e:
+            return self._json(400, {"error": str(e)})
+        try:
+            outputs = await self.batcher.submit(x)
+        except QueueFullError as e:
+            return self._json(503, {"error": str(e)})
+        except Exception as e:
+            return self._json(500, {"error": str(e)})
+
+        labels = outputs.argmax(axis=1) if outputs.ndim == 2 else outputs.reshape(-1)
+        response: Dict[str, Any] = {"predictions": labels.astype(int).tolist()}
+        if self.class_names is not None:
+            response["labels"] = [self.class_names[label] for label in response["predictions"]]
+        if payload.get("return_probabilities") and outputs.ndim == 2:
+            response["probabilities"] = np.round(outputs, 6).tolist()
+        return self._json(200, response)
+
+    @staticmethod
+    def _json(status: int, body: Dict[str, Any]) -> Tuple[int, str, bytes]:
+        return status, "application/json", json.dumps(body).encode()
+
+    def metrics_text(self) -> str:
+        """Batcher counters and latency quantiles in the Prometheus text format."""
+        stats = self.batcher.stats()
+        lines = []
+        for name in ("requests", "rows", "batches", "rejected", "errors"):
+            lines.append(f"# TYPE hsi_{name}_total counter")
+            lines.append(f"hsi_{name}_total {int(stats[name])}")
+        lines += [
+            "# TYPE hsi_inference_seconds_total counter",
+            f"hsi_inference_seconds_total {stats['inference_seconds']:.6f}",
+            "# TYPE hsi_queue_depth gauge",
+            f"hsi_queue_depth {stats['queue_depth']}",
+            "# TYPE hsi_mean_batch_rows gauge",
+            f"hsi_mean_batch_rows {stats['mean_batch_rows']:.3f}",
+            "# TYPE hsi_request_latency_seconds summary",
+        ]
+        for key, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+            value = stats["latency_seconds"][key]
+            lines.append(
+                f'hsi_request_latency_seconds{{quantile="{quantile}"}} {"NaN" if value is None else f"{value:.6f}"}'
+            )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,138 @@
+import logging
+import os
+from typing import Any, Dict
+
+import numpy as np
+from typing_extensions import Annotated
+
+from model.calibration import (
+    TemperatureScaler,
+    TopKProbabilities,
+    expected_calibration_error,
+    held_out_images,
+    negative_log_likelihood,
+)
+from model.compact import BandArray, load_bands
+from model.prediction_cache import PredictionCache, cached_predict
+from .config import CalibrationConfig
+from .instrumentation import instrumented
+from .tracking import experiment_tracker_name
+
+
+@instrumented("calibration")
+def calibrate(
+    model: Any,
+    x_test: BandArray,
+    y_test: np.ndarray,
+    test_sample_nums: np.ndarray,
+    config: CalibrationConfig = CalibrationConfig()
+) -> Dict[str, Any]:
+    """
+    Fit a softmax temperature on held-out test images and store the calibrated
+    top-k probabilities of every test pixel (model.calibration.TopKProbabilities),
+    so confidence filtering, voting and review selection never rerun the model.
+
+    The raw softmax outputs come from the prediction cache shared with
+    evaluation. Images are split into a calibration half, on which the
+    temperature is fitted, and the rest, on which NLL and expected calibration
+    error are reported before and after scaling.
+
+    Args:
+        model (Model): Trained Keras model.
+        x_test (np.ndarray): Test features.
+        y_test (np.ndarray): One-hot encoded test labels.
+        test_sample_nums (np.ndarray): Sample_num of every test pixel.
+        config (CalibrationConfig): Output directory, k, held-out fraction and
+            the prediction cache directory (None disables it) and size cap.
+
+    Returns:
+        dict: "temperature", "directory" of the stored probabilities (with
+        the pixels' sample_nums.npy next to them), their
+        "bytes", and NLL/ECE before and after calibration on the images not
+        used for fitting.
+    """
+    try:
+        logging.info("Calibrating softmax outputs...")
+        x_test = load_bands(x_test)
+        probabilities = cached_predict(
+            model, x_test, cache_dir=config.prediction_cache_dir, max_bytes=config.prediction_cache_max_bytes
+        )
+        y_true = np.argmax(y_test, axis=1)
+
+        fit_rows = held_out_images(test_sample_nums, config.holdout_fraction, config.seed)
+        scaler = TemperatureScaler().fit(probabilities[fit_rows], y_true[fit_rows])
+        calibrated = scaler.transform(probabilities)
+
+        # Check on the images the temperature was not fitted on (all of them if none remain)
+        check_rows = ~fit_rows if (~fit_rows).any() else fit_rows
+        report: Dict[str, Any] = {
+            "temperature": scaler.temperature,
+            "nll_before": negative_log_likelihood(probabilities[check_rows], y_true[check_rows]),
+            "nll_after": negative_log_likelihood(calibrated[check_rows], y_true[check_rows]),
+            "ece_before": expected_calibration_error(probabilities[check_rows], y_true[check_rows]),
+            "ece_after": expected_calibration_error(calibrated[check_rows], y_true[check_rows]),
+        }
+
+        top_k = TopKProbabilities.from_probabilities(calibrated, config.top_k, scaler.temperature)
+        directory = os.path.join(config.output_dir, PredictionCache.make_key(model, x_test))
+        top_k.save(directory)
+        np.save(os.path.join(directory, "sample_nums.npy"), np.asarray(test_sample_nums))
+        report.update(directory=directory, bytes=top_k.nbytes)
+        logging.info(
+            f"Temperature {scaler.temperature:.3f}: ECE {report['ece_before']:.4f} -> {report['ece_after']:.4f}, "
+            f"NLL {report['nll_before']:.4f} -> {report['nll_after']:.4f}; top-{top_k.k} probabilities "
+            f"({top_k.nbytes / 1e6:.1f} MB) stored in {directory}"
+        )
+
+        try:
+            import mlflow
+
+            mlflow.log_metrics({f"calibration_{name}": float(report[name]) for name in (
+                "temperature", "nll_before", "nll_after", "ece_before", "ece_after"
+            )})
+        except ImportError:
+            logging.info("MLflow not installed; calibration results are only logged.")
+        return report
+    except Exception as e:
+        logging.error(f"Error during calibration: {str(e)}")
+        raise e
+
+
+def _build_calibration_step():
+    from zenml import step
+    from tensorflow.keras.models import Model
+
+    @step(enable_cache=False, experiment_tracker=experiment_tracker_name())
+    def calibration(
+        model: Model,
+        x_test: BandArray,
+        y_test: np.ndarray,
+        test_sample_nums: np.ndarray,
+        config: CalibrationConfig = CalibrationConfig()
+    ) -> Annotated[Dict[str, Any], "Calibration report"]:
+        """
+        ZenML step wrapping `calibrate`. Never cached, since its output is the
+        probability files written under config.output_dir.
+
+        Args:
+            model (Model): Trained Keras model.
+            x_test (np.ndarray): Test features.
+            y_test (np.ndarray): One-hot encoded test labels.
+            test_sample_nums (np.ndarray): Sample_num of every test pixel.
+            config (CalibrationConfig): Calibration and storage options.
+
+        Returns:
+            dict: The calibration report (see `calibrate`).
+        """
+        return calibrate(model, x_test, y_test, test_sample_nums, config)
+
+    return calibration
+
+
+def __getattr__(name):
+    # The ZenML step is built on first access so that importing this module
+    # does not load ZenML or TensorFlow.
+    if name == "calibration":
+        globals()[name] = _build_calibration_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,26 +2,21 @@ import logging
 from typing import Tuple
 import pandas as pd
 import numpy as np
-from zenml import step
 from typing_extensions import Annotated
-from sklearn.preprocessing import LabelEncoder
 
+from model.compact import BandArray
 from model.data_cleaning import (
     DataCleaning,
     DataPreprocessStrategy,
-    DataDivideStrategy
+    DataDivideStrategy,
+    ShardedPreprocessStrategy
 )
+from .config import DataCleaningConfig
+from .instrumentation import instrumented
 
-@step(enable_cache=True)  
-def clean_data(
-    data: pd.DataFrame,
-) -> Tuple[
-    Annotated[np.ndarray, "X_train"],
-    Annotated[np.ndarray, "X_test"],
-    Annotated[np.ndarray, "y_train"],
-    Annotated[np.ndarray, "y_test"],
-    Annotated[LabelEncoder, "LabelEncoder"]
-]:
+
+@instrumented("clean_data")
+def clean(data: pd.DataFrame, config: DataCleaningConfig = DataCleaningConfig()) -> Tuple:
     """
     Preprocesses and cleans the input data, then divides it into training 
     and testing datasets using strategy classes from model.data_cleaning.
@@ -32,6 +27,8 @@ def clean_data(
 
     Args:
         data (pd.DataFrame): The raw data to be cleaned and split.
+        config (DataCleaningConfig): With num_workers > 1, preprocessing runs
+            sharded by Sample_num across a process pool (identical result).
 
     Returns:
         Tuple:
@@ -40,22 +37,77 @@ def clean_data(
             - y_train (np.ndarray): One-hot encoded training labels.
             - y_test (np.ndarray): One-hot encoded testing labels.
             - label_encoder (LabelEncoder): For decoding predicted labels.
+            - train_sample_nums (np.ndarray): Sample_num of every training pixel.
+            - test_sample_nums (np.ndarray): Sample_num of every testing pixel,
+              used for image-level metrics.
     """
     try:
         logging.info("Initializing data preprocessing strategy...")
-        preprocess_strategy = DataPreprocessStrategy()
+        if config.num_workers > 1:
+            preprocess_strategy = ShardedPreprocessStrategy(
+                num_workers=config.num_workers, shards_per_worker=config.shards_per_worker
+            )
+        else:
+            preprocess_strategy = DataPreprocessStrategy()
         data_cleaning_preprocess = DataCleaning(data, preprocess_strategy)
         preprocessed_data, label_encoder = data_cleaning_preprocess.handle_data()
 
         logging.info("Preprocessing completed successfully.")
         logging.info("Initializing data division strategy...")
-        divide_strategy = DataDivideStrategy()
+        divide_strategy = DataDivideStrategy(return_sample_nums=True)
         data_cleaning_divide = DataCleaning(preprocessed_data, divide_strategy)
-        X_train, X_test, y_train, y_test = data_cleaning_divide.handle_data()
+        (
+            X_train, X_test, y_train, y_test, train_sample_nums, test_sample_nums
+        ) = data_cleaning_divide.handle_data()
 
         logging.info("Data division into train and test sets completed successfully.")
-        return X_train, X_test, y_train, y_test, label_encoder
+        return (
+            X_train, X_test, y_train, y_test, label_encoder,
+            train_sample_nums, test_sample_nums
+        )
 
     except Exception as e:
         logging.error(f"Error during data cleaning and division: {str(e)}")
         raise e
+
+
+def _build_clean_data_step():
+    from zenml import step
+    from sklearn.preprocessing import LabelEncoder
+
+    @step(enable_cache=True)
+    def clean_data(
+        data: pd.DataFrame,
+        config: DataCleaningConfig = DataCleaningConfig(),
+    ) -> Tuple[
+        Annotated[BandArray, "X_train"],
+        Annotated[BandArray, "X_test"],
+        Annotated[np.ndarray, "y_train"],
+        Annotated[np.ndarray, "y_test"],
+        Annotated[LabelEncoder, "LabelEncoder"],
+        Annotated[np.ndarray, "train_sample_nums"],
+        Annotated[np.ndarray, "test_sample_nums"]
+    ]:
+        """
+        ZenML step wrapping `clean`: preprocesses, splits and reshapes the data.
+
+        Args:
+            data (pd.DataFrame): The raw data to be cleaned and split.
+            config (DataCleaningConfig): Serial or sharded preprocessing.
+
+        Returns:
+            Tuple: X_train, X_test, y_train, y_test, label_encoder,
+            train_sample_nums, test_sample_nums (see `clean`).
+        """
+        return clean(data, config)
+
+    return clean_data
+
+
+def __getattr__(name):
+    # The ZenML step is built on first access so that importing this module
+    # does not load ZenML.
+    if name == "clean_data":
+        globals()[name] = _build_clean_data_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,27 @@
-from zenml.config.strict_base_model import StrictBaseModel
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class StrictBaseModel(BaseModel):
+    """
+    Config base rejecting unknown fields, equivalent to ZenML's StrictBaseModel
+    but importable without loading ZenML.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+
+class DataIngestionConfig(StrictBaseModel):
+    """Data Ingestion Configurations"""
+    band_dtype: Optional[str] = None
+    band_scale: Optional[float] = None
+    band_offset: float = 0.0
+    chunksize: int = 100_000
+
+class DataCleaningConfig(StrictBaseModel):
+    """Data Cleaning Configurations"""
+    num_workers: int = 1
+    shards_per_worker: int = 4
 
 class ModelNameConfig(StrictBaseModel):
     """Model Configurations"""
@@ -6,4 +29,70 @@ class ModelNameConfig(StrictBaseModel):
     fine_tuning: bool = False
     checkpoint_path: str = "1D_model_checkpoint.weights.h5"
     epochs: int = 10
-    batch_size: int = 32
\ No newline at end of file
+    batch_size: int = 32
+    max_pixels_per_image: Optional[int] = None
+    max_pixels_per_class: Optional[int] = None
+    balance_classes: bool = False
+    sampler_seed: int = 0
+
+class EvaluationConfig(StrictBaseModel):
+    """Evaluation Configurations"""
+    bootstrap_replicates: int = 0
+    confidence_level: float = 0.95
+    bootstrap_seed: int = 42
+    prediction_cache_dir: Optional[str] = ".cache/predictions"
+    prediction_cache_max_bytes: int = 2 * 1024 ** 3
+
+class CascadeConfig(StrictBaseModel):
+    """Classical Front-End Cascade Configurations"""
+    classifier: str = "centroid"
+    threshold: float = 0.95
+    sweep_thresholds: List[float] = [0.5, 0.8, 0.9, 0.95, 0.99]
+    max_fit_rows: int = 200_000
+    timing_rows: int = 16384
+    prediction_cache_dir: Optional[str] = ".cache/predictions"
+    prediction_cache_max_bytes: int = 2 * 1024 ** 3
+    seed: int = 0
+
+class CalibrationConfig(StrictBaseModel):
+    """Probability Calibration Configurations"""
+    output_dir: str = ".cache/calibrated"
+    top_k: int = 3
+    holdout_fraction: float = 0.5
+    seed: int = 42
+    prediction_cache_dir: Optional[str] = ".cache/predictions"
+    prediction_cache_max_bytes: int = 2 * 1024 ** 3
+
+class TileExportConfig(StrictBaseModel):
+    """Summary Tile Export Configurations"""
+    output_dir: str = "tiles"
+    positions_path: Optional[str] = None
+    zoom_levels: List[int] = [6, 8, 10, 12]
+    hex_pixels: float = 24.0
+    quantiles: List[float] = [0.1, 0.5, 0.9]
+    spectrum_dtype: str = "float16"
+    prediction_cache_dir: Optional[str] = ".cache/predictions"
+    prediction_cache_max_bytes: int = 2 * 1024 ** 3
+
+class PublishConfig(StrictBaseModel):
+    """Prediction Publishing Configurations"""
+    store_uri: str = "sqlite:///.cache/hsi_store.db"
+    database: str = "hsi"
+    batch_size: int = 1000
+    polygons_path: Optional[str] = None
+    prediction_cache_dir: Optional[str] = ".cache/predictions"
+    prediction_cache_max_bytes: int = 2 * 1024 ** 3
+
+class SimilarityIndexConfig(StrictBaseModel):
+    """Spectral Similarity Index Configurations"""
+    output_dir: str = ".cache/spectral_index"
+    level: str = "pixel"
+    metric: str = "euclidean"
+    pca_components: Optional[float] = None
+    n_lists: Optional[int] = None
+
+class CrossValidationConfig(StrictBaseModel):
+    """Cross-Validation Configurations"""
+    n_folds: int = 5
+    num_workers: int = 1
+    seed: int = 42
@@ -0,0 +1,113 @@
+import logging
+import os
+from typing import Any, Dict
+
+import pandas as pd
+from typing_extensions import Annotated
+
+from model.compact import frequency_bands
+from model.cross_validation import CNNFoldTrainer, CrossValidation
+from model.data_cleaning import DataCleaning, DataPreprocessStrategy
+from .config import CrossValidationConfig, ModelNameConfig
+from .instrumentation import instrumented
+from .tracking import experiment_tracker_name
+
+FOLD_LOG_KEYS = ("pixel_accuracy", "pixel_f1", "image_accuracy", "image_f1",
+                 "load_seconds", "fit_predict_seconds")
+
+
+def log_cross_validation(summary: Dict[str, Any]) -> None:
+    """
+    Log per-fold results and timings (as steps of cv_* metrics) and the pooled
+    and mean/std metrics to the active MLflow run; skipped without MLflow.
+    """
+    try:
+        import mlflow
+    except ImportError:
+        logging.info("MLflow not installed; cross-validation results are only logged.")
+        return
+    for fold in summary["folds"]:
+        mlflow.log_metrics(
+            {f"cv_fold_{key}": fold[key] for key in FOLD_LOG_KEYS if key in fold}, step=fold["fold"]
+        )
+    mlflow.log_metrics({f"cv_{name}": value for name, value in summary["pixel_metrics"].items()})
+    mlflow.log_metrics({f"cv_{name}": value for name, value in summary["image_metrics"].items()})
+    mlflow.log_metrics({f"cv_mean_{name}": value for name, value in summary["mean"].items()})
+    mlflow.log_metrics({f"cv_std_{name}": value for name, value in summary["std"].items()})
+    mlflow.log_metric("cv_seconds", summary["seconds"])
+
+
+@instrumented("cross_validation")
+def cross_validate(
+    data: pd.DataFrame,
+    config: CrossValidationConfig = CrossValidationConfig(),
+    model_config: ModelNameConfig = ModelNameConfig()
+) -> Dict[str, Any]:
+    """
+    Stratified group k-fold cross-validation of the CNN, folds split by Sample_num
+    and trained concurrently in worker processes sharing one memory-mapped copy
+    of the band matrix (see model.cross_validation.CrossValidation).
+
+    Args:
+        data (pd.DataFrame): Raw samples, as returned by ingest_data.
+        config (CrossValidationConfig): Folds, worker processes and seed.
+        model_config (ModelNameConfig): Epochs, batch size and pixel budget per fold.
+
+    Returns:
+        dict: Per-fold, pooled and mean/std metrics (see CrossValidation.run).
+    """
+    try:
+        logging.info("Preparing data for cross-validation...")
+        preprocessed, label_encoder = DataCleaning(data, DataPreprocessStrategy()).handle_data()
+
+        trainer = CNNFoldTrainer(
+            epochs=model_config.epochs,
+            batch_size=model_config.batch_size,
+            max_pixels_per_image=model_config.max_pixels_per_image,
+            threads_per_worker=max(1, (os.cpu_count() or 1) // config.num_workers)
+        )
+        summary = CrossValidation(trainer, config.n_folds, config.num_workers, config.seed).run(
+            frequency_bands(preprocessed),
+            preprocessed['Label_Encoded'].to_numpy(),
+            preprocessed['Sample_num'].to_numpy(),
+            num_classes=len(label_encoder.classes_)
+        )
+        log_cross_validation(summary)
+        return summary
+    except Exception as e:
+        logging.error(f"Error during cross-validation: {str(e)}")
+        raise e
+
+
+def _build_cross_validation_step():
+    from zenml import step
+
+    @step(enable_cache=True, experiment_tracker=experiment_tracker_name())
+    def cross_validation(
+        data: pd.DataFrame,
+        config: CrossValidationConfig = CrossValidationConfig(),
+        model_config: ModelNameConfig = ModelNameConfig()
+    ) -> Annotated[Dict[str, Any], "Cross-validation results"]:
+        """
+        ZenML step wrapping `cross_validate`.
+
+        Args:
+            data (pd.DataFrame): Raw samples, as returned by ingest_data.
+            config (CrossValidationConfig): Folds, worker processes and seed.
+            model_config (ModelNameConfig): Training options per fold.
+
+        Returns:
+            dict: Per-fold, pooled and mean/std metrics.
+        """
+        return cross_validate(data, config, model_config)
+
+    return cross_validation
+
+
+def __getattr__(name):
+    # The ZenML step (and with it the stack's experiment tracker) is only
+    # loaded on first access.
+    if name == "cross_validation":
+        globals()[name] = _build_cross_validation_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,148 +1,375 @@
 import logging
-import mlflow
-from zenml import step
-from zenml.client import Client
-from typing import Tuple, Dict
+import threading
+import time
+from typing import Any, Optional, Tuple, Dict
 
 import numpy as np
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, f1_score, confusion_matrix
 from typing_extensions import Annotated
-from tensorflow.keras.models import Model
 
-experiment_tracker = Client().active_stack.experiment_tracker
+from model.compact import BandArray, load_bands, predict_batches
+from model.evaluation import ConfusionAccumulator, bootstrap_confidence_intervals
+from model.prediction_cache import cached_predict
+from model.spectral_classifiers import CascadeClassifier, get_spectral_classifier, threshold_tradeoff
+from .config import CascadeConfig, EvaluationConfig
+from .instrumentation import instrumented
+from .tracking import experiment_tracker_name
 
-@step(enable_cache=True, experiment_tracker=experiment_tracker.name)
-def evaluation(
-    model: Model,
-    x_test: np.ndarray,
+# pyplot keeps global state; steps run in threads under the local runner
+_PLOT_LOCK = threading.Lock()
+
+
+def log_confusion_matrix(cm: np.ndarray, class_names, title: str, artifact_file: str) -> None:
+    """
+    Plot a confusion matrix heatmap and log it to the active MLflow run.
+
+    Args:
+        cm (np.ndarray): Confusion matrix, rows are true labels.
+        class_names: Tick labels for both axes.
+        title (str): Plot title.
+        artifact_file (str): File name of the logged figure.
+    """
+    import matplotlib.pyplot as plt
+    import mlflow
+    import seaborn as sns
+
+    with _PLOT_LOCK:
+        figure = plt.figure(figsize=(10, 8))
+        sns.heatmap(
+            cm, annot=True, fmt="d", cmap="Blues",
+            xticklabels=class_names,
+            yticklabels=class_names
+        )
+        plt.title(title)
+        plt.xlabel("Predicted")
+        plt.ylabel("True")
+        plt.tight_layout()
+        mlflow.log_figure(figure, artifact_file)
+        plt.close(figure)
+
+
+def log_evaluation(
+    pixel_metrics: Dict[str, float],
+    image_metrics: Dict[str, float],
+    accumulator: ConfusionAccumulator,
+    class_names
+) -> None:
+    """
+    Log the metrics and both confusion matrices to the active MLflow run;
+    skipped without MLflow.
+    """
+    try:
+        import mlflow
+    except ImportError:
+        logging.info("MLflow not installed; evaluation metrics are only logged.")
+        return
+    mlflow.log_metrics({**pixel_metrics, **image_metrics})
+    log_confusion_matrix(
+        accumulator.pixel_confusion_matrix,
+        class_names,
+        "Pixel-Level Confusion Matrix",
+        "pixel_confusion_matrix.png"
+    )
+    log_confusion_matrix(
+        accumulator.image_confusion_matrix,
+        class_names,
+        "Image-Level Confusion Matrix",
+        "image_confusion_matrix.png"
+    )
+
+
+@instrumented("evaluation")
+def evaluate(
+    model: Any,
+    x_test: BandArray,
     y_test: np.ndarray,
-    label_encoder: LabelEncoder
-) -> Tuple[
-    Annotated[Dict[str, float], "Pixel-level metrics"],
-    Annotated[Dict[str, float], "Image-level metrics"]
-]:
+    label_encoder: Any,
+    test_sample_nums: Optional[np.ndarray] = None,
+    config: EvaluationConfig = EvaluationConfig()
+) -> Tuple[Dict[str, float], Dict[str, float]]:
     """
     Evaluate the model's performance at both pixel-level and image-level.
 
-    With caching enabled, if model, x_test, y_test remain unchanged,
-    ZenML will skip re-running. However, typically the model artifact
-    changes if training changes.
-
-    Logs confusion matrices and accuracy/F1 metrics to MLflow.
+    All metrics are derived from one set of integer confusion counts
+    (see model.evaluation.ConfusionAccumulator). Logs confusion matrices
+    and accuracy/F1 metrics to MLflow when it is installed.
 
     Args:
         model (Model): Trained Keras model for evaluation.
         x_test (np.ndarray): Test features.
         y_test (np.ndarray): One-hot encoded test labels.
         label_encoder (LabelEncoder): For inverse-transforming label indices.
+        test_sample_nums (np.ndarray, optional): Sample_num of every test pixel.
+            Image-level metrics use a majority vote per image; without it every
+            pixel is treated as its own image.
+        config (EvaluationConfig): Evaluation options. With bootstrap_replicates > 0
+            (and test_sample_nums given), percentile confidence intervals from
+            resampling test images are added as "<metric>_ci_lower/_ci_upper".
+            Predictions are cached under prediction_cache_dir (None disables it).
 
     Returns:
         (dict, dict): A tuple of two dictionaries:
           - Pixel-level metrics (accuracy, f1, etc.)
-          - Image-level metrics (accuracy, etc.)
+          - Image-level metrics (accuracy, f1, etc.)
     """
     try:
         logging.info("Starting model evaluation...")
+        x_test = load_bands(x_test)
 
         # Decode true labels from one-hot encoding
         y_true_int = np.argmax(y_test, axis=1)
 
-        # Model predictions
-        y_pred_probs = model.predict(x_test, verbose=0)
+        # Model predictions (reused from the prediction cache when the model
+        # weights and x_test are unchanged)
+        y_pred_probs = cached_predict(
+            model,
+            x_test,
+            cache_dir=config.prediction_cache_dir,
+            max_bytes=config.prediction_cache_max_bytes
+        )
         y_pred_int = np.argmax(y_pred_probs, axis=1)
 
-        # Convert integer labels back to class names
-        y_true_labels = label_encoder.inverse_transform(y_true_int)
-        y_pred_labels = label_encoder.inverse_transform(y_pred_int)
+        # One bincount over (image, true, predicted) drives every metric below
+        accumulator = ConfusionAccumulator(len(label_encoder.classes_))
+        accumulator.update(y_true_int, y_pred_int, test_sample_nums)
 
         # -----------------------
         # Pixel-level Metrics
         # -----------------------
-        pixel_accuracy = accuracy_score(y_true_labels, y_pred_labels)
-        pixel_f1 = f1_score(y_true_labels, y_pred_labels, average="weighted")
-
-        mlflow.log_metric("pixel_accuracy", pixel_accuracy)
-        mlflow.log_metric("pixel_f1", pixel_f1)
-
-        # Pixel-level Confusion Matrix
-        pixel_cm = confusion_matrix(y_true_labels, y_pred_labels)
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(
-            pixel_cm, annot=True, fmt="d", cmap="Blues",
-            xticklabels=label_encoder.classes_,
-            yticklabels=label_encoder.classes_
-        )
-        plt.title("Pixel-Level Confusion Matrix")
-        plt.xlabel("Predicted")
-        plt.ylabel("True")
-        plt.tight_layout()
-        mlflow.log_figure(plt.gcf(), "pixel_confusion_matrix.png")
-        plt.close()
-
-        pixel_metrics = {
-            "pixel_accuracy": pixel_accuracy,
-            "pixel_f1": pixel_f1
-        }
+        pixel_metrics = accumulator.pixel_metrics()
 
         # -----------------------
         # Image-level Metrics
         # -----------------------
-        test_df = pd.DataFrame({
-            "Sample_num": np.arange(len(y_true_labels)),  
-            "Label": y_true_labels,
-            "Predicted_Pixel_Label": y_pred_int
-        })
-
-        # Majority vote across each Sample_num
-        image_predictions = (
-            test_df.groupby("Sample_num")["Predicted_Pixel_Label"]
-            .apply(lambda x: np.bincount(x).argmax())
-            .reset_index()
-            .rename(columns={"Predicted_Pixel_Label": "Predicted_Image_Label"})
-        )
+        image_metrics = accumulator.image_metrics()
 
-        # Merge ground truth labels
-        image_predictions["Label"] = y_true_labels[:len(image_predictions)]
-        image_predictions["Encoded_Label"] = label_encoder.transform(image_predictions["Label"])
-        image_predictions["Encoded_Predicted_Label"] = image_predictions["Predicted_Image_Label"]
+        # -----------------------
+        # Bootstrap Confidence Intervals
+        # -----------------------
+        if config.bootstrap_replicates > 0:
+            if test_sample_nums is None:
+                logging.warning(
+                    "Skipping bootstrap confidence intervals: test_sample_nums not provided."
+                )
+            else:
+                intervals = bootstrap_confidence_intervals(
+                    accumulator,
+                    n_replicates=config.bootstrap_replicates,
+                    confidence_level=config.confidence_level,
+                    seed=config.bootstrap_seed
+                )
+                for name, (lower, upper) in intervals.items():
+                    metrics = pixel_metrics if name.startswith("pixel_") else image_metrics
+                    metrics[f"{name}_ci_lower"] = lower
+                    metrics[f"{name}_ci_upper"] = upper
+                logging.info(
+                    f"{config.confidence_level:.0%} bootstrap intervals over "
+                    f"{accumulator.sample_nums.size} test images "
+                    f"({config.bootstrap_replicates} replicates): {intervals}"
+                )
+
+        log_evaluation(pixel_metrics, image_metrics, accumulator, label_encoder.classes_)
+        logging.info(f"Pixel-level metrics: {pixel_metrics}")
+        logging.info(f"Image-level metrics: {image_metrics}")
+        logging.info("Model evaluation completed successfully.")
+        return pixel_metrics, image_metrics
+
+    except Exception as e:
+        logging.error(f"Error during model evaluation: {str(e)}")
+        raise e
 
-        # Image-level Accuracy
-        image_accuracy = accuracy_score(
-            image_predictions["Encoded_Label"],
-            image_predictions["Encoded_Predicted_Label"]
+
+@instrumented("cascade_evaluation")
+def evaluate_cascade(
+    model: Any,
+    x_train: BandArray,
+    y_train: np.ndarray,
+    x_test: BandArray,
+    y_test: np.ndarray,
+    test_sample_nums: Optional[np.ndarray] = None,
+    config: CascadeConfig = CascadeConfig()
+) -> Dict[str, Any]:
+    """
+    Evaluate a classical front-end (model.spectral_classifiers) cascaded with
+    the CNN: confident front predictions are accepted and only the uncertain
+    pixels are scored by the CNN.
+
+    Args:
+        model (Model): Trained Keras model.
+        x_train (np.ndarray): Training features, used to fit the front classifier.
+        y_train (np.ndarray): One-hot encoded training labels.
+        x_test (np.ndarray): Test features.
+        y_test (np.ndarray): One-hot encoded test labels.
+        test_sample_nums (np.ndarray, optional): Sample_num of every test pixel.
+        config (CascadeConfig): Front classifier, confidence threshold, the
+            thresholds of the trade-off sweep and the prediction cache directory
+            and size cap.
+
+    Returns:
+        dict: Offload fraction, estimated speedup, cascade and CNN-only
+        pixel/image metrics, their accuracy differences and the threshold sweep.
+    """
+    try:
+        logging.info(f"Evaluating the {config.classifier} + CNN cascade...")
+        x_train, x_test = load_bands(x_train), load_bands(x_test)
+        y_train_int, y_true_int = np.argmax(y_train, axis=1), np.argmax(y_test, axis=1)
+        num_classes = y_test.shape[1]
+
+        rows = np.arange(len(x_train))
+        if len(rows) > config.max_fit_rows:
+            rows = np.sort(np.random.default_rng(config.seed).choice(rows, config.max_fit_rows, replace=False))
+        start = time.perf_counter()
+        front = get_spectral_classifier(config.classifier).fit(x_train[rows], y_train_int[rows], num_classes)
+        fit_seconds = time.perf_counter() - start
+
+        def model_predict(x):
+            return predict_batches(model, x, batch_size=4096, verbose=0)
+
+        # CNN time per pixel on a fixed sample, the reference for the speedup. A
+        # warm-up call first, so predict-function tracing and setup are not timed
+        model_predict(x_test[:min(len(x_test), 256)])
+        timing_rows = slice(0, min(len(x_test), config.timing_rows))
+        start = time.perf_counter()
+        model_predict(x_test[timing_rows])
+        model_seconds_per_pixel = (time.perf_counter() - start) / max(timing_rows.stop, 1)
+
+        cascade = CascadeClassifier(front, model_predict, config.threshold)
+        result = cascade.predict(x_test)
+        model_labels = np.argmax(
+            cached_predict(
+                model,
+                x_test,
+                cache_dir=config.prediction_cache_dir,
+                max_bytes=config.prediction_cache_max_bytes
+            ),
+            axis=1
         )
-        mlflow.log_metric("image_accuracy", image_accuracy)
 
-        # Image-level Confusion Matrix
-        image_cm = confusion_matrix(
-            image_predictions["Encoded_Label"],
-            image_predictions["Encoded_Predicted_Label"]
+        cascade_accumulator = ConfusionAccumulator(num_classes)
+        cascade_accumulator.update(y_true_int, result["labels"], test_sample_nums)
+        model_accumulator = ConfusionAccumulator(num_classes)
+        model_accumulator.update(y_true_int, model_labels, test_sample_nums)
+
+        report: Dict[str, Any] = {
+            "cascade_offload_fraction": result["offload_fraction"],
+            "cascade_speedup": CascadeClassifier.speedup(result, model_seconds_per_pixel),
+            "cascade_front_fit_seconds": fit_seconds,
+            "cascade_front_pixel_accuracy": float((result["front_proba"].argmax(axis=1) == y_true_int).mean()),
+        }
+        for prefix, accumulator in (("cascade", cascade_accumulator), ("cnn", model_accumulator)):
+            report.update({f"{prefix}_{name}": value for name, value in accumulator.pixel_metrics().items()})
+            report.update({f"{prefix}_{name}": value for name, value in accumulator.image_metrics().items()})
+        for name in ("pixel_accuracy", "image_accuracy", "pixel_macro_f1"):
+            report[f"cascade_{name}_delta"] = report[f"cascade_{name}"] - report[f"cnn_{name}"]
+
+        report["threshold_tradeoff"] = threshold_tradeoff(
+            result["front_proba"], model_labels, y_true_int, config.sweep_thresholds
         )
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(
-            image_cm, annot=True, fmt="d", cmap="Blues",
-            xticklabels=label_encoder.classes_,
-            yticklabels=label_encoder.classes_
+        logging.info(
+            f"Cascade at threshold {config.threshold}: {report['cascade_offload_fraction']:.1%} of pixels offloaded, "
+            f"speedup {report['cascade_speedup'] or float('nan'):.2f}x, pixel accuracy "
+            f"{report['cascade_pixel_accuracy']:.4f} ({report['cascade_pixel_accuracy_delta']:+.4f} vs CNN only)"
         )
-        plt.title("Image-Level Confusion Matrix")
-        plt.xlabel("Predicted")
-        plt.ylabel("True")
-        plt.tight_layout()
-        mlflow.log_figure(plt.gcf(), "image_confusion_matrix.png")
-        plt.close()
 
-        image_metrics = {
-            "image_accuracy": image_accuracy
-        }
+        try:
+            import mlflow
 
-        logging.info("Model evaluation completed successfully.")
-        return pixel_metrics, image_metrics
+            mlflow.log_metrics(
+                {name: value for name, value in report.items() if isinstance(value, float)}
+            )
+        except ImportError:
+            logging.info("MLflow not installed; cascade results are only logged.")
+        return report
 
     except Exception as e:
-        logging.error(f"Error during model evaluation: {str(e)}")
+        logging.error(f"Error during cascade evaluation: {str(e)}")
         raise e
+
+
+def _build_evaluation_step():
+    from zenml import step
+    from sklearn.preprocessing import LabelEncoder
+    from tensorflow.keras.models import Model
+
+    @step(enable_cache=True, experiment_tracker=experiment_tracker_name())
+    def evaluation(
+        model: Model,
+        x_test: BandArray,
+        y_test: np.ndarray,
+        label_encoder: LabelEncoder,
+        test_sample_nums: Optional[np.ndarray] = None,
+        config: EvaluationConfig = EvaluationConfig()
+    ) -> Tuple[
+        Annotated[Dict[str, float], "Pixel-level metrics"],
+        Annotated[Dict[str, float], "Image-level metrics"]
+    ]:
+        """
+        ZenML step wrapping `evaluate`.
+
+        With caching enabled, if model, x_test, y_test remain unchanged,
+        ZenML will skip re-running. However, typically the model artifact
+        changes if training changes.
+
+        Args:
+            model (Model): Trained Keras model for evaluation.
+            x_test (np.ndarray): Test features.
+            y_test (np.ndarray): One-hot encoded test labels.
+            label_encoder (LabelEncoder): For inverse-transforming label indices.
+            test_sample_nums (np.ndarray, optional): Sample_num of every test pixel.
+            config (EvaluationConfig): Evaluation options.
+
+        Returns:
+            (dict, dict): Pixel-level and image-level metrics.
+        """
+        return evaluate(model, x_test, y_test, label_encoder, test_sample_nums, config)
+
+    return evaluation
+
+
+def _build_cascade_evaluation_step():
+    from zenml import step
+    from tensorflow.keras.models import Model
+
+    @step(enable_cache=True, experiment_tracker=experiment_tracker_name())
+    def cascade_evaluation(
+        model: Model,
+        x_train: BandArray,
+        y_train: np.ndarray,
+        x_test: BandArray,
+        y_test: np.ndarray,
+        test_sample_nums: Optional[np.ndarray] = None,
+        config: CascadeConfig = CascadeConfig()
+    ) -> Annotated[Dict[str, Any], "Cascade report"]:
+        """
+        ZenML step wrapping `evaluate_cascade`.
+
+        Args:
+            model (Model): Trained Keras model.
+            x_train (np.ndarray): Training features for the front classifier.
+            y_train (np.ndarray): One-hot encoded training labels.
+            x_test (np.ndarray): Test features.
+            y_test (np.ndarray): One-hot encoded test labels.
+            test_sample_nums (np.ndarray, optional): Sample_num of every test pixel.
+            config (CascadeConfig): Cascade options.
+
+        Returns:
+            dict: The cascade report (see `evaluate_cascade`).
+        """
+        return evaluate_cascade(model, x_train, y_train, x_test, y_test, test_sample_nums, config)
+
+    return cascade_evaluation
+
+
+_STEP_BUILDERS = {
+    "evaluation": _build_evaluation_step,
+    "cascade_evaluation": _build_cascade_evaluation_step,
+}
+
+
+def __getattr__(name):
+    # The ZenML step (and with it TensorFlow, MLflow and the stack's experiment
+    # tracker) is only loaded on first access, keeping `import steps.evaluation` fast.
+    if name in _STEP_BUILDERS:
+        globals()[name] = _STEP_BUILDERS[name]()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
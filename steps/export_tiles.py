@@ -0,0 +1,131 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from typing_extensions import Annotated
+
+from model.compact import BandArray, load_bands
+from model.prediction_cache import cached_predict
+from model.summary_tiles import SummaryTileExporter, polygon_centroids
+from .config import TileExportConfig
+from .instrumentation import instrumented
+
+
+def load_positions(path: str) -> pd.DataFrame:
+    """
+    Image positions from a CSV with Sample_num, longitude and latitude columns, or
+    from a JSON export of the `polygons` collection (centroid of each polygon).
+    """
+    if path.endswith(".json"):
+        with open(path) as fid:
+            return polygon_centroids(json.load(fid))
+    return pd.read_csv(path, usecols=["Sample_num", "longitude", "latitude"])
+
+
+@instrumented("export_tiles")
+def export_tiles(
+    x_test: BandArray,
+    y_test: np.ndarray,
+    label_encoder: Any,
+    test_sample_nums: np.ndarray,
+    model: Optional[Any] = None,
+    config: TileExportConfig = TileExportConfig()
+) -> Dict[str, Any]:
+    """
+    Export per-image and per-hexagon summaries of the test pixels as binary tiles
+    for the hsi-visualization map (see model.summary_tiles.SummaryTileExporter).
+
+    Args:
+        x_test (np.ndarray): Cleaned test features.
+        y_test (np.ndarray): One-hot encoded test labels.
+        label_encoder (LabelEncoder): Gives the class names.
+        test_sample_nums (np.ndarray): Sample_num of every test pixel.
+        model (Model, optional): Trained model; its predictions are read from the
+            prediction cache filled by evaluation. Without it only true label
+            counts are exported.
+        config (TileExportConfig): Output directory, image positions, tiling and
+            the prediction cache directory (use evaluation's; None disables it)
+            and size cap.
+
+    Returns:
+        dict: The tile manifest.
+    """
+    try:
+        logging.info("Exporting summary tiles...")
+        y_pred = None
+        if model is not None:
+            y_pred = np.argmax(
+                cached_predict(
+                    model,
+                    load_bands(x_test),
+                    cache_dir=config.prediction_cache_dir,
+                    max_bytes=config.prediction_cache_max_bytes
+                ),
+                axis=1
+            )
+        positions = load_positions(config.positions_path) if config.positions_path else None
+        if positions is None:
+            logging.warning("No positions_path configured; only image summaries are exported.")
+        exporter = SummaryTileExporter(
+            zoom_levels=config.zoom_levels,
+            hex_pixels=config.hex_pixels,
+            quantiles=config.quantiles,
+            spectrum_dtype=config.spectrum_dtype
+        )
+        return exporter.export(
+            config.output_dir,
+            x_test,
+            test_sample_nums,
+            positions=positions,
+            y_true=np.argmax(y_test, axis=1),
+            y_pred=y_pred,
+            class_names=[str(name) for name in label_encoder.classes_]
+        )
+    except Exception as e:
+        logging.error(f"Error during summary tile export: {str(e)}")
+        raise e
+
+
+def _build_export_tiles_step():
+    from zenml import step
+    from sklearn.preprocessing import LabelEncoder
+    from tensorflow.keras.models import Model
+
+    @step(enable_cache=False)
+    def export_summary_tiles(
+        model: Model,
+        x_test: BandArray,
+        y_test: np.ndarray,
+        label_encoder: LabelEncoder,
+        test_sample_nums: np.ndarray,
+        config: TileExportConfig = TileExportConfig()
+    ) -> Annotated[Dict[str, Any], "Tile manifest"]:
+        """
+        ZenML step wrapping `export_tiles`. Never cached, since its output is the
+        tile files written to config.output_dir.
+
+        Args:
+            model (Model): Trained Keras model.
+            x_test (np.ndarray): Cleaned test features.
+            y_test (np.ndarray): One-hot encoded test labels.
+            label_encoder (LabelEncoder): Gives the class names.
+            test_sample_nums (np.ndarray): Sample_num of every test pixel.
+            config (TileExportConfig): Output directory, image positions and tiling.
+
+        Returns:
+            dict: The tile manifest.
+        """
+        return export_tiles(x_test, y_test, label_encoder, test_sample_nums, model, config)
+
+    return export_summary_tiles
+
+
+def __getattr__(name):
+    # The ZenML step is built on first access so that importing this module
+    # does not load ZenML or TensorFlow.
+    if name == "export_summary_tiles":
+        globals()[name] = _build_export_tiles_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
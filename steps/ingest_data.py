@@ -1,20 +1,33 @@
 import logging
+from typing import Optional
+
 import pandas as pd
-from zenml import step
+
+from model.compact import SpectralEncoding, encode_frame
+from .config import DataIngestionConfig
+from .instrumentation import instrumented
 
 class IngestData:
     """
     Data ingestion class which loads data from the specified CSV file.
     """
 
-    def __init__(self, data_path: str) -> None:
+    def __init__(
+        self, data_path: str, encoding: Optional[SpectralEncoding] = None, chunksize: int = 100_000
+    ) -> None:
         """
         Initialize with the path to the dataset.
 
         Args:
             data_path (str): Path to the dataset CSV file.
+            encoding (SpectralEncoding, optional): Store the frq columns compactly
+                (model.compact). The CSV is then parsed in chunks of `chunksize`
+                rows, so float64 bands never exist for the whole table.
+            chunksize (int): Rows parsed at once when encoding.
         """
         self.data_path = data_path
+        self.encoding = encoding
+        self.chunksize = chunksize
 
     def get_data(self) -> pd.DataFrame:
         """
@@ -25,7 +38,17 @@ class IngestData:
         """
         try:
             logging.info(f"Ingesting data from {self.data_path}")
-            df = pd.read_csv(self.data_path)
+            if self.encoding is None:
+                df = pd.read_csv(self.data_path)
+            else:
+                chunks = [
+                    encode_frame(chunk, self.encoding)
+                    for chunk in pd.read_csv(self.data_path, chunksize=self.chunksize)
+                ]
+                attrs = chunks[0].attrs
+                df = pd.concat(chunks, ignore_index=True)
+                df.attrs = attrs
+                logging.info(f"Frequency columns stored as {self.encoding}")
             logging.info(f"Data successfully loaded. Shape: {df.shape}")
             
             # --- Optional: Confirm essential columns exist ---
@@ -43,20 +66,54 @@ class IngestData:
             raise e
 
 
-@step(enable_cache=True) 
-def ingest_data(data_path: str) -> pd.DataFrame:
+@instrumented("ingest_data")
+def ingest(data_path: str, config: DataIngestionConfig = DataIngestionConfig()) -> pd.DataFrame:
     """
-    ZenML step to ingest data from a CSV file.
+    Ingest data from a CSV file.
 
     Args:
         data_path (str): Path to the CSV file.
+        config (DataIngestionConfig): With band_dtype set, the frq columns are
+            stored as int16/float16 codes (model.compact.SpectralEncoding).
 
     Returns:
         pd.DataFrame: Ingested data as a DataFrame.
     """
     try:
-        ingestor = IngestData(data_path)
+        encoding = None
+        if config.band_dtype is not None:
+            encoding = SpectralEncoding(config.band_dtype, config.band_scale, config.band_offset)
+        ingestor = IngestData(data_path, encoding=encoding, chunksize=config.chunksize)
         return ingestor.get_data()
     except Exception as e:
         logging.error(f"Error in ingest_data step: {e}")
         raise e
+
+
+def _build_ingest_data_step():
+    from zenml import step
+
+    @step(enable_cache=True)
+    def ingest_data(data_path: str, config: DataIngestionConfig = DataIngestionConfig()) -> pd.DataFrame:
+        """
+        ZenML step to ingest data from a CSV file.
+
+        Args:
+            data_path (str): Path to the CSV file.
+            config (DataIngestionConfig): Optional compact band storage.
+
+        Returns:
+            pd.DataFrame: Ingested data as a DataFrame.
+        """
+        return ingest(data_path, config)
+
+    return ingest_data
+
+
+def __getattr__(name):
+    # The ZenML step is built on first access so that importing this module
+    # (e.g. for IngestData) does not load ZenML.
+    if name == "ingest_data":
+        globals()[name] = _build_ingest_data_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
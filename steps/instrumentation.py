@@ -0,0 +1,246 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_TRACE_PATH = os.path.join(".cache", "traces", "steps.jsonl")
+DEFAULT_PROFILE_DIR = os.path.join(".cache", "profiles")
+SAMPLE_INTERVAL = 0.01
+METRIC_KEYS = (
+    "wall_seconds", "cpu_seconds", "peak_rss_mb", "rows_per_second", "input_memory_bytes", "output_memory_bytes",
+)
+
+
+def _enabled() -> bool:
+    return os.environ.get("HSI_INSTRUMENTATION", "1") != "0"
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """Current resident set size, read from /proc on Linux (None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as fid:
+            return int(fid.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss_bytes() -> int:
+    """Peak resident set size of this process (0 where `resource` is unavailable, e.g. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def payload_bytes(value: Any) -> int:
+    """
+    In-memory size of a step input/output: arrays and lazy chunked arrays by nbytes,
+    DataFrames/Series by their memory usage, tuples summed; anything else counts as 0.
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(payload_bytes(item) for item in value)
+    if hasattr(value, "memory_usage") and hasattr(value, "shape"):
+        usage = value.memory_usage(deep=False)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if hasattr(value, "nbytes") and hasattr(value, "shape"):
+        return int(value.nbytes)
+    return 0
+
+
+def payload_rows(values: Iterable[Any]) -> int:
+    """Rows of the first tabular input (DataFrame or array), the unit of rows/s."""
+    for value in values:
+        shape = getattr(value, "shape", None)
+        if shape:
+            return int(shape[0])
+    return 0
+
+
+class _Sampler(threading.Thread):
+    """
+    Background thread sampling the process RSS and, when profiling, the Python
+    stack of the step's thread every `interval` seconds.
+    """
+
+    def __init__(self, thread_id: int, interval: float, profile: bool) -> None:
+        super().__init__(name="step-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.profile = profile
+        self.stacks: Counter = Counter()
+        self.peak_rss = _current_rss_bytes() or 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            rss = _current_rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+            if self.profile:
+                frame = sys._current_frames().get(self.thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _write_profile(step_name: str, stacks: Counter, profile_dir: str) -> str:
+    """Write samples in collapsed-stack format (flamegraph.pl / speedscope) and log the hottest functions."""
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{step_name}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+    with open(path, "w") as fid:
+        for stack, count in stacks.most_common():
+            fid.write(f"{stack} {count}\n")
+    leaf = Counter()
+    for stack, count in stacks.items():
+        leaf[stack.rsplit(";", 1)[-1]] += count
+    total = sum(stacks.values())
+    hottest = ", ".join(f"{name} {count / total:.0%}" for name, count in leaf.most_common(5))
+    logging.info(f"[{step_name}] {total} profile samples written to {path}; hottest: {hottest}")
+    return path
+
+
+def _log_to_mlflow(record: Dict[str, Any]) -> None:
+    # Only log when the step already runs under MLflow; never import it here
+    mlflow = sys.modules.get("mlflow")
+    if mlflow is None or mlflow.active_run() is None:
+        return
+    try:
+        mlflow.log_metrics({
+            f"perf.{record['step']}.{key}": record[key] for key in METRIC_KEYS if record.get(key) is not None
+        })
+    except Exception as e:
+        logging.warning(f"Could not log step metrics to MLflow: {e}")
+
+
+def _append_trace(record: Dict[str, Any], trace_path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+    with open(trace_path, "a") as fid:
+        fid.write(json.dumps(record) + "\n")
+
+
+def instrumented(
+    step_name: Optional[str] = None,
+    profile: Optional[bool] = None,
+    trace_path: Optional[str] = None,
+) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording wall time, CPU time, peak RSS, rows/s and the in-memory
+    size of the inputs and outputs of a step function (not their materialized
+    artifact size, which depends on the store).
+
+    Each call appends one record to a JSON-lines trace (HSI_TRACE_PATH, default
+    .cache/traces/steps.jsonl) and, when an MLflow run is active, logs the numbers
+    as `perf.<step>.<metric>`. With profiling on (argument or HSI_PROFILE=1), a
+    sampling profiler records the step thread's stacks every 10 ms and writes them
+    in collapsed-stack format to HSI_PROFILE_DIR. HSI_INSTRUMENTATION=0 turns
+    the decorator into a pass-through.
+
+    Args:
+        step_name (str, optional): Name in the trace; defaults to the function name.
+        profile (bool, optional): Enable the sampling profiler; defaults to HSI_PROFILE.
+        trace_path (str, optional): Trace file; defaults to HSI_TRACE_PATH.
+
+    Returns:
+        Callable: The decorator. The wrapped function keeps the last record in `last_record`.
+    """
+    def decorator(fn: Callable) -> Callable:
+        name = step_name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled():
+                return fn(*args, **kwargs)
+            do_profile = profile if profile is not None else os.environ.get("HSI_PROFILE") == "1"
+            inputs = list(args) + list(kwargs.values())
+            sampler = _Sampler(threading.get_ident(), SAMPLE_INTERVAL, do_profile)
+            sampler.start()
+            started_at = time.time()
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            status = "ok"
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                wall = time.perf_counter() - wall_start
+                cpu = time.process_time() - cpu_start
+                sampler.stop()
+                peak = max(sampler.peak_rss, _current_rss_bytes() or 0) or _max_rss_bytes()
+                rows = payload_rows(inputs)
+                record = {
+                    "step": name,
+                    "status": status,
+                    "started_at": round(started_at, 6),
+                    "wall_seconds": round(wall, 6),
+                    "cpu_seconds": round(cpu, 6),
+                    "peak_rss_mb": round(peak / 1024 ** 2, 2),
+                    "rows": rows,
+                    "rows_per_second": round(rows / wall, 1) if rows and wall > 0 else None,
+                    "input_memory_bytes": payload_bytes(inputs),
+                    "output_memory_bytes": payload_bytes(result),
+                    "pid": os.getpid(),
+                }
+                if do_profile and sampler.stacks:
+                    record["profile"] = _write_profile(
+                        name, sampler.stacks, os.environ.get("HSI_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+                    )
+                wrapper.last_record = record
+                logging.info(
+                    f"[{name}] {wall:.2f}s wall, {cpu:.2f}s CPU, peak RSS {record['peak_rss_mb']:.0f} MB, "
+                    f"{record['input_memory_bytes'] / 1e6:.1f} MB in / {record['output_memory_bytes'] / 1e6:.1f} MB out"
+                )
+                try:
+                    _append_trace(record, trace_path or os.environ.get("HSI_TRACE_PATH", DEFAULT_TRACE_PATH))
+                except OSError as e:
+                    logging.warning(f"Could not write step trace: {e}")
+                _log_to_mlflow(record)
+
+        wrapper.last_record = None
+        return wrapper
+
+    return decorator
+
+
+def load_trace(trace_path: str = DEFAULT_TRACE_PATH) -> List[Dict[str, Any]]:
+    """Records of a JSON-lines step trace, oldest first."""
+    with open(trace_path) as fid:
+        return [json.loads(line) for line in fid if line.strip()]
+
+
+def to_chrome_trace(records: List[Dict[str, Any]], output_path: str) -> None:
+    """
+    Convert step records to the Chrome trace event format, viewable in
+    chrome://tracing or Perfetto as a per-step timeline.
+    """
+    events = [
+        {
+            "name": record["step"],
+            "ph": "X",
+            "ts": record["started_at"] * 1e6,
+            "dur": record["wall_seconds"] * 1e6,
+            "pid": record.get("pid", 0),
+            "tid": record["step"],
+            "args": {key: record.get(key) for key in METRIC_KEYS},
+        }
+        for record in records
+    ]
+    with open(output_path, "w") as fid:
+        json.dump({"traceEvents": events}, fid)
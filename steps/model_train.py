@@ -1,16 +1,15 @@
 import logging
-from typing import Tuple
+from typing import Any, Optional, Tuple
 import numpy as np  
 import pandas as pd
-from zenml import step
-from zenml.client import Client
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
-from tensorflow.keras.models import Model
 
+from model.compact import BandArray, load_bands
 from model.model_dev import CNNModel, PCATransformer
+from model.sampling import PixelBudgetSampler
 from .config import ModelNameConfig
+from .instrumentation import instrumented
+from .tracking import experiment_tracker_name
 
-experiment_tracker = Client().active_stack.experiment_tracker
 
 def define_callbacks(checkpoint_path: str):
     """
@@ -22,6 +21,8 @@ def define_callbacks(checkpoint_path: str):
     Returns:
         list: A list of Keras callbacks.
     """
+    from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
+
     early_stopping = EarlyStopping(
         monitor='val_accuracy', patience=30, verbose=1
     )
@@ -38,30 +39,37 @@ def define_callbacks(checkpoint_path: str):
     return [checkpoint, early_stopping, lr_scheduler]
 
 
-@step(enable_cache=True, experiment_tracker=experiment_tracker.name)
-def model_train(
-    x_train: np.ndarray,    
-    x_test: np.ndarray,
+@instrumented("model_train")
+def train(
+    x_train: BandArray,    
+    x_test: BandArray,
     y_train: np.ndarray,     
     y_test: np.ndarray,      
+    train_sample_nums: Optional[np.ndarray] = None,
     config: ModelNameConfig = ModelNameConfig()
-) -> Model:
+) -> Any:
     """
     Trains a CNN model on the provided data (NumPy arrays).
-    With caching enabled, if x_train/x_test/y_train/y_test remain unchanged 
-    and the code is identical, ZenML will skip re-running this step.
 
     Args:
         x_train (np.ndarray): Training features (Conv1D-ready shape).
         x_test (np.ndarray): Testing features (Conv1D-ready shape).
         y_train (np.ndarray): One-hot encoded training labels.
         y_test (np.ndarray): One-hot encoded testing labels.
-        config (ModelNameConfig): Configuration for the model training.
+        train_sample_nums (np.ndarray, optional): Sample_num of every training
+            pixel, needed by the per-image pixel cap.
+        config (ModelNameConfig): Configuration for the model training. With
+            max_pixels_per_image / max_pixels_per_class set, every epoch trains
+            on a fresh capped subset (model.sampling.PixelBudgetSampler).
 
     Returns:
         Model: The trained Keras model.
     """
     try:
+        # Large artifacts may arrive as lazy chunked proxies; training needs them in memory
+        # (compact bands stay encoded and are decoded batch by batch)
+        x_train, x_test = load_bands(x_train), load_bands(x_test)
+
         # Check model name from config
         if config.model_name.lower() == "cnn":
             # Build the CNN model
@@ -80,6 +88,20 @@ def model_train(
             # Define training callbacks
             callbacks = define_callbacks(config.checkpoint_path)
 
+            # Optional per-image / per-class pixel budget for each epoch
+            sampler = None
+            if config.max_pixels_per_image is not None or config.max_pixels_per_class is not None:
+                if train_sample_nums is None:
+                    raise ValueError("Pixel budget sampling needs train_sample_nums.")
+                sampler = PixelBudgetSampler(
+                    np.asarray(train_sample_nums),
+                    y_train,
+                    max_pixels_per_image=config.max_pixels_per_image,
+                    max_pixels_per_class=config.max_pixels_per_class,
+                    balance_classes=config.balance_classes,
+                    seed=config.sampler_seed
+                )
+
             # Train the model
             history = cnn_model.train(
                 x_train,
@@ -88,7 +110,8 @@ def model_train(
                 y_test,
                 epochs=config.epochs,
                 batch_size=config.batch_size,
-                callbacks=callbacks
+                callbacks=callbacks,
+                sampler=sampler
             )
 
             logging.info("Model training completed successfully.")
@@ -101,3 +124,46 @@ def model_train(
     except Exception as e:
         logging.error(f"Error during model training: {str(e)}")
         raise e
+
+
+def _build_model_train_step():
+    from zenml import step
+    from tensorflow.keras.models import Model
+
+    @step(enable_cache=True, experiment_tracker=experiment_tracker_name())
+    def model_train(
+        x_train: BandArray,
+        x_test: BandArray,
+        y_train: np.ndarray,
+        y_test: np.ndarray,
+        train_sample_nums: Optional[np.ndarray] = None,
+        config: ModelNameConfig = ModelNameConfig()
+    ) -> Model:
+        """
+        ZenML step wrapping `train`.
+        With caching enabled, if x_train/x_test/y_train/y_test remain unchanged 
+        and the code is identical, ZenML will skip re-running this step.
+
+        Args:
+            x_train (np.ndarray): Training features (Conv1D-ready shape).
+            x_test (np.ndarray): Testing features (Conv1D-ready shape).
+            y_train (np.ndarray): One-hot encoded training labels.
+            y_test (np.ndarray): One-hot encoded testing labels.
+            train_sample_nums (np.ndarray, optional): Sample_num of every training pixel.
+            config (ModelNameConfig): Configuration for the model training.
+
+        Returns:
+            Model: The trained Keras model.
+        """
+        return train(x_train, x_test, y_train, y_test, train_sample_nums, config)
+
+    return model_train
+
+
+def __getattr__(name):
+    # The ZenML step (and with it TensorFlow and the stack's experiment tracker)
+    # is only loaded on first access, keeping `import steps.model_train` fast.
+    if name == "model_train":
+        globals()[name] = _build_model_train_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,132 @@
+import json
+import logging
+from typing import Any, Dict
+
+import numpy as np
+from typing_extensions import Annotated
+
+from model.compact import BandArray, load_bands
+from model.evaluation import ConfusionAccumulator
+from model.prediction_cache import cached_predict
+from model.prediction_store import get_store, prediction_documents
+from .config import PublishConfig
+from .instrumentation import instrumented
+
+
+@instrumented("publish")
+def publish(
+    model: Any,
+    x_test: BandArray,
+    y_test: np.ndarray,
+    label_encoder: Any,
+    test_sample_nums: np.ndarray,
+    config: PublishConfig = PublishConfig()
+) -> Dict[str, Dict[str, float]]:
+    """
+    Publish per-image predictions (and polygons) to the store read by the
+    hsi-visualization backend.
+
+    Image predictions are the majority vote of their test pixels, as in the
+    image-level metrics of evaluation, whose cached predictions are reused.
+    Documents are upserted by sample_num in batches, so re-running the step
+    updates the existing documents instead of duplicating them.
+
+    Args:
+        model (Model): Trained Keras model.
+        x_test (np.ndarray): Test features.
+        y_test (np.ndarray): One-hot encoded test labels.
+        label_encoder (LabelEncoder): Gives the label names.
+        test_sample_nums (np.ndarray): Sample_num of every test pixel.
+        config (PublishConfig): Store URI ("sqlite:///...", "memory://..." or
+            "mongodb://..."), batch size and an optional polygons JSON file
+            ([{"sample_num", "coordinates"}, ...]). Predictions are read through
+            prediction_cache_dir, shared with evaluation (None disables it) and
+            capped at prediction_cache_max_bytes.
+
+    Returns:
+        dict: Collection -> upsert statistics (rows, batches, seconds, rows_per_second).
+    """
+    try:
+        logging.info(f"Publishing predictions to {config.store_uri.split('@')[-1]}...")
+        y_pred = np.argmax(
+            cached_predict(
+                model,
+                load_bands(x_test),
+                cache_dir=config.prediction_cache_dir,
+                max_bytes=config.prediction_cache_max_bytes
+            ),
+            axis=1
+        )
+        accumulator = ConfusionAccumulator(len(label_encoder.classes_))
+        accumulator.update(np.argmax(y_test, axis=1), y_pred, test_sample_nums)
+
+        votes = accumulator.image_counts.sum(axis=1)
+        pixel_counts = votes.sum(axis=1)
+        predicted = accumulator.image_predictions
+        documents = prediction_documents(
+            accumulator.sample_nums,
+            accumulator.image_labels,
+            predicted,
+            label_encoder.classes_,
+            pixel_counts=pixel_counts,
+            agreement=votes[np.arange(len(predicted)), predicted] / pixel_counts
+        )
+
+        store = get_store(config.store_uri, config.database)
+        stats = {"predictions": store.upsert("predictions", documents, batch_size=config.batch_size)}
+        if config.polygons_path:
+            with open(config.polygons_path) as fid:
+                polygons = [
+                    {"sample_num": int(polygon["sample_num"]), "coordinates": polygon["coordinates"]}
+                    for polygon in json.load(fid)
+                ]
+            stats["polygons"] = store.upsert("polygons", polygons, batch_size=config.batch_size)
+
+        logging.info("Publishing completed successfully.")
+        return stats
+    except Exception as e:
+        logging.error(f"Error while publishing predictions: {str(e)}")
+        raise e
+
+
+def _build_publish_step():
+    from zenml import step
+    from sklearn.preprocessing import LabelEncoder
+    from tensorflow.keras.models import Model
+
+    @step(enable_cache=False)
+    def publish_predictions(
+        model: Model,
+        x_test: BandArray,
+        y_test: np.ndarray,
+        label_encoder: LabelEncoder,
+        test_sample_nums: np.ndarray,
+        config: PublishConfig = PublishConfig()
+    ) -> Annotated[Dict[str, Dict[str, float]], "Publish statistics"]:
+        """
+        ZenML step wrapping `publish`. Never cached, since its effect is the
+        write to the store.
+
+        Args:
+            model (Model): Trained Keras model.
+            x_test (np.ndarray): Test features.
+            y_test (np.ndarray): One-hot encoded test labels.
+            label_encoder (LabelEncoder): Gives the label names.
+            test_sample_nums (np.ndarray): Sample_num of every test pixel.
+            config (PublishConfig): Store and batching options.
+
+        Returns:
+            dict: Upsert statistics per collection.
+        """
+        return publish(model, x_test, y_test, label_encoder, test_sample_nums, config)
+
+    return publish_predictions
+
+
+def __getattr__(name):
+    # The ZenML step is built on first access so that importing this module
+    # does not load ZenML or TensorFlow.
+    if name == "publish_predictions":
+        globals()[name] = _build_publish_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,82 @@
+import logging
+
+import numpy as np
+from typing_extensions import Annotated
+
+from model.compact import BandArray
+from model.spectral_index import SpectralIndex, image_spectra
+from .config import SimilarityIndexConfig
+from .instrumentation import instrumented
+
+
+@instrumented("similarity_index")
+def build_index(
+    x: np.ndarray,
+    sample_nums: np.ndarray,
+    config: SimilarityIndexConfig = SimilarityIndexConfig()
+) -> str:
+    """
+    Build and save a spectral similarity index over the cleaned band matrix, for
+    finding pixels or images that look like a suspicious one during label QA.
+
+    Args:
+        x (np.ndarray): Cleaned features (pixels, bands[, 1]).
+        sample_nums (np.ndarray): Sample_num of every pixel.
+        config (SimilarityIndexConfig): "pixel" or "image" (mean spectra) level,
+            metric, optional PCA reduction and IVF lists.
+
+    Returns:
+        str: Directory of the saved index (load with SpectralIndex.load).
+    """
+    try:
+        logging.info(f"Building {config.level}-level spectral index...")
+        index = SpectralIndex(config.metric, config.pca_components, config.n_lists)
+        x = np.asarray(x).reshape(len(x), -1)
+        if config.level == "image":
+            keys, spectra, counts = image_spectra(x, sample_nums)
+            index.build(spectra, sample_num=keys, pixel_count=counts)
+        elif config.level == "pixel":
+            index.build(x, sample_num=np.asarray(sample_nums), position=np.arange(len(x)))
+        else:
+            raise ValueError(f"level must be 'pixel' or 'image', got {config.level!r}")
+        index.save(config.output_dir)
+        logging.info(f"Spectral index saved to {config.output_dir}")
+        return config.output_dir
+    except Exception as e:
+        logging.error(f"Error while building the similarity index: {str(e)}")
+        raise e
+
+
+def _build_similarity_index_step():
+    from zenml import step
+
+    @step(enable_cache=False)
+    def similarity_index(
+        x_train: BandArray,
+        train_sample_nums: np.ndarray,
+        config: SimilarityIndexConfig = SimilarityIndexConfig()
+    ) -> Annotated[str, "Spectral index directory"]:
+        """
+        ZenML step wrapping `build_index` over the training pixels. Never cached,
+        since its output is the index files written to config.output_dir.
+
+        Args:
+            x_train (np.ndarray): Training features.
+            train_sample_nums (np.ndarray): Sample_num of every training pixel.
+            config (SimilarityIndexConfig): Index options.
+
+        Returns:
+            str: Directory of the saved index.
+        """
+        return build_index(x_train, train_sample_nums, config)
+
+    return similarity_index
+
+
+def __getattr__(name):
+    # The ZenML step is built on first access so that importing this module
+    # does not load ZenML.
+    if name == "similarity_index":
+        globals()[name] = _build_similarity_index_step()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,26 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Optional
+
+
+@lru_cache(maxsize=None)
+def experiment_tracker_name() -> Optional[str]:
+    """
+    Name of the experiment tracker the tracked steps should use.
+
+    Resolved on first use rather than at import time: HSI_EXPERIMENT_TRACKER wins
+    if set, otherwise the active ZenML stack is queried. Returns None when there is
+    no stack or no tracker, so steps can still be built and run locally.
+    """
+    name = os.environ.get("HSI_EXPERIMENT_TRACKER")
+    if name:
+        return name
+    try:
+        from zenml.client import Client
+
+        tracker = Client().active_stack.experiment_tracker
+    except Exception as e:
+        logging.warning(f"Could not resolve the ZenML experiment tracker: {e}")
+        return None
+    return tracker.name if tracker is not None else None
@@ -0,0 +1,67 @@
+import json
+import os
+import pickle
+
+import numpy as np
+
+from model.batch_inference import NODATA_LABEL, BatchInference, rows_per_window
+
+
+class BrightnessModel:
+    """Picklable stand-in: class 1 for pixels whose mean reflectance exceeds 0.5."""
+
+    def predict(self, x):
+        mean = x.reshape(len(x), -1).mean(axis=1)
+        return np.stack([1 - mean, mean], axis=1)
+
+
+def _write_inputs(tmp_path):
+    model_path = tmp_path / "model.pkl"
+    with open(model_path, "wb") as fid:
+        pickle.dump(BrightnessModel(), fid)
+    rng = np.random.default_rng(0)
+    bright = rng.uniform(0.6, 1.0, size=(8, 40, 30)).astype(np.float32)
+    dark = rng.uniform(0.0, 0.4, size=(8, 25, 30)).astype(np.float32)
+    dark[:, :5, :] = 0.9  # a bright strip that must not flip the majority
+    dark[:, -1, :] = np.nan  # nodata row
+    tiles = []
+    for name, tile in (("bright.npy", bright), ("dark.npy", dark)):
+        np.save(tmp_path / name, tile)
+        tiles.append(str(tmp_path / name))
+    return str(model_path), tiles
+
+
+def test_batch_inference_writes_label_maps_and_majority_labels(tmp_path):
+    """
+    Test if tiles scored across worker processes in small windows give the same label
+    maps as in-process scoring, with nodata pixels and majority labels handled.
+    """
+    model_path, tiles = _write_inputs(tmp_path)
+    # A tiny memory ceiling forces many windows per tile
+    pooled = BatchInference(model_path, workers=2, memory_limit_mb=0.05, class_names=["dark", "bright"])
+    report = pooled.run(tiles, str(tmp_path / "pooled"))
+    serial = BatchInference(model_path, workers=0).run(tiles, str(tmp_path / "serial"))
+
+    assert rows_per_window(30, 8, 0.05, 2) < 25
+    assert report["pixels"] == 40 * 30 + 25 * 30
+    assert report["pixels_per_second"] > 0
+    # The ceiling is shared: the parent plus every worker counts against it
+    assert report["peak_total_rss_mb"] >= report["peak_rss_mb"] + 2 * report["peak_worker_rss_mb"] - 0.2
+    assert report["within_memory_limit"] is False
+    for name in ("bright", "dark"):
+        pooled_labels = np.load(tmp_path / "pooled" / f"{name}_labels.npy")
+        np.testing.assert_array_equal(pooled_labels, np.load(tmp_path / "serial" / f"{name}_labels.npy"))
+
+    dark_labels = np.load(tmp_path / "pooled" / "dark_labels.npy")
+    assert (dark_labels[:5] == 1).all() and (dark_labels[5:-1] == 0).all()
+    assert (dark_labels[-1] == NODATA_LABEL).all()
+
+    images = {image["image"]: image for image in report["images"]}
+    assert images["bright.npy"]["majority_label_name"] == "bright"
+    assert images["dark.npy"]["majority_label"] == 0
+    assert images["dark.npy"]["valid_pixels"] == 24 * 30
+    assert [image["majority_label"] for image in serial["images"]] == [1, 0]
+
+    with open(tmp_path / "pooled" / "batch_inference_report.json") as fid:
+        assert json.load(fid)["tiles"] == 2
+    assert os.path.exists(tmp_path / "pooled" / "majority_labels.csv")
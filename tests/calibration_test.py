@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from model.calibration import (
+    TemperatureScaler,
+    TopKProbabilities,
+    expected_calibration_error,
+    held_out_images,
+)
+from steps.calibration import calibrate
+from steps.config import CalibrationConfig
+
+
+def overconfident_probabilities(n=20000, classes=5, temperature=3.0, seed=0):
+    """Softmax samples whose labels follow p, sharpened by 1 / temperature."""
+    rng = np.random.default_rng(seed)
+    logits = rng.normal(scale=1.5, size=(n, classes))
+    calibrated = np.exp(logits - logits.max(axis=1, keepdims=True))
+    calibrated /= calibrated.sum(axis=1, keepdims=True)
+    y = (calibrated.cumsum(axis=1) > rng.random((n, 1))).argmax(axis=1)
+    sharp = np.exp((logits - logits.max(axis=1, keepdims=True)) * temperature)
+    return (sharp / sharp.sum(axis=1, keepdims=True)).astype(np.float32), y
+
+
+def test_temperature_scaler_recovers_overconfidence():
+    """
+    Test if the fitted temperature undoes sharpened probabilities and lowers
+    the expected calibration error.
+    """
+    probabilities, y = overconfident_probabilities()
+    scaler = TemperatureScaler().fit(probabilities, y)
+    calibrated = scaler.transform(probabilities)
+
+    assert scaler.temperature == pytest.approx(3.0, rel=0.1)
+    assert calibrated.dtype == np.float32
+    np.testing.assert_allclose(calibrated.sum(axis=1), 1, atol=1e-5)
+    np.testing.assert_array_equal(calibrated.argmax(axis=1), probabilities.argmax(axis=1))
+    assert expected_calibration_error(calibrated, y) < expected_calibration_error(probabilities, y) / 2
+
+
+def test_top_k_roundtrip_and_queries(tmp_path):
+    """
+    Test if top-k probabilities survive a save/load round trip and answer
+    confidence, voting and review queries like the full probabilities.
+    """
+    probabilities, _ = overconfident_probabilities(n=600, classes=11, temperature=1.0, seed=1)
+    sample_nums = np.repeat(np.arange(20), 30)
+    top_k = TopKProbabilities.from_probabilities(probabilities, k=3, temperature=2.0)
+    assert top_k.indices.dtype == np.uint8 and top_k.probabilities.dtype == np.float16
+    assert top_k.nbytes == 600 * 3 * 3
+
+    top_k.save(str(tmp_path))
+    loaded = TopKProbabilities.load(str(tmp_path))
+    assert isinstance(loaded.indices, np.memmap) and loaded.temperature == 2.0 and loaded.num_classes == 11
+    np.testing.assert_array_equal(loaded.labels(), probabilities.argmax(axis=1))
+    np.testing.assert_allclose(loaded.confidence(), probabilities.max(axis=1), atol=1e-3)
+    top_two = np.sort(probabilities, axis=1)[:, -2:]
+    np.testing.assert_allclose(loaded.margin(), top_two[:, 1] - top_two[:, 0], atol=2e-3)
+
+    votes = loaded.image_votes(sample_nums)
+    expected = [np.bincount(probabilities[sample_nums == s].argmax(axis=1), minlength=11).argmax() for s in range(20)]
+    np.testing.assert_array_equal(votes["labels"], expected)
+    assert (votes["voters"] == 30).all()
+    strict = loaded.image_votes(sample_nums, min_confidence=0.99)
+    assert (strict["voters"] > 0).all() and (strict["voters"] <= 30).all()
+
+    review = loaded.select_for_review(10)
+    assert set(review) == set(np.argsort(loaded.margin(), kind="stable")[:10])
+    images = loaded.select_for_review(3, sample_nums=sample_nums, by="confidence")
+    image_confidence = loaded.confidence().reshape(20, 30).mean(axis=1)
+    np.testing.assert_array_equal(images, np.argsort(image_confidence, kind="stable")[:3])
+
+
+def test_calibrate_step_stores_calibrated_probabilities(tmp_path):
+    """
+    Test if the step fits the temperature on held-out images, reports the
+    calibration gain and stores probabilities under the model/input key.
+    """
+    probabilities, y = overconfident_probabilities(n=6000, classes=4, seed=2)
+    x_test = np.arange(len(y), dtype=np.float32).reshape(-1, 1, 1)
+    sample_nums = np.repeat(np.arange(200), 30)
+
+    class LookupModel:
+        def predict(self, x, batch_size=32, verbose=0):
+            return probabilities[np.asarray(x).reshape(-1).astype(int)]
+
+        def get_weights(self):
+            return [np.ones(3)]
+
+    config = CalibrationConfig(output_dir=str(tmp_path / "calibrated"), prediction_cache_dir=str(tmp_path / "predictions"))
+    report = calibrate(LookupModel(), x_test, np.eye(4)[y], sample_nums, config)
+
+    assert report["temperature"] > 1.5
+    assert report["ece_after"] < report["ece_before"] and report["nll_after"] < report["nll_before"]
+    stored = TopKProbabilities.load(report["directory"])
+    assert len(stored) == len(y) and stored.k == 3 and stored.temperature == report["temperature"]
+    np.testing.assert_array_equal(stored.labels(), probabilities.argmax(axis=1))
+    np.testing.assert_array_equal(np.load(f"{report['directory']}/sample_nums.npy"), sample_nums)
+
+    fit_rows = held_out_images(sample_nums, config.holdout_fraction, config.seed)
+    assert 0 < fit_rows.mean() < 1
+    assert all(len(np.unique(fit_rows[sample_nums == s])) == 1 for s in range(200))
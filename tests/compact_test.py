@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from materializer.formats import load_artifact, read_header, save_artifact
+from model.compact import CompactBands, SpectralEncoding, frame_encoding, predict_batches
+from model.data_cleaning import DataCleaning, DataDivideStrategy, DataPreprocessStrategy, ShardedPreprocessStrategy
+from model.prediction_cache import array_fingerprint
+from model.sampling import PixelBudgetSampler, SampledBatches
+from steps.config import DataIngestionConfig
+from steps.ingest_data import ingest
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("int16", 0.5e-4 + 1e-6), ("float16", 1e-3)])
+def test_encoding_roundtrip_and_missing_codes(dtype, tolerance):
+    """
+    Test if decoded values are within the encoding's resolution and NaN / -9999
+    come back as NaN.
+    """
+    encoding = SpectralEncoding(dtype)
+    values = np.random.default_rng(0).random((100, 8))
+    values[3, 2], values[7, 5] = np.nan, -9999
+    codes = encoding.encode(values)
+
+    assert codes.dtype == np.dtype(dtype)
+    assert encoding.missing(codes).sum() == 2
+    decoded = encoding.decode(codes)
+    assert decoded.dtype == np.float32
+    assert np.isnan(decoded[3, 2]) and np.isnan(decoded[7, 5])
+    valid = ~np.isnan(values) & (values != -9999)
+    assert np.abs(decoded[valid] - values[valid]).max() <= tolerance
+    assert SpectralEncoding.from_dict(encoding.to_dict()) == encoding
+
+
+def test_compact_pipeline_matches_float_pipeline(synthetic_samples):
+    """
+    Test if compact ingestion drops the same rows, keeps labels and Sample_nums,
+    and yields 4x smaller train/test bands that decode to the float values.
+    """
+    samples_path = synthetic_samples(n_images=60, n_bands=24, pixels_per_image=30, nan_rate=0.03, seed=5)
+    config = DataIngestionConfig(band_dtype="int16", chunksize=300)
+    raw_float, raw_compact = ingest(samples_path), ingest(samples_path, config)
+    assert frame_encoding(raw_compact) == SpectralEncoding("int16")
+
+    float_data, _ = DataCleaning(raw_float, DataPreprocessStrategy()).handle_data()
+    compact_data, _ = DataCleaning(raw_compact.copy(), DataPreprocessStrategy()).handle_data()
+    sharded_data, _ = DataCleaning(ingest(samples_path, config), ShardedPreprocessStrategy(num_workers=2)).handle_data()
+    for data in (compact_data, sharded_data):
+        assert frame_encoding(data) == SpectralEncoding("int16")
+        np.testing.assert_array_equal(data["Sample_num"].to_numpy(), float_data["Sample_num"].to_numpy())
+        np.testing.assert_array_equal(data["Label_Encoded"].to_numpy(), float_data["Label_Encoded"].to_numpy())
+
+    x_train, x_test, y_train, _ = DataCleaning(compact_data, DataDivideStrategy()).handle_data()
+    float_train, float_test, float_y_train, _ = DataCleaning(float_data, DataDivideStrategy()).handle_data()
+    assert isinstance(x_train, CompactBands) and x_train.shape == float_train.shape
+    assert x_train.nbytes * 4 == float_train.nbytes
+    np.testing.assert_allclose(np.asarray(x_test), float_test, atol=0.5e-4 + 1e-6)
+    np.testing.assert_array_equal(y_train, float_y_train)
+
+    # Batches fed to the model are decoded float32 rows
+    batches = SampledBatches(x_train, y_train, PixelBudgetSampler(np.zeros(len(x_train)), y_train), 16)
+    x_batch, _ = batches[0]
+    rows = np.sort(batches.indices[:16])
+    assert x_batch.dtype == np.float32 and x_batch.shape == (16,) + x_train.shape[1:]
+    np.testing.assert_allclose(x_batch, float_train[rows], atol=0.5e-4 + 1e-6)
+
+
+@pytest.mark.parametrize("chunked_min_bytes", [None, 1])
+def test_compact_bands_artifact_roundtrip(tmp_path, chunked_min_bytes):
+    """
+    Test if CompactBands are stored as codes with their encoding and load back
+    without being decoded.
+    """
+    encoding = SpectralEncoding("int16", scale=2e-4, offset=-0.1)
+    bands = CompactBands(encoding.encode(np.random.default_rng(1).random((500, 12, 1))), encoding)
+    save_artifact(bands, str(tmp_path), chunked_min_bytes=chunked_min_bytes)
+    header = read_header(str(tmp_path))
+    loaded = load_artifact(str(tmp_path), header)
+
+    assert header["format"] == "compact"
+    assert isinstance(loaded, CompactBands) and loaded.encoding == encoding
+    np.testing.assert_array_equal(np.asarray(loaded.codes), bands.codes)
+    np.testing.assert_array_equal(loaded[[3, 40, 499]], bands[[3, 40, 499]])
+
+
+def test_prediction_over_compact_bands_is_batched():
+    """
+    Test if predictions decode one batch at a time and the cache key depends on
+    the codes and encoding.
+    """
+    class RecordingModel:
+        def __init__(self):
+            self.batches = []
+
+        def predict(self, x, batch_size=32, verbose=0):
+            self.batches.append((x.dtype, len(x)))
+            return x.reshape(len(x), -1)[:, :2]
+
+    encoding = SpectralEncoding("float16")
+    values = np.random.default_rng(2).random((1000, 6, 1))
+    bands = CompactBands(encoding.encode(values), encoding)
+    model = RecordingModel()
+    outputs = predict_batches(model, bands, batch_size=256)
+
+    assert [length for _, length in model.batches] == [256, 256, 256, 232]
+    assert all(dtype == np.float32 for dtype, _ in model.batches)
+    np.testing.assert_allclose(outputs, values.reshape(1000, -1)[:, :2], atol=1e-3)
+    assert array_fingerprint(bands) != array_fingerprint(CompactBands(bands.codes, SpectralEncoding("float16", 2.0)))
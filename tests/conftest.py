@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from pipelines.synthetic_data import make_pixel_table
+
+SAMPLES_PATH = "./data/samples.csv"
+
+
+@pytest.fixture(autouse=True)
+def step_trace_path(tmp_path, monkeypatch):
+    """Send the records of instrumented steps to a per-test trace, not .cache/traces."""
+    path = tmp_path / "steps.jsonl"
+    monkeypatch.setenv("HSI_TRACE_PATH", str(path))
+    return path
+
+
+@pytest.fixture(scope="session")
+def synthetic_samples(tmp_path_factory):
+    """
+    Factory writing a synthetic samples CSV and returning its path. Keyword
+    arguments go to make_pixel_table; with split_images=True the second half of
+    every image's pixels comes after all first halves, so images span chunks.
+    Each distinct table is written once per session.
+    """
+    paths = {}
+
+    def write(split_images: bool = False, **table_kwargs) -> str:
+        key = (split_images, tuple(sorted(table_kwargs.items())))
+        if key not in paths:
+            table = make_pixel_table(**table_kwargs)
+            if split_images:
+                position = table.groupby("Sample_num").cumcount()
+                second_half = position >= table.groupby("Sample_num")["Sample_num"].transform("size") // 2
+                table = pd.concat([table[~second_half], table[second_half]])
+            path = tmp_path_factory.mktemp("data") / "samples.csv"
+            table.to_csv(path, index=False)
+            paths[key] = str(path)
+        return paths[key]
+
+    return write
+
+
+@pytest.fixture(scope="module")
+def samples_path(synthetic_samples):
+    """
+    The real samples CSV when it is present, otherwise a synthetic table with the
+    same columns (including NaNs and "Mixed or Not Classified" images to clean).
+    """
+    if os.path.exists(SAMPLES_PATH):
+        return SAMPLES_PATH
+    return synthetic_samples(n_images=60, n_bands=32, pixels_per_image=50, nan_rate=0.02)
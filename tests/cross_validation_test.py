@@ -0,0 +1,51 @@
+import numpy as np
+
+from model.cross_validation import CrossValidation, group_folds
+from pipelines.synthetic_data import make_pixel_table
+
+
+class NearestCentroidTrainer:
+    """Picklable stand-in for the CNN: nearest class mean spectrum."""
+
+    def __call__(self, x_train, y_train, train_sample_nums, x_test, num_classes):
+        centroids = np.stack([x_train[y_train == label].mean(axis=0) for label in range(num_classes)])
+        distances = ((x_test[:, None, :] - centroids[None]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+
+
+def _dataset():
+    table = make_pixel_table(n_images=60, n_bands=16, pixels_per_image=20, seed=4)
+    labels = table["Label"].factorize(sort=True)[0]
+    x = table.filter(like="frq").to_numpy(dtype=np.float32)
+    return x, labels, table["Sample_num"].to_numpy()
+
+
+def test_group_folds_keep_images_together():
+    """
+    Test if every image is held out in exactly one fold and never split across
+    train and test.
+    """
+    x, labels, sample_nums = _dataset()
+    folds = group_folds(labels, sample_nums, n_folds=4, seed=0)
+    held_out = np.concatenate([sample_nums[test] for _, test in folds])
+    assert sorted(np.unique(held_out)) == sorted(np.unique(sample_nums))
+    for train, test in folds:
+        assert not set(sample_nums[train]) & set(sample_nums[test])
+        assert len(train) + len(test) == len(x)
+
+
+def test_parallel_cross_validation_matches_serial():
+    """
+    Test if folds run in worker processes over the memory-mapped matrix give the
+    same pooled and per-fold metrics as running them in-process.
+    """
+    x, labels, sample_nums = _dataset()
+    serial = CrossValidation(NearestCentroidTrainer(), n_folds=3, num_workers=1, seed=0).run(x, labels, sample_nums)
+    parallel = CrossValidation(NearestCentroidTrainer(), n_folds=3, num_workers=2, seed=0).run(x, labels, sample_nums)
+
+    assert serial["image_metrics"] == parallel["image_metrics"]
+    assert serial["pixel_metrics"] == parallel["pixel_metrics"]
+    assert [fold["image_accuracy"] for fold in serial["folds"]] == [fold["image_accuracy"] for fold in parallel["folds"]]
+    assert sum(fold["test_pixels"] for fold in parallel["folds"]) == len(x)
+    assert serial["pixel_metrics"]["pixel_accuracy"] > 0.5
+    assert set(serial["mean"]) == set(serial["std"])
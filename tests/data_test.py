@@ -2,10 +2,12 @@ import logging
 import pytest
 import pandas as pd
 import numpy as np
-from model.data_cleaning import DataCleaning, DataPreprocessStrategy, DataDivideStrategy
+from model.data_cleaning import (
+    DataCleaning, DataPreprocessStrategy, DataDivideStrategy, ShardedPreprocessStrategy
+)
 
 
-def test_preprocessing_shapes():
+def test_preprocessing_shapes(samples_path):
     """
     Test if the preprocessing step outputs the correct data structure and shapes.
     """
@@ -13,7 +15,7 @@ def test_preprocessing_shapes():
         logging.info("Testing preprocessing shapes...")
 
         # Sample data for testing
-        df = pd.read_csv("./data/samples.csv")
+        df = pd.read_csv(samples_path)
         preprocess_strategy = DataPreprocessStrategy()
         data_cleaning = DataCleaning(df, preprocess_strategy)
         preprocessed_data, label_encoder = data_cleaning.handle_data()
@@ -32,7 +34,7 @@ def test_preprocessing_shapes():
         pytest.fail(f"Preprocessing shapes test failed: {str(e)}")
 
 
-def test_train_test_split_shapes():
+def test_train_test_split_shapes(samples_path):
     """
     Test if the train-test split step produces correctly shaped outputs.
     """
@@ -40,7 +42,7 @@ def test_train_test_split_shapes():
         logging.info("Testing train-test split shapes...")
 
         # Sample data for testing
-        df = pd.read_csv("./data/samples.csv")
+        df = pd.read_csv(samples_path)
         preprocess_strategy = DataPreprocessStrategy()
         data_cleaning_preprocess = DataCleaning(df, preprocess_strategy)
         preprocessed_data, _ = data_cleaning_preprocess.handle_data()
@@ -62,7 +64,7 @@ def test_train_test_split_shapes():
         pytest.fail(f"Train-test split shapes test failed: {str(e)}")
 
 
-def test_no_data_leakage():
+def test_no_data_leakage(samples_path):
     """
     Test if there is any data leakage between training and testing datasets.
     """
@@ -70,7 +72,7 @@ def test_no_data_leakage():
         logging.info("Testing for data leakage...")
 
         # Sample data for testing
-        df = pd.read_csv("./data/samples.csv")
+        df = pd.read_csv(samples_path)
         preprocess_strategy = DataPreprocessStrategy()
         data_cleaning_preprocess = DataCleaning(df, preprocess_strategy)
         preprocessed_data, _ = data_cleaning_preprocess.handle_data()
@@ -91,7 +93,7 @@ def test_no_data_leakage():
         pytest.fail(f"Data leakage test failed: {str(e)}")
 
 
-def test_label_range_consistency():
+def test_label_range_consistency(samples_path):
     """
     Test if label encoding is consistent and within expected range.
     """
@@ -99,7 +101,7 @@ def test_label_range_consistency():
         logging.info("Testing label encoding consistency...")
 
         # Sample data for testing
-        df = pd.read_csv("./data/samples.csv")
+        df = pd.read_csv(samples_path)
         preprocess_strategy = DataPreprocessStrategy()
         data_cleaning = DataCleaning(df, preprocess_strategy)
         preprocessed_data, label_encoder = data_cleaning.handle_data()
@@ -115,7 +117,7 @@ def test_label_range_consistency():
         pytest.fail(f"Label range consistency test failed: {str(e)}")
 
 
-def test_frequency_columns_integrity():
+def test_frequency_columns_integrity(samples_path):
     """
     Test if frequency columns contain valid values after preprocessing.
     """
@@ -123,7 +125,7 @@ def test_frequency_columns_integrity():
         logging.info("Testing frequency column integrity...")
 
         # Sample data for testing
-        df = pd.read_csv("./data/samples.csv")
+        df = pd.read_csv(samples_path)
         preprocess_strategy = DataPreprocessStrategy()
         data_cleaning = DataCleaning(df, preprocess_strategy)
         preprocessed_data, _ = data_cleaning.handle_data()
@@ -136,3 +138,53 @@ def test_frequency_columns_integrity():
         logging.info("Frequency column integrity test passed.")
     except Exception as e:
         pytest.fail(f"Frequency column integrity test failed: {str(e)}")
+
+
+def test_sharded_preprocessing_matches_serial(samples_path):
+    """
+    Test if sharded multi-process preprocessing returns exactly the serial result,
+    also when the pixels of an image are not stored contiguously.
+    """
+    try:
+        logging.info("Testing sharded preprocessing...")
+
+        df = pd.read_csv(samples_path)
+        shuffled = df.sample(frac=1.0, random_state=0)
+        for source in (df, shuffled):
+            expected, expected_encoder = DataPreprocessStrategy().handle_data(source.copy())
+            sharded, sharded_encoder = ShardedPreprocessStrategy(num_workers=2).handle_data(source.copy())
+
+            pd.testing.assert_frame_equal(sharded, expected, check_exact=True)
+            assert list(sharded_encoder.classes_) == list(expected_encoder.classes_), "Label encoding differs."
+
+        logging.info("Sharded preprocessing test passed.")
+    except Exception as e:
+        pytest.fail(f"Sharded preprocessing test failed: {str(e)}")
+
+
+def test_sharded_preprocessing_keeps_images_in_one_shard(samples_path, monkeypatch):
+    """
+    Test if shards are formed by Sample_num, so an image stored under several
+    File names is cleaned in a single shard.
+    """
+    df = pd.read_csv(samples_path)
+    # Give every second pixel of an image a different file name of the same sample
+    second_file = df.groupby("Sample_num").cumcount() % 2 == 1
+    df.loc[second_file, "File"] = df.loc[second_file, "File"] + "_part2"
+
+    shards = []
+    original = ShardedPreprocessStrategy._shard_rows
+
+    def recording_shard_rows(image_codes, num_shards):
+        shards.extend(original(image_codes, num_shards))
+        return shards
+
+    monkeypatch.setattr(ShardedPreprocessStrategy, "_shard_rows", staticmethod(recording_shard_rows))
+    ShardedPreprocessStrategy(num_workers=1, shards_per_worker=8).handle_data(df.copy())
+
+    sample_nums = df["File"].str.split("_").str[0].astype(int).to_numpy()
+    shard_of_row = np.empty(len(df), dtype=int)
+    for shard, rows in enumerate(shards):
+        shard_of_row[rows] = shard
+    assert (pd.Series(shard_of_row).groupby(sample_nums).nunique() == 1).all()
+    assert len(shards) > 1
@@ -0,0 +1,120 @@
+import pickle
+
+import numpy as np
+
+import model.early_exit
+from model.early_exit import EarlyExitVoter, TilePixels, vote_settled
+
+
+def _first_band_label(pixels):
+    return pixels[:, 0].astype(int)
+
+
+class FirstBandModel:
+    """Picklable stand-in: class 1 for pixels whose first band exceeds 0.5."""
+
+    def predict(self, x):
+        first = (x.reshape(len(x), -1)[:, 0] > 0.5).astype(np.float32)
+        return np.stack([1 - first, first], axis=1)
+
+
+def test_vote_settled_bounds():
+    """
+    Test if a vote settles when the runner-up cannot catch up, or when the sample
+    is large enough, but not on a close race.
+    """
+    assert vote_settled(np.array([60, 10, 0]), scored=70, total=100, alpha=1e-9)
+    assert not vote_settled(np.array([6, 4]), scored=10, total=10_000, alpha=0.01)
+    assert vote_settled(np.array([900, 100]), scored=1000, total=100_000, alpha=0.001)
+    assert not vote_settled(np.array([510, 490]), scored=1000, total=100_000, alpha=0.001)
+
+
+def test_early_exit_saves_pixels_and_agrees_with_full_voting():
+    """
+    Test if homogeneous images exit early, a contested image is scored in full,
+    and the early labels agree with full voting.
+    """
+    rng = np.random.default_rng(0)
+    x, sample_nums = [], []
+    for image, (size, purity) in enumerate([(5000, 0.95), (8000, 0.8), (3000, 0.7), (4000, 0.5)]):
+        labels = np.where(rng.random(size) < purity, image % 3, (image + 1) % 3)
+        x.append(labels[:, None].astype(np.float32))
+        sample_nums.append(np.full(size, 100 + image))
+    voter = EarlyExitVoter(_first_band_label, num_classes=3, confidence=0.99, batch_size=64, verify=True)
+    images, report = voter.classify_images(np.concatenate(x), np.concatenate(sample_nums))
+
+    assert report["agreement_rate"] == 1.0
+    assert images["early_exit"].tolist()[:3] == [True, True, True]
+    assert images.loc[0, "scored_pixels"] < 500
+    contested = images.iloc[3]
+    assert not contested["early_exit"]
+    assert contested["scored_pixels"] == contested["total_pixels"] == 4000
+    assert report["pixels_saved_fraction"] > 0.5
+    assert report["pixels_total"] == 20_000
+
+
+def test_tiles_are_voted_from_lazily_read_windows(tmp_path):
+    """
+    Test if tile pixels are read window by window, skipping NaN pixels, and if
+    voting in worker processes gives the same labels as in-process voting.
+    """
+    model_path = tmp_path / "model.pkl"
+    with open(model_path, "wb") as fid:
+        pickle.dump(FirstBandModel(), fid)
+    rng = np.random.default_rng(1)
+    tiles = []
+    for name, purity in (("bright", 0.97), ("dark", 0.03)):
+        tile = np.where(rng.random((4, 120, 50)) < purity, 0.9, 0.1).astype(np.float32)
+        tile[:, :3, :] = np.nan
+        np.save(tmp_path / f"{name}.npy", tile)
+        tiles.append(str(tmp_path / f"{name}.npy"))
+
+    pixels = TilePixels(tiles[0], window_rows=7)
+    tile = np.load(tiles[0])
+    assert len(pixels) == 117 * 50 and len(pixels.windows) == 18
+    rows = np.array([0, 1, 349, 350, 5849])
+    np.testing.assert_array_equal(pixels[rows], tile[:, 3:, :].reshape(4, -1).T[rows])
+
+    voter = EarlyExitVoter.from_path(str(model_path), num_classes=2, batch_size=64)
+    serial, report = voter.classify_tiles(tiles, memory_limit_mb=0.05)
+    pooled, pooled_report = voter.classify_tiles(tiles, workers=2, memory_limit_mb=0.05)
+
+    assert serial["label"].tolist() == [1, 0]
+    assert serial.equals(pooled)
+    assert report["pixels_total"] == 2 * 117 * 50 and report["pixels_saved_fraction"] > 0.5
+    assert pooled_report["workers"] == 2
+
+
+def test_tile_windows_are_read_once_within_the_cache_budget(tmp_path, monkeypatch):
+    """
+    Test if the valid pixels of windows already read are reused while they fit
+    the cache, and if a tile without valid pixels is left out of the agreement rate.
+    """
+    rng = np.random.default_rng(2)
+    tile = np.where(rng.random((4, 60, 50)) < 0.97, 0.9, 0.1).astype(np.float32)
+    np.save(tmp_path / "bright.npy", tile)
+    np.save(tmp_path / "empty.npy", np.full((4, 10, 10), np.nan, dtype=np.float32))
+    reads = []
+    read_window = model.early_exit.read_window
+
+    def recording_read_window(path, row_start, row_stop, bands=None):
+        reads.append(row_start)
+        return read_window(path, row_start, row_stop, bands)
+
+    monkeypatch.setattr(model.early_exit, "read_window", recording_read_window)
+
+    pixels = TilePixels(str(tmp_path / "bright.npy"), window_rows=6, cache_bytes=tile.nbytes)
+    reads.clear()
+    for rows in (np.arange(0, 3000, 7), np.arange(1, 3000, 5), np.arange(3000)):
+        np.testing.assert_array_equal(pixels[rows], tile.reshape(4, -1).T[rows])
+    assert sorted(reads) == list(range(0, 60, 6))
+
+    uncached = TilePixels(str(tmp_path / "bright.npy"), window_rows=6)
+    reads.clear()
+    uncached[np.arange(3000)], uncached[np.arange(3000)]
+    assert len(reads) == 20
+
+    voter = EarlyExitVoter(_first_band_label, num_classes=2, batch_size=64, verify=True)
+    images, report = voter.classify_tiles([str(tmp_path / "bright.npy"), str(tmp_path / "empty.npy")])
+    assert images["total_pixels"].tolist() == [3000, 0]
+    assert report["agreement_rate"] == 1.0
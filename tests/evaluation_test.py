@@ -0,0 +1,164 @@
+import time
+
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, mean_squared_error, r2_score
+
+from model.evaluation import (
+    ConfusionAccumulator,
+    RegressionAccumulator,
+    batch_confusion_counts,
+    bootstrap_confidence_intervals,
+    confusion_counts,
+)
+
+
+def _random_predictions(seed=0, n_pixels=5000, num_classes=6, n_images=40):
+    rng = np.random.default_rng(seed)
+    sample_nums = rng.integers(0, n_images, n_pixels) * 7 + 3
+    image_labels = rng.integers(0, num_classes, sample_nums.max() + 1)
+    y_true = image_labels[sample_nums]
+    noise = rng.random(n_pixels) < 0.3
+    y_pred = np.where(noise, rng.integers(0, num_classes, n_pixels), y_true)
+    return y_true, y_pred, sample_nums
+
+
+def test_pixel_metrics_match_sklearn():
+    """
+    Test if metrics derived from the confusion counts match sklearn's.
+    """
+    num_classes = 6
+    y_true, y_pred, sample_nums = _random_predictions(num_classes=num_classes)
+    accumulator = ConfusionAccumulator(num_classes).update(y_true, y_pred, sample_nums)
+    metrics = accumulator.pixel_metrics()
+
+    np.testing.assert_array_equal(
+        accumulator.pixel_confusion_matrix,
+        confusion_matrix(y_true, y_pred, labels=range(num_classes)),
+    )
+    assert metrics["pixel_accuracy"] == pytest.approx(accuracy_score(y_true, y_pred))
+    assert metrics["pixel_f1"] == pytest.approx(f1_score(y_true, y_pred, average="weighted"))
+    assert metrics["pixel_macro_f1"] == pytest.approx(f1_score(y_true, y_pred, average="macro"))
+
+
+def test_image_metrics_use_majority_vote():
+    """
+    Test if image-level metrics come from a per-image majority vote.
+    """
+    num_classes = 6
+    y_true, y_pred, sample_nums = _random_predictions(num_classes=num_classes)
+    accumulator = ConfusionAccumulator(num_classes).update(y_true, y_pred, sample_nums)
+
+    images = np.unique(sample_nums)
+    expected_pred = [np.bincount(y_pred[sample_nums == s], minlength=num_classes).argmax() for s in images]
+    expected_true = [y_true[sample_nums == s][0] for s in images]
+
+    np.testing.assert_array_equal(accumulator.sample_nums, images)
+    np.testing.assert_array_equal(accumulator.image_predictions, expected_pred)
+    assert accumulator.image_metrics()["image_accuracy"] == pytest.approx(
+        accuracy_score(expected_true, expected_pred)
+    )
+
+
+def test_sharded_merge_matches_single_pass():
+    """
+    Test if merging partial accumulators (with images split across shards) matches a single pass.
+    """
+    num_classes = 6
+    y_true, y_pred, sample_nums = _random_predictions(num_classes=num_classes)
+    full = ConfusionAccumulator(num_classes).update(y_true, y_pred, sample_nums)
+
+    shards = np.array_split(np.arange(y_true.size), 4)
+    partials = [
+        ConfusionAccumulator(num_classes).update(y_true[idx], y_pred[idx], sample_nums[idx])
+        for idx in shards
+    ]
+    merged = ConfusionAccumulator.merge_all(partials)
+
+    np.testing.assert_array_equal(merged.sample_nums, full.sample_nums)
+    np.testing.assert_array_equal(merged.image_counts, full.image_counts)
+    assert merged.image_metrics() == full.image_metrics()
+
+
+def test_batch_confusion_counts_per_model():
+    """
+    Test if the multi-model bincount matches per-model confusion matrices.
+    """
+    y_true, y_pred, _ = _random_predictions()
+    y_preds = np.stack([y_pred, y_true, np.roll(y_pred, 1)])
+    batched = batch_confusion_counts(y_true, y_preds, 6)
+    for i in range(3):
+        np.testing.assert_array_equal(batched[i], confusion_counts(y_true, y_preds[i], 6))
+
+
+def test_regression_accumulator_matches_sklearn():
+    """
+    Test if merged single-pass regression moments match sklearn's MSE and R2.
+    """
+    rng = np.random.default_rng(1)
+    y_true = rng.normal(10, 3, 1000)
+    y_pred = y_true + rng.normal(0, 1, 1000)
+    accumulator = RegressionAccumulator()
+    for idx in np.array_split(np.arange(1000), 3):
+        accumulator.merge(RegressionAccumulator().update(y_true[idx], y_pred[idx]))
+
+    assert accumulator.mse == pytest.approx(mean_squared_error(y_true, y_pred))
+    assert accumulator.r2 == pytest.approx(r2_score(y_true, y_pred))
+
+
+def test_bootstrap_intervals_bracket_estimates_quickly():
+    """
+    Test if image-resampling bootstrap intervals contain the point estimates and run fast.
+    """
+    num_classes = 6
+    y_true, y_pred, sample_nums = _random_predictions(num_classes=num_classes, n_images=60)
+    accumulator = ConfusionAccumulator(num_classes).update(y_true, y_pred, sample_nums)
+    estimates = {**accumulator.pixel_metrics(), **accumulator.image_metrics()}
+
+    start = time.perf_counter()
+    intervals = bootstrap_confidence_intervals(accumulator, n_replicates=5000, seed=0)
+    elapsed = time.perf_counter() - start
+
+    assert set(intervals) == set(estimates)
+    for name, (lower, upper) in intervals.items():
+        assert lower <= estimates[name] <= upper, name
+    assert elapsed < 1.0
+
+
+def test_bootstrap_intervals_collapse_for_identical_images():
+    """
+    Test if resampling identical images yields zero-width intervals.
+    """
+    sample_nums = np.repeat(np.arange(10), 20)
+    y_true = np.zeros(200, dtype=int)
+    y_pred = np.tile(np.r_[np.zeros(15, dtype=int), np.ones(5, dtype=int)], 10)
+    accumulator = ConfusionAccumulator(2).update(y_true, y_pred, sample_nums)
+
+    lower, upper = bootstrap_confidence_intervals(accumulator, n_replicates=200, seed=0)["pixel_accuracy"]
+    assert lower == pytest.approx(0.75) and upper == pytest.approx(0.75)
+
+
+def test_evaluate_step_runs_without_mlflow(monkeypatch):
+    """
+    Test if the evaluation step returns its metrics when MLflow is not installed.
+    """
+    import sys
+
+    from sklearn.preprocessing import LabelEncoder
+
+    from steps.config import EvaluationConfig
+    from steps.evaluation import evaluate
+
+    class FirstBandModel:
+        def predict(self, x, batch_size=32, verbose=0):
+            return np.eye(3, dtype=np.float32)[np.asarray(x).reshape(len(x), -1)[:, 0].astype(int)]
+
+    monkeypatch.setitem(sys.modules, "mlflow", None)
+    y_true, y_pred, sample_nums = _random_predictions(num_classes=3)
+    x = y_pred.astype(np.float32).reshape(-1, 1, 1)
+    pixel_metrics, image_metrics = evaluate(
+        FirstBandModel(), x, np.eye(3)[y_true], LabelEncoder().fit(["a", "b", "c"]), sample_nums,
+        EvaluationConfig(prediction_cache_dir=None)
+    )
+    assert pixel_metrics["pixel_accuracy"] == pytest.approx(accuracy_score(y_true, y_pred))
+    assert "image_accuracy" in image_metrics
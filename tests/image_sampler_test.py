@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipelines.utils import _image_keys, sample_images
+
+# Every image is split across the file so its pixels arrive in different chunks
+SPLIT_TABLE = {"split_images": True, "n_images": 120, "n_bands": 8, "pixels_per_image": 40, "seed": 3}
+
+
+def test_sampler_keeps_whole_images_of_every_label(synthetic_samples):
+    """
+    Test if the sampler returns complete images only, at least two per label, and
+    stays within the row budget apart from those per-label images.
+    """
+    samples_path = synthetic_samples(**SPLIT_TABLE)
+    full = pd.read_csv(samples_path)
+    sample = sample_images(samples_path, max_rows=1200, chunksize=500)
+
+    rows_per_image = full.groupby("Sample_num").size()
+    sampled = sample.groupby("Sample_num").size()
+    assert (sampled == rows_per_image[sampled.index]).all()
+    assert sample.index.is_monotonic_increasing
+    assert sample.equals(full.loc[sample.index])
+
+    images_per_label = sample.groupby("Label")["Sample_num"].nunique()
+    assert len(images_per_label) == full["Label"].nunique()
+    assert (images_per_label >= 2).all()
+    assert len(sample) <= 1200 + 2 * 40 * len(images_per_label)
+
+
+def test_sampler_is_deterministic_per_seed(synthetic_samples):
+    """
+    Test if the sample depends on the seed but not on the chunk size.
+    """
+    samples_path = synthetic_samples(**SPLIT_TABLE)
+    first = sample_images(samples_path, max_rows=800, chunksize=300)
+    assert first.equals(sample_images(samples_path, max_rows=800, chunksize=5000))
+    other = sample_images(samples_path, max_rows=800, chunksize=300, seed=1)
+    assert set(other["Sample_num"]) != set(first["Sample_num"])
+
+
+@pytest.mark.parametrize("chunksize", [40, 120, 1000])
+def test_sampler_fills_the_budget_whatever_the_chunking(tmp_path, chunksize):
+    """
+    Test if an image evicted from the budget does not shut out a smaller-key
+    image that arrives later and still fits.
+    """
+    sample_nums = np.arange(1, 50)
+    x, z, y = sample_nums[np.argsort(_image_keys(sample_nums, 0))[[0, 1, 2]]]
+    table = pd.DataFrame({
+        "Sample_num": np.repeat([x, y, z], [60, 60, 30]),
+        "Label": "grass",
+        "frq_1": 0.5,
+    })
+    path = tmp_path / "samples.csv"
+    table.to_csv(path, index=False)
+
+    sample = sample_images(str(path), max_rows=100, min_images_per_label=0, chunksize=chunksize)
+    assert sorted(set(sample["Sample_num"])) == sorted([x, z])
+    assert len(sample) == 90
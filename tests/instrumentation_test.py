@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+from steps.instrumentation import instrumented, load_trace, to_chrome_trace
+
+
+def test_instrumented_step_records_trace_and_profile(tmp_path, monkeypatch):
+    """
+    Test if an instrumented step records timings, memory, rows/s and bytes to the
+    trace, writes a profile when asked, and still records failing calls.
+    """
+    trace_path = str(tmp_path / "trace.jsonl")
+    monkeypatch.setenv("HSI_PROFILE_DIR", str(tmp_path / "profiles"))
+
+    @instrumented("scale", profile=True, trace_path=trace_path)
+    def scale(x, factor=2.0):
+        for _ in range(20):
+            y = np.sort(x * factor, axis=0)
+        return y
+
+    x = np.random.default_rng(0).normal(size=(200_000, 8))
+    scale(x)
+
+    record = scale.last_record
+    assert record["step"] == "scale" and record["status"] == "ok"
+    assert record["rows"] == 200_000 and record["rows_per_second"] > 0
+    assert record["input_memory_bytes"] == x.nbytes and record["output_memory_bytes"] == x.nbytes
+    assert record["peak_rss_mb"] > x.nbytes / 1024 ** 2
+    assert record["cpu_seconds"] > 0
+    assert os.path.exists(record["profile"])
+    with open(record["profile"]) as fid:
+        assert "scale" in fid.read()
+
+    @instrumented("broken", trace_path=trace_path)
+    def broken(x):
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        broken(x)
+
+    records = load_trace(trace_path)
+    assert [r["step"] for r in records] == ["scale", "broken"]
+    assert records[1]["status"] == "error"
+    to_chrome_trace(records, str(tmp_path / "chrome.json"))
+    assert os.path.getsize(tmp_path / "chrome.json") > 0
+
+
+def test_instrumentation_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("HSI_INSTRUMENTATION", "0")
+    trace_path = tmp_path / "trace.jsonl"
+
+    @instrumented(trace_path=str(trace_path))
+    def identity(x):
+        return x
+
+    assert identity(3) == 3
+    assert identity.last_record is None and not trace_path.exists()
@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+import pytest
+
+from pipelines.local_runner import LocalPipelineRunner, LocalStep
+
+CALLS = []
+
+
+def load(size):
+    CALLS.append("load")
+    return np.arange(size, dtype=np.float64)
+
+
+def double(values):
+    CALLS.append("double")
+    time.sleep(0.3)
+    return values * 2
+
+
+def square(values):
+    CALLS.append("square")
+    time.sleep(0.3)
+    return values ** 2
+
+
+def combine(doubled, squared):
+    CALLS.append("combine")
+    return doubled + squared, float(squared.sum())
+
+
+def _steps(size=10):
+    return [
+        LocalStep("load", load, params={"size": size}, outputs=("values",)),
+        LocalStep("double", double, inputs={"values": "load.values"}),
+        LocalStep("square", square, inputs={"values": "load"}),
+        LocalStep(
+            "combine",
+            combine,
+            inputs={"doubled": "double", "squared": "square.output"},
+            outputs=("combined", "total"),
+        ),
+    ]
+
+
+def test_independent_branches_run_concurrently(tmp_path):
+    """
+    Test if the two independent branches overlap and outputs are routed by name.
+    """
+    runner = LocalPipelineRunner(_steps(), cache_dir=str(tmp_path))
+    results = runner.run()
+
+    np.testing.assert_array_equal(results["combine"]["combined"], np.arange(10) * 2 + np.arange(10) ** 2)
+    assert results["combine"]["total"] == float((np.arange(10) ** 2).sum())
+    timings = {entry["step"]: entry for entry in runner.report}
+    double_step, square_step = timings["double"], timings["square"]
+    assert max(double_step["started_at"], square_step["started_at"]) < min(
+        double_step["finished_at"], square_step["finished_at"]
+    )
+
+
+def test_cached_steps_are_skipped_until_params_change(tmp_path):
+    """
+    Test if a re-run loads every step from cache and a param change invalidates downstream steps.
+    """
+    LocalPipelineRunner(_steps(), cache_dir=str(tmp_path)).run()
+    CALLS.clear()
+
+    runner = LocalPipelineRunner(_steps(), cache_dir=str(tmp_path))
+    runner.run()
+    assert CALLS == []
+    assert all(entry["cached"] for entry in runner.report if entry["step"] != "<total>")
+
+    LocalPipelineRunner(_steps(size=12), cache_dir=str(tmp_path)).run()
+    assert sorted(CALLS) == ["combine", "double", "load", "square"]
+
+
+def test_invalid_graphs_are_rejected(tmp_path):
+    """
+    Test if unknown inputs and cycles are reported before anything runs.
+    """
+    with pytest.raises(ValueError, match="unknown step"):
+        LocalPipelineRunner([LocalStep("a", load, inputs={"size": "missing"})], cache_dir=str(tmp_path))
+    with pytest.raises(ValueError, match="cycle"):
+        LocalPipelineRunner(
+            [LocalStep("a", double, inputs={"values": "b"}), LocalStep("b", double, inputs={"values": "a"})],
+            cache_dir=str(tmp_path),
+        )
+
+
+def test_after_orders_steps_without_passing_outputs(tmp_path):
+    """
+    Test if a step declared `after` another waits for it, and if the training
+    pipeline runs the uncached publish and tile export steps after evaluation
+    (and never caches calibration or the similarity index).
+    """
+    steps = _steps() + [LocalStep("report", lambda: CALLS.append("report"), after=("combine",), enable_cache=False)]
+    CALLS.clear()
+    LocalPipelineRunner(steps, cache_dir=str(tmp_path)).run()
+    assert CALLS[-1] == "report"
+    with pytest.raises(ValueError, match="unknown step"):
+        LocalPipelineRunner([LocalStep("a", load, params={"size": 1}, after=("missing",))], cache_dir=str(tmp_path))
+
+    from pipelines.local_runner import training_pipeline_steps
+    from steps.config import CalibrationConfig, PublishConfig, SimilarityIndexConfig, TileExportConfig
+
+    pipeline = {
+        step.name: step
+        for step in training_pipeline_steps(
+            "samples.csv",
+            publish_config=PublishConfig(),
+            export_config=TileExportConfig(),
+            similarity_config=SimilarityIndexConfig(),
+            calibration_config=CalibrationConfig(),
+        )
+    }
+    for name in ("publish", "export_tiles"):
+        assert pipeline[name].upstream == ["clean_data", "evaluation", "model_train"]
+        assert not pipeline[name].enable_cache
+    assert pipeline["similarity_index"].upstream == ["clean_data"]
+    assert not pipeline["similarity_index"].enable_cache and not pipeline["calibration"].enable_cache
@@ -0,0 +1,129 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from materializer.chunked import ChecksumError, LazyChunkedArray, save_chunked
+from materializer.content_store import ContentAddressedStore
+from materializer.formats import load_artifact, read_header, save_artifact
+
+
+def _roundtrip(obj, directory):
+    directory.mkdir()
+    save_artifact(obj, str(directory))
+    header = read_header(str(directory))
+    return header, load_artifact(str(directory), header)
+
+
+def test_arrays_load_memory_mapped(tmp_path):
+    """
+    Test if numeric arrays are stored as .npy and come back memory-mapped and writable.
+    """
+    X = np.random.default_rng(0).random((50, 373, 1), dtype=np.float32)
+    header, loaded = _roundtrip(X, tmp_path / "array")
+
+    assert header["format"] == "npy"
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, X)
+
+    # Copy-on-write: in-place edits do not touch the stored artifact
+    loaded[0] = -1
+    np.testing.assert_array_equal(load_artifact(str(tmp_path / "array"), header)[0], X[0])
+
+
+def test_frames_and_series_use_parquet(tmp_path):
+    """
+    Test if DataFrames and Series round-trip through Parquet with index and names intact.
+    """
+    df = pd.DataFrame({"frq0": [0.1, 0.2, 0.3], "Label": ["Shrubs", "Built-up", "Shrubs"]}, index=[5, 7, 9])
+    header, loaded = _roundtrip(df, tmp_path / "frame")
+    assert header["format"] == "parquet"
+    pd.testing.assert_frame_equal(loaded, df)
+
+    series = pd.Series([1, 2, 3], name="Sample_num")
+    header, loaded = _roundtrip(series, tmp_path / "series")
+    assert header["format"] == "parquet"
+    pd.testing.assert_series_equal(loaded, series)
+
+
+def test_unsupported_objects_fall_back_to_pickle(tmp_path):
+    """
+    Test if objects without a dedicated format are pickled and strings stored as text.
+    """
+    header, loaded = _roundtrip({"classes": ["Shrubs"]}, tmp_path / "dict")
+    assert header["format"] == "pickle"
+    assert loaded == {"classes": ["Shrubs"]}
+
+    header, loaded = _roundtrip(pd.DataFrame({0: [1.0]}), tmp_path / "int_columns")
+    assert header["format"] == "pickle"
+
+    header, loaded = _roundtrip("cnn", tmp_path / "text")
+    assert header["format"] == "text" and loaded == "cnn"
+
+
+def test_chunked_arrays_decode_only_touched_chunks(tmp_path):
+    """
+    Test if large arrays are stored in compressed chunks and indexed lazily.
+    """
+    rng = np.random.default_rng(0)
+    X = (rng.random((40000, 64, 1)) * 0.5).astype(np.float32)
+    directory = tmp_path / "chunked"
+    directory.mkdir()
+    header = save_artifact(X, str(directory), chunked_min_bytes=1)
+
+    assert header["format"] == "chunked" and len(header["chunks"]) > 1
+    loaded = load_artifact(str(directory), read_header(str(directory)))
+    assert isinstance(loaded, LazyChunkedArray)
+    assert loaded.shape == X.shape
+
+    rows = np.array([3, 39999, 2, 3])
+    np.testing.assert_array_equal(loaded[rows], X[rows])
+    np.testing.assert_array_equal(loaded[10:20, 5], X[10:20, 5])
+    assert len(loaded._cache) == 2
+    np.testing.assert_array_equal(np.asarray(loaded), X)
+
+
+def test_chunk_corruption_is_detected(tmp_path):
+    """
+    Test if a damaged chunk fails its checksum instead of returning bad data.
+    """
+    X = np.arange(20000, dtype=np.float32).reshape(2000, 10)
+    directory = tmp_path / "corrupt"
+    directory.mkdir()
+    header = save_artifact(X, str(directory), chunked_min_bytes=1)
+
+    chunk_path = directory / header["chunks"][0]["file"]
+    data = bytearray(chunk_path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    chunk_path.write_bytes(bytes(data))
+
+    with pytest.raises(ChecksumError):
+        load_artifact(str(directory), header)[0]
+
+
+def test_content_store_deduplicates_and_collects(tmp_path):
+    """
+    Test if identical arrays share hard-linked chunks and unreferenced blobs are reclaimed.
+    """
+    store = ContentAddressedStore(str(tmp_path / "cas"))
+    X = np.random.default_rng(0).random((40000, 64), dtype=np.float32)
+
+    first, second = tmp_path / "run1", tmp_path / "run2"
+    first.mkdir()
+    second.mkdir()
+    save_chunked(X, str(first), store=store)
+    header = save_chunked(X, str(second), store=store)
+
+    assert header["deduplicated_chunks"] == len(header["chunks"])
+    chunk = header["chunks"][0]["file"]
+    assert os.path.samefile(first / chunk, second / chunk)
+    np.testing.assert_array_equal(np.asarray(LazyChunkedArray(str(second), header)), X)
+
+    shutil.rmtree(first)
+    assert store.gc(grace_seconds=0) == (0, 0)
+    shutil.rmtree(second)
+    removed, _ = store.gc(grace_seconds=0)
+    assert removed == len(header["chunks"])
+    assert store.usage() == (0, 0)
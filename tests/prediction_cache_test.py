@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from model.prediction_cache import PredictionCache
+
+
+class CountingModel:
+    """Minimal stand-in exposing the Keras methods the cache relies on."""
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.calls = 0
+
+    def get_weights(self):
+        return self.weights
+
+    def predict(self, x, verbose=0):
+        self.calls += 1
+        logits = x.reshape(len(x), -1)[:, :3] @ self.weights[0]
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_cache_reuses_predictions_for_same_model_and_input(tmp_path):
+    """
+    Test if a second predict with unchanged weights and input is served from the cache.
+    """
+    x = np.random.default_rng(0).normal(size=(100, 5, 1)).astype(np.float32)
+    model = CountingModel([np.eye(3, dtype=np.float32)])
+    cache = PredictionCache(str(tmp_path))
+
+    first = cache.predict(model, x)
+    second = cache.predict(model, x)
+
+    assert model.calls == 1
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_cache_misses_when_weights_or_input_change(tmp_path):
+    """
+    Test if changing the model weights or the input invalidates the cached entry.
+    """
+    x = np.random.default_rng(0).normal(size=(100, 5, 1)).astype(np.float32)
+    model = CountingModel([np.eye(3, dtype=np.float32)])
+    cache = PredictionCache(str(tmp_path))
+
+    cache.predict(model, x)
+    model.weights = [2 * np.eye(3, dtype=np.float32)]
+    cache.predict(model, x)
+    cache.predict(model, x + 1)
+
+    assert model.calls == 3
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """
+    Test if the size bound evicts the least recently used entry first.
+    """
+    entry = np.zeros((1000, 3), dtype=np.float32)
+    entry_bytes = os.path.getsize(_save_probe(tmp_path, entry))
+    cache = PredictionCache(str(tmp_path / "cache"), max_bytes=2 * entry_bytes)
+
+    cache.put("a", entry)
+    cache.put("b", entry)
+    os.utime(cache._path("a"), (1, 1))
+    os.utime(cache._path("b"), (2, 2))
+    cache.get("a")
+    cache.put("c", entry)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def _save_probe(tmp_path, array):
+    path = tmp_path / "probe.npy"
+    np.save(path, array)
+    return path
@@ -0,0 +1,63 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+from model.prediction_store import InMemoryStore, close_stores, get_store
+from steps.config import PublishConfig
+from steps.publish import publish
+
+
+class FixedModel:
+    """Stand-in model returning given class probabilities."""
+
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+
+    def predict(self, x, verbose=0):
+        return self.probabilities
+
+
+def test_publish_upserts_image_predictions_idempotently(tmp_path):
+    """
+    Test if publishing twice to SQLite leaves one majority-vote document per image,
+    plus the polygons, and reuses the store for the same URI.
+    """
+    sample_nums = np.repeat([7, 3, 9], 4)
+    y_true = np.repeat([0, 1, 2], 4)
+    y_pred = np.array([0, 0, 1, 0, 1, 1, 1, 2, 2, 0, 0, 0])
+    label_encoder = SimpleNamespace(classes_=np.array(["Shrubs", "Wetlands", "Built-up"]))
+    polygons_path = tmp_path / "polygons.json"
+    polygons_path.write_text(json.dumps([{"sample_num": 3, "coordinates": [[18.4, -33.9], [18.5, -33.9]]}]))
+    config = PublishConfig(
+        store_uri=f"sqlite:///{tmp_path / 'store.db'}", batch_size=2,
+        polygons_path=str(polygons_path), prediction_cache_dir=None
+    )
+
+    try:
+        for _ in range(2):
+            stats = publish(
+                FixedModel(np.eye(3)[y_pred]), np.zeros((12, 4, 1)), np.eye(3)[y_true],
+                label_encoder, sample_nums, config
+            )
+        assert stats["predictions"]["rows"] == 3 and stats["predictions"]["batches"] == 2
+
+        store = get_store(config.store_uri)
+        documents = store.find("predictions")
+        assert [document["sample_num"] for document in documents] == [3, 7, 9]
+        assert documents[0]["predicted_label_name"] == "Wetlands" and documents[0]["agreement"] == 0.75
+        assert documents[2]["ground_truth_label"] == "Built-up" and documents[2]["predicted_label"] == 0
+        assert store.find("polygons")[0]["coordinates"][1] == [18.5, -33.9]
+    finally:
+        close_stores()
+
+
+def test_in_memory_store_batches_round_trips():
+    """
+    Test if upserts are grouped into ceil(rows / batch_size) round trips and replace by key.
+    """
+    store = InMemoryStore()
+    store.upsert("predictions", ({"sample_num": i % 50, "value": i} for i in range(120)), batch_size=25)
+    assert store.round_trips == 5
+    assert len(store.find("predictions")) == 50
+    assert store.find("predictions")[0]["value"] == 100
@@ -0,0 +1,51 @@
+import numpy as np
+
+from model.sampling import PixelBudgetSampler, SampledBatches
+
+
+def test_sampler_caps_pixels_and_redraws_each_epoch():
+    """
+    Test if an epoch holds at most the capped number of pixels per image and per
+    class, matches len(sampler), and draws a different subset every epoch.
+    """
+    rng = np.random.default_rng(0)
+    sizes = np.array([2000, 1500, 30, 10, 400, 5])
+    sample_nums = np.repeat(np.arange(100, 106), sizes)
+    labels = np.repeat([0, 0, 1, 1, 2, 2], sizes)
+    order = rng.permutation(len(labels))
+    sample_nums, labels = sample_nums[order], labels[order]
+    sampler = PixelBudgetSampler(sample_nums, labels, max_pixels_per_image=100, max_pixels_per_class=150)
+
+    first, second = sampler.epoch_indices(0), sampler.epoch_indices(1)
+    assert len(first) == len(second) == len(sampler) == 150 + 40 + 105
+    assert len(np.unique(first)) == len(first)
+    assert np.bincount(sample_nums[first] - 100).max() <= 100
+    assert np.bincount(labels[first]).tolist() == [150, 40, 105]
+    assert (np.bincount(sample_nums[first] - 100)[[2, 3, 5]] == [30, 10, 5]).all()
+    assert len(np.intersect1d(first, second)) < len(first)
+    np.testing.assert_array_equal(first, sampler.epoch_indices(0))
+
+
+def test_batches_gather_rows_and_balance_weights():
+    """
+    Test if batches gather the sampled rows of x and y, and if balanced sample
+    weights give every class the same total weight.
+    """
+    labels = np.repeat([0, 1], [300, 60])
+    x = np.arange(len(labels), dtype=np.float32)[:, None]
+    y = np.eye(2)[labels]
+    sampler = PixelBudgetSampler(np.arange(len(labels)) // 20, y, max_pixels_per_image=10, balance_classes=True)
+    batches = SampledBatches(x, y, sampler, batch_size=32)
+
+    seen, totals = [], np.zeros(2)
+    for i in range(len(batches)):
+        xb, yb, wb = batches[i]
+        np.testing.assert_array_equal(yb.argmax(axis=1), labels[xb[:, 0].astype(int)])
+        seen.extend(xb[:, 0].astype(int))
+        np.add.at(totals, yb.argmax(axis=1), wb)
+    assert sorted(seen) == sorted(batches.indices)
+    np.testing.assert_allclose(totals[0], totals[1], rtol=1e-5)
+
+    previous = batches.indices.copy()
+    batches.on_epoch_end()
+    assert batches.epoch == 1 and not np.array_equal(np.sort(previous), np.sort(batches.indices))
@@ -0,0 +1,102 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from serving.server import PredictionServer
+
+
+class SlowBrightnessModel:
+    """Stand-in model: class 1 for bright spectra; each call costs a fixed 20 ms, like a forward pass."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, x):
+        time.sleep(0.02)
+        self.batch_sizes.append(len(x))
+        mean = x.reshape(len(x), -1).mean(axis=1)
+        return np.stack([1 - mean, mean], axis=1)
+
+
+def _post(url, payload):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_concurrent_requests_are_micro_batched():
+    """
+    Test if concurrent requests share model calls, get their own predictions back,
+    and show up in the health and metrics endpoints.
+    """
+    model = SlowBrightnessModel()
+    server = PredictionServer(
+        model, class_names=["dark", "bright"], n_bands=4, max_batch_size=256, max_latency_ms=20
+    ).start_background()
+    url = f"http://{server.host}:{server.port}"
+    try:
+        warmup_calls = len(model.batch_sizes)
+        spectra = [[0.9] * 4 if i % 3 == 0 else [0.1] * 4 for i in range(40)]
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            results = list(pool.map(lambda s: _post(f"{url}/predict", {"instances": [s]}), spectra))
+
+        assert all(status == 200 for status, _ in results)
+        assert [body["predictions"][0] for _, body in results] == [1 if i % 3 == 0 else 0 for i in range(40)]
+        assert results[0][1]["labels"] == ["bright"]
+        assert len(model.batch_sizes) - warmup_calls < 40
+
+        status, body = _post(f"{url}/predict", {"instances": [[0.1] * 3]})
+        assert status == 400 and "4 bands" in body["error"]
+
+        with urllib.request.urlopen(f"{url}/health", timeout=10) as response:
+            assert json.loads(response.read())["status"] == "ok"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+            metrics = response.read().decode()
+        assert "hsi_requests_total 40" in metrics
+        assert 'hsi_request_latency_seconds{quantile="0.99"}' in metrics
+    finally:
+        server.shutdown()
+
+
+def test_load_test_reports_latency_and_errors(tmp_path):
+    """
+    Test if closed- and open-loop load tests report throughput, latency percentiles
+    and errors, and if a replay file's non-request lines are skipped.
+    """
+    from serving.load_test import LoadTest, check_thresholds, load_recorded_requests, synthetic_requests
+
+    server = PredictionServer(SlowBrightnessModel(), n_bands=4, max_latency_ms=5).start_background()
+    url = f"http://{server.host}:{server.port}/predict"
+    recorded = tmp_path / "recorded.jsonl"
+    recorded.write_text(
+        json.dumps({"instances": [[0.2] * 4]}) + "\n"
+        + json.dumps({"payload": {"inputs": [[0.8] * 4]}}) + "\n"
+        + json.dumps({"instances": [[0.5] * 3]}) + "\n"  # wrong length: the server answers 400
+        + json.dumps({"request_id": "not-a-prediction"}) + "\n"
+    )
+    try:
+        bodies, skipped = load_recorded_requests(str(recorded))
+        assert (len(bodies), skipped) == (3, 1)
+        replay = LoadTest(url, bodies, mode="closed", concurrency=2, num_requests=30).run()
+        assert replay["requests"] == 30
+        assert replay["status_counts"] == {"200": 20, "400": 10}
+        assert replay["error_rate"] == round(10 / 30, 6)
+        assert check_thresholds(replay, max_error_rate=0.01)
+
+        open_loop = LoadTest(
+            url, synthetic_requests(10, n_bands=4), mode="open", rate=200, num_requests=40
+        ).run()
+        assert open_loop["succeeded"] == 40 and open_loop["errors"] == 0
+        assert open_loop["throughput_rps"] > 0
+        assert open_loop["latency_ms"]["p50"] <= open_loop["latency_ms"]["p99"]
+    finally:
+        server.shutdown()
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from model.compact import CompactBands, SpectralEncoding
+from model.data_cleaning import DataCleaning, DataDivideStrategy, DataPreprocessStrategy
+from model.spectral_classifiers import SPECTRAL_CLASSIFIERS, CascadeClassifier, get_spectral_classifier, threshold_tradeoff
+from pipelines.synthetic_data import make_pixel_table
+from steps.config import CascadeConfig
+from steps.evaluation import evaluate_cascade
+
+
+@pytest.fixture(scope="module")
+def split():
+    table = make_pixel_table(n_images=60, n_bands=32, pixels_per_image=40, seed=3)
+    data, _ = DataCleaning(table, DataPreprocessStrategy()).handle_data()
+    return DataCleaning(data, DataDivideStrategy(return_sample_nums=True)).handle_data()
+
+
+class PrototypeModel:
+    """Stand-in for the CNN: labels pixels by their nearest class prototype and records its inputs."""
+
+    def __init__(self, x, y):
+        y = y.argmax(axis=1)
+        x = x.reshape(len(x), -1)
+        self.prototypes = np.stack([x[y == k].mean(axis=0) for k in range(y.max() + 1)])
+        self.rows_seen = 0
+
+    def predict(self, x, batch_size=32, verbose=0):
+        x = np.asarray(x).reshape(len(x), -1)
+        self.rows_seen += len(x)
+        distances = np.square(x[:, None, :] - self.prototypes[None]).sum(axis=2)
+        return np.eye(len(self.prototypes), dtype=np.float32)[distances.argmin(axis=1)]
+
+    def get_weights(self):
+        return [self.prototypes]
+
+
+@pytest.mark.parametrize("name", sorted(SPECTRAL_CLASSIFIERS))
+def test_classifiers_fit_and_score_blocks(split, name):
+    """
+    Test if every classifier separates the synthetic classes and returns
+    probabilities, whether pixels come as Conv1D arrays or compact codes.
+    """
+    x_train, x_test, y_train, y_test = split[:4]
+    classifier = get_spectral_classifier(name).fit(x_train, y_train)
+    proba = classifier.predict_proba(x_test)
+
+    assert proba.shape == y_test.shape and proba.dtype == np.float32
+    np.testing.assert_allclose(proba.sum(axis=1), 1, atol=1e-5)
+    assert (proba.argmax(axis=1) == y_test.argmax(axis=1)).mean() > 0.75
+
+    encoding = SpectralEncoding("int16")
+    compact = CompactBands(encoding.encode(x_test), encoding)
+    np.testing.assert_array_equal(classifier.predict(compact), classifier.predict(x_test))
+
+
+def test_cascade_sends_only_uncertain_pixels_to_the_model(split):
+    """
+    Test if accepted front predictions skip the model, and if the threshold
+    moves pixels between the two stages.
+    """
+    x_train, x_test, y_train, y_test = split[:4]
+    front = get_spectral_classifier("centroid").fit(x_train, y_train)
+    model = PrototypeModel(x_train, y_train)
+    model_labels = model.predict(x_test).argmax(axis=1)
+
+    model.rows_seen = 0
+    result = CascadeClassifier(front, model.predict, threshold=0.9).predict(x_test)
+    assert model.rows_seen == int((~result["offloaded"]).sum())
+    np.testing.assert_array_equal(result["labels"][~result["offloaded"]], model_labels[~result["offloaded"]])
+    np.testing.assert_array_equal(
+        result["labels"][result["offloaded"]], result["front_proba"].argmax(axis=1)[result["offloaded"]]
+    )
+
+    everything = CascadeClassifier(front, model.predict, threshold=1.1).predict(x_test)
+    assert everything["offload_fraction"] == 0.0
+    np.testing.assert_array_equal(everything["labels"], model_labels)
+    nothing = CascadeClassifier(front, model.predict, threshold=0.0).predict(x_test)
+    assert nothing["offload_fraction"] == 1.0 and nothing["model_seconds_per_pixel"] is None
+
+    tradeoff = threshold_tradeoff(result["front_proba"], model_labels, y_test.argmax(axis=1), [0.0, 0.9, 1.1])
+    assert tradeoff[0.9]["offload_fraction"] == pytest.approx(result["offload_fraction"])
+    assert tradeoff[0.9]["accuracy"] == pytest.approx((result["labels"] == y_test.argmax(axis=1)).mean())
+    assert tradeoff[1.1]["offload_fraction"] == 0.0
+
+
+def test_evaluate_cascade_reports_offload_speedup_and_accuracy(split):
+    """
+    Test if the cascade evaluation reports the offloaded fraction, a speedup and
+    the accuracy difference against the CNN alone.
+    """
+    x_train, x_test, y_train, y_test, _, test_sample_nums = split
+    model = PrototypeModel(x_train, y_train)
+    config = CascadeConfig(classifier="sam", threshold=0.9, prediction_cache_dir=None)
+    report = evaluate_cascade(model, x_train, y_train, x_test, y_test, test_sample_nums, config)
+
+    assert 0.0 <= report["cascade_offload_fraction"] <= 1.0
+    assert report["cascade_speedup"] is None or report["cascade_speedup"] > 0
+    assert report["cascade_pixel_accuracy_delta"] == pytest.approx(
+        report["cascade_pixel_accuracy"] - report["cnn_pixel_accuracy"]
+    )
+    assert "cascade_image_accuracy" in report and "cnn_image_accuracy" in report
+    assert sorted(report["threshold_tradeoff"]) == sorted(config.sweep_thresholds)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from model.spectral_index import SpectralIndex
+
+
+def _spectra(n=4000, bands=24, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.random((8, bands))
+    brightness = rng.uniform(0.5, 1.5, size=(n, 1))
+    return ((centres[rng.integers(0, 8, n)] + rng.normal(0, 0.03, (n, bands))) * brightness).astype(np.float32)
+
+
+def test_exact_search_matches_brute_force():
+    """
+    Test if blocked exact search, scoring a few queries at a time, returns the
+    brute-force neighbours and distances for both the euclidean and the
+    spectral angle metric.
+    """
+    x = _spectra()
+    queries = x[:7] * 1.01
+    unit = lambda v: v / np.linalg.norm(v, axis=1, keepdims=True)  # noqa: E731
+    expected = {
+        "euclidean": np.linalg.norm(queries[:, None, :] - x[None], axis=2),
+        "angle": np.arccos(np.clip(unit(queries) @ unit(x).T, -1, 1)),
+    }
+    for metric, brute in expected.items():
+        index = SpectralIndex(metric, block_rows=500, query_rows=3).build(x, row=np.arange(len(x)))
+        distances, positions = index.search(queries, k=5)
+        np.testing.assert_allclose(distances, np.sort(brute, axis=1)[:, :5], atol=2e-3)
+        np.testing.assert_allclose(np.take_along_axis(brute, positions, axis=1), distances, atol=2e-3)
+
+
+def test_ivf_search_and_round_trip(tmp_path):
+    """
+    Test if probing every IVF list equals exact search, a few lists keep most
+    neighbours, and a saved PCA index answers the same after loading.
+    """
+    x = _spectra(seed=1)
+    index = SpectralIndex("euclidean", pca_components=6, n_lists=16).build(x, row=np.arange(len(x)))
+    queries = x[::400]
+    exact_distances, exact = index.search(queries, k=10)
+    _, probed_all = index.search(queries, k=10, n_probe=16)
+    _, approximate = index.search(queries, k=10, n_probe=4)
+    np.testing.assert_array_equal(probed_all, exact)
+    recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approximate, exact)])
+    assert recall >= 0.8
+
+    index.save(str(tmp_path))
+    loaded = SpectralIndex.load(str(tmp_path))
+    table = loaded.neighbours(queries, k=10)
+    np.testing.assert_allclose(table["distance"].to_numpy().reshape(-1, 10), exact_distances, rtol=1e-5)
+    assert (table.loc[table["rank"] == 0, "row"].to_numpy() == np.arange(0, len(x), 400)).all()
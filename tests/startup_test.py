@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+from benchmarks.import_time import DEFERRED_PACKAGES, MODULES, ROOT
+
+
+def test_step_modules_defer_heavy_imports():
+    """
+    Test if importing the step, model and pipeline modules loads none of the
+    deferred packages (TensorFlow, ZenML, MLflow, plotting).
+    """
+    probe = (
+        f"import sys\n"
+        f"for name in {list(MODULES)!r}:\n"
+        f"    __import__(name)\n"
+        f"print(','.join(p for p in {DEFERRED_PACKAGES!r} if p in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    assert completed.stdout.strip() == ""
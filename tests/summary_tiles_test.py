@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from model.prediction_cache import cached_predict
+from model.summary_tiles import SummaryTileExporter, decode_tile, grouped_quantiles, read_manifest
+from steps.config import TileExportConfig
+from steps.export_tiles import export_tiles
+
+
+def test_grouped_quantiles_match_numpy():
+    """
+    Test if the single-sort grouped quantiles equal np.quantile per group.
+    """
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(3000, 12)).astype(np.float32)
+    groups = rng.integers(0, 40, size=3000) * 11
+    keys, quantiles = grouped_quantiles(x, groups, [0.0, 0.25, 0.5, 1.0])
+    expected = np.stack([np.quantile(x[groups == key].astype(np.float64), [0.0, 0.25, 0.5, 1.0], axis=0) for key in keys])
+    np.testing.assert_allclose(quantiles, expected, atol=1e-9)
+
+
+def test_tiles_add_up_to_the_image_summaries(tmp_path):
+    """
+    Test if every zoom level's tiles cover all pixels and labels of the located
+    images, and if the image tile round-trips the per-image sums.
+    """
+    rng = np.random.default_rng(1)
+    sample_nums = np.repeat(np.arange(100, 130), 50)
+    x = rng.random((len(sample_nums), 16)).astype(np.float32)
+    y_true, y_pred = rng.integers(0, 3, len(x)), rng.integers(0, 3, len(x))
+    positions = pd.DataFrame({
+        "Sample_num": np.arange(100, 128),  # the last two images have no position
+        "longitude": 18.4 + rng.random(28) * 0.5,
+        "latitude": -33.9 + rng.random(28) * 0.5,
+    })
+
+    manifest = SummaryTileExporter(zoom_levels=[7, 11], spectrum_dtype="float32").export(
+        str(tmp_path), x, sample_nums, positions, y_true, y_pred, ["a", "b", "c"]
+    )
+    assert manifest == read_manifest(str(tmp_path))
+
+    images = decode_tile((tmp_path / "images.bin").read_bytes(), "float32")
+    np.testing.assert_array_equal(images["id"], np.arange(100, 130))
+    np.testing.assert_allclose(images["frequency_sum"][0], x[:50].astype(np.float64).sum())
+    np.testing.assert_allclose(images["mean_spectrum"][3], x[150:200].mean(axis=0), rtol=1e-5)
+    assert images["true_counts"].sum() == len(x)
+
+    located = sample_nums < 128
+    for zoom in ("7", "11"):
+        tiles = [
+            decode_tile(open(os.path.join(root, name), "rb").read(), "float32")
+            for root, _, names in os.walk(tmp_path / zoom) for name in names
+        ]
+        assert len(tiles) == manifest["zoom_levels"][zoom]["tiles"]
+        assert sum(tile["pixel_count"].sum() for tile in tiles) == located.sum()
+        assert sum(tile["image_count"].sum() for tile in tiles) == 28
+        pred_counts = sum(tile["pred_counts"].sum(axis=0) for tile in tiles)
+        np.testing.assert_array_equal(pred_counts, np.bincount(y_pred[located], minlength=3))
+        assert all((np.abs(tile["latitude"] + 33.65) < 1).all() for tile in tiles)
+
+
+def test_export_step_reads_the_configured_prediction_cache(tmp_path):
+    """
+    Test if the export step predicts through the configured cache directory, so
+    it reuses evaluation's predictions instead of writing a second copy, and
+    keeps that cache within the configured size.
+    """
+    class CountingModel:
+        calls = 0
+
+        def predict(self, x, batch_size=32, verbose=0):
+            CountingModel.calls += 1
+            return np.eye(2, dtype=np.float32)[(x.reshape(len(x), -1)[:, 0] > 0.5).astype(int)]
+
+        def get_weights(self):
+            return [np.ones(2)]
+
+    rng = np.random.default_rng(2)
+    x = rng.random((200, 4, 1)).astype(np.float32)
+    sample_nums = np.repeat(np.arange(10), 20)
+    y = np.eye(2)[rng.integers(0, 2, len(x))]
+    cache_dir = tmp_path / "predictions"
+    model = CountingModel()
+    cached_predict(model, x, cache_dir=str(cache_dir))
+
+    config = TileExportConfig(output_dir=str(tmp_path / "tiles"), prediction_cache_dir=str(cache_dir))
+    export_tiles(x, y, LabelEncoder().fit(["a", "b"]), sample_nums, model, config)
+    assert CountingModel.calls == 1
+    assert len(os.listdir(cache_dir)) == 1
+    images = decode_tile((tmp_path / "tiles" / "images.bin").read_bytes(), config.spectrum_dtype)
+    assert images["pred_counts"].sum() == len(x)
+
+    capped = TileExportConfig(
+        output_dir=str(tmp_path / "tiles"), prediction_cache_dir=str(cache_dir), prediction_cache_max_bytes=0
+    )
+    export_tiles(x[:100], y[:100], LabelEncoder().fit(["a", "b"]), sample_nums[:100], model, capped)
+    assert CountingModel.calls == 2
+    assert os.listdir(cache_dir) == []
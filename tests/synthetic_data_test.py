@@ -0,0 +1,45 @@
+import numpy as np
+
+from benchmarks.pipeline_benchmark import compare
+from pipelines.synthetic_data import make_cube, make_pixel_table
+
+
+def test_pixel_table_matches_samples_layout():
+    """
+    Test if the synthetic table has the samples.csv columns, one class per image,
+    every class present and the requested NaN rate.
+    """
+    table = make_pixel_table(n_images=48, n_bands=16, pixels_per_image=30, nan_rate=0.1, seed=1)
+
+    assert len(table) == 48 * 30
+    assert [f"frq{i}" for i in range(16)] == list(table.columns[:16])
+    for column in ("Label", "Sample_num", "File", "img_pxl_index", "row_coord", "col_coord"):
+        assert column in table.columns
+    assert (table.groupby("Sample_num")["Label"].nunique() == 1).all()
+    assert table["Label"].nunique() == 12
+    assert (table["File"].str.split("_").str[0].astype(int) == table["Sample_num"]).all()
+    nan_rows = table.filter(like="frq").isna().any(axis=1).mean()
+    assert 0.05 < nan_rows < 0.15
+
+
+def test_cube_layout_and_baseline_comparison():
+    """
+    Test if cubes come out as (bands, rows, cols) with a matching label map, and if
+    the benchmark comparison flags stages beyond the thresholds and stages
+    without a baseline timing.
+    """
+    cube, labels = make_cube(n_bands=8, rows=20, cols=30, n_classes=4, nan_rate=0.1, seed=2)
+    assert cube.shape == (8, 20, 30) and cube.dtype == np.float32
+    assert labels.shape == (20, 30) and labels.max() < 4
+    assert np.isnan(cube).any(axis=0).sum() == np.isnan(cube).all(axis=0).sum()
+
+    baseline = {
+        "thresholds": {"relative": 0.5, "absolute_seconds": 0.0},
+        "results": {"small": {"stages": {"ingest": {"seconds": 1.0}, "divide": {"seconds": 1.0}}}},
+    }
+    current = {"results": {"small": {"stages": {
+        "ingest": {"seconds": 1.4}, "divide": {"seconds": 1.6}, "predict": {"skipped": "no tf"},
+    }}}}
+    regressions = compare(current, baseline)
+    assert len(regressions) == 2 and regressions[0].startswith("small/divide")
+    assert regressions[1] == "small/predict: no baseline timing (missing)"